@@ -0,0 +1 @@
+# Suite de benchmarks de performance (voir run_benchmarks.py) et banc de robustesse (voir robustness.py)
@@ -0,0 +1,275 @@
+"""
+Banc de robustesse: taux de décodage et débit du décodeur sous dégradations synthétiques.
+
+Usage (depuis la racine du dépôt):
+    python -m src.benchmarks.robustness [--cases 40] [--seed 1234] [--workers 4]
+                                        [--degradations clean,noise,...] [--configurations default,...]
+                                        [--output report.json]
+
+Chaque cas est un message aléatoire (longueur et niveau ECC tirés avec la graine) encodé puis rendu,
+dégradé selon chaque réglage de DEGRADATIONS (modèle vectorisé: perspective, redimensionnement, flou,
+dégradé d'éclairage, occultation, bruit, compression JPEG), puis décodé avec chaque configuration du
+décodeur de DECODER_CONFIGURATIONS, sur la même image dégradée. Les cas sont répartis entre processus.
+Le rapport JSON donne, par (configuration, dégradation): taux de succès, temps de décodage, temps moyen
+par étape (instrumentation.DecodeStats) et débit; un tableau comparatif est écrit sur stderr.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+from contextlib import contextmanager
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.instrumentation as instr
+import src.core.batch as batch
+
+ROBUSTNESS_SEED = 1234
+DEFAULT_CASES = 40
+CELL_PIXEL_SIZE = 10
+ECC_LEVELS = [10, 20, 30, 50]
+MESSAGE_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 .,-éàç"
+
+# Réglages de dégradation (paramètres de degrade_image; absents = pas de dégradation)
+DEGRADATIONS = {
+    'clean': {},
+    'noise': {'noise_sigma': 14},
+    'blur': {'blur_px': 2.0},
+    'jpeg': {'jpeg_quality': 30},
+    'perspective': {'perspective': 0.012},
+    'lighting': {'lighting_gradient': 0.7},
+    'occlusion': {'occlusion_fraction': 0.01},
+    'rescale': {'rescale': 0.67},
+    'combined': {'rescale': 0.85, 'blur_px': 0.8, 'lighting_gradient': 0.4, 'noise_sigma': 6, 'jpeg_quality': 60},
+}
+
+# Configurations du décodeur comparées: {dictionnaire de protocol_config: valeurs remplacées}
+DECODER_CONFIGURATIONS = {
+    'default': {},
+    'no-illumination': {'ILLUMINATION_CONFIG': {'enabled': False}},
+    'adaptive': {'CLASSIFICATION_CONFIG': {'mode': 'adaptive'}},
+}
+
+@contextmanager
+def decoder_configuration(overrides: dict):
+    """Applique temporairement overrides ({'NOM_CONFIG': {clé: valeur}}) aux dictionnaires de protocol_config."""
+    saved = {}
+    try:
+        for config_name, values in overrides.items():
+            config = getattr(pc, config_name)
+            saved[config_name] = {key: config[key] for key in values}
+            config.update(values)
+        yield
+    finally:
+        for config_name, values in saved.items():
+            getattr(pc, config_name).update(values)
+
+def make_case(seed: int, index: int) -> dict:
+    """Message aléatoire reproductible: {'message', 'ecc'} (longueur de 1 octet à la capacité du symbole)."""
+    rng = random.Random(f"{seed}-case-{index}")
+    ecc_level = rng.choice(ECC_LEVELS)
+    capacity_bytes = en.compute_payload_capacity(ecc_level)[0] // 8
+    length = rng.randint(1, capacity_bytes // 2) # Caractères accentués: jusqu'à 2 octets UTF-8
+    return {'message': "".join(rng.choice(MESSAGE_ALPHABET) for _ in range(length)), 'ecc': ecc_level}
+
+def _perspective_coefficients(np, source_corners, target_corners):
+    """Coefficients PIL PERSPECTIVE qui envoient chaque coin de target_corners (sortie) sur source_corners (entrée)."""
+    rows = []
+    for (x, y), (u, v) in zip(target_corners, source_corners):
+        rows.append([x, y, 1, 0, 0, 0, -u * x, -u * y])
+        rows.append([0, 0, 0, x, y, 1, -v * x, -v * y])
+    return tuple(np.linalg.solve(np.array(rows, dtype=np.float64), np.array(source_corners, dtype=np.float64).ravel()))
+
+def degrade_image(image, params: dict, rng):
+    """
+    Applique le modèle de dégradation à une image RVB, dans l'ordre d'une prise de vue:
+    perspective (déplacement relatif des coins), rescale (facteur d'échelle), blur_px (flou gaussien),
+    lighting_gradient (perte de luminosité relative le long d'une direction aléatoire),
+    occlusion_fraction (rectangle opaque couvrant cette part de la surface), noise_sigma (bruit gaussien),
+    jpeg_quality (compression). rng: numpy.random.Generator (tirages reproductibles).
+    """
+    np = backends.numpy()
+    Image = backends.pil_image()
+    width, height = image.size
+
+    if params.get('perspective'):
+        shift = params['perspective'] * width
+        corners = [(0, 0), (width, 0), (width, height), (0, height)]
+        moved = [(x + rng.uniform(-shift, shift), y + rng.uniform(-shift, shift)) for x, y in corners]
+        image = image.transform(image.size, Image.Transform.PERSPECTIVE,
+                                _perspective_coefficients(np, corners, moved),
+                                Image.Resampling.BICUBIC, fillcolor=pc.WHITE)
+    if params.get('rescale'):
+        image = image.resize((max(1, round(width * params['rescale'])), max(1, round(height * params['rescale']))),
+                             Image.Resampling.BILINEAR)
+    if params.get('blur_px'):
+        image = image.filter(backends.pil_image_filter().GaussianBlur(params['blur_px']))
+
+    pixels = np.asarray(image, dtype=np.float32)
+    if params.get('lighting_gradient'):
+        angle = rng.uniform(0, 2 * np.pi)
+        y, x = np.mgrid[0:pixels.shape[0], 0:pixels.shape[1]]
+        projection = np.cos(angle) * x / pixels.shape[1] + np.sin(angle) * y / pixels.shape[0]
+        projection = (projection - projection.min()) / max(float(np.ptp(projection)), 1e-9)
+        pixels = pixels * (1 - params['lighting_gradient'] * projection)[..., None]
+    if params.get('occlusion_fraction'):
+        side_y = max(1, int(pixels.shape[0] * np.sqrt(params['occlusion_fraction'])))
+        side_x = max(1, int(pixels.shape[1] * np.sqrt(params['occlusion_fraction'])))
+        top = rng.integers(0, pixels.shape[0] - side_y + 1)
+        left = rng.integers(0, pixels.shape[1] - side_x + 1)
+        pixels[top:top + side_y, left:left + side_x] = rng.uniform(0, 255, 3)
+    if params.get('noise_sigma'):
+        pixels = pixels + rng.normal(0, params['noise_sigma'], pixels.shape).astype(np.float32)
+    image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+    if params.get('jpeg_quality'):
+        buffer = io.BytesIO()
+        image.save(buffer, 'JPEG', quality=params['jpeg_quality'])
+        buffer.seek(0)
+        image = Image.open(buffer).convert('RGB')
+    return image
+
+class _CaseTask:
+    """Tâche picklable: un cas, une dégradation, toutes les configurations du décodeur."""
+
+    def __init__(self, seed: int, configurations: dict):
+        self.seed = seed
+        self.configurations = configurations
+
+    def __call__(self, item: tuple) -> list[dict]:
+        degradation_name, params, index = item
+        case = make_case(self.seed, index)
+        image = iu.render_protocol_image(en.encode_message_to_matrix(case['message'], case['ecc']), CELL_PIXEL_SIZE)
+        rng = backends.numpy().random.default_rng([self.seed, index, sum(map(ord, degradation_name))])
+        image = degrade_image(image, params, rng)
+
+        records = []
+        for configuration_name, overrides in self.configurations.items():
+            stats = instr.DecodeStats()
+            error = None
+            with decoder_configuration(overrides):
+                start = time.perf_counter()
+                try:
+                    decoded = de.decode_image_to_message(image, stats) == case['message']
+                    if not decoded:
+                        error = "Wrong message"
+                except (ValueError, RuntimeError) as e:
+                    decoded = False
+                    error = str(e).split(". Details")[0][:80]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+            records.append({'configuration': configuration_name, 'degradation': degradation_name,
+                            'decoded': decoded, 'decode_ms': elapsed_ms, 'stages': dict(stats.stages),
+                            'error': error})
+        return records
+
+def summarize(records: list[dict]) -> list[dict]:
+    """Agrège les résultats par (configuration, dégradation), dans l'ordre de première apparition."""
+    groups = {}
+    for record in records:
+        groups.setdefault((record['configuration'], record['degradation']), []).append(record)
+    summary = []
+    for (configuration_name, degradation_name), group in groups.items():
+        decode_times = [record['decode_ms'] for record in group]
+        stage_names = sorted({name for record in group for name in record['stages']})
+        errors = {}
+        for record in group:
+            if record['error']:
+                errors[record['error']] = errors.get(record['error'], 0) + 1
+        mean_ms = statistics.fmean(decode_times)
+        summary.append({
+            'configuration': configuration_name,
+            'degradation': degradation_name,
+            'cases': len(group),
+            'decoded': sum(record['decoded'] for record in group),
+            'success_rate': sum(record['decoded'] for record in group) / len(group),
+            'mean_decode_ms': mean_ms,
+            'median_decode_ms': statistics.median(decode_times),
+            'decodes_per_s': 1000 / mean_ms if mean_ms > 0 else 0.0, # Par cœur
+            'stages_ms': {name: statistics.fmean(record['stages'].get(name, 0.0) for record in group)
+                          for name in stage_names},
+            'errors': errors,
+        })
+    return summary
+
+def run_harness(cases: int = DEFAULT_CASES, seed: int = ROBUSTNESS_SEED, degradations: dict = None,
+                configurations: dict = None, workers: int = 1) -> dict:
+    """Exécute tous les (cas, dégradation) sur workers processus et retourne le rapport."""
+    degradations = DEGRADATIONS if degradations is None else degradations
+    configurations = DECODER_CONFIGURATIONS if configurations is None else configurations
+    items = ((name, params, index) for name, params in degradations.items() for index in range(cases))
+    start = time.perf_counter()
+    records = [record for records in batch.run_tasks(_CaseTask(seed, configurations), items, workers)
+               for record in records]
+    wall_s = time.perf_counter() - start
+    order = {(c, d): i for i, (c, d) in enumerate((c, d) for d in degradations for c in configurations)}
+    records.sort(key=lambda record: order[(record['configuration'], record['degradation'])])
+    return {
+        'seed': seed,
+        'cases': cases,
+        'workers': workers,
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'degradations': degradations,
+        'configurations': configurations,
+        'wall_s': wall_s,
+        'decodes_per_s': len(records) / wall_s if wall_s > 0 else 0.0, # Tous processus confondus
+        'results': summarize(records),
+    }
+
+def format_table(report: dict) -> str:
+    """Tableau comparatif: une ligne par dégradation, une colonne 'succès % / ms moyen' par configuration."""
+    configurations = list(report['configurations'])
+    by_key = {(result['configuration'], result['degradation']): result for result in report['results']}
+    width = max(16, *(len(name) + 2 for name in configurations))
+    lines = ["degradation".ljust(14) + "".join(name.rjust(width) for name in configurations)]
+    for degradation_name in report['degradations']:
+        cells = []
+        for configuration_name in configurations:
+            result = by_key[(configuration_name, degradation_name)]
+            cells.append(f"{result['success_rate']:.0%} {result['mean_decode_ms']:.1f}ms".rjust(width))
+        lines.append(degradation_name.ljust(14) + "".join(cells))
+    lines.append(f"{report['decodes_per_s']:.0f} decodes/s on {report['workers']} worker(s), {report['wall_s']:.1f} s")
+    return "\n".join(lines)
+
+def _select(names: str, available: dict, kind: str) -> dict:
+    if not names:
+        return available
+    selected = {}
+    for name in names.split(','):
+        if name not in available:
+            raise SystemExit(f"Unknown {kind} '{name}' (available: {', '.join(available)}).")
+        selected[name] = available[name]
+    return selected
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Banc de robustesse du décodeur (dégradations synthétiques).")
+    parser.add_argument('--cases', type=int, default=DEFAULT_CASES, help="Nombre de messages par dégradation.")
+    parser.add_argument('--seed', type=int, default=ROBUSTNESS_SEED, help="Graine des messages et des dégradations.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Processus (défaut: nombre de cœurs).")
+    parser.add_argument('--degradations', help=f"Sous-ensemble séparé par des virgules de: {', '.join(DEGRADATIONS)}.")
+    parser.add_argument('--configurations',
+                        help=f"Sous-ensemble séparé par des virgules de: {', '.join(DECODER_CONFIGURATIONS)}.")
+    parser.add_argument('--output', help="Fichier JSON du rapport (stdout par défaut).")
+    args = parser.parse_args(argv)
+
+    report = run_harness(args.cases, args.seed, _select(args.degradations, DEGRADATIONS, 'degradation'),
+                         _select(args.configurations, DECODER_CONFIGURATIONS, 'configuration'), args.workers)
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report_json + "\n")
+    else:
+        print(report_json)
+    print(format_table(report), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
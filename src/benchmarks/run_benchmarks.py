@@ -0,0 +1,259 @@
+"""
+Suite de benchmarks reproductible pour l'encodeur (dont le choix du masque), le rendu et le décodeur.
+
+Usage (depuis la racine du dépôt):
+    python -m src.benchmarks.run_benchmarks [--quick] [--output results.json]
+                                            [--baseline src/benchmarks/baseline.json] [--threshold 0.25]
+                                            [--update-baseline]
+
+Les entrées sont déterministes (messages générés avec une graine fixe, clé XOR fixe).
+Les résultats sont écrits en JSON; avec --baseline, chaque mesure (son minimum sur les répétitions) est comparée
+à la référence et le script sort avec le code 1 si une étape est plus lente que (1 + seuil) x la référence et d'au moins
+le plancher de bruit (écart absolu, en ms: les étapes de quelques microsecondes ne déclenchent pas d'alerte).
+En mode rapide, le seuil par défaut est QUICK_THRESHOLD: la vitesse d'une machine partagée varie d'une exécution à
+l'autre bien au-delà de 25 %; les régressions fines se vérifient en mode complet sur une machine au repos.
+Les seuils par étape peuvent être fixés dans la référence: {"thresholds": {"decode": 0.5}, "noise_floor_ms": 0.05, ...}.
+Les étapes du décodage sont mesurées sur une image rendue à REFERENCE_CELL_PIXEL_SIZE pixels par cellule dans les
+deux modes: les mesures rapides se comparent à une référence complète. Le décodage est mesuré sur le PNG rendu
+(input=png: lecture directe de la palette exacte) et sur sa copie JPEG (input=jpeg), sur laquelle sont aussi
+mesurées les étapes du chemin calibré (calibrate, sample, parse).
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import src.core.protocol_config as pc
+import src.core.matrix_layout as ml
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.data_processing as dp
+import src.core.masking as masking
+import src.core.illumination as illumination
+import src.core.grid as gr
+import src.core.orientation as orient
+
+BENCHMARK_SEED = 1234
+BENCHMARK_XOR_KEY = '1011001110001111'
+DEFAULT_BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+DEFAULT_THRESHOLD = 0.25 # 25 % plus lent que la référence = régression
+QUICK_THRESHOLD = 1.0 # Mode rapide (contrôle de développement, machine quelconque): seules les régressions grossières
+DEFAULT_NOISE_FLOOR_MS = 0.05 # Écart absolu en dessous duquel un ralentissement n'est pas une régression
+COMPARED_STATISTIC = 'min_ms' # Statistique comparée à la référence (voir compare_with_baseline)
+MIN_SAMPLE_MS = 1.0 # Durée minimale d'une mesure: les appels courts sont répétés en boucle
+REFERENCE_CELL_PIXEL_SIZE = 4 # Taille de cellule de l'image décodée (mêmes clés en mode rapide et complet)
+JPEG_QUALITY = 90 # Copie avec perte de l'image décodée: mesure du chemin calibré du décodeur
+
+FULL_CONFIG = {
+    'message_lengths': [8, 64, 'max'],  # 'max': message qui remplit le symbole au niveau ECC donné
+    'ecc_levels': [0, 20, 50],
+    'cell_pixel_sizes': [2, 4, 10, 20],
+    'repeats': 7,
+}
+
+QUICK_CONFIG = {
+    'message_lengths': [64],
+    'ecc_levels': [20],
+    'cell_pixel_sizes': [4],
+    'repeats': 15, # Peu de mesures par étape: davantage de répétitions pour un minimum stable
+}
+
+def make_message(length, ecc_level_percent: int, seed: int = BENCHMARK_SEED) -> str:
+    """Génère un message ASCII déterministe; length='max' remplit la capacité du symbole."""
+    if length == 'max':
+        target_bits, _ = en.compute_payload_capacity(ecc_level_percent)
+        length = target_bits // 8
+    rng = random.Random(f"{seed}-{length}-{ecc_level_percent}")
+    alphabet = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 "
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+def time_call(func, repeats: int, min_sample_ms: float = MIN_SAMPLE_MS) -> dict:
+    """
+    Exécute func repeats fois (après un appel de chauffe) et retourne les statistiques en ms par appel.
+    Chaque mesure dure au moins min_sample_ms: un appel plus court est répété en boucle (loops) et la durée
+    moyenne est retenue, ce qui stabilise les étapes de quelques microsecondes.
+    """
+    start = time.perf_counter()
+    func() # Chauffe: caches de disposition, imports paresseux
+    warmup_ms = (time.perf_counter() - start) * 1000
+    loops = max(1, int(min_sample_ms / warmup_ms) + 1) if warmup_ms < min_sample_ms else 1
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(loops):
+            func()
+        timings.append((time.perf_counter() - start) * 1000 / loops)
+    return {
+        'median_ms': statistics.median(timings),
+        'min_ms': min(timings),
+        'repeats': repeats,
+        'loops': loops,
+    }
+
+def benchmark_key(name: str, params: dict) -> str:
+    """Identifiant stable d'une mesure, utilisé pour la comparaison avec la référence."""
+    return name + "".join(f"[{k}={params[k]}]" for k in sorted(params))
+
+def run_benchmarks(config: dict, work_dir: str) -> list[dict]:
+    """Exécute toutes les étapes pour chaque combinaison de paramètres de config."""
+    results = []
+
+    def record(name, params, func):
+        stats = time_call(func, config['repeats'])
+        results.append({'name': name, 'params': params, 'key': benchmark_key(name, params), **stats})
+
+    for ecc_level in config['ecc_levels']:
+        for length in config['message_lengths']:
+            message = make_message(length, ecc_level)
+            params = {'ecc': ecc_level, 'length': length}
+
+            record('encode', params, lambda: en.encode_message_to_matrix(message, ecc_level, BENCHMARK_XOR_KEY))
+            bit_matrix = en.encode_message_to_matrix(message, ecc_level, BENCHMARK_XOR_KEY)
+            record('mask', params, lambda: masking.select_mask(bit_matrix))
+
+            image_path = os.path.join(work_dir, f"bench_{ecc_level}_{length}.png")
+            for cell_size in config['cell_pixel_sizes']:
+                render_path = os.path.join(work_dir, f"render_{cell_size}.png")
+                record('render', {**params, 'cell_px': cell_size},
+                       lambda: iu.create_protocol_image(bit_matrix, cell_size, render_path))
+            iu.create_protocol_image(bit_matrix, REFERENCE_CELL_PIXEL_SIZE, image_path)
+            params = {**params, 'cell_px': REFERENCE_CELL_PIXEL_SIZE} # Étapes mesurées sur l'image décodée
+
+            record('load', params, lambda: iu.load_image_from_file(image_path))
+            record('decode', {**params, 'input': 'png'}, lambda: de.decode_image_to_message(image_path))
+
+            # Copie JPEG: les couleurs ne sont plus exactes, le décodeur prend le chemin calibré
+            # (échantillonnage vectorisé, correction d'éclairage, calibration sur les cellules fixes)
+            jpeg_path = os.path.join(work_dir, f"bench_{ecc_level}_{length}.jpg")
+            iu.load_image_from_file(image_path).save(jpeg_path, quality=JPEG_QUALITY)
+            image = iu.load_image_from_file(jpeg_path)
+            if de.exact_palette_cells(image) is not None:
+                raise RuntimeError("Benchmark JPEG input was read by the exact-palette fast path.")
+            params = {**params, 'input': 'jpeg'}
+            cell_px_size = de.estimate_image_parameters(image)
+            grid = gr.measure_grid(image, *orient.timing_lines(orient.IDENTITY)) or gr.uniform_grid(cell_px_size)
+
+            def calibrate():
+                cell_colors = de.sample_cell_colors(image, cell_px_size, grid)
+                if pc.ILLUMINATION_CONFIG['enabled']:
+                    cell_colors = illumination.compensate_cell_colors(cell_colors)
+                return cell_colors, illumination.reference_calibration(cell_colors)
+
+            record('calibrate', params, calibrate)
+            cell_colors, calibration_map = calibrate()
+
+            fill_order = ml.get_data_ecc_fill_order()
+            record('sample', params,
+                   lambda: de.sample_cells(image, cell_px_size, calibration_map, fill_order, cell_colors))
+
+            metadata_stream = "".join(
+                bits for bits, _, _ in de.sample_cells(image, cell_px_size, calibration_map, de.get_metadata_cells(),
+                                                       cell_colors)
+            )
+            record('parse', params, lambda: dp.parse_metadata_bits(metadata_stream))
+
+            record('decode', params, lambda: de.decode_image_to_message(jpeg_path))
+    return results
+
+def compare_with_baseline(results: list[dict], baseline: dict, default_threshold: float,
+                          noise_floor_ms: float = None) -> list[dict]:
+    """
+    Compare le minimum des mesures (COMPARED_STATISTIC) au minimum de référence: le minimum écarte les mesures
+    ralenties par la machine (ordonnancement, fréquence du processeur), qui font varier la médiane d'une exécution
+    à l'autre sans changement de code.
+    Retourne la liste des régressions [{'key', 'min_ms', 'baseline_ms', 'ratio', 'threshold'}].
+    Un ralentissement de moins de noise_floor_ms (par défaut: 'noise_floor_ms' de la référence, sinon
+    DEFAULT_NOISE_FLOOR_MS) n'est pas une régression. Les mesures absentes de la référence sont ignorées.
+    """
+    baseline_by_key = {entry['key']: entry for entry in baseline.get('results', [])}
+    thresholds = baseline.get('thresholds', {})
+    if noise_floor_ms is None:
+        noise_floor_ms = baseline.get('noise_floor_ms', DEFAULT_NOISE_FLOOR_MS)
+    regressions = []
+    for result in results:
+        reference = baseline_by_key.get(result['key'])
+        if reference is None or reference[COMPARED_STATISTIC] <= 0:
+            continue
+        threshold = thresholds.get(result['name'], default_threshold)
+        measured_ms, baseline_ms = result[COMPARED_STATISTIC], reference[COMPARED_STATISTIC]
+        ratio = measured_ms / baseline_ms
+        if ratio > 1 + threshold and measured_ms - baseline_ms > noise_floor_ms:
+            regressions.append({
+                'key': result['key'],
+                COMPARED_STATISTIC: measured_ms,
+                'baseline_ms': baseline_ms,
+                'ratio': ratio,
+                'threshold': threshold,
+            })
+    return regressions
+
+def build_report(results: list[dict], quick: bool) -> dict:
+    """Assemble le rapport JSON (résultats + contexte d'exécution)."""
+    return {
+        'quick': quick,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'matrix_dim': pc.MATRIX_DIM,
+        'reference_cell_px': REFERENCE_CELL_PIXEL_SIZE,
+        'results': results,
+    }
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de l'encodeur/décodeur.")
+    parser.add_argument('--quick', action='store_true', help="Mode rapide pour le développement.")
+    parser.add_argument('--output', help="Fichier JSON de résultats (stdout par défaut).")
+    parser.add_argument('--baseline', help="Fichier JSON de référence à comparer.")
+    parser.add_argument('--threshold', type=float, default=None,
+                        help=f"Ralentissement relatif toléré (0.25 = +25 %%; défaut: {DEFAULT_THRESHOLD}, "
+                             f"{QUICK_THRESHOLD} avec --quick).")
+    parser.add_argument('--noise-floor', type=float, default=None,
+                        help=f"Écart absolu toléré en ms (défaut: celui de la référence, sinon {DEFAULT_NOISE_FLOOR_MS}).")
+    parser.add_argument('--update-baseline', action='store_true',
+                        help="Écrit les résultats dans le fichier --baseline (ou la référence par défaut).")
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        results = run_benchmarks(QUICK_CONFIG if args.quick else FULL_CONFIG, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    report = build_report(results, args.quick)
+
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report_json + "\n")
+    else:
+        print(report_json)
+
+    if args.update_baseline:
+        baseline_path = args.baseline or DEFAULT_BASELINE_PATH
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            f.write(report_json + "\n")
+        print(f"Baseline written to {baseline_path}", file=sys.stderr)
+        return 0
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        threshold = args.threshold
+        if threshold is None:
+            threshold = QUICK_THRESHOLD if args.quick else DEFAULT_THRESHOLD
+        regressions = compare_with_baseline(results, baseline, threshold, args.noise_floor)
+        for regression in regressions:
+            print(f"REGRESSION {regression['key']}: {regression[COMPARED_STATISTIC]:.3f} ms "
+                  f"vs {regression['baseline_ms']:.3f} ms (x{regression['ratio']:.2f}, "
+                  f"threshold +{regression['threshold']:.0%})", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
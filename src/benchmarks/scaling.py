@@ -0,0 +1,140 @@
+"""
+Passage à l'échelle du traitement par lots: débit d'encodage et de décodage selon l'exécuteur et le nombre de workers.
+
+Usage (depuis la racine du dépôt):
+    python -m src.benchmarks.scaling [--items 64] [--seed 1234] [--workers 1,2,4] [--backends process,thread]
+                                     [--output report.json]
+
+Les messages sont déterministes (graine fixe). Pour chaque exécuteur de batch.run_tasks ('process', 'thread')
+et chaque nombre de workers, les messages sont encodés en PNG (batch.encode_job), puis les images sont décodées
+depuis leurs octets (batch.decode_job). Le temps mesuré comprend le démarrage des workers: c'est le coût réel
+d'un lot, et ce que l'exécuteur 'thread' évite. Le rapport JSON donne, par (opération, exécuteur, workers): débit,
+accélération par rapport à un worker et efficacité (accélération / workers); un tableau est écrit sur stderr.
+Les mesures dépendent de la machine (cpu_count figure dans le rapport): au-delà du nombre de cœurs,
+l'accélération plafonne.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+import src.core.protocol_config as pc
+import src.core.batch as batch
+
+SCALING_SEED = 1234
+DEFAULT_ITEMS = 64
+MESSAGE_LENGTH = 64
+CELL_PIXEL_SIZE = 4
+MESSAGE_ALPHABET = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 "
+
+def default_worker_counts(cpu_count: int = None) -> list[int]:
+    """1, 2, 4... jusqu'au nombre de cœurs, plus le nombre de cœurs lui-même."""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    counts = {cpu_count}
+    workers = 1
+    while workers < cpu_count:
+        counts.add(workers)
+        workers *= 2
+    return sorted(counts)
+
+def make_jobs(items: int, seed: int = SCALING_SEED) -> list[dict]:
+    """Tâches d'encodage reproductibles ({'id', 'message', 'ecc'}, voir batch.iter_encode_jobs)."""
+    jobs = []
+    for index in range(items):
+        rng = random.Random(f"{seed}-scaling-{index}")
+        message = "".join(rng.choice(MESSAGE_ALPHABET) for _ in range(MESSAGE_LENGTH))
+        jobs.append({'id': f"{index:08d}", 'message': message, 'ecc': pc.DEFAULT_ECC_LEVEL_PERCENT})
+    return jobs
+
+def _timed_run(func, items: list, workers: int, backend: str) -> tuple[float, list]:
+    start = time.perf_counter()
+    results = list(batch.run_tasks(func, items, workers, backend=backend))
+    return time.perf_counter() - start, results
+
+def run_scaling(items: int = DEFAULT_ITEMS, seed: int = SCALING_SEED, worker_counts: list[int] = None,
+                backends: tuple = pc.BATCH_BACKENDS) -> dict:
+    """
+    Mesure l'encodage et le décodage de items symboles pour chaque (exécuteur, nombre de workers).
+    Un worker (exécution séquentielle, référence de l'accélération) est toujours mesuré.
+    """
+    worker_counts = sorted(set(worker_counts or default_worker_counts()) | {1})
+    encode_task = batch._EncodeTask(CELL_PIXEL_SIZE)
+    jobs = make_jobs(items, seed)
+    images = [{'source': name, 'data': data} for result in map(encode_task, jobs) for name, data in result['files']]
+    operations = {'encode': (encode_task, jobs, lambda result: 'error' not in result),
+                  'decode': (batch.decode_job, images, lambda record: record['ok'])}
+
+    results = []
+    for operation, (func, operation_items, succeeded) in operations.items():
+        for backend in backends:
+            for workers in worker_counts:
+                wall_s, outputs = _timed_run(func, operation_items, workers, backend)
+                if workers == 1:
+                    single_s = wall_s
+                speedup = single_s / wall_s if wall_s > 0 else 0.0
+                results.append({
+                    'operation': operation,
+                    'backend': backend,
+                    'workers': workers,
+                    'items': len(operation_items),
+                    'errors': sum(not succeeded(output) for output in outputs),
+                    'wall_s': wall_s,
+                    'items_per_s': len(operation_items) / wall_s if wall_s > 0 else 0.0,
+                    'speedup': speedup,
+                    'efficiency': speedup / workers,
+                })
+    return {
+        'items': items,
+        'seed': seed,
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'worker_counts': worker_counts,
+        'results': results,
+    }
+
+def format_table(report: dict) -> str:
+    """Tableau texte: une ligne par (opération, exécuteur, workers)."""
+    lines = [f"{'operation':<10}{'backend':<10}{'workers':>8}{'items/s':>10}{'speedup':>9}{'eff.':>7}{'errors':>8}"]
+    for result in report['results']:
+        lines.append(f"{result['operation']:<10}{result['backend']:<10}{result['workers']:>8}"
+                     f"{result['items_per_s']:>10.1f}{result['speedup']:>8.2f}x{result['efficiency']:>7.0%}"
+                     f"{result['errors']:>8}")
+    lines.append(f"({report['items']} items, {report['cpu_count']} CPU(s))")
+    return "\n".join(lines)
+
+def _parse_list(values: str, kind: str, allowed=None) -> list:
+    selected = [value.strip() for value in values.split(',') if value.strip()]
+    if allowed is not None:
+        for value in selected:
+            if value not in allowed:
+                raise SystemExit(f"Unknown {kind} '{value}' (available: {', '.join(allowed)}).")
+    return selected
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Passage à l'échelle de l'encodage/décodage par lots.")
+    parser.add_argument('--items', type=int, default=DEFAULT_ITEMS, help="Nombre de symboles par mesure.")
+    parser.add_argument('--seed', type=int, default=SCALING_SEED, help="Graine des messages.")
+    parser.add_argument('--workers', help="Nombres de workers séparés par des virgules (défaut: 1, 2, 4... cœurs).")
+    parser.add_argument('--backends', default=",".join(pc.BATCH_BACKENDS),
+                        help=f"Sous-ensemble séparé par des virgules de: {', '.join(pc.BATCH_BACKENDS)}.")
+    parser.add_argument('--output', help="Fichier JSON du rapport (stdout par défaut).")
+    args = parser.parse_args(argv)
+
+    worker_counts = sorted({int(value) for value in _parse_list(args.workers, 'worker count')}) if args.workers else None
+    report = run_scaling(args.items, args.seed, worker_counts,
+                         tuple(_parse_list(args.backends, 'backend', pc.BATCH_BACKENDS)))
+    report_json = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(report_json + "\n")
+    else:
+        print(report_json)
+    print(format_table(report), file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
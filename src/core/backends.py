@@ -0,0 +1,33 @@
+# Chargement paresseux des dépendances lourdes (Pillow, NumPy).
+# Le cœur (disposition, encodage en matrice de bits) n'utilise que la bibliothèque standard:
+# ces modules ne sont importés qu'au premier rendu / décodage d'image (sous verrou: sûr entre threads).
+import importlib
+import threading
+
+_modules_cache = {}
+_modules_lock = threading.Lock()
+
+def _load(module_name: str):
+    module = _modules_cache.get(module_name)
+    if module is None:
+        with _modules_lock:
+            module = _modules_cache.get(module_name)
+            if module is None:
+                module = _modules_cache[module_name] = importlib.import_module(module_name)
+    return module
+
+def pil_image():
+    """Retourne le module PIL.Image (importé au premier appel)."""
+    return _load('PIL.Image')
+
+def pil_image_draw():
+    """Retourne le module PIL.ImageDraw (importé au premier appel)."""
+    return _load('PIL.ImageDraw')
+
+def pil_image_filter():
+    """Retourne le module PIL.ImageFilter (importé au premier appel)."""
+    return _load('PIL.ImageFilter')
+
+def numpy():
+    """Retourne le module numpy (importé au premier appel)."""
+    return _load('numpy')
@@ -0,0 +1,429 @@
+import csv
+import glob
+import io
+import json
+import os
+import sys
+import tarfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+import src.core.protocol_config as pc
+import src.core.encoder as encoder
+import src.core.decoder as decoder
+import src.core.image_utils as iu
+import src.core.structured_append as sa
+import src.core.bulk_output as bulk
+import src.core.sheet as sheet
+
+# Traitement par lots (encode / decode) utilisé par la ligne de commande (src/main.py).
+# Les entrées sont lues en flux et au plus max_in_flight tâches sont en cours à la fois:
+# la mémoire reste bornée quelle que soit la taille de l'entrée.
+# Les workers sont des processus ou des threads (voir BATCH_BACKENDS). La bibliothèque est sûre entre threads:
+# les artefacts partagés (profil de protocole, modules chargés paresseusement) sont construits sous verrou et
+# ne sont plus modifiés ensuite.
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.gif', '.tif', '.tiff', '.webp')
+MANIFEST_FILENAME = '_manifest.jsonl'
+BULK_EXTENSIONS = ('.npy', '.tiles') # Sorties en masse: un seul fichier de tuiles projeté en mémoire
+
+# --- Lecture des entrées ---
+
+def iter_encode_jobs(source: str, default_ecc: int = pc.DEFAULT_ECC_LEVEL_PERCENT):
+    """
+    Lit les messages à encoder depuis un fichier JSONL, CSV ou l'entrée standard ('-', JSONL ou texte brut).
+    JSONL: {"id": ..., "message": ..., "ecc": ...} ("id" et "ecc" optionnels).
+    CSV: colonnes id, message, ecc (en-tête obligatoire, "id" et "ecc" optionnels).
+    Texte brut (stdin uniquement): une ligne = un message.
+    Produit des dicts {'id': str, 'message': str, 'ecc': int}; l'id par défaut est le numéro de ligne.
+    """
+    if source == '-':
+        yield from _iter_jsonl_or_text(sys.stdin, default_ecc)
+        return
+    with open(source, encoding='utf-8', newline='') as f:
+        if source.lower().endswith('.csv'):
+            for line_number, row in enumerate(csv.DictReader(f), start=1):
+                yield _make_job(row, line_number, default_ecc)
+        else:
+            yield from _iter_jsonl_or_text(f, default_ecc)
+
+def _iter_jsonl_or_text(stream, default_ecc: int):
+    for line_number, line in enumerate(stream, start=1):
+        line = line.rstrip('\n')
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            record = line
+        if not isinstance(record, dict):
+            record = {'message': line}
+        yield _make_job(record, line_number, default_ecc)
+
+def _make_job(record: dict, line_number: int, default_ecc: int) -> dict:
+    if record.get('message') is None:
+        raise ValueError(f"Input record {line_number} has no 'message' field.")
+    job_id = str(record.get('id') or f"{line_number:08d}")
+    if os.sep in job_id or '/' in job_id or job_id.startswith('.'):
+        raise ValueError(f"Input record {line_number}: invalid id '{job_id}' (used as a file name).")
+    ecc = record.get('ecc')
+    return {'id': job_id, 'message': str(record['message']), 'ecc': int(ecc) if ecc not in (None, '') else default_ecc}
+
+def iter_decode_sources(source: str):
+    """
+    Énumère les images à décoder: répertoire (parcours récursif), motif glob ou archive tar.
+    Produit des dicts {'source': nom, 'path': chemin} ou {'source': nom, 'data': octets} (membres tar).
+    Les archives sont lues membre par membre: un seul membre est chargé en mémoire à la fois.
+    """
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    yield {'source': os.path.relpath(path, source), 'path': path}
+    elif os.path.isfile(source) and tarfile.is_tarfile(source):
+        with tarfile.open(source, 'r:*') as archive:
+            for member in archive:
+                if member.isfile() and member.name.lower().endswith(IMAGE_EXTENSIONS):
+                    yield {'source': member.name, 'data': archive.extractfile(member).read()}
+    else:
+        for path in sorted(glob.iglob(source, recursive=True)):
+            if os.path.isfile(path) and path.lower().endswith(IMAGE_EXTENSIONS):
+                yield {'source': path, 'path': path}
+
+# --- Tâches (exécutées dans les workers) ---
+
+def encode_job(job: dict, cell_pixel_size: int) -> dict:
+    """Encode un message en une ou plusieurs images PNG. Retourne {'id', 'files': [(nom, octets)]} ou {'id', 'error'}."""
+    try:
+        matrices = encoder.encode_message_to_matrices(job['message'], job['ecc'])
+        if len(matrices) == 1:
+            names = [f"{job['id']}.png"]
+        else:
+            names = [f"{job['id']}.{i + 1}of{len(matrices)}.png" for i in range(len(matrices))]
+        files = [
+            (name, iu.encode_image_bytes(iu.render_protocol_image(matrix, cell_pixel_size)))
+            for name, matrix in zip(names, matrices)
+        ]
+        return {'id': job['id'], 'files': files}
+    except Exception as e:
+        return {'id': job['id'], 'error': f"{type(e).__name__}: {e}"}
+
+def encode_tile_job(job: dict, cell_pixel_size: int) -> dict:
+    """
+    Encode un message en une tuile RVB brute (sortie en masse: un seul symbole par message).
+    Retourne {'id', 'index', 'tile': octets} ou {'id', 'index', 'error'}.
+    """
+    try:
+        matrix = encoder.encode_message_to_matrix(job['message'], job['ecc'])
+        return {'id': job['id'], 'index': job['index'], 'tile': bulk.render_tile_bytes(matrix, cell_pixel_size)}
+    except Exception as e:
+        return {'id': job['id'], 'index': job['index'], 'error': f"{type(e).__name__}: {e}"}
+
+def decode_job(item: dict) -> dict:
+    """Décode une image (chemin ou octets). Retourne un enregistrement JSON-sérialisable."""
+    start = time.perf_counter()
+    record = {'source': item['source']}
+    try:
+        image = item['path'] if 'path' in item else io.BytesIO(item['data'])
+        segment = decoder.decode_image_to_segment(image)
+        if segment['total'] == 1:
+            record['ok'] = True
+            record['message'] = segment['data'].decode('utf-8')
+        else:
+            record['ok'] = True
+            record['message'] = None
+            record['segment'] = {key: segment[key] for key in ('index', 'total', 'parity')}
+            record['segment_data'] = segment['data'].hex()
+    except Exception as e:
+        record['ok'] = False
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['ms'] = round((time.perf_counter() - start) * 1000, 3)
+    return record
+
+# --- Exécution ---
+
+class ProgressReporter:
+    """Affiche périodiquement (stderr) le nombre d'éléments traités et le débit."""
+
+    def __init__(self, label: str, stream=None, interval_s: float = 1.0):
+        self.label = label
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval_s = interval_s
+        self.start = time.perf_counter()
+        self.last_report = self.start
+        self.done = 0
+        self.errors = 0
+        self.skipped = 0
+
+    def update(self, ok: bool = True):
+        self.done += 1
+        if not ok:
+            self.errors += 1
+        now = time.perf_counter()
+        if self.interval_s is not None and now - self.last_report >= self.interval_s:
+            self.last_report = now
+            self.report()
+
+    def report(self, final: bool = False):
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        prefix = "done" if final else "progress"
+        print(f"[{self.label}] {prefix}: {self.done} processed, {self.errors} error(s), {self.skipped} skipped, "
+              f"{self.done / elapsed:.1f} items/s", file=self.stream)
+
+    def summary(self) -> dict:
+        elapsed = time.perf_counter() - self.start
+        return {'processed': self.done, 'errors': self.errors, 'skipped': self.skipped,
+                'elapsed_s': elapsed, 'items_per_s': self.done / elapsed if elapsed > 0 else 0.0}
+
+def run_tasks(func, items, workers: int = 1, max_in_flight: int = None, backend: str = None):
+    """
+    Applique func à chaque élément de items (itérable consommé paresseusement) et produit les résultats
+    dans l'ordre d'achèvement. workers <= 1: exécution dans le processus courant.
+    backend: 'process' (func et les éléments doivent être picklables) ou 'thread' (voir pc.BATCH_BACKENDS);
+    par défaut BATCH_CONFIG['backend'].
+    Au plus max_in_flight tâches (4 x workers par défaut) sont soumises en même temps.
+    """
+    backend = backend or pc.BATCH_CONFIG['backend']
+    if backend not in pc.BATCH_BACKENDS:
+        raise ValueError(f"Unknown batch backend '{backend}' (supported: {', '.join(pc.BATCH_BACKENDS)}).")
+    if workers <= 1:
+        for item in items:
+            yield func(item)
+        return
+
+    max_in_flight = max_in_flight or 4 * workers
+    if backend == 'thread':
+        pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch')
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    with pool:
+        yield from _run_bounded(pool, func, items, max_in_flight)
+
+def _run_bounded(pool, func, items, max_in_flight: int):
+    pending = set()
+    for item in items:
+        pending.add(pool.submit(func, item))
+        if len(pending) >= max_in_flight:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+    for future in pending:
+        yield future.result()
+
+class _EncodeTask:
+    """Tâche d'encodage picklable (pour ProcessPoolExecutor)."""
+
+    def __init__(self, cell_pixel_size: int):
+        self.cell_pixel_size = cell_pixel_size
+
+    def __call__(self, job: dict) -> dict:
+        return encode_job(job, self.cell_pixel_size)
+
+class _EncodeTileTask(_EncodeTask):
+    def __call__(self, job: dict) -> dict:
+        return encode_tile_job(job, self.cell_pixel_size)
+
+def _read_manifest_ids(manifest_path: str) -> set:
+    done_ids = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    done_ids.add(json.loads(line)['id'])
+    return done_ids
+
+def run_encode(source: str, output: str, ecc: int = pc.DEFAULT_ECC_LEVEL_PERCENT,
+               cell_pixel_size: int = pc.DEFAULT_CELL_PIXEL_SIZE, workers: int = 1,
+               resume: bool = True, progress: ProgressReporter = None, backend: str = None) -> dict:
+    """
+    Encode tous les messages de source vers output (répertoire, ou archive si output finit par .tar).
+    Les ids terminés sont consignés dans un manifeste JSONL (dans le répertoire, ou <archive>.manifest.jsonl);
+    avec resume, les ids déjà présents dans le manifeste sont sautés. backend: voir run_tasks.
+    Retourne le résumé de ProgressReporter.
+    """
+    if output.lower().endswith(BULK_EXTENSIONS):
+        return run_encode_bulk(source, output, ecc, cell_pixel_size, workers, resume, progress, backend)
+    progress = progress or ProgressReporter('encode')
+    to_archive = output.lower().endswith('.tar')
+    if to_archive:
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        manifest_path = output + '.manifest.jsonl'
+    else:
+        os.makedirs(output, exist_ok=True)
+        manifest_path = os.path.join(output, MANIFEST_FILENAME)
+    done_ids = _read_manifest_ids(manifest_path) if resume else set()
+
+    def pending_jobs():
+        for job in iter_encode_jobs(source, ecc):
+            if job['id'] in done_ids:
+                progress.skipped += 1
+                continue
+            yield job
+
+    archive = tarfile.open(output, 'a' if resume and os.path.exists(output) else 'w') if to_archive else None
+    try:
+        with open(manifest_path, 'a' if resume else 'w', encoding='utf-8') as manifest:
+            for result in run_tasks(_EncodeTask(cell_pixel_size), pending_jobs(), workers, backend=backend):
+                if 'error' in result:
+                    print(f"[encode] {result['id']}: {result['error']}", file=progress.stream)
+                    progress.update(ok=False)
+                    continue
+                for name, data in result['files']:
+                    if archive is not None:
+                        info = tarfile.TarInfo(name)
+                        info.size = len(data)
+                        info.mtime = int(time.time())
+                        archive.addfile(info, io.BytesIO(data))
+                    else:
+                        with open(os.path.join(output, name), 'wb') as f:
+                            f.write(data)
+                manifest.write(json.dumps({'id': result['id'], 'files': [name for name, _ in result['files']]}) + "\n")
+                manifest.flush()
+                progress.update()
+    finally:
+        if archive is not None:
+            archive.close()
+    progress.report(final=True)
+    return progress.summary()
+
+def run_encode_bulk(source: str, output: str, ecc: int = pc.DEFAULT_ECC_LEVEL_PERCENT,
+                    cell_pixel_size: int = pc.DEFAULT_CELL_PIXEL_SIZE, workers: int = 1,
+                    resume: bool = True, progress: ProgressReporter = None, backend: str = None) -> dict:
+    """
+    Encode tous les messages de source dans un seul fichier de tuiles préalloué (output en .npy ou .tiles,
+    voir bulk_output): la tuile i est le symbole du i-ème message. Le nombre de messages est compté par une
+    première lecture de source (stdin n'est donc pas accepté). Le manifeste <output>.manifest.jsonl associe
+    chaque id à l'index de sa tuile; avec resume, le fichier existant est rouvert et les ids déjà présents
+    dans le manifeste sont sautés. Un message qui ne tient pas dans un symbole est une erreur (tuile laissée vide).
+    Retourne le résumé de ProgressReporter.
+    """
+    if source == '-':
+        raise ValueError("Bulk output needs a file input: stdin cannot be counted before encoding.")
+    progress = progress or ProgressReporter('encode')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    manifest_path = output + '.manifest.jsonl'
+    count = sum(1 for _ in iter_encode_jobs(source, ecc))
+    if not count:
+        raise ValueError(f"No message to encode in {source}.")
+    done_ids = _read_manifest_ids(manifest_path) if resume else set()
+
+    def pending_jobs():
+        for index, job in enumerate(iter_encode_jobs(source, ecc)):
+            if job['id'] in done_ids:
+                progress.skipped += 1
+                continue
+            yield {**job, 'index': index}
+
+    with bulk.BulkTileWriter(output, count, cell_pixel_size, reuse_existing=resume) as writer, \
+         open(manifest_path, 'a' if resume else 'w', encoding='utf-8') as manifest:
+        for result in run_tasks(_EncodeTileTask(cell_pixel_size), pending_jobs(), workers, backend=backend):
+            if 'error' in result:
+                print(f"[encode] {result['id']}: {result['error']}", file=progress.stream)
+                progress.update(ok=False)
+                continue
+            writer.write_tile_bytes(result['index'], result['tile'])
+            manifest.write(json.dumps({'id': result['id'], 'index': result['index']}) + "\n")
+            manifest.flush()
+            progress.update()
+    progress.report(final=True)
+    return progress.summary()
+
+def run_sheet(source: str, output: str, ecc: int = pc.DEFAULT_ECC_LEVEL_PERCENT, layout: dict = None,
+              progress: ProgressReporter = None) -> dict:
+    """
+    Encode tous les messages de source et les dispose en planches d'étiquettes (voir sheet.write_sheets):
+    un PDF multipage, ou un fichier image par page. Les symboles d'ajout structuré d'un message se suivent.
+    Retourne le résumé de ProgressReporter, complété par la liste 'pages' des fichiers écrits.
+    """
+    progress = progress or ProgressReporter('sheet')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+
+    def matrices():
+        for job in iter_encode_jobs(source, ecc):
+            try:
+                job_matrices = encoder.encode_message_to_matrices(job['message'], job['ecc'])
+            except Exception as e:
+                print(f"[sheet] {job['id']}: {type(e).__name__}: {e}", file=progress.stream)
+                progress.update(ok=False)
+                continue
+            yield from job_matrices
+            progress.update()
+
+    pages = sheet.write_sheets(matrices(), output, layout)
+    progress.report(final=True)
+    return {**progress.summary(), 'pages': pages}
+
+def run_decode(source: str, output: str, workers: int = 1, resume: bool = True,
+               progress: ProgressReporter = None, backend: str = None) -> dict:
+    """
+    Décode toutes les images de source (répertoire, glob ou archive tar) et écrit un enregistrement JSONL
+    par image dans output ('-' pour stdout). Les segments d'ajout structuré sont regroupés: un
+    enregistrement supplémentaire {'sources': [...], 'message': ...} est écrit quand une séquence est complète,
+    ou {'sources': [...], 'ok': False, 'error': ...} quand une séquence incomplète est abandonnée par
+    l'assembleur (plus de max_pending_sequences séquences en cours).
+    Avec resume, les sources déjà présentes dans output sont sautées, et les segments déjà décodés d'une
+    séquence encore ouverte (sans enregistrement 'sources') sont rechargés dans l'assembleur. backend: voir run_tasks.
+    Retourne le résumé de ProgressReporter.
+    """
+    progress = progress or ProgressReporter('decode')
+    done_sources = set()
+    previous_records = []
+    if resume and output != '-' and os.path.exists(output):
+        with open(output, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    previous_records.append(record)
+                    if 'source' in record:
+                        done_sources.add(record['source'])
+    closed_sources = {source for record in previous_records for source in record.get('sources', ())}
+    pending_segments = [record for record in previous_records
+                        if record.get('segment') and record['source'] not in closed_sources]
+
+    def pending_items():
+        for item in iter_decode_sources(source):
+            if item['source'] in done_sources:
+                progress.skipped += 1
+                continue
+            yield item
+
+    segment_sources = {}
+    out = sys.stdout if output == '-' else open(output, 'a' if resume else 'w', encoding='utf-8')
+
+    def evict(parity, total):
+        sources = segment_sources.pop((parity, total), [])
+        error = f"Incomplete structured append sequence abandoned ({len(sources)} source(s), {total} segment(s) expected)."
+        out.write(json.dumps({'sources': sources, 'ok': False, 'error': error}) + "\n")
+
+    assembler = sa.StructuredAppendAssembler(on_evict=evict)
+
+    def add_segment(record):
+        key = (record['segment']['parity'], record['segment']['total'])
+        segment_sources.setdefault(key, []).append(record['source'])
+        try:
+            message = assembler.add_segment({**record['segment'], 'data': bytes.fromhex(record['segment_data'])})
+        except ValueError as e:
+            out.write(json.dumps({'sources': segment_sources.pop(key), 'ok': False, 'error': str(e)}) + "\n")
+            return
+        if message is not None:
+            out.write(json.dumps({'sources': segment_sources.pop(key), 'ok': True, 'message': message},
+                                 ensure_ascii=False) + "\n")
+
+    try:
+        # Une interruption entre un segment et l'enregistrement de sa séquence complète se rattrape ici.
+        for record in pending_segments:
+            add_segment(record)
+        out.flush()
+        for record in run_tasks(decode_job, pending_items(), workers, backend=backend):
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            progress.update(ok=record['ok'])
+            if record.get('segment'):
+                add_segment(record)
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    progress.report(final=True)
+    return progress.summary()
@@ -0,0 +1,209 @@
+import ast
+import mmap
+import os
+import struct
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+
+# Sortie en masse: un lot de symboles rendu directement dans un seul fichier préalloué et projeté en mémoire
+# (mmap), sans fichier ni encodage PNG par symbole. Deux formats:
+# - 'raw' (.tiles): en-tête fixe + index (une entrée par tuile) + tuiles RVB uint8 de taille fixe,
+#   alignées sur une page: la tuile i est à data_offset + i * stride.
+# - 'npy' (.npy): tableau NumPy (count, hauteur, largeur, 3) uint8, lisible par numpy.load(mmap_mode='r').
+# Les deux formats sont écrits avec la bibliothèque standard; la mémoire utilisée ne dépend pas de la taille du lot.
+
+RAW_MAGIC = b'SYMTILES'
+RAW_FORMAT_VERSION = 1
+# magic, version, canaux, largeur, hauteur, taille de cellule, nombre de tuiles, offset de l'index, offset des données
+_RAW_HEADER = struct.Struct('<8sHHIIIIQQ')
+# offset de la tuile, drapeaux (TILE_WRITTEN)
+_RAW_INDEX_ENTRY = struct.Struct('<QI4x')
+_NPY_MAGIC = b'\x93NUMPY'
+_DATA_ALIGNMENT = 4096
+CHANNELS = 3
+
+TILE_WRITTEN = 1
+
+_color_pixels = {bits: bytes(rgb) for bits, rgb in pc.BITS_TO_COLOR_MAP.items()}
+
+def bulk_format_for_path(path: str) -> str:
+    """'npy' pour un chemin en .npy, 'raw' sinon."""
+    return 'npy' if path.lower().endswith('.npy') else 'raw'
+
+def render_tile_bytes(bit_matrix, cell_pixel_size: int) -> bytes:
+    """Rend bit_matrix en pixels RVB bruts (ligne par ligne, uint8), sans Pillow."""
+    pixel_rows = []
+    for row in bit_matrix:
+        line = b"".join(_color_pixels.get(bits, bytes(pc.WHITE)) * cell_pixel_size for bits in row)
+        pixel_rows.append(line * cell_pixel_size)
+    return b"".join(pixel_rows)
+
+def _align(offset: int) -> int:
+    return -(-offset // _DATA_ALIGNMENT) * _DATA_ALIGNMENT
+
+def _npy_header(count: int, height: int, width: int) -> bytes:
+    header = repr({'descr': '|u1', 'fortran_order': False, 'shape': (count, height, width, CHANNELS)})
+    # Version 1.0: magic + version + longueur (uint16) + dictionnaire complété par des espaces et '\n'
+    preamble_length = len(_NPY_MAGIC) + 2 + 2
+    padded_length = -(-(preamble_length + len(header) + 1) // 64) * 64
+    header = header + ' ' * (padded_length - preamble_length - len(header) - 1) + '\n'
+    return _NPY_MAGIC + bytes([1, 0]) + struct.pack('<H', len(header)) + header.encode('latin1')
+
+def _read_layout(mapped) -> dict:
+    """Lit l'en-tête d'un fichier de tuiles (raw ou npy) projeté en mémoire."""
+    if mapped[:len(RAW_MAGIC)] == RAW_MAGIC:
+        (_, version, channels, width, height, cell_pixel_size,
+         count, index_offset, data_offset) = _RAW_HEADER.unpack_from(mapped, 0)
+        if version != RAW_FORMAT_VERSION or channels != CHANNELS:
+            raise ValueError(f"Unsupported tile file (version {version}, {channels} channels).")
+        return {'format': 'raw', 'count': count, 'height': height, 'width': width,
+                'cell_pixel_size': cell_pixel_size, 'index_offset': index_offset, 'data_offset': data_offset}
+    if mapped[:len(_NPY_MAGIC)] == _NPY_MAGIC:
+        header_length = struct.unpack_from('<H', mapped, 8)[0]
+        header = ast.literal_eval(mapped[10:10 + header_length].decode('latin1'))
+        if header['descr'] != '|u1' or header['fortran_order'] or len(header['shape']) != 4:
+            raise ValueError(f"Unsupported .npy tile file: {header}.")
+        count, height, width, channels = header['shape']
+        if channels != CHANNELS:
+            raise ValueError(f"Unsupported .npy tile file: {channels} channels.")
+        return {'format': 'npy', 'count': count, 'height': height, 'width': width,
+                'cell_pixel_size': height // pc.MATRIX_DIM, 'index_offset': None, 'data_offset': 10 + header_length}
+    raise ValueError("Not a tile file (unknown magic).")
+
+class BulkTileWriter:
+    """
+    Écrit des symboles dans un fichier de tuiles préalloué (voir bulk_format_for_path).
+    Le fichier est créé à sa taille finale puis projeté en mémoire; chaque tuile est écrite à sa place.
+    reuse_existing: rouvre un fichier existant de même géométrie au lieu de le recréer (reprise).
+    """
+
+    def __init__(self, path: str, count: int, cell_pixel_size: int, reuse_existing: bool = False):
+        if count <= 0:
+            raise ValueError("Tile count must be positive.")
+        self.path = path
+        self.count = count
+        self.cell_pixel_size = cell_pixel_size
+        self.format = bulk_format_for_path(path)
+        self.height = self.width = pc.MATRIX_DIM * cell_pixel_size
+        self.stride = self.height * self.width * CHANNELS
+
+        if self.format == 'npy':
+            header = _npy_header(count, self.height, self.width)
+            self.index_offset = None
+            self.data_offset = len(header)
+        else:
+            header = None
+            self.index_offset = _RAW_HEADER.size
+            self.data_offset = _align(self.index_offset + count * _RAW_INDEX_ENTRY.size)
+        total_size = self.data_offset + count * self.stride
+
+        reused = reuse_existing and os.path.exists(path)
+        if reused and os.path.getsize(path) != total_size:
+            raise ValueError(f"Existing tile file {path} has a different geometry.")
+        self._mapped = None
+        self._file = open(path, 'r+b' if reused else 'w+b')
+        if not reused:
+            self._file.truncate(total_size) # Fichier creux: pas d'écriture de zéros
+        self._mapped = mmap.mmap(self._file.fileno(), total_size)
+        if reused:
+            layout = _read_layout(self._mapped)
+            if (layout['count'], layout['height'], layout['width']) != (count, self.height, self.width):
+                self.close()
+                raise ValueError(f"Existing tile file {path} has a different geometry.")
+        elif self.format == 'npy':
+            self._mapped[:len(header)] = header
+        else:
+            _RAW_HEADER.pack_into(self._mapped, 0, RAW_MAGIC, RAW_FORMAT_VERSION, CHANNELS, self.width, self.height,
+                                  cell_pixel_size, count, self.index_offset, self.data_offset)
+            for i in range(count):
+                _RAW_INDEX_ENTRY.pack_into(self._mapped, self.index_offset + i * _RAW_INDEX_ENTRY.size,
+                                           self.data_offset + i * self.stride, 0)
+
+    def write_tile_bytes(self, index: int, tile: bytes):
+        """Copie une tuile déjà rendue (render_tile_bytes) à la position index."""
+        if not 0 <= index < self.count:
+            raise IndexError(f"Tile index {index} out of range (0-{self.count - 1}).")
+        if len(tile) != self.stride:
+            raise ValueError(f"Tile has {len(tile)} bytes, expected {self.stride}.")
+        offset = self.data_offset + index * self.stride
+        self._mapped[offset:offset + self.stride] = tile
+        if self.index_offset is not None:
+            entry_offset = self.index_offset + index * _RAW_INDEX_ENTRY.size
+            _RAW_INDEX_ENTRY.pack_into(self._mapped, entry_offset, offset, TILE_WRITTEN)
+
+    def write(self, index: int, bit_matrix):
+        """Rend bit_matrix et l'écrit à la position index."""
+        self.write_tile_bytes(index, render_tile_bytes(bit_matrix, self.cell_pixel_size))
+
+    def close(self):
+        if self._mapped is not None:
+            self._mapped.flush()
+            self._mapped.close()
+            self._mapped = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class TileFile:
+    """
+    Lecture d'un fichier de tuiles (raw ou npy) projeté en mémoire, sans copie:
+    tile(i) retourne une memoryview sur les octets RVB de la tuile i.
+    """
+
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        layout = _read_layout(self._mapped)
+        self.format = layout['format']
+        self.count = layout['count']
+        self.height = layout['height']
+        self.width = layout['width']
+        self.cell_pixel_size = layout['cell_pixel_size']
+        self.stride = self.height * self.width * CHANNELS
+        self._index_offset = layout['index_offset']
+        self._data_offset = layout['data_offset']
+        self._view = memoryview(self._mapped)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def is_written(self, index: int) -> bool:
+        """Vrai si la tuile a été écrite (toujours vrai pour le format npy, qui n'a pas d'index)."""
+        if self._index_offset is None:
+            return True
+        _, flags = _RAW_INDEX_ENTRY.unpack_from(self._mapped, self._index_offset + index * _RAW_INDEX_ENTRY.size)
+        return bool(flags & TILE_WRITTEN)
+
+    def tile(self, index: int) -> memoryview:
+        if not 0 <= index < self.count:
+            raise IndexError(f"Tile index {index} out of range (0-{self.count - 1}).")
+        offset = self._data_offset + index * self.stride
+        return self._view[offset:offset + self.stride]
+
+    def tile_image(self, index: int):
+        """Tuile index sous forme d'image PIL (copie)."""
+        return backends.pil_image().frombytes("RGB", (self.width, self.height), bytes(self.tile(index)))
+
+    def as_numpy(self):
+        """Vue NumPy (count, hauteur, largeur, 3) sur le fichier, sans copie."""
+        np = backends.numpy()
+        return np.frombuffer(self._mapped, dtype=np.uint8, count=self.count * self.stride,
+                             offset=self._data_offset).reshape(self.count, self.height, self.width, CHANNELS)
+
+    def close(self):
+        self._view.release()
+        self._mapped.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
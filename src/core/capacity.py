@@ -0,0 +1,71 @@
+import src.core.protocol_config as pc
+import src.core.profile as pf
+import src.core.structured_append as sa
+
+# Planification de capacité: indique si un message tient dans un symbole sans construire de matrice ni
+# d'image. Les capacités (bits de message, bits ECC) sont précalculées à la compilation du profil de protocole
+# pour chaque version et chaque niveau d'ECC (0 à 100 %, voir profile.compile_profile); une requête se résume
+# ensuite à une recherche dans ces tables
+# et à la longueur UTF-8 du message (immédiate pour un texte ASCII). Le choix de version reproduit celui de
+# encoder.encode_message_to_matrix: version 2 (masquée) si le message y tient et que le masquage est actif,
+# sinon version 1 (capacité maximale).
+
+ECC_LEVELS = pf.ECC_LEVELS
+
+def capacity_tables(profile: pf.ProtocolProfile = None):
+    """Tables {version: {niveau ECC: (bits de message, bits ECC)}} du profil (lecture seule)."""
+    return pf.resolve(profile).capacity_tables
+
+def message_length(message: str | bytes) -> int:
+    """Longueur en octets du message encodé (UTF-8 pour un texte)."""
+    if isinstance(message, str):
+        return len(message) if message.isascii() else len(message.encode('utf-8'))
+    return len(message)
+
+def _capacity(version: int, ecc_level_percent: int, profile: pf.ProtocolProfile = None) -> tuple[int, int]:
+    try:
+        return capacity_tables(profile)[version][ecc_level_percent]
+    except (KeyError, TypeError):
+        raise ValueError("ecc_level_percent must be an integer between 0 and 100.")
+
+def plan_length(length_bytes: int, ecc_level_percent: int, structured_append: bool = False,
+                profile: pf.ProtocolProfile = None) -> dict:
+    """
+    Plan d'encodage d'un message de length_bytes octets au niveau ecc_level_percent.
+    Retourne {'fits', 'version', 'symbols', 'message_bits', 'capacity_bits', 'ecc_bits', 'headroom_bits'}:
+    version est celle du symbole produit (None si le message ne tient pas), capacity_bits et ecc_bits la
+    répartition du payload de ce symbole, headroom_bits la place restante (négative: dépassement, mesuré par
+    rapport au symbole de version 1).
+    structured_append: accepter un découpage sur plusieurs symboles (voir encode_message_to_matrices);
+    symbols est alors le nombre de symboles de la séquence.
+    """
+    if length_bytes < 0:
+        raise ValueError("length_bytes must be non-negative.")
+    message_bits = length_bytes * 8
+    base_bits, base_ecc_bits = _capacity(pc.PROTOCOL_VERSION_BASE, ecc_level_percent, profile)
+    extended_bits, extended_ecc_bits = _capacity(pc.PROTOCOL_VERSION_EXTENDED, ecc_level_percent, profile)
+    plan = {'fits': True, 'version': pc.PROTOCOL_VERSION_BASE, 'symbols': 1, 'message_bits': message_bits,
+            'capacity_bits': base_bits, 'ecc_bits': base_ecc_bits, 'headroom_bits': base_bits - message_bits}
+
+    if message_bits <= extended_bits and pc.MASKING_CONFIG['enabled']:
+        plan.update(version=pc.PROTOCOL_VERSION_EXTENDED, capacity_bits=extended_bits, ecc_bits=extended_ecc_bits,
+                    headroom_bits=extended_bits - message_bits)
+    elif message_bits > base_bits:
+        chunk_bytes = extended_bits // 8 - sa.structured_append_header_length()
+        symbols = -(-length_bytes // chunk_bytes) if chunk_bytes > 0 else 0
+        if structured_append and 0 < symbols <= sa.max_structured_append_symbols():
+            # Segments de version 2; la place restante est celle du dernier segment.
+            plan.update(version=pc.PROTOCOL_VERSION_EXTENDED, symbols=symbols, capacity_bits=extended_bits,
+                        ecc_bits=extended_ecc_bits, headroom_bits=(symbols * chunk_bytes - length_bytes) * 8)
+        else:
+            plan.update(fits=False, version=None, symbols=symbols if structured_append else 1)
+    return plan
+
+def plan_message(message: str | bytes, ecc_level_percent: int, structured_append: bool = False,
+                 profile: pf.ProtocolProfile = None) -> dict:
+    """Plan d'encodage d'un message texte ou binaire (voir plan_length)."""
+    return plan_length(message_length(message), ecc_level_percent, structured_append, profile)
+
+def message_fits(message: str | bytes, ecc_level_percent: int, profile: pf.ProtocolProfile = None) -> bool:
+    """Vrai si le message tient dans un seul symbole (encode_message_to_matrix ne lèvera pas d'erreur de taille)."""
+    return message_length(message) * 8 <= _capacity(pc.PROTOCOL_VERSION_BASE, ecc_level_percent, profile)[0]
@@ -0,0 +1,133 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.profile as pf
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Chargement adaptatif des grandes captures (photos, caméras industrielles de 12 à 50 MP).
+# Le décodeur n'a besoin que de quelques pixels par cellule: au lieu de décoder et convertir toute
+# l'image en RVB, on
+# 1. décode un aperçu réduit (JPEG: décodage réduit "draft" de libjpeg, 1/2 à 1/8; autres formats: reduce);
+# 2. y localise le symbole grâce aux anneaux noirs des motifs de détection (FP), sur un fond clair;
+# 3. ne rééchantillonne que cette région, à partir de la résolution utile la plus basse
+#    (nouveau décodage réduit pour un JPEG), en une image de travail de working_cell_px pixels par cellule.
+# Les petites images (jusqu'à max_direct_cell_px pixels par cellule) sont décodées telles quelles.
+
+def _is_image(source) -> bool:
+    return isinstance(source, backends.pil_image().Image)
+
+def _open(source):
+    """Ouvre source (chemin ou fichier binaire) sans décoder les pixels."""
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return backends.pil_image().open(source)
+
+def _reduced_size(size: tuple[int, int], factor: float) -> tuple[int, int]:
+    return tuple(max(1, int(side / factor)) for side in size)
+
+def _ring_line(dark_line, pitch: float, core_cells: int):
+    """
+    (premier, dernier + 1) pixel sombre d'une ligne et écart de ses deux séries sombres extrêmes à la largeur
+    d'un cœur de FP (core_cells cellules): faible si la ligne traverse deux FP en leur centre.
+    """
+    np = backends.numpy()
+    dark_pixels = np.flatnonzero(dark_line)
+    if len(dark_pixels) == 0:
+        return None
+    breaks = np.flatnonzero(np.diff(dark_pixels) > 1)
+    first_run = (dark_pixels[breaks[0]] if len(breaks) else dark_pixels[-1]) - dark_pixels[0] + 1
+    last_run = dark_pixels[-1] - (dark_pixels[breaks[-1] + 1] if len(breaks) else dark_pixels[0]) + 1
+    return dark_pixels[0], dark_pixels[-1] + 1, abs(first_run - core_cells * pitch) + abs(last_run - core_cells * pitch)
+
+def locate_symbol(image: Image.Image, profile: pf.ProtocolProfile = None) -> tuple[float, float, float, float] | None:
+    """
+    Localise le symbole (tourné d'un nombre de quarts de tour ou non, éventuellement en miroir) dans une
+    image RVB à fond clair.
+    Retourne la boîte (gauche, haut, droite, bas) en pixels, ou None si la géométrie trouvée est incohérente.
+
+    Seuls les anneaux noirs des FP (cellules 1 à MATRIX_DIM - 2) sont garantis sombres: l'étendue du contenu
+    sombre donne le pas de la grille à une cellule près, ce qui suffit pour tracer des lignes à travers les
+    centres des FP. Les FP occupent trois coins: l'un des bords haut/bas porte deux FP, de même pour
+    gauche/droite. Le long de la ligne qui traverse deux FP (séries sombres extrêmes de la largeur d'un cœur
+    de FP), les premier et dernier pixels sombres sont les bords extérieurs de leurs anneaux (bordés de blanc).
+    """
+    np = backends.numpy()
+    cfg = pc.CAPTURE_CONFIG
+    dark = np.asarray(image.convert('RGB')).min(axis=2) < cfg['dark_threshold']
+    rows = np.flatnonzero(dark.any(axis=1))
+    cols = np.flatnonzero(dark.any(axis=0))
+    if len(rows) == 0:
+        return None
+
+    profile = pf.resolve(profile)
+    core_start, core_end, _, _ = profile.zone_coords['FP_TL_CORE']
+    core_span = profile.matrix_dim - 2 * core_start # Des anneaux des FP de gauche/haut à ceux de droite/bas
+    core_cells = core_end - core_start + 1
+    pitch_estimate = ((rows[-1] - rows[0] + 1) + (cols[-1] - cols[0] + 1)) / 2 / (profile.matrix_dim - 1)
+    # Centre d'un FP mesuré depuis le bord du contenu, qui est la cellule 0 ou la cellule core_start
+    center_offset = ((core_start + core_end + 1) / 2 - core_start / 2) * pitch_estimate
+    horizontal = [_ring_line(dark[min(max(int(y), 0), dark.shape[0] - 1)], pitch_estimate, core_cells)
+                  for y in (rows[0] + center_offset, rows[-1] + 1 - center_offset)]
+    vertical = [_ring_line(dark[:, min(max(int(x), 0), dark.shape[1] - 1)], pitch_estimate, core_cells)
+                for x in (cols[0] + center_offset, cols[-1] + 1 - center_offset)]
+    horizontal = [line for line in horizontal if line is not None]
+    vertical = [line for line in vertical if line is not None]
+    if not horizontal or not vertical:
+        return None
+
+    # Une série de cellules de données sombres peut avoir la largeur d'un cœur de FP (trois couleurs sur quatre
+    # sont sombres): la ligne du bord sans FP imite alors celle des deux FP, mais son étendue compte une
+    # cellule de plus. Le couple retenu est celui dont les étendues horizontale et verticale concordent.
+    (left, right, _), (top, bottom, _) = min(
+        ((h, v) for h in horizontal for v in vertical),
+        key=lambda pair: pair[0][2] + pair[1][2] + abs((pair[0][1] - pair[0][0]) - (pair[1][1] - pair[1][0])))
+    pitch_x = (right - left) / core_span
+    pitch_y = (bottom - top) / core_span
+    if pitch_x <= 0 or abs(pitch_x - pitch_y) > cfg['max_pitch_mismatch'] * max(pitch_x, pitch_y):
+        return None
+    return (float(left - core_start * pitch_x), float(top - core_start * pitch_y),
+            float(right + core_start * pitch_x), float(bottom + core_start * pitch_y))
+
+def load_working_image(source, profile: pf.ProtocolProfile = None) -> Image.Image:
+    """
+    Retourne l'image RVB à décoder pour source (chemin, fichier binaire ou image PIL).
+    Pour une grande capture: région du symbole rééchantillonnée à working_cell_px pixels par cellule
+    (toute l'image si le symbole n'est pas localisé). Sinon: l'image entière, en RVB.
+    """
+    cfg = pc.CAPTURE_CONFIG
+    matrix_dim = pf.resolve(profile).matrix_dim
+    image = source if _is_image(source) else _open(source)
+    width, height = image.size
+    if min(width, height) <= matrix_dim * cfg['max_direct_cell_px']:
+        return image if image.mode == "RGB" else image.convert("RGB")
+
+    # Le décodage réduit n'est possible qu'avant le décodage des pixels, donc sur un fichier que l'on peut rouvrir
+    draft_capable = image.format == 'JPEG' and not _is_image(source)
+    preview_factor = min(width, height) / cfg['preview_min_side']
+    if draft_capable:
+        image.draft('RGB', _reduced_size(image.size, preview_factor))
+        preview = image.convert('RGB')
+    else:
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        preview = image.reduce(max(1, int(preview_factor))).convert('RGB')
+
+    scale_x, scale_y = width / preview.width, height / preview.height
+    box = locate_symbol(preview, profile) or (0, 0, preview.width, preview.height)
+    box = (max(0.0, box[0] * scale_x), max(0.0, box[1] * scale_y),
+           min(float(width), box[2] * scale_x), min(float(height), box[3] * scale_y))
+
+    working_side = matrix_dim * cfg['working_cell_px']
+    if draft_capable:
+        # Résolution la plus basse qui garde au moins working_cell_px pixels par cellule dans la région
+        roi_factor = max(1.0, min(box[2] - box[0], box[3] - box[1]) / working_side)
+        image = _open(source)
+        image.draft('RGB', _reduced_size(image.size, roi_factor))
+        draft_x, draft_y = image.size[0] / width, image.size[1] / height
+        box = (box[0] * draft_x, box[1] * draft_y, box[2] * draft_x, box[3] * draft_y)
+    working = image.resize((working_side, working_side), backends.pil_image().Resampling.BOX, box=box)
+    return working if working.mode == "RGB" else working.convert("RGB")
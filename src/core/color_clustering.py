@@ -0,0 +1,48 @@
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.profile as pf
+
+# Calibration adaptative des couleurs (mode de classification 'adaptive').
+# Les patchs CCP ne couvrent qu'un coin du symbole: sous un éclairage inégal, leurs couleurs s'écartent de
+# celles des cellules éloignées. Partant des couleurs CCP, quelques itérations de k-means (k = taille de la
+# palette) sur les couleurs de toutes les cellules recentrent chaque couleur de référence sur la moyenne de
+# sa classe. Les cellules des motifs fixes (FP, TP, CCP), dont la couleur est connue, sont des ancres:
+# leur classe est imposée, ce qui relie chaque classe à sa paire de bits.
+# Chaque itération tient en quelques opérations NumPy sur un tableau (MATRIX_DIM², 3).
+
+def refine_calibration(
+    cell_colors,
+    calibration_map: dict[str, tuple[int, int, int]],
+    iterations: int = None,
+    profile: pf.ProtocolProfile = None
+    ) -> dict[str, tuple[int, int, int]]:
+    """
+    Affine calibration_map (voir decoder.perform_color_calibration) par k-means sur cell_colors, les
+    couleurs de toutes les cellules (tableau (MATRIX_DIM, MATRIX_DIM, 3), voir decoder.sample_cell_colors),
+    cellules fixes ancrées à leur couleur connue. Retourne une nouvelle calibration_map.
+    """
+    np = backends.numpy()
+    if iterations is None:
+        iterations = pc.CLASSIFICATION_CONFIG['kmeans_iterations']
+    bits_order = sorted(calibration_map)
+    label_of_bits = {bits: k for k, bits in enumerate(bits_order)}
+    profile = pf.resolve(profile)
+    fixed_cells = profile.fixed_cells
+    anchor_indices = np.array([r * profile.matrix_dim + c for r, c, _ in fixed_cells])
+    anchor_labels = np.array([label_of_bits[bits] for _, _, bits in fixed_cells])
+
+    colors = np.asarray(cell_colors, dtype=np.float64).reshape(-1, 3)
+    centroids = np.array([calibration_map[bits] for bits in bits_order], dtype=np.float64)
+    for _ in range(iterations):
+        distances = ((colors[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        labels = distances.argmin(axis=1)
+        labels[anchor_indices] = anchor_labels
+        counts = np.bincount(labels, minlength=len(bits_order))
+        sums = np.stack([np.bincount(labels, weights=colors[:, channel], minlength=len(bits_order))
+                         for channel in range(3)], axis=1)
+        updated = np.where(counts[:, None] > 0, sums / np.maximum(counts, 1)[:, None], centroids)
+        if np.abs(updated - centroids).max() < 0.5: # Convergé (au demi-niveau de gris près)
+            centroids = updated
+            break
+        centroids = updated
+    return {bits: tuple(int(round(v)) for v in centroids[k]) for k, bits in enumerate(bits_order)}
@@ -1,3 +1,4 @@
+import hashlib
 import random
 import src.core.protocol_config as pc
 
@@ -7,7 +8,14 @@ def text_to_padded_bits(text: str, target_bit_length: int) -> str:
     pour atteindre target_bit_length.
     Lève une ValueError si le texte encodé est déjà plus long que target_bit_length.
     """
-    byte_array = text.encode('utf-8')
+    return bytes_to_padded_bits(text.encode('utf-8'), target_bit_length)
+
+def bytes_to_padded_bits(byte_array: bytes, target_bit_length: int) -> str:
+    """
+    Convertit des octets en une chaîne de bits et ajoute un padding de '0'
+    pour atteindre target_bit_length.
+    Lève une ValueError si les octets sont déjà plus longs que target_bit_length.
+    """
     bits_list = []
     for byte in byte_array:
         bits_list.append(format(byte, '08b'))
@@ -27,6 +35,20 @@ def generate_xor_key(bit_length: int) -> str:
         raise ValueError("Bit length must be positive.")
     return ''.join(random.choice('01') for _ in range(bit_length))
 
+def derive_xor_key(seed: bytes, bit_length: int) -> str:
+    """
+    Dérive une clé XOR déterministe (chaîne de bits) de seed par SHA-256.
+    Mêmes entrées -> même clé, donc symboles identiques octet pour octet (utile pour le cache de rendu).
+    """
+    if bit_length <= 0:
+        raise ValueError("Bit length must be positive.")
+    digest = b""
+    counter = 0
+    while len(digest) * 8 < bit_length:
+        digest += hashlib.sha256(counter.to_bytes(4, 'big') + seed).digest()
+        counter += 1
+    return "".join(format(byte, '08b') for byte in digest)[:bit_length]
+
 def apply_xor_cipher(data_bits: str, key_bits: str) -> str:
     """
     Applique un chiffrement XOR entre data_bits et key_bits.
@@ -130,6 +152,40 @@ def format_metadata_bits(
         
     return protected_metadata_bits 
 
+def format_extended_metadata_bits(**field_values: int) -> str:
+    """
+    Assemble le bloc de métadonnées étendues (version 2) selon EXTENDED_METADATA_CONFIG.
+    Les champs non fournis valent 0, les bits réservés sont mis à '0'.
+    Protection: simple répétition du bloc d'information.
+    """
+    cfg = pc.EXTENDED_METADATA_CONFIG
+    known_fields = dict(cfg['fields'])
+
+    unknown = set(field_values) - set(known_fields)
+    if unknown:
+        raise ValueError(f"Unknown extended metadata field(s): {sorted(unknown)}.")
+
+    info_bits_list = []
+    for name, num_bits in cfg['fields']:
+        value = int(field_values.get(name, 0))
+        if not (0 <= value < 2**num_bits):
+            raise ValueError(f"Extended metadata field '{name}' value {value} does not fit on {num_bits} bits.")
+        info_bits_list.append(format(value, f'0{num_bits}b'))
+    info_bits_str = "".join(info_bits_list)
+
+    if len(info_bits_str) > cfg['info_bits']:
+        raise ValueError(f"Extended metadata fields ({len(info_bits_str)} bits) exceed info_bits ({cfg['info_bits']}).")
+    info_bits_str = info_bits_str.ljust(cfg['info_bits'], '0') # Bits réservés
+
+    if cfg['protection_bits'] != cfg['info_bits']:
+        raise NotImplementedError("Only simple repetition is implemented for extended metadata protection.")
+    return info_bits_str + info_bits_str
+
+def extended_metadata_length() -> int:
+    """Retourne la longueur en bits du bloc de métadonnées étendues (information + protection)."""
+    cfg = pc.EXTENDED_METADATA_CONFIG
+    return cfg['info_bits'] + cfg['protection_bits']
+
 # --- Functions for Phase 6: Decoder - Interpretation and Data Recovery ---
 
 def parse_metadata_bits(metadata_stream: str) -> dict:
@@ -210,6 +266,31 @@ def parse_metadata_bits(metadata_stream: str) -> dict:
         'xor_key': xor_key
     }
 
+def parse_extended_metadata_bits(extended_stream: str) -> dict:
+    """
+    Parses the extended metadata block (protocol version 2).
+    Verifies the repetition protection and returns a dict {field_name: value}.
+    """
+    cfg = pc.EXTENDED_METADATA_CONFIG
+    expected_len = extended_metadata_length()
+
+    if len(extended_stream) != expected_len:
+        raise ValueError(
+            f"Extended metadata stream length is incorrect. Expected {expected_len}, got {len(extended_stream)}."
+        )
+
+    block1 = extended_stream[:cfg['info_bits']]
+    block2 = extended_stream[cfg['info_bits']:]
+    if block1 != block2:
+        raise ValueError("Extended metadata protection check failed: repeated blocks do not match.")
+
+    parsed = {}
+    current_pos = 0
+    for name, num_bits in cfg['fields']:
+        parsed[name] = int(block1[current_pos : current_pos + num_bits], 2)
+        current_pos += num_bits
+    return parsed
+
 def verify_simple_ecc(encrypted_data_bits: str, received_ecc_bits: str) -> bool:
     """
     Verifies the simple checksum ECC.
@@ -239,11 +320,69 @@ def verify_simple_ecc(encrypted_data_bits: str, received_ecc_bits: str) -> bool:
         
     return calculated_ecc == received_ecc_bits
 
-def padded_bits_to_text(data_bits: str) -> str:
+def resolve_erasures_simple_ecc(
+    payload_bits: str,
+    message_len: int,
+    erasures: list[tuple[int, str]],
+    max_erasures: int = None
+    ) -> str | None:
     """
-    Converts a bit string (padded UTF-8) back to text.
-    The input data_bits is assumed to be the original message bits that were
-    padded with '0's at the end to reach a certain target length.
+    Tries to fix a payload (encrypted data + checksum ECC) whose checksum does not verify,
+    using erasures: cells flagged as unreliable by the soft-decision classifier.
+    erasures is a list of (bit_offset_in_payload, alternative_bits) where alternative_bits is
+    the second most likely bit pair for that cell.
+    The checksum is a sum of bytes modulo 2^N, so the effect of each alternative is a known
+    additive delta: every combination of alternatives is checked arithmetically without
+    recomputing the checksum. Returns the corrected payload if exactly one combination
+    verifies, None otherwise (no solution, ambiguous solution, or no ECC bits).
+    """
+    num_ecc_bits = len(payload_bits) - message_len
+    if num_ecc_bits <= 0 or num_ecc_bits % 8 != 0 or not erasures:
+        return None
+    if max_erasures is not None:
+        erasures = erasures[:max_erasures]
+
+    modulus = 2**num_ecc_bits
+    data_sum = int(calculate_simple_ecc(payload_bits[:message_len], num_ecc_bits), 2)
+    received_ecc = int(payload_bits[message_len:], 2)
+
+    # Delta apporté par chaque alternative: sur la somme des données, ou sur la valeur ECC reçue
+    deltas = []
+    for offset, alternative_bits in erasures:
+        width = len(alternative_bits)
+        change = int(alternative_bits, 2) - int(payload_bits[offset : offset + width], 2)
+        if offset < message_len:
+            shift = 8 - width - (offset % 8) # Position de la paire de bits dans son octet
+            deltas.append((change << shift, 0))
+        else:
+            shift = num_ecc_bits - width - (offset - message_len)
+            deltas.append((0, change << shift))
+
+    solutions = []
+    for mask in range(1, 2**len(erasures)): # mask = 0 correspond au payload reçu, déjà invalide
+        sum_delta, ecc_delta = 0, 0
+        for i, (d_sum, d_ecc) in enumerate(deltas):
+            if mask >> i & 1:
+                sum_delta += d_sum
+                ecc_delta += d_ecc
+        if (data_sum + sum_delta) % modulus == received_ecc + ecc_delta:
+            solutions.append(mask)
+            if len(solutions) > 1:
+                return None # Ambigu: plusieurs combinaisons vérifient le checksum
+
+    if not solutions:
+        return None
+
+    corrected = list(payload_bits)
+    for i, (offset, alternative_bits) in enumerate(erasures):
+        if solutions[0] >> i & 1:
+            corrected[offset : offset + len(alternative_bits)] = alternative_bits
+    return "".join(corrected)
+
+def padded_bits_to_bytes(data_bits: str) -> bytes:
+    """
+    Converts a bit string back to bytes, ignoring a trailing incomplete byte.
+    Padding is not removed here (see padded_bits_to_text).
     """
     byte_list = []
     # Iterate over the bit string in 8-bit chunks (bytes)
@@ -262,7 +401,15 @@ def padded_bits_to_text(data_bits: str) -> str:
         
         byte_list.append(int(byte_str, 2))
     
-    byte_array = bytes(byte_list)
+    return bytes(byte_list)
+
+def padded_bits_to_text(data_bits: str) -> str:
+    """
+    Converts a bit string (padded UTF-8) back to text.
+    The input data_bits is assumed to be the original message bits that were
+    padded with '0's at the end to reach a certain target length.
+    """
+    byte_array = padded_bits_to_bytes(data_bits)
     
     try:
         # Decode using UTF-8.
@@ -1,10 +1,27 @@
-from PIL import Image
+from __future__ import annotations
+import logging
+from typing import TYPE_CHECKING
 import src.core.protocol_config as pc
-import src.core.matrix_layout as ml
+import src.core.backends as backends
+import src.core.profile as pf
 import src.core.image_utils as iu
 import src.core.data_processing as dp
+import src.core.structured_append as sa
+import src.core.masking as masking
+import src.core.placement as pl
+import src.core.instrumentation as instr
+import src.core.capture as capture
+import src.core.color_clustering as cc
+import src.core.illumination as illumination
+import src.core.grid as gr
+import src.core.orientation as orient
 
-def estimate_image_parameters(image: Image.Image) -> int:
+if TYPE_CHECKING:
+    from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+def estimate_image_parameters(image: Image.Image, profile: pf.ProtocolProfile = None) -> int:
     """
     Estime la taille d'une cellule en pixels (version simplifiée).
     Prend la largeur de l'image et la divise par MATRIX_DIM.
@@ -16,17 +33,20 @@ def estimate_image_parameters(image: Image.Image) -> int:
     # Algorithme simplifié : cell_px = image.width // MATRIX_DIM
     # Pour une version plus robuste, il faudrait détecter les Finder Patterns
     # pour déterminer l'orientation, la perspective, et la taille réelle des cellules.
-    cell_px_size = image.width // pc.MATRIX_DIM
+    matrix_dim = pf.resolve(profile).matrix_dim
+    cell_px_size = image.width // matrix_dim
     
     if cell_px_size <= 0:
         raise ValueError(f"La taille de cellule estimée ({cell_px_size}px) est invalide. "
-                         f"L'image est peut-être trop petite (largeur: {image.width}px) pour la dimension de la matrice ({pc.MATRIX_DIM}).")
+                         f"L'image est peut-être trop petite (largeur: {image.width}px) pour la dimension de la matrice ({matrix_dim}).")
     return cell_px_size
 
-def perform_color_calibration(image: Image.Image, cell_px_size: int) -> dict[str, tuple[int, int, int]]:
+def perform_color_calibration(image: Image.Image, cell_px_size: int, grid=None,
+                              profile: pf.ProtocolProfile = None) -> dict[str, tuple[int, int, int]]:
     """
     Effectue la calibration des couleurs en échantillonnant les couleurs RVB moyennes
     des zones centrales des patches de calibration (CCP).
+    grid: (centres des lignes, centres des colonnes) mesurés (voir grid.measure_grid), à la place du pas entier.
     Retourne une calibration_map: {'00': sampled_white_rgb, '01': sampled_black_rgb, ...}
     """
     if image is None:
@@ -34,9 +54,10 @@ def perform_color_calibration(image: Image.Image, cell_px_size: int) -> dict[str
     if cell_px_size <= 0:
         raise ValueError("La taille de cellule (cell_px_size) doit être positive.")
 
+    profile = pf.resolve(profile)
     calibration_map = {}
     ccp_patch_base_name = 'CCP_PATCH_'
-    expected_ccp_colors = pc.CCP_CONFIG['colors'] # Liste des couleurs RVB attendues pour les patches
+    expected_ccp_colors = profile.settings['CCP_CONFIG']['colors'] # Liste des couleurs RVB attendues pour les patches
     
     # Les bits correspondants aux pc.CCP_CONFIG['colors']
     # Il faut mapper la couleur attendue du patch à sa représentation en bits
@@ -44,13 +65,13 @@ def perform_color_calibration(image: Image.Image, cell_px_size: int) -> dict[str
     # pc.CCP_CONFIG['colors']: [(R,G,B)_0, (R,G,B)_1, ...]
     # calibration_map doit être { 'bits_0': sampled_rgb_for_patch_0, ... }
 
-    bits_for_ccp_color = {color: bits for bits, color in pc.BITS_TO_COLOR_MAP.items()}
+    bits_for_ccp_color = profile.color_to_bits
 
     for i in range(len(expected_ccp_colors)):
         patch_zone_name = f"{ccp_patch_base_name}{i}"
         try:
-            r_start, r_end, c_start, c_end = ml.get_zone_coordinates(patch_zone_name)
-        except ValueError:
+            r_start, r_end, c_start, c_end = profile.zone_coords[patch_zone_name]
+        except KeyError:
             raise ValueError(f"Coordonnées pour {patch_zone_name} non trouvées. Vérifiez matrix_layout.py.")
 
         # Échantillonner la couleur au centre du patch
@@ -59,10 +80,18 @@ def perform_color_calibration(image: Image.Image, cell_px_size: int) -> dict[str
         # Ou, mieux, une petite zone au centre du patch global.
         
         # Coordonnées en pixels du patch
-        patch_x_start_px = c_start * cell_px_size
-        patch_y_start_px = r_start * cell_px_size
-        patch_width_px = (c_end - c_start + 1) * cell_px_size
-        patch_height_px = (r_end - r_start + 1) * cell_px_size
+        if grid is None:
+            patch_x_start_px = c_start * cell_px_size
+            patch_y_start_px = r_start * cell_px_size
+            patch_width_px = (c_end - c_start + 1) * cell_px_size
+            patch_height_px = (r_end - r_start + 1) * cell_px_size
+        else:
+            row_centers, col_centers = grid
+            pitch_x, pitch_y = gr.grid_pitch(col_centers), gr.grid_pitch(row_centers)
+            patch_x_start_px = int(round(col_centers[c_start] - pitch_x / 2))
+            patch_y_start_px = int(round(row_centers[r_start] - pitch_y / 2))
+            patch_width_px = int(round((c_end - c_start + 1) * pitch_x))
+            patch_height_px = int(round((r_end - r_start + 1) * pitch_y))
 
         # Définir une petite zone d'échantillonnage au centre du patch (par exemple, 1/4 de la taille du patch)
         sample_area_width = max(1, patch_width_px // 2)
@@ -104,7 +133,7 @@ def perform_color_calibration(image: Image.Image, cell_px_size: int) -> dict[str
         
         if bits_representation is None:
             raise ValueError(f"La couleur théorique {theoretical_color_of_this_patch} du patch CCP {i} "
-                             f"n'a pas de correspondance dans BITS_TO_COLOR_MAP.")
+                             f"n'a pas de correspondance dans COLOR_TO_BITS_MAP.")
             
         calibration_map[bits_representation] = sampled_rgb
         # print(f"Calibré {bits_representation} (patch {i}, théorique {theoretical_color_of_this_patch}) -> {sampled_rgb}")
@@ -120,12 +149,28 @@ def perform_color_calibration(image: Image.Image, cell_px_size: int) -> dict[str
 def extract_bit_matrix_from_image(
     image: Image.Image, 
     cell_px_size: int, 
-    calibration_map: dict[str, tuple[int, int, int]]
+    calibration_map: dict[str, tuple[int, int, int]],
+    profile: pf.ProtocolProfile = None
     ) -> list[list[str]]:
     """
     Convertit l'image en matrice de bits.
     Échantillonne la couleur au centre de chaque cellule et utilise iu.rgb_to_bits.
     """
+    return extract_soft_bit_matrix_from_image(image, cell_px_size, calibration_map, profile=profile)[0]
+
+def extract_soft_bit_matrix_from_image(
+    image: Image.Image, 
+    cell_px_size: int, 
+    calibration_map: dict[str, tuple[int, int, int]],
+    stats: instr.DecodeStats = None,
+    profile: pf.ProtocolProfile = None
+    ) -> tuple[list[list[str]], list[list[float]], list[list[str]]]:
+    """
+    Variante "souple" de extract_bit_matrix_from_image.
+    Retourne (bit_matrix, confidence_matrix, alternative_matrix): pour chaque cellule, la paire de bits
+    retenue, sa confiance (voir iu.rgb_to_bits_with_confidence) et la paire de bits du second choix.
+    Les cellules hors de l'image restent à None (confiance 0.0); un seul avertissement (logging) est émis par appel.
+    """
     if image is None:
         raise ValueError("L'image fournie est None.")
     if cell_px_size <= 0:
@@ -135,17 +180,22 @@ def extract_bit_matrix_from_image(
 
     # S'attendre à ce que l'image ait des dimensions qui sont des multiples de cell_px_size
     # et correspondent à MATRIX_DIM
-    expected_width = pc.MATRIX_DIM * cell_px_size
-    expected_height = pc.MATRIX_DIM * cell_px_size
+    matrix_dim = pf.resolve(profile).matrix_dim
+    expected_width = matrix_dim * cell_px_size
+    expected_height = matrix_dim * cell_px_size
     if image.width != expected_width or image.height != expected_height:
-        print(f"Warning: Image dimensions ({image.width}x{image.height}) ne correspondent pas exactement "
-              f"aux dimensions attendues ({expected_width}x{expected_height}) basées sur MATRIX_DIM et cell_px_size.")
+        instr.warn(logger, stats,
+                   "Image dimensions (%dx%d) ne correspondent pas exactement aux dimensions attendues (%dx%d) "
+                   "basées sur MATRIX_DIM et cell_px_size.", image.width, image.height, expected_width, expected_height)
 
-    bit_matrix = [[None for _ in range(pc.MATRIX_DIM)] for _ in range(pc.MATRIX_DIM)]
+    bit_matrix = [[None for _ in range(matrix_dim)] for _ in range(matrix_dim)]
+    confidence_matrix = [[0.0 for _ in range(matrix_dim)] for _ in range(matrix_dim)]
+    alternative_matrix = [[None for _ in range(matrix_dim)] for _ in range(matrix_dim)]
     pixel_offset_within_cell = cell_px_size // 2 # Échantillonner au centre de la cellule
+    out_of_bounds_cells = []
 
-    for r_cell in range(pc.MATRIX_DIM): # Ligne de la cellule dans la matrice
-        for c_cell in range(pc.MATRIX_DIM): # Colonne de la cellule dans la matrice
+    for r_cell in range(matrix_dim): # Ligne de la cellule dans la matrice
+        for c_cell in range(matrix_dim): # Colonne de la cellule dans la matrice
             # Calculer le centre en pixels de la cellule
             center_x_px = c_cell * cell_px_size + pixel_offset_within_cell
             center_y_px = r_cell * cell_px_size + pixel_offset_within_cell
@@ -153,25 +203,55 @@ def extract_bit_matrix_from_image(
             # S'assurer que les coordonnées du pixel sont dans les limites de l'image
             if 0 <= center_x_px < image.width and 0 <= center_y_px < image.height:
                 sampled_rgb = image.getpixel((center_x_px, center_y_px))
-                bits_pair = iu.rgb_to_bits(sampled_rgb, calibration_map)
+                bits_pair, confidence, alternative_bits = iu.rgb_to_bits_with_confidence(sampled_rgb, calibration_map)
                 bit_matrix[r_cell][c_cell] = bits_pair
+                confidence_matrix[r_cell][c_cell] = confidence
+                alternative_matrix[r_cell][c_cell] = alternative_bits
             else:
                 # Cela ne devrait pas arriver si l'image a la bonne taille et cell_px_size est correct
-                print(f"Warning: Coordonnées de pixel ({center_x_px},{center_y_px}) hors limites pour la cellule ({r_cell},{c_cell}). Laissant à None.")
                 # bit_matrix[r_cell][c_cell] reste None
+                out_of_bounds_cells.append((r_cell, c_cell))
+
+    if out_of_bounds_cells:
+        # Un seul avertissement agrégé par appel (et non un par cellule)
+        instr.warn(logger, stats, "%d cellule(s) hors limites de l'image laissées à None (première: %s).",
+                   len(out_of_bounds_cells), out_of_bounds_cells[0])
     
-    return bit_matrix
+    return bit_matrix, confidence_matrix, alternative_matrix
 
-def extract_metadata_stream(bit_matrix: list[list[str]]) -> str:
+def find_payload_erasures(
+    confidence_matrix: list[list[float | None]],
+    alternative_matrix: list[list[str]],
+    threshold: float = None,
+    profile: pf.ProtocolProfile = None
+    ) -> list[tuple[int, str, tuple[int, int]]]:
+    """
+    Liste les cellules DATA_ECC dont la confiance est inférieure au seuil (effacements).
+    Retourne [(bit_offset_dans_le_payload, bits_alternatifs, (row, col)), ...],
+    triée de la cellule la moins sûre à la plus sûre.
+    """
+    if threshold is None:
+        threshold = pc.SOFT_DECODING_CONFIG['erasure_confidence_threshold']
+
+    erasures = []
+    for cell_index, (r, c) in enumerate(pf.resolve(profile).fill_order):
+        confidence = confidence_matrix[r][c]
+        if confidence is not None and confidence < threshold and alternative_matrix[r][c] is not None:
+            erasures.append((confidence, cell_index * pc.BITS_PER_CELL, alternative_matrix[r][c], (r, c)))
+    erasures.sort(key=lambda e: e[0])
+    return [(offset, alternative_bits, cell) for _, offset, alternative_bits, cell in erasures]
+
+def extract_metadata_stream(bit_matrix: list[list[str]], profile: pf.ProtocolProfile = None) -> str:
     """
     Extrait le flux de bits des métadonnées à partir de la bit_matrix.
     Lit les bits des cellules METADATA (définies par matrix_layout) et les concatène.
     """
-    if not bit_matrix or not bit_matrix[0] or len(bit_matrix) != pc.MATRIX_DIM or len(bit_matrix[0]) != pc.MATRIX_DIM:
+    profile = pf.resolve(profile)
+    if not bit_matrix or not bit_matrix[0] or len(bit_matrix) != profile.matrix_dim or len(bit_matrix[0]) != profile.matrix_dim:
         raise ValueError("bit_matrix fournie est invalide ou de mauvaise dimension.")
 
     metadata_bits_list = []
-    md_coords = ml.get_zone_coordinates('METADATA_AREA')
+    md_coords = profile.zone_coords['METADATA_AREA']
     md_r_start, md_r_end, md_c_start, md_c_end = md_coords
 
     # Ordre de lecture: balayage ligne par ligne dans la zone de métadonnées
@@ -196,16 +276,17 @@ def extract_metadata_stream(bit_matrix: list[list[str]]) -> str:
                          f"ne correspond pas à METADATA_CONFIG total_bits ({expected_total_metadata_bits}).")
     return metadata_stream
 
-def extract_payload_stream(bit_matrix: list[list[str]]) -> str:
+def extract_payload_stream(bit_matrix: list[list[str]], profile: pf.ProtocolProfile = None) -> str:
     """
     Extrait le flux de bits du payload (données cryptées + ECC) à partir de la bit_matrix.
     Utilise matrix_layout.get_data_ecc_fill_order().
     """
-    if not bit_matrix or not bit_matrix[0] or len(bit_matrix) != pc.MATRIX_DIM or len(bit_matrix[0]) != pc.MATRIX_DIM:
+    profile = pf.resolve(profile)
+    if not bit_matrix or not bit_matrix[0] or len(bit_matrix) != profile.matrix_dim or len(bit_matrix[0]) != profile.matrix_dim:
         raise ValueError("bit_matrix fournie est invalide ou de mauvaise dimension.")
 
     payload_bits_list = []
-    data_ecc_fill_order = ml.get_data_ecc_fill_order()
+    data_ecc_fill_order = profile.fill_order
 
     for r, c in data_ecc_fill_order:
         cell_bits = bit_matrix[r][c]
@@ -225,77 +306,466 @@ def extract_payload_stream(bit_matrix: list[list[str]]) -> str:
 
     return payload_stream
 
-# --- Main Decoding Orchestration (Phase 6/7) ---
+# --- Décodage paresseux: métadonnées d'abord, puis uniquement les cellules du payload ---
 
-def decode_image_to_message(image_path: str) -> str:
+def sample_cell_colors(image: Image.Image, cell_px_size: int, grid=None, profile: pf.ProtocolProfile = None,
+                       cells=None):
     """
-    Decodes a protocol image from the given path and returns the embedded message.
-    Orchestrates the full decoding process.
+    Échantillonne en une seule passe vectorisée la couleur du centre de toutes les cellules.
+    grid: (centres des lignes, centres des colonnes) en pixels (voir grid.measure_grid); par défaut, la grille
+    au pas entier cell_px_size.
+    cells: masque booléen (MATRIX_DIM, MATRIX_DIM) des cellules de l'image à échantillonner (toutes par défaut);
+    les autres cellules valent NaN.
+    Retourne un tableau NumPy (MATRIX_DIM, MATRIX_DIM, 3) de flottants.
+    Lève une ValueError si une cellule tombe hors de l'image.
     """
-    # 1. Load Image and Estimate Parameters
-    try:
-        image = iu.load_image_from_file(image_path)
-    except FileNotFoundError:
-        raise FileNotFoundError(f"Decoder: Image file not found at {image_path}")
-    except Exception as e:
-        raise ValueError(f"Decoder: Error loading image '{image_path}'. Details: {e}")
+    np = backends.numpy()
+    row_centers, col_centers = grid if grid is not None else gr.uniform_grid(cell_px_size, profile)
+    rows = np.floor(row_centers).astype(int)
+    cols = np.floor(col_centers).astype(int)
+    if rows.min() < 0 or cols.min() < 0 or rows.max() >= image.height or cols.max() >= image.width:
+        raise ValueError(f"Coordonnées de pixel ({cols.max()},{rows.max()}) hors limites pour la cellule "
+                         f"({len(row_centers) - 1},{len(col_centers) - 1}).")
+    pixels = np.asarray(image if image.mode == "RGB" else image.convert("RGB"))
+    if cells is None:
+        return pixels[rows][:, cols].astype(np.float64)
+    cell_rows, cell_cols = np.nonzero(cells)
+    colors = np.full((len(rows), len(cols), 3), np.nan)
+    colors[cell_rows, cell_cols] = pixels[rows[cell_rows], cols[cell_cols]]
+    return colors
 
-    cell_px_size = estimate_image_parameters(image)
-    calibration_map = perform_color_calibration(image, cell_px_size)
+def sample_cells(
+    image: Image.Image,
+    cell_px_size: int,
+    calibration_map: dict[str, tuple[int, int, int]],
+    cells: list[tuple[int, int]],
+    cell_colors=None
+    ) -> list[tuple[str, float, str]]:
+    """
+    Échantillonne et classe uniquement les cellules demandées (centre de chaque cellule).
+    Si cell_colors (voir sample_cell_colors) est fourni, les couleurs y sont lues au lieu de l'image.
+    Retourne, dans l'ordre de cells, des tuples (bits, confiance, bits_alternatifs)
+    (voir iu.rgb_to_bits_with_confidence).
+    Lève une ValueError dès qu'une cellule tombe hors de l'image.
+    """
+    if image is None:
+        raise ValueError("L'image fournie est None.")
+    if cell_px_size <= 0:
+        raise ValueError("La taille de cellule (cell_px_size) doit être positive.")
+    if not calibration_map:
+        raise ValueError("La calibration_map est vide.")
 
-    # 2. Extract Bit Matrix and Streams
-    try:
-        bit_matrix = extract_bit_matrix_from_image(image, cell_px_size, calibration_map)
-        metadata_stream = extract_metadata_stream(bit_matrix)
-        payload_stream = extract_payload_stream(bit_matrix)
-    except ValueError as e:
-        # Errors from extract_* functions (e.g. invalid bits, wrong length)
-        raise ValueError(f"Decoder: Error extracting bitstreams from image. Details: {e}")
+    if cell_colors is not None:
+        color_rows = cell_colors.tolist()
+        return [iu.rgb_to_bits_with_confidence(color_rows[r_cell][c_cell], calibration_map) for r_cell, c_cell in cells]
 
-    # 3. Interpret Metadata and Recover Data
-    try:
-        parsed_metadata = dp.parse_metadata_bits(metadata_stream)
-    except ValueError as e:
-        raise ValueError(f"Decoder: Error parsing metadata. Details: {e}")
+    pixel_offset_within_cell = cell_px_size // 2
+    samples = []
+    for r_cell, c_cell in cells:
+        center_x_px = c_cell * cell_px_size + pixel_offset_within_cell
+        center_y_px = r_cell * cell_px_size + pixel_offset_within_cell
+        if not (0 <= center_x_px < image.width and 0 <= center_y_px < image.height):
+            raise ValueError(f"Coordonnées de pixel ({center_x_px},{center_y_px}) hors limites pour la cellule ({r_cell},{c_cell}).")
+        samples.append(iu.rgb_to_bits_with_confidence(image.getpixel((center_x_px, center_y_px)), calibration_map))
+    return samples
+
+def _exact_fixed_cells(profile: pf.ProtocolProfile):
+    """(lignes, colonnes, indices de palette attendus) des cellules des motifs fixes (tableaux en lecture seule)."""
+    def build():
+        np = backends.numpy()
+        palette_index = {bits: index for index, bits in enumerate(profile.bits_order)}
+        rows, cols, indices = zip(*((r, c, palette_index[bits]) for r, c, bits in profile.fixed_cells))
+        return pf.read_only(np.array(rows), np.array(cols), np.array(indices))
+    return profile.cached('exact_fixed_cells', build)
+
+def exact_palette_cells(image: Image.Image, profile: pf.ProtocolProfile = None):
+    """
+    Lecture directe d'une image sans perte aux couleurs exactes de la palette (rendu de render_protocol_image).
+    L'image doit être carrée, de côté multiple de MATRIX_DIM, chaque cellule uniforme et d'une couleur de
+    COLOR_TO_BITS_MAP (image en mode palette 'P' ou RVB), et les motifs fixes intacts dans l'une des
+    orientations de orientation.ORIENTATIONS. Le symbole de chaque cellule est alors lu par index de palette:
+    ni calibration ni distance.
+    Retourne la matrice des paires de bits (MATRIX_DIM x MATRIX_DIM) dans l'orientation de référence, ou None
+    si l'image ne remplit pas ces
+    conditions (le décodage suit alors le chemin habituel).
+    """
+    profile = pf.resolve(profile)
+    dim = profile.matrix_dim
+    if image.width != image.height or image.width % dim or image.mode not in ('P', 'RGB'):
+        return None
+    np = backends.numpy()
+    palette_keys = {(r << 16) | (g << 8) | b: index for index, (r, g, b) in enumerate(profile.palette)}
+    if image.mode == 'P':
+        image = image.convert('RGB') # Conversion sans perte des index en couleurs
+    # Rejet rapide (en C) des images à plus de couleurs que la palette: photos, captures, images redimensionnées
+    colors = image.getcolors(maxcolors=len(palette_keys))
+    if colors is None or any((r << 16) | (g << 8) | b not in palette_keys for _, (r, g, b) in colors):
+        return None
+    pixels = np.asarray(image).astype(np.int32)
+    keys = (pixels[..., 0] << 16) | (pixels[..., 1] << 8) | pixels[..., 2]
+    cell_px_size = image.width // dim
+    blocks = keys.reshape(dim, cell_px_size, dim, cell_px_size)
+    cell_keys = blocks[:, 0, :, 0]
+    if not (blocks == cell_keys[:, None, :, None]).all(): # Cellules non uniformes: pas un rendu à la grille exacte
+        return None
+    cell_indices = np.zeros((dim, dim), dtype=int)
+    for key, index in palette_keys.items():
+        cell_indices[cell_keys == key] = index
+    rows, cols, expected = _exact_fixed_cells(profile)
+    for orientation in orient.ORIENTATIONS: # Symbole tourné ou retourné: vue dans l'orientation de référence
+        canonical = orient.canonical_view(cell_indices, orientation)
+        if (canonical[rows, cols] == expected).all():
+            return np.array(profile.bits_order)[canonical].tolist()
+    return None # Motifs fixes altérés
+
+def sample_exact_cells(cell_bits: list[list[str]], cells: list[tuple[int, int]]) -> list[tuple[str, float, str]]:
+    """
+    Équivalent de sample_cells pour une matrice lue par exact_palette_cells: tuples (bits, 1.0, bits).
+    Le second choix est la couleur lue elle-même: aucune cellule n'est un effacement.
+    """
+    return [(cell_bits[r_cell][c_cell], 1.0, cell_bits[r_cell][c_cell]) for r_cell, c_cell in cells]
 
-    # --- Protocol Version Check (Future enhancement) ---
-    # if parsed_metadata.get('protocol_version') != 1: # Assuming 1 is current/supported version
-    #     raise ValueError(f"Decoder: Unsupported protocol version {parsed_metadata.get('protocol_version')}.")
+def get_metadata_cells(profile: pf.ProtocolProfile = None) -> list[tuple[int, int]]:
+    """Retourne les cellules METADATA_AREA dans l'ordre de lecture (balayage ligne par ligne)."""
+    return list(pf.resolve(profile).metadata_cells)
 
-    xor_key = parsed_metadata['xor_key']
-    message_encrypted_len = parsed_metadata['message_encrypted_len']
-    # ecc_level_code = parsed_metadata['ecc_level_code'] # This is the ecc_level_percent, currently not directly used for ECC bit count here
+def validate_metadata(parsed_metadata: dict, profile: pf.ProtocolProfile = None) -> dict:
+    """
+    Vérifie la cohérence des métadonnées avec la disposition du symbole, avant toute lecture du payload.
+    Retourne {'payload_bits': int, 'num_ecc_bits': int} (payload hors métadonnées étendues).
+    Lève une ValueError pour une version inconnue ou une longueur de message incohérente.
+    """
+    protocol_version = parsed_metadata.get('protocol_version')
+    if protocol_version not in pc.SUPPORTED_PROTOCOL_VERSIONS:
+        raise ValueError(f"Decoder: Unsupported protocol version {protocol_version}.")
 
-    # Separate encrypted message and ECC bits from payload_stream
+    payload_bits = pf.resolve(profile).payload_bits(protocol_version == pc.PROTOCOL_VERSION_EXTENDED)
+
+    message_encrypted_len = parsed_metadata.get('message_encrypted_len')
     if not isinstance(message_encrypted_len, int) or message_encrypted_len < 0:
         raise ValueError(
             f"Decoder: Invalid 'message_encrypted_len' ({message_encrypted_len}) from metadata."
         )
-    if message_encrypted_len > len(payload_stream):
+    if message_encrypted_len > payload_bits:
         raise ValueError(
             f"Decoder: Metadata 'message_encrypted_len' ({message_encrypted_len}) "
-            f"is greater than actual payload stream length ({len(payload_stream)})."
+            f"is greater than actual payload stream length ({payload_bits})."
         )
-    
-    encrypted_message_bits = payload_stream[:message_encrypted_len]
-    received_ecc_bits = payload_stream[message_encrypted_len:]
-    
-    # Verify ECC
-    # verify_simple_ecc will also handle received_ecc_bits length checks (must be multiple of 8 or zero)
-    is_ecc_valid = dp.verify_simple_ecc(encrypted_message_bits, received_ecc_bits)
-    if not is_ecc_valid:
-        raise ValueError("Decoder: ECC verification failed. Data may be corrupted.")
+    num_ecc_bits = payload_bits - message_encrypted_len
+    if num_ecc_bits % 8 != 0:
+        raise ValueError(
+            f"Decoder: Metadata 'message_encrypted_len' ({message_encrypted_len}) leaves {num_ecc_bits} ECC bits, "
+            f"which is not a multiple of 8. The image is probably not a valid symbol."
+        )
+    return {'payload_bits': payload_bits, 'num_ecc_bits': num_ecc_bits}
 
-    # Decrypt message
-    try:
-        padded_message_bits = dp.apply_xor_cipher(encrypted_message_bits, xor_key)
-    except ValueError as e: # e.g. empty XOR key from metadata (though parse_metadata should prevent this)
-        raise ValueError(f"Decoder: Error applying XOR cipher. Details: {e}")
-    
-    # Convert to text
+def _load_image(image, profile: pf.ProtocolProfile = None) -> Image.Image:
+    """
+    Accepts a file path, a binary file object or an already loaded PIL image and returns an RGB image.
+    Large captures are reduced to the symbol region at a working resolution (see capture.load_working_image).
+    """
+    if isinstance(image, backends.pil_image().Image):
+        return capture.load_working_image(image, profile)
     try:
-        final_message = dp.padded_bits_to_text(padded_message_bits)
-    except ValueError as e: # e.g. UTF-8 decoding error
-        raise ValueError(f"Decoder: Error converting bits to text. Data may be corrupted or not valid text. Details: {e}")
-        
-    return final_message 
\ No newline at end of file
+        return capture.load_working_image(image, profile)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Decoder: Image file not found at {image}")
+    except Exception as e:
+        raise ValueError(f"Decoder: Error loading image '{image}'. Details: {e}")
+
+def _header_cells_mask(profile: pf.ProtocolProfile):
+    """Masque (MATRIX_DIM, MATRIX_DIM) en lecture seule des cellules fixes et METADATA_AREA (orientation de référence)."""
+    def build():
+        np = backends.numpy()
+        mask = np.zeros((profile.matrix_dim, profile.matrix_dim), dtype=bool)
+        for r, c, _ in profile.fixed_cells:
+            mask[r, c] = True
+        for r, c in profile.metadata_cells:
+            mask[r, c] = True
+        return pf.read_only(mask)[0]
+    return profile.cached('header_cells_mask', build)
+
+def _read_metadata(image: Image.Image, stats: instr.DecodeStats = None,
+                   profile: pf.ProtocolProfile = None, header_only: bool = False) -> tuple[dict, dict, object]:
+    """
+    Estimates the grid, calibrates colors and reads only the METADATA_AREA cells.
+    A lossless render in the exact palette colors (see exact_palette_cells and
+    CLASSIFICATION_CONFIG['exact_palette']) is read by direct lookup: calibration and clustering are skipped.
+    Otherwise, the symbol orientation (rotation by quarter turns, mirroring) is detected on the fixed pattern cells
+    (see orientation.detect_orientation). The grid (cell centers with a fractional pitch) is then measured
+    on the timing patterns (see grid.measure_grid); the integer cell size derived from the image width is the
+    fallback. All cell colors are sampled at once and viewed in the reference orientation (no copy).
+    When ILLUMINATION_CONFIG['enabled'], they are corrected for uneven lighting and the calibration uses
+    every fixed pattern cell; in the 'adaptive' classification mode the calibration is then refined by
+    clustering (see CLASSIFICATION_CONFIG).
+    With header_only (peek_metadata), only the fixed pattern and metadata cells are sampled: the illumination
+    field is fitted on the fixed cells alone (no refit on payload cells) and the 'adaptive' clustering, which
+    needs every cell, is skipped. read_cells then only reads those cells.
+    Returns (parsed_metadata, layout_info from validate_metadata, read_cells), read_cells(cells) returning
+    the (bits, confidence, alternative_bits) samples of the given cells (see sample_cells).
+    """
+    profile = pf.resolve(profile)
+    read_cells = _cell_reader(image, stats, profile, header_only)
+
+    with instr.stage_timer('metadata', stats):
+        metadata_cells = profile.metadata_cells
+        try:
+            metadata_stream = "".join(bits for bits, _, _ in read_cells(metadata_cells))
+        except ValueError as e:
+            raise ValueError(f"Decoder: Error extracting bitstreams from image. Details: {e}")
+
+        try:
+            parsed_metadata = dp.parse_metadata_bits(metadata_stream)
+        except ValueError as e:
+            raise ValueError(f"Decoder: Error parsing metadata. Details: {e}")
+
+        layout_info = validate_metadata(parsed_metadata, profile)
+    if stats is not None:
+        stats.count('sampled_cells', len(metadata_cells))
+
+    return parsed_metadata, layout_info, read_cells
+
+def _cell_reader(image: Image.Image, stats: instr.DecodeStats, profile: pf.ProtocolProfile, header_only: bool = False):
+    """Exact palette lookup, or orientation, grid and color calibration (see _read_metadata); returns read_cells."""
+    with instr.stage_timer('estimate', stats):
+        exact_cells = exact_palette_cells(image, profile) if pc.CLASSIFICATION_CONFIG['exact_palette'] else None
+        if exact_cells is not None:
+            if stats is not None:
+                stats.count('exact_palette')
+            return lambda cells: sample_exact_cells(exact_cells, cells)
+        cell_px_size = estimate_image_parameters(image, profile)
+        try:
+            orientation_cells = orient.fixed_cells_mask(profile) if header_only else None
+            orientation = orient.detect_orientation(
+                sample_cell_colors(image, cell_px_size, gr.size_grid(image, profile), profile, orientation_cells), profile)
+        except ValueError as e:
+            raise ValueError(f"Decoder: Error extracting bitstreams from image. Details: {e}")
+        grid = gr.measure_grid(image, *orient.timing_lines(orientation, profile), profile=profile)
+        expected_size = profile.matrix_dim * cell_px_size
+        if grid is None:
+            grid = gr.uniform_grid(cell_px_size, profile)
+            if image.width != expected_size or image.height != expected_size:
+                instr.warn(logger, stats,
+                           "Image dimensions (%dx%d) do not match the expected %dx%d for MATRIX_DIM=%d and cell size %dpx "
+                           "(timing patterns could not be measured).",
+                           image.width, image.height, expected_size, expected_size, profile.matrix_dim, cell_px_size)
+
+    classification_mode = pc.CLASSIFICATION_CONFIG['mode']
+    if classification_mode not in pc.CLASSIFICATION_MODES:
+        raise ValueError(f"Decoder: Unknown classification mode '{classification_mode}' "
+                         f"(supported: {', '.join(pc.CLASSIFICATION_MODES)}).")
+
+    with instr.stage_timer('calibrate', stats):
+        try:
+            cells = orient.to_image_view(_header_cells_mask(profile), orientation) if header_only else None
+            cell_colors = orient.canonical_view(sample_cell_colors(image, cell_px_size, grid, profile, cells), orientation)
+        except ValueError as e:
+            raise ValueError(f"Decoder: Error extracting bitstreams from image. Details: {e}")
+        if pc.ILLUMINATION_CONFIG['enabled']:
+            cell_colors = illumination.compensate_cell_colors(cell_colors, profile=profile, refit=not header_only)
+            calibration_map = illumination.reference_calibration(cell_colors, profile)
+        elif orientation == orient.IDENTITY:
+            calibration_map = perform_color_calibration(image, cell_px_size, grid, profile)
+        else: # Les zones CCP de l'image ont tourné: moyennes des cellules fixes, lues dans la vue de référence
+            calibration_map = illumination.reference_calibration(cell_colors, profile)
+
+    if classification_mode == 'adaptive' and not header_only:
+        with instr.stage_timer('cluster', stats):
+            calibration_map = cc.refine_calibration(cell_colors, calibration_map, profile=profile)
+
+    return lambda cells: sample_cells(image, cell_px_size, calibration_map, cells, cell_colors)
+
+def peek_metadata(image, stats: instr.DecodeStats = None, profile: pf.ProtocolProfile = None) -> dict:
+    """
+    Reads only the symbol header: samples the fixed pattern cells (at their positions in every orientation
+    to detect it, see orientation.fixed_cells_mask; then in the detected orientation for the calibration) and
+    the metadata cells. Payload cells are never classified, and only sampled where a fixed cell of another
+    orientation would lie (see _read_metadata, header_only).
+    An exact-palette render is still checked as a whole by exact_palette_cells (pixel comparison, cheaper
+    than the header-only calibration) before its metadata cells are looked up.
+    image is a file path or a PIL image.
+    Returns {'protocol_version', 'ecc_level_code', 'message_encrypted_len', 'num_ecc_bits'}.
+    The XOR key is deliberately not returned. Raises ValueError on an invalid header.
+    """
+    with instr.stage_timer('load', stats):
+        image = _load_image(image, profile)
+    parsed_metadata, layout_info, _ = _read_metadata(image, stats, profile, header_only=True)
+    return {
+        'protocol_version': parsed_metadata['protocol_version'],
+        'ecc_level_code': parsed_metadata['ecc_level_code'],
+        'message_encrypted_len': parsed_metadata['message_encrypted_len'],
+        'num_ecc_bits': layout_info['num_ecc_bits'],
+    }
+
+# --- Main Decoding Orchestration (Phase 6/7) ---
+
+def _decode_image_to_padded_bits(image_path, stats: instr.DecodeStats = None, profile: pf.ProtocolProfile = None) -> dict:
+    """
+    Runs the decoding pipeline up to decryption, metadata first: the header is read and
+    validated before any payload cell is sampled, and fixed pattern cells are never classified.
+    Each stage is timed through instrumentation.stage_timer (see DecodeStats).
+    Returns a dict with 'metadata', 'extended_metadata' (empty for PROTOCOL_VERSION_BASE symbols),
+    'padded_message_bits', 'confidence_map' (None for cells that were not sampled),
+    'erasures' (list of (row, col) low-confidence payload cells) and 'corrected_erasures'
+    (number of erased cells switched to their second choice by ECC).
+    """
+    # 1. Load Image, estimate parameters and read the metadata only
+    profile = pf.resolve(profile)
+    with instr.stage_timer('load', stats):
+        image = _load_image(image_path, profile)
+    parsed_metadata, _, read_cells = _read_metadata(image, stats, profile)
+
+    # 2. Sample the payload cells
+    with instr.stage_timer('sample', stats):
+        data_ecc_fill_order = profile.fill_order
+        try:
+            payload_samples = read_cells(data_ecc_fill_order)
+        except ValueError as e:
+            raise ValueError(f"Decoder: Error extracting bitstreams from image. Details: {e}")
+
+        payload_cells = [bits for bits, _, _ in payload_samples]
+        alternative_cells = [alternative_bits for _, _, alternative_bits in payload_samples]
+        confidence_matrix = [[None for _ in range(profile.matrix_dim)] for _ in range(profile.matrix_dim)]
+        for (r, c), (_, confidence, _) in zip(data_ecc_fill_order, payload_samples):
+            confidence_matrix[r][c] = confidence
+    if stats is not None:
+        stats.count('sampled_cells', len(data_ecc_fill_order))
+
+    # 3. Interpret Metadata and Recover Data
+    with instr.stage_timer('ecc', stats):
+        extended_metadata = {}
+        extended_len = 0
+        if parsed_metadata['protocol_version'] == pc.PROTOCOL_VERSION_EXTENDED:
+            extended_len = dp.extended_metadata_length()
+            try:
+                extended_metadata = dp.parse_extended_metadata_bits("".join(payload_cells)[:extended_len])
+            except ValueError as e:
+                raise ValueError(f"Decoder: Error parsing extended metadata. Details: {e}")
+            # The extended block is never masked: it tells which mask to remove from the other cells
+            mask_id = extended_metadata.get('mask', 0)
+            if mask_id:
+                try:
+                    payload_cells = masking.unmask_payload_cells(payload_cells, mask_id, profile)
+                except ValueError as e:
+                    raise ValueError(f"Decoder: Invalid extended metadata. Details: {e}")
+                alternative_cells = masking.unmask_payload_cells(alternative_cells, mask_id, profile)
+            placement_id = extended_metadata.get('placement', 0)
+        else:
+            placement_id = 0
+
+        alternative_matrix = [[None for _ in range(profile.matrix_dim)] for _ in range(profile.matrix_dim)]
+        for (r, c), alternative_bits in zip(data_ecc_fill_order, alternative_cells):
+            alternative_matrix[r][c] = alternative_bits
+        try:
+            # Cells are read in fill order; the payload stream follows the placement order
+            payload_cells = pl.cells_to_stream(payload_cells, placement_id, profile)
+            erasures = []
+            for offset, bits, cell in find_payload_erasures(confidence_matrix, alternative_matrix, profile=profile):
+                stream_offset = pl.cell_index_to_stream_position(offset // pc.BITS_PER_CELL, placement_id, profile) * pc.BITS_PER_CELL
+                # The extended block has its own repetition protection: only data/ECC erasures are kept
+                if stream_offset >= extended_len:
+                    erasures.append((stream_offset - extended_len, bits, cell))
+        except ValueError as e:
+            raise ValueError(f"Decoder: Invalid extended metadata. Details: {e}")
+        payload_stream = "".join(payload_cells)[extended_len:]
+
+        message_encrypted_len = parsed_metadata['message_encrypted_len']
+
+        # Verify ECC
+        # verify_simple_ecc will also handle received_ecc_bits length checks (must be multiple of 8 or zero)
+        corrected_erasures = 0
+        is_ecc_valid = dp.verify_simple_ecc(payload_stream[:message_encrypted_len], payload_stream[message_encrypted_len:])
+        if not is_ecc_valid:
+            # Soft-decision retry: try the second-choice color of low-confidence cells
+            corrected_payload = dp.resolve_erasures_simple_ecc(
+                payload_stream, message_encrypted_len,
+                [(offset, bits) for offset, bits, _ in erasures],
+                max_erasures=pc.SOFT_DECODING_CONFIG['max_erasures']
+            )
+            if corrected_payload is None:
+                raise ValueError(
+                    f"Decoder: ECC verification failed. Data may be corrupted "
+                    f"({len(erasures)} low-confidence cell(s) could not resolve it)."
+                )
+            corrected_erasures = sum(
+                1 for i in range(0, len(payload_stream), pc.BITS_PER_CELL)
+                if payload_stream[i : i + pc.BITS_PER_CELL] != corrected_payload[i : i + pc.BITS_PER_CELL]
+            )
+            payload_stream = corrected_payload
+    if stats is not None:
+        stats.count('erasures', len(erasures))
+        stats.count('corrected_erasures', corrected_erasures)
+
+    # Decrypt message
+    with instr.stage_timer('decrypt', stats):
+        try:
+            padded_message_bits = dp.apply_xor_cipher(payload_stream[:message_encrypted_len], parsed_metadata['xor_key'])
+        except ValueError as e: # e.g. empty XOR key from metadata (though parse_metadata should prevent this)
+            raise ValueError(f"Decoder: Error applying XOR cipher. Details: {e}")
+
+    return {
+        'metadata': parsed_metadata,
+        'extended_metadata': extended_metadata,
+        'padded_message_bits': padded_message_bits,
+        'confidence_map': confidence_matrix,
+        'erasures': [cell for _, _, cell in erasures],
+        'corrected_erasures': corrected_erasures,
+    }
+
+def _padded_bits_to_message(decoded: dict, stats: instr.DecodeStats = None) -> str:
+    """Converts the decrypted bits of a single (non structured append) symbol to text."""
+    if decoded['extended_metadata'].get('structured_append'):
+        raise ValueError(
+            "Decoder: Image is a structured append symbol (part of a multi-symbol message). "
+            "Use decode_image_to_segment with a StructuredAppendAssembler."
+        )
+    with instr.stage_timer('text', stats):
+        try:
+            return dp.padded_bits_to_text(decoded['padded_message_bits'])
+        except ValueError as e: # e.g. UTF-8 decoding error
+            raise ValueError(f"Decoder: Error converting bits to text. Data may be corrupted or not valid text. Details: {e}")
+
+def decode_image_to_message(image_path: str, stats: instr.DecodeStats = None, profile: pf.ProtocolProfile = None) -> str:
+    """
+    Decodes a protocol image from the given path and returns the embedded message.
+    Orchestrates the full decoding process.
+    Pass an instrumentation.DecodeStats as stats to collect per-stage timings and warnings.
+    Structured append symbols only carry part of a message: use decode_image_to_segment
+    together with a StructuredAppendAssembler for those.
+    """
+    return _padded_bits_to_message(_decode_image_to_padded_bits(image_path, stats, profile), stats)
+
+def decode_image_with_confidence(image_path: str, stats: instr.DecodeStats = None, profile: pf.ProtocolProfile = None) -> dict:
+    """
+    Like decode_image_to_message, but also exposes the soft-decision information.
+    Returns {'message': str, 'confidence_map': list[list[float | None]] (MATRIX_DIM x MATRIX_DIM, 0.0 to 1.0,
+    None for cells that are not read: fixed patterns and metadata),
+    'erasures': list of (row, col) low-confidence payload cells, 'corrected_erasures': int}.
+    """
+    decoded = _decode_image_to_padded_bits(image_path, stats, profile)
+    return {
+        'message': _padded_bits_to_message(decoded, stats),
+        'confidence_map': decoded['confidence_map'],
+        'erasures': decoded['erasures'],
+        'corrected_erasures': decoded['corrected_erasures'],
+    }
+
+def decode_image_to_segment(image_path: str, stats: instr.DecodeStats = None, profile: pf.ProtocolProfile = None) -> dict:
+    """
+    Decodes a protocol image into a structured append segment
+    {'index': int, 'total': int, 'parity': int, 'data': bytes}, ready for
+    StructuredAppendAssembler.add_segment. A single (non structured append) symbol
+    is returned as a one-symbol sequence, so callers can treat every scan the same way.
+    """
+    decoded = _decode_image_to_padded_bits(image_path, stats, profile)
+    with instr.stage_timer('text', stats):
+        message_bytes = dp.padded_bits_to_bytes(decoded['padded_message_bits'])
+
+        if not decoded['extended_metadata'].get('structured_append'):
+            message_bytes = message_bytes.rstrip(b'\x00')
+            return {'index': 0, 'total': 1, 'parity': sa.compute_message_parity(message_bytes), 'data': message_bytes}
+
+        try:
+            return sa.parse_structured_append_segment(message_bytes)
+        except ValueError as e:
+            raise ValueError(f"Decoder: Error parsing structured append header. Details: {e}")
@@ -1,77 +1,62 @@
-import numpy as np
 import src.core.protocol_config as pc
-import src.core.matrix_layout as ml
+import src.core.profile as pf
 import src.core.data_processing as dp
+import src.core.structured_append as sa
+import src.core.masking as masking
+import src.core.placement as pl
 
-def initialize_bit_matrix():
+def initialize_bit_matrix(profile: pf.ProtocolProfile = None):
     """
-    Crée une matrice MATRIX_DIM x MATRIX_DIM pour stocker les paires de bits (chaînes '00', '01', etc.).
-    Initialisée avec des chaînes vides ou None.
+    Crée une matrice MATRIX_DIM x MATRIX_DIM (dimension du profil) pour stocker les paires de bits
+    (chaînes '00', '01', etc.). Initialisée avec None.
     """
-    # Le plan suggère numpy.empty avec dtype=object ou une liste de listes.
-    # Utiliser une liste de listes de chaînes vides est simple et correspond à l'attente de stocker des paires de bits.
-    return [[None for _ in range(pc.MATRIX_DIM)] for _ in range(pc.MATRIX_DIM)]
-    # Alternative avec NumPy si préféré plus tard pour des opérations vectorielles:
-    # return np.full((pc.MATRIX_DIM, pc.MATRIX_DIM), None, dtype=object) 
+    matrix_dim = pf.resolve(profile).matrix_dim
+    return [[None for _ in range(matrix_dim)] for _ in range(matrix_dim)]
 
-def populate_fixed_zones(bit_matrix):
+def populate_fixed_zones(bit_matrix, profile: pf.ProtocolProfile = None):
     """
-    Remplit la bit_matrix avec les motifs fixes (FP, TP, CCP).
+    Remplit la bit_matrix avec les motifs fixes (FP, TP, CCP), recopiés du gabarit compilé du profil.
     Les zones METADATA et DATA_ECC sont laissées vides (None).
     """
-    for r in range(pc.MATRIX_DIM):
-        for c in range(pc.MATRIX_DIM):
-            zone_type = ml.get_cell_zone_type(r, c)
-
-            # Les zones de métadonnées et de données/ECC ne sont pas remplies ici.
-            if zone_type == 'METADATA_AREA' or zone_type == 'DATA_ECC':
-                continue
-
-            # Calculer les coordonnées relatives pour get_fixed_pattern_bits
-            # Cela nécessite de connaître le coin supérieur gauche de la zone spécifique
-            relative_r, relative_c = -1, -1
-
-            if zone_type.startswith('FP_TL'):
-                base_coords = ml.get_zone_coordinates('FP_TL')
-                if 'CORE' in zone_type: core_coords = ml.get_zone_coordinates('FP_TL_CORE'); relative_r, relative_c = r - core_coords[0], c - core_coords[2]
-                else: relative_r, relative_c = r - base_coords[0], c - base_coords[2] # Pour la marge, relative à FP_TL
-            elif zone_type.startswith('FP_TR'):
-                base_coords = ml.get_zone_coordinates('FP_TR')
-                if 'CORE' in zone_type: core_coords = ml.get_zone_coordinates('FP_TR_CORE'); relative_r, relative_c = r - core_coords[0], c - core_coords[2]
-                else: relative_r, relative_c = r - base_coords[0], c - base_coords[2]
-            elif zone_type.startswith('FP_BL'):
-                base_coords = ml.get_zone_coordinates('FP_BL')
-                if 'CORE' in zone_type: core_coords = ml.get_zone_coordinates('FP_BL_CORE'); relative_r, relative_c = r - core_coords[0], c - core_coords[2]
-                else: relative_r, relative_c = r - base_coords[0], c - base_coords[2]
-            elif zone_type == 'TP_H':
-                tp_h_coords = ml.get_zone_coordinates('TP_H')
-                relative_r = r - tp_h_coords[0] # Devrait être 0
-                relative_c = c - tp_h_coords[2]
-            elif zone_type == 'TP_V':
-                tp_v_coords = ml.get_zone_coordinates('TP_V')
-                relative_r = r - tp_v_coords[0]
-                relative_c = c - tp_v_coords[2] # Devrait être 0
-            elif zone_type.startswith('CCP_PATCH_'):
-                patch_coords = ml.get_zone_coordinates(zone_type)
-                relative_r = r - patch_coords[0]
-                relative_c = c - patch_coords[2]
-            else:
-                # Should not happen if zone_type is not METADATA or DATA_ECC
-                # print(f"Warning: Unhandled zone type {zone_type} in populate_fixed_zones for cell ({r},{c})")
-                continue
-            
-            if relative_r >= 0 and relative_c >= 0: # Check if relative coords were set
-                 bit_matrix[r][c] = ml.get_fixed_pattern_bits(zone_type, relative_r, relative_c)
-            # else: 
-                # This case indicates an issue with relative coordinate calculation logic for a zone_type
-                # print(f"Error: Could not determine relative coords for {zone_type} at ({r},{c})")
-
+    for r, template_row in enumerate(pf.resolve(profile).fixed_template):
+        row = bit_matrix[r]
+        for c, bits in enumerate(template_row):
+            if bits is not None:
+                row[c] = bits
     return bit_matrix
 
-# --- Fonctions de la Phase 3 et suivantes seraient ajoutées ici ---
-# def encode_message_to_matrix(...)
+def get_fixed_pattern_cells(profile: pf.ProtocolProfile = None) -> list[tuple[int, int, str]]:
+    """
+    Retourne les cellules des motifs fixes (FP, TP, CCP) et leur paire de bits: [(row, col, bits)],
+    en balayage ligne par ligne. Ce sont les cellules de couleur connue d'avance pour le décodeur.
+    """
+    return list(pf.resolve(profile).fixed_cells)
+
+# --- Fonctions de la Phase 3 et suivantes ---
 
-def encode_message_to_matrix(message_text: str, ecc_level_percent: int, custom_xor_key_str: str = None) -> list[list[str]]:
+def compute_payload_capacity(ecc_level_percent: int, extended: bool = False,
+                             profile: pf.ProtocolProfile = None) -> tuple[int, int]:
+    """
+    Calcule la répartition de l'espace DATA_ECC entre le message (crypté) et l'ECC.
+    Si extended est vrai, l'espace du bloc de métadonnées étendues est réservé en tête du payload.
+    Les niveaux entiers sont lus dans les tables de capacité du profil.
+    Retourne (target_message_bit_length, num_ecc_bits).
+    """
+    profile = pf.resolve(profile)
+    version = pc.PROTOCOL_VERSION_EXTENDED if extended else pc.PROTOCOL_VERSION_BASE
+    capacity = profile.capacity_tables[version].get(ecc_level_percent)
+    if capacity is not None:
+        return capacity
+    return pf.split_payload_capacity(profile.payload_bits(extended), ecc_level_percent)
+
+def encode_message_to_matrix(
+    message_text: str,
+    ecc_level_percent: int,
+    custom_xor_key_str: str = None,
+    mask_id: int = None,
+    placement_order: str = None,
+    profile: pf.ProtocolProfile = None
+    ) -> list[list[str]]:
     """
     Orchestre l'encodage complet d'un message texte en une matrice de bits.
     1. Initialise la matrice de bits.
@@ -79,44 +64,77 @@ def encode_message_to_matrix(message_text: str, ecc_level_percent: int, custom_x
     3. Prépare les données (texte -> bits, cryptage, ECC).
     4. Prépare les métadonnées.
     5. Place les métadonnées et le payload (données cryptées + ECC) dans la matrice.
+    6. Choisit et applique le masque des données (symbole de version 2, voir masking).
+    mask_id: None = masque choisi automatiquement si MASKING_CONFIG['enabled'] et si le message tient dans
+    un symbole de version 2 (sinon symbole de version 1 non masqué, capacité maximale);
+    0 = symbole de version 1 sans masque; 1 à 7 = masque imposé (symbole de version 2).
+    placement_order: ordre de placement du payload des symboles de version 2 ('row', 'block', 'diagonal';
+    None = PLACEMENT_CONFIG['default']). Les symboles de version 1 sont toujours remplis ligne par ligne.
+    profile: profil de protocole compilé (voir profile.compile_profile; None = profil par défaut).
     Retourne la bit_matrix complétée.
     """
+    message_bytes = message_text.encode('utf-8')
+    if mask_id is None:
+        if not pc.MASKING_CONFIG['enabled']:
+            mask_id = 0
+        else:
+            masked_capacity_bits, _ = compute_payload_capacity(ecc_level_percent, extended=True, profile=profile)
+            if len(message_bytes) * 8 > masked_capacity_bits:
+                mask_id = 0
+    if mask_id == 0:
+        return encode_bytes_to_matrix(message_bytes, ecc_level_percent, custom_xor_key_str,
+                                      placement_order=placement_order, profile=profile)
+    return encode_bytes_to_matrix(message_bytes, ecc_level_percent, custom_xor_key_str, extended_fields={},
+                                  mask_id=mask_id, placement_order=placement_order, profile=profile)
+
+def encode_bytes_to_matrix(
+    message_bytes: bytes,
+    ecc_level_percent: int,
+    custom_xor_key_str: str = None,
+    extended_fields: dict = None,
+    mask_id: int = None,
+    placement_order: str = None,
+    profile: pf.ProtocolProfile = None
+    ) -> list[list[str]]:
+    """
+    Encode des octets bruts en une matrice de bits (voir encode_message_to_matrix).
+    Si extended_fields est fourni (même vide), le symbole est de version PROTOCOL_VERSION_EXTENDED
+    et le payload commence par le bloc de métadonnées étendues construit à partir de ces champs.
+    Les symboles de version 2 sont masqués: mask_id imposé, ou choisi par pénalité minimale si None
+    (0 si MASKING_CONFIG['enabled'] est faux). Le payload est placé selon placement_order (voir placement).
+    Les champs 'mask' et 'placement' sont renseignés par l'encodeur.
+    """
+    extended = extended_fields is not None
+    if not extended:
+        if mask_id:
+            raise ValueError("Data masking requires an extended (version 2) symbol.")
+        if placement_order not in (None, 'row'):
+            raise ValueError("Interleaved placement requires an extended (version 2) symbol.")
+        placement_id = 0
+    else:
+        for reserved_field in ('mask', 'placement'):
+            if reserved_field in extended_fields:
+                raise ValueError(f"The '{reserved_field}' extended metadata field is set by the encoder.")
+        placement_id = pl.placement_id(placement_order or pc.PLACEMENT_CONFIG['default'])
+        extended_fields = {**extended_fields, 'placement': placement_id}
+
+    profile = pf.resolve(profile)
+
     # 1. Initialiser bit_matrix
-    bit_matrix = initialize_bit_matrix()
+    bit_matrix = initialize_bit_matrix(profile)
 
     # 2. Remplir les zones fixes (FP, TP, CCP)
-    populate_fixed_zones(bit_matrix)
+    populate_fixed_zones(bit_matrix, profile)
 
     # 3. Obtenir l'ordre de remplissage pour les données et ECC
-    data_ecc_fill_order = ml.get_data_ecc_fill_order()
+    data_ecc_fill_order = profile.fill_order
     available_data_ecc_bits = len(data_ecc_fill_order) * pc.BITS_PER_CELL
 
-    # 4. Calculer num_ecc_bits
-    # Doit être un multiple de BITS_PER_CELL (donc pair) et un multiple de 8 (pour calculate_simple_ecc)
-    # Donc, multiple de lcm(2, 8) = 8.
-    if not (0 <= ecc_level_percent <= 100):
-        raise ValueError("ecc_level_percent must be between 0 and 100.")
-    
-    # Calculer le nombre brut de bits ECC
-    raw_num_ecc_bits = available_data_ecc_bits * (ecc_level_percent / 100.0)
-    
-    # Arrondir au multiple de 8 inférieur ou égal (pour être sûr d'avoir assez de place et de respecter la contrainte ECC)
-    num_ecc_bits = int(raw_num_ecc_bits // 8) * 8
-
-    if num_ecc_bits < 0: num_ecc_bits = 0 # Ne peut pas être négatif
-    # S'assurer qu'on ne demande pas plus de bits ECC que disponibles, moins une marge pour les données
-    min_data_bits_needed = 8 # Au moins 1 octet de données utiles
-    if num_ecc_bits > available_data_ecc_bits - min_data_bits_needed :
-        num_ecc_bits = int((available_data_ecc_bits - min_data_bits_needed) // 8) * 8
-        if num_ecc_bits < 0: num_ecc_bits = 0 # Au cas où available_data_ecc_bits est très petit
+    # 4-5. Calculer num_ecc_bits et la longueur cible du message
+    target_message_bit_length, num_ecc_bits = compute_payload_capacity(ecc_level_percent, extended, profile)
 
-    # 5. Calculer la longueur cible pour les bits du message (avant cryptage)
-    target_message_bit_length = available_data_ecc_bits - num_ecc_bits
-    if target_message_bit_length < 0:
-        raise ValueError(f"Not enough space for message and ECC. Target message bits: {target_message_bit_length}")
-
-    # 6. Convertir le message texte en bits paddés
-    message_bits = dp.text_to_padded_bits(message_text, target_message_bit_length)
+    # 6. Convertir le message en bits paddés
+    message_bits = dp.bytes_to_padded_bits(message_bytes, target_message_bit_length)
 
     # 7. Gérer la clé XOR
     # La clé XOR pour les métadonnées est de pc.METADATA_CONFIG['key_bits']
@@ -135,88 +153,46 @@ def encode_message_to_matrix(message_text: str, ecc_level_percent: int, custom_x
     encrypted_message_len_bits = len(encrypted_message_bits) # Devrait être target_message_bit_length
 
     # 9. Calculer les bits ECC sur les données cryptées
-    # S'assurer que calculate_simple_ecc peut gérer le cas où num_ecc_bits est 0.
-    # Ma fonction actuelle lève une erreur si num_ecc_bits est 0 ou non multiple de 8.
-    # Si ecc_level_percent est 0, num_ecc_bits sera 0. Il faut gérer ce cas.
+    # Si ecc_level_percent est 0, num_ecc_bits sera 0: pas d'ECC.
     if num_ecc_bits == 0:
         ecc_bits = ""
     else:
         ecc_bits = dp.calculate_simple_ecc(encrypted_message_bits, num_ecc_bits)
     
     # 10. Préparer les bits de métadonnées
-    # L'ecc_level_code pour les métadonnées pourrait être le ecc_level_percent lui-même si c'est un code.
-    # Le plan indique: format_metadata_bits(1, ecc_level_percent, len(encrypted_bits), xor_key)
-    # Assumons que ecc_level_percent peut être directement utilisé comme code si < 16 (pour 4 bits)
-    # Ou alors, il faut définir un mappage. Pour l'instant, passons ecc_level_percent.
-    # La fonction format_metadata_bits s'attend à un entier pour ecc_level_code.
-    # On va utiliser ecc_level_percent comme code pour l'instant.
+    # On utilise ecc_level_percent comme code pour l'instant.
     # S'assurer qu'il tient sur METADATA_CONFIG['ecc_level_bits']
     max_ecc_code = (2**pc.METADATA_CONFIG['ecc_level_bits']) - 1
     ecc_code_for_metadata = min(int(ecc_level_percent), max_ecc_code) # Simple troncature
 
     metadata_stream = dp.format_metadata_bits(
-        protocol_version=1, # Version du protocole
+        protocol_version=pc.PROTOCOL_VERSION_EXTENDED if extended else pc.PROTOCOL_VERSION_BASE,
         ecc_level_code=ecc_code_for_metadata, 
         message_encrypted_len=encrypted_message_len_bits,
         xor_key_actual_bits=xor_key_for_metadata_and_data
     )
     
     # 11. Placer metadata_stream dans les cellules METADATA de bit_matrix
-    # Il faut un ordre de remplissage pour les métadonnées.
-    # Utilisons un simple balayage ligne par ligne dans la zone METADATA_AREA.
-    md_coords = ml.get_zone_coordinates('METADATA_AREA')
-    md_r_start, md_r_end, md_c_start, md_c_end = md_coords
-    
-    current_bit_index_metadata = 0
-    for r in range(md_r_start, md_r_end + 1):
-        for c in range(md_c_start, md_c_end + 1):
-            # Vérifier si la cellule est bien de type METADATA_AREA (au cas où la définition de zone serait complexe)
-            # Normalement, toutes les cellules dans ces boucles le sont.
-            if ml.get_cell_zone_type(r,c) == 'METADATA_AREA':
-                if current_bit_index_metadata < len(metadata_stream):
-                    bits_to_place = metadata_stream[current_bit_index_metadata : current_bit_index_metadata + pc.BITS_PER_CELL]
-                    if len(bits_to_place) == pc.BITS_PER_CELL:
-                         bit_matrix[r][c] = bits_to_place
-                    else: # Fin du stream, ne remplit pas une cellule entière (ne devrait pas arriver si total_bits est multiple de BITS_PER_CELL)
-                        # print(f"Warning: Trailing metadata bits not filling a full cell at ({r},{c}). Bits: {bits_to_place}")
-                        # On pourrait padder ici ou lever une erreur si METADATA_CONFIG est mal alignée.
-                        # Pour l'instant, on s'attend à un alignement parfait.
-                        if bits_to_place: # S'il reste des bits
-                             raise ValueError(f"Metadata stream length not a multiple of BITS_PER_CELL. Remainder: {bits_to_place}")
-                    current_bit_index_metadata += pc.BITS_PER_CELL
-                # else: # Plus de bits de métadonnées à placer (normal)
-    
-    if current_bit_index_metadata != len(metadata_stream):
-        raise ValueError(f"Metadata stream not fully placed. Expected {len(metadata_stream)} bits, placed {current_bit_index_metadata}.")
-
-    # 12. Concaténer payload_stream = encrypted_message_bits + ecc_bits
-    payload_stream = encrypted_message_bits + ecc_bits
-    if len(payload_stream) != target_message_bit_length + num_ecc_bits: # target_message_bit_length = len(encrypted_message_bits)
+    # Simple balayage ligne par ligne dans la zone METADATA_AREA (cellules compilées dans le profil).
+    metadata_cells = profile.metadata_cells
+    if len(metadata_stream) != len(metadata_cells) * pc.BITS_PER_CELL:
+        raise ValueError(f"Metadata stream not fully placed. Expected {len(metadata_stream)} bits, "
+                         f"METADATA_AREA holds {len(metadata_cells) * pc.BITS_PER_CELL}.")
+    for i, (r, c) in enumerate(metadata_cells):
+        bit_matrix[r][c] = metadata_stream[i * pc.BITS_PER_CELL : (i + 1) * pc.BITS_PER_CELL]
+
+    # 12. Concaténer payload_stream = [métadonnées étendues] + encrypted_message_bits + ecc_bits
+    extended_stream = dp.format_extended_metadata_bits(**extended_fields) if extended else ""
+    payload_stream = extended_stream + encrypted_message_bits + ecc_bits
+    if len(payload_stream) != len(extended_stream) + target_message_bit_length + num_ecc_bits:
          raise ValueError(\
-            f"Payload stream length mismatch. Expected {target_message_bit_length + num_ecc_bits}, " \
+            f"Payload stream length mismatch. Expected {len(extended_stream) + target_message_bit_length + num_ecc_bits}, " \
             f"got {len(payload_stream)} (Encrypted: {len(encrypted_message_bits)}, ECC: {len(ecc_bits)})")
 
 
-    # 13. Remplir les cellules DATA_ECC de bit_matrix avec payload_stream
-    current_bit_index_payload = 0
-    for r_coord, c_coord in data_ecc_fill_order:
-        if current_bit_index_payload < len(payload_stream):
-            bits_to_place = payload_stream[current_bit_index_payload : current_bit_index_payload + pc.BITS_PER_CELL]
-            if len(bits_to_place) == pc.BITS_PER_CELL:
-                bit_matrix[r_coord][c_coord] = bits_to_place
-            else: # Fin du payload_stream, ne remplit pas une cellule entière
-                  # Cela ne devrait pas arriver si available_data_ecc_bits était correct
-                  # et que payload_stream correspond à cette longueur.
-                if bits_to_place:
-                    raise ValueError(f"Payload stream length not a multiple of BITS_PER_CELL for DATA_ECC. Remainder: {bits_to_place}")
-            current_bit_index_payload += pc.BITS_PER_CELL
-        # else: # Plus de bits de payload à placer (peut arriver si payload plus court que l'espace dispo)
-              # Ce cas est géré par text_to_padded_bits et le calcul de num_ecc_bits
-              # qui s'assurent que le payload utilise tout l'espace disponible.
-
-    if current_bit_index_payload != len(payload_stream):
-        raise ValueError(f"Payload stream not fully placed in DATA_ECC area. Expected {len(payload_stream)} bits, placed {current_bit_index_payload}.")
-    
+    # 13. Remplir les cellules DATA_ECC de bit_matrix avec payload_stream, dans l'ordre de placement
+    if len(payload_stream) % pc.BITS_PER_CELL:
+        raise ValueError(f"Payload stream length not a multiple of BITS_PER_CELL for DATA_ECC. Length: {len(payload_stream)}")
     if len(payload_stream) != available_data_ecc_bits:
         # This is a critical check. The payload (encrypted data + ECC) MUST exactly fill the available DATA_ECC space.
         # Our calculations for target_message_bit_length and num_ecc_bits are designed to ensure this.
@@ -225,9 +201,41 @@ def encode_message_to_matrix(message_text: str, ecc_level_percent: int, custom_x
             f"available_data_ecc_bits ({available_data_ecc_bits}). This indicates an issue "
             f"in calculating message/ECC bit lengths."
         )
-
-    # 14. Retourner la bit_matrix complétée
+    stream_cells = [payload_stream[i : i + pc.BITS_PER_CELL] for i in range(0, len(payload_stream), pc.BITS_PER_CELL)]
+    for (r_coord, c_coord), bits_to_place in zip(data_ecc_fill_order, pl.stream_to_cells(stream_cells, placement_id, profile)):
+        bit_matrix[r_coord][c_coord] = bits_to_place
+
+    # 14. Masquer les données (version 2): le bloc de métadonnées étendues est réécrit avec le masque retenu
+    if extended:
+        if mask_id is None:
+            mask_id = masking.select_mask(bit_matrix, extended_fields, profile) if pc.MASKING_CONFIG['enabled'] else 0
+        masked_extended_stream = dp.format_extended_metadata_bits(**extended_fields, mask=mask_id)
+        for i, (r_coord, c_coord) in enumerate(data_ecc_fill_order[:len(masked_extended_stream) // pc.BITS_PER_CELL]):
+            bit_matrix[r_coord][c_coord] = masked_extended_stream[i * pc.BITS_PER_CELL : (i + 1) * pc.BITS_PER_CELL]
+        masking.apply_mask(bit_matrix, mask_id, profile)
+
+    # 15. Retourner la bit_matrix complétée
     return bit_matrix
 
-# --- Fonctions de la Phase 3 et suivantes seraient ajoutées ici ---
-# def encode_message_to_matrix(...) 
\ No newline at end of file
+def encode_message_to_matrices(message_text: str, ecc_level_percent: int, custom_xor_key_str: str = None,
+                               profile: pf.ProtocolProfile = None) -> list[list[list[str]]]:
+    """
+    Encode un message texte sur un ou plusieurs symboles (ajout structuré).
+    Si le message tient dans un seul symbole, retourne [encode_message_to_matrix(...)].
+    Sinon, le message est découpé en segments portant chacun un en-tête (index, total, parité)
+    et chaque segment est encodé dans un symbole de version PROTOCOL_VERSION_EXTENDED.
+    Lève une ValueError si le message dépasse la capacité de la séquence maximale.
+    """
+    message_bytes = message_text.encode('utf-8')
+
+    single_symbol_bits, _ = compute_payload_capacity(ecc_level_percent, profile=profile)
+    if len(message_bytes) * 8 <= single_symbol_bits:
+        return [encode_message_to_matrix(message_text, ecc_level_percent, custom_xor_key_str, profile=profile)]
+
+    segment_bits, _ = compute_payload_capacity(ecc_level_percent, extended=True, profile=profile)
+    segments = sa.split_message_into_segments(message_bytes, segment_bits // 8)
+    return [
+        encode_bytes_to_matrix(segment, ecc_level_percent, custom_xor_key_str, extended_fields={'structured_append': 1},
+                               profile=profile)
+        for segment in segments
+    ]
@@ -0,0 +1,154 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.profile as pf
+
+if TYPE_CHECKING:
+    from PIL import Image
+
+# Récupération de la grille à partir des motifs de synchronisation (TP).
+# Une image redimensionnée (vignette, impression numérisée à une résolution quelconque) a un pas de cellule
+# non entier: des centres placés à c * cell_px_size + cell_px_size // 2 dérivent de plusieurs pixels vers le
+# bord opposé. La ligne TP_H (noir/blanc alternés) est bordée de blanc (marges des FP) sur toute la ligne 6:
+# chaque transition du profil de luminance de cette ligne est une frontière de colonne entre les colonnes
+# 7 et 28. Ces frontières, localisées au sous-pixel, donnent par moindres carrés l'origine et le pas
+# horizontaux; de même pour les lignes avec TP_V (colonne 6).
+# Une grille est un couple (centres des lignes, centres des colonnes) en pixels (tableaux NumPy de MATRIX_DIM
+# flottants); la cellule (r, c) est échantillonnée au pixel (floor(col_centers[c]), floor(row_centers[r])).
+
+def uniform_grid(cell_px_size: int, profile: pf.ProtocolProfile = None):
+    """Grille au pas entier cell_px_size (mêmes pixels que l'échantillonnage historique du décodeur)."""
+    np = backends.numpy()
+    centers = (np.arange(pf.resolve(profile).matrix_dim) * cell_px_size + cell_px_size // 2).astype(np.float64)
+    return centers, centers.copy()
+
+def size_grid(image: Image.Image, profile: pf.ProtocolProfile = None):
+    """Grille déduite de la seule taille de l'image (symbole occupant toute l'image), pas fractionnaire."""
+    np = backends.numpy()
+    matrix_dim = pf.resolve(profile).matrix_dim
+    cell_indices = np.arange(matrix_dim) + 0.5
+    return cell_indices * image.height / matrix_dim, cell_indices * image.width / matrix_dim
+
+def grid_pitch(centers) -> float:
+    """Pas moyen (en pixels) d'un tableau de centres."""
+    return float(centers[-1] - centers[0]) / (len(centers) - 1)
+
+def _luminance(image: Image.Image):
+    np = backends.numpy()
+    return np.asarray(image.convert('L'), dtype=np.float64)
+
+def _line_edges(profile, pitch: float) -> list[float]:
+    """
+    Positions (sous-pixel, bord gauche du pixel 0 = 0.0) des transitions clair/sombre d'un profil.
+    Seuil local: moyenne glissante sur deux pas (milieu entre noir et blanc sur une ligne alternée);
+    hystérésis d'un quart du contraste pour ignorer le bruit des zones unies.
+    """
+    np = backends.numpy()
+    low, high = np.percentile(profile, (5, 95))
+    if high - low < pc.GRID_CONFIG['min_contrast']:
+        return []
+    window = max(2, int(round(2 * pitch)))
+    threshold = np.convolve(profile, np.ones(window) / window, mode='same')
+    hysteresis = (high - low) / 4
+    state = np.where(profile > threshold + hysteresis, 1, np.where(profile < threshold - hysteresis, -1, 0))
+    decided = np.flatnonzero(state)
+    changes = np.flatnonzero(state[decided][1:] != state[decided][:-1])
+
+    # Pour chaque changement d'état: premier changement de signe de (profil - seuil) entre les deux échantillons
+    above = profile - threshold
+    crossings = np.flatnonzero(np.sign(above[1:]) != np.sign(above[:-1]))
+    starts, ends = decided[changes], decided[changes + 1]
+    if len(crossings) == 0 or len(starts) == 0:
+        return []
+    found = crossings[np.minimum(np.searchsorted(crossings, starts), len(crossings) - 1)]
+    m = np.where((found >= starts) & (found < ends), found, starts)
+    step = above[m] - above[m + 1]
+    fraction = np.divide(above[m], step, out=np.full(len(m), 0.5), where=step != 0)
+    return list(m + 0.5 + fraction) # Le pixel m est échantillonné en son centre, m + 0.5
+
+def _fit_axis(edges: list[float], pitch_estimate: float, first_boundary: int, last_boundary: int):
+    """
+    Ajuste frontière(k) = origine + k * pas sur les transitions d'une ligne TP, k étant l'indice de
+    frontière de colonne (first_boundary à last_boundary). Retourne (origine, pas) ou None.
+    """
+    np = backends.numpy()
+    cfg = pc.GRID_CONFIG
+    expected_edges = last_boundary - first_boundary + 1
+    if len(edges) < cfg['min_edge_fraction'] * expected_edges:
+        return None
+    positions = np.array(edges)
+    spacings = np.diff(positions)
+    pitch = float(np.median(spacings[spacings > pitch_estimate / 2])) if (spacings > pitch_estimate / 2).any() else 0.0
+    if not (1 - cfg['max_pitch_error']) * pitch_estimate <= pitch <= (1 + cfg['max_pitch_error']) * pitch_estimate:
+        return None
+
+    # Indices de frontière relatifs, pas à pas (une frontière manquante compte double): insensible aux
+    # cellules de largeurs inégales d'un redimensionnement au plus proche voisin
+    steps = np.rint(spacings / pitch)
+    indices = np.concatenate([[0.0], np.cumsum(steps)])
+    keep = np.concatenate([[True], steps > 0]) # Transition parasite à moins d'un demi-pas de la précédente
+    for _ in range(2): # Ajustement, puis nouvel ajustement sans les transitions aberrantes
+        if keep.sum() < cfg['min_edge_fraction'] * expected_edges or len(np.unique(indices[keep])) < keep.sum():
+            return None
+        slope, intercept = np.polyfit(indices[keep], positions[keep], 1)
+        keep = np.abs(positions - (intercept + slope * indices)) <= slope * cfg['max_edge_residual']
+
+    # La première transition trouvée est la frontière la plus proche de sa position prévue
+    index_offset = int(round(intercept / slope))
+    if index_offset < first_boundary or index_offset + indices[keep].max() > last_boundary:
+        return None
+    return float(intercept - index_offset * slope), float(slope)
+
+def _measure(luminance, row_centers, col_centers, timing_row: int, timing_col: int, profile: pf.ProtocolProfile):
+    """Une passe de mesure: profils des lignes TP placés selon la grille courante. Retourne une grille ou None."""
+    np = backends.numpy()
+    # Les deux motifs TP couvrent les frontières first à last, symétriques: inchangées par rotation ou miroir
+    _, _, first, last = profile.zone_coords['TP_H']
+    last += 1
+    cell_indices = np.arange(profile.matrix_dim) + 0.5
+
+    fits = []
+    for axis, line_center, pitch in (
+        (0, row_centers[timing_row], grid_pitch(row_centers)), # Ligne TP horizontale -> colonnes
+        (1, col_centers[timing_col], grid_pitch(col_centers)), # Ligne TP verticale -> lignes
+    ):
+        half_band = max(0, int(pitch * pc.GRID_CONFIG['band_fraction'] / 2))
+        center = int(line_center)
+        lines = luminance[max(0, center - half_band):center + half_band + 1] if axis == 0 else \
+                luminance[:, max(0, center - half_band):center + half_band + 1].T
+        if lines.size == 0:
+            return None
+        # Pas attendu le long de la ligne: celui de l'autre axe
+        along_pitch = grid_pitch(col_centers) if axis == 0 else grid_pitch(row_centers)
+        fit = _fit_axis(_line_edges(lines.mean(axis=0), along_pitch), along_pitch, first, last)
+        if fit is None:
+            return None
+        fits.append(fit)
+    (col_origin, col_pitch), (row_origin, row_pitch) = fits
+    return row_origin + cell_indices * row_pitch, col_origin + cell_indices * col_pitch
+
+def measure_grid(image: Image.Image, timing_row: int = None, timing_col: int = None, profile: pf.ProtocolProfile = None):
+    """
+    Mesure la grille sur les motifs de synchronisation de image (symbole occupant l'image).
+    timing_row / timing_col: ligne et colonne de cellules de l'image qui portent les motifs TP horizontal
+    et vertical (par défaut celles du symbole non tourné; voir orientation.timing_lines).
+    Retourne (row_centers, col_centers), ou None si les lignes TP ne sont pas lisibles.
+    """
+    profile = pf.resolve(profile)
+    if timing_row is None:
+        timing_row = profile.zone_coords['TP_H'][0]
+    if timing_col is None:
+        timing_col = profile.zone_coords['TP_V'][2]
+    luminance = _luminance(image)
+    height, width = luminance.shape
+    grid = size_grid(image, profile)
+    for _ in range(pc.GRID_CONFIG['passes']): # Chaque passe replace les lignes de mesure selon la grille trouvée
+        grid = _measure(luminance, *grid, timing_row, timing_col, profile)
+        if grid is None:
+            return None
+    row_centers, col_centers = grid
+    if row_centers[0] < 0 or col_centers[0] < 0 or row_centers[-1] >= height or col_centers[-1] >= width:
+        return None
+    return grid
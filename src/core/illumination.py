@@ -0,0 +1,113 @@
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.profile as pf
+
+# Compensation spatiale de l'éclairage.
+# Le symbole contient des dizaines de cellules de couleur connue réparties sur sa surface: lignes de
+# synchronisation (TP, noir/blanc alternés), anneaux et marges blanches des FP, patchs CCP.
+# Pour chaque canal, on ajuste par moindres carrés un champ de gain et un champ de décalage polynomiaux
+# (degré ILLUMINATION_CONFIG['degree'] en ligne/colonne): observé = gain(r, c) * attendu + décalage(r, c).
+# Les couleurs de toutes les cellules sont ensuite corrigées en une opération vectorisée.
+# Aucune référence ne couvre le quart bas-droit du symbole: le champ y est extrapolé. Un second ajustement
+# ajoute donc comme références les cellules classées avec une confiance suffisante après la première
+# correction (ILLUMINATION_CONFIG['refit_confidence']), qui couvrent toute la surface.
+# Les tableaux constants (références, monômes de la grille) sont calculés une fois par profil de protocole.
+
+def _polynomial_terms(np, rows, cols, degree: int, matrix_dim: int):
+    """Monômes u^i * v^j (i + j <= degree) des coordonnées normalisées dans [-1, 1]: tableau (n, termes)."""
+    u = np.asarray(cols, dtype=np.float64) / (matrix_dim - 1) * 2 - 1
+    v = np.asarray(rows, dtype=np.float64) / (matrix_dim - 1) * 2 - 1
+    return np.stack([u ** i * v ** j for i in range(degree + 1) for j in range(degree + 1 - i)], axis=1)
+
+def _references(np, profile):
+    """Cellules des motifs fixes: (lignes, colonnes, couleurs attendues (n, 3), indice de palette (n,))."""
+    def build():
+        fixed_cells = profile.fixed_cells
+        return pf.read_only(np.array([r for r, _, _ in fixed_cells]), np.array([c for _, c, _ in fixed_cells]),
+                            np.array([profile.bits_to_color[bits] for _, _, bits in fixed_cells], dtype=np.float64),
+                            np.array([profile.bits_order.index(bits) for _, _, bits in fixed_cells]))
+    return profile.cached('illumination_references', build)
+
+def _grid_terms(np, degree: int, profile):
+    def build():
+        grid_rows, grid_cols = np.mgrid[0:profile.matrix_dim, 0:profile.matrix_dim]
+        return pf.read_only(_polynomial_terms(np, grid_rows.ravel(), grid_cols.ravel(), degree, profile.matrix_dim))[0]
+    return profile.cached(('illumination_grid_terms', degree), build)
+
+def _fit(np, colors, rows, cols, expected, degree: int, profile):
+    """Champs (gain, décalage) (MATRIX_DIM, MATRIX_DIM, 3) ajustés sur les cellules (rows, cols) de couleur attendue expected."""
+    observed = colors[rows, cols]
+    terms = _polynomial_terms(np, rows, cols, degree, profile.matrix_dim)
+    grid_terms = _grid_terms(np, degree, profile)
+    # Un système par canal, résolus ensemble par les équations normales: inconnues = [coefficients du gain,
+    # coefficients du décalage]; une légère régularisation garde le système inversible
+    systems = np.concatenate([terms[None, :, :] * (expected.T / 255)[:, :, None],
+                              np.broadcast_to(terms, (3,) + terms.shape)], axis=2)
+    normal = systems.transpose(0, 2, 1) @ systems + 1e-9 * np.eye(systems.shape[2])
+    coefficients = np.linalg.solve(normal, (systems.transpose(0, 2, 1) @ observed.T[:, :, None]))[:, :, 0]
+    term_count = terms.shape[1]
+    gain = grid_terms @ coefficients[:, :term_count].T / 255
+    offset = grid_terms @ coefficients[:, term_count:].T
+    shape = (profile.matrix_dim, profile.matrix_dim, 3)
+    return gain.reshape(shape), offset.reshape(shape)
+
+def _apply(np, colors, field):
+    gain, offset = field
+    gain = np.maximum(gain, pc.ILLUMINATION_CONFIG['min_gain'])
+    return np.clip(np.rint((colors - offset) / gain), 0, 255)
+
+def fit_illumination_field(cell_colors, degree: int = None, profile: pf.ProtocolProfile = None, refit: bool = True):
+    """
+    Ajuste les champs de gain et de décalage sur les cellules de cell_colors
+    (tableau (MATRIX_DIM, MATRIX_DIM, 3), voir decoder.sample_cell_colors): motifs fixes, puis
+    (second ajustement, sauf si refit est faux) toutes les cellules classées avec une confiance suffisante.
+    Sans second ajustement, seules les cellules fixes de cell_colors sont lues.
+    Retourne (gain, décalage), deux tableaux (MATRIX_DIM, MATRIX_DIM, 3).
+    """
+    np = backends.numpy()
+    cfg = pc.ILLUMINATION_CONFIG
+    if degree is None:
+        degree = cfg['degree']
+    profile = pf.resolve(profile)
+    colors = np.asarray(cell_colors, dtype=np.float64)
+    rows, cols, expected, _ = _references(np, profile)
+    field = _fit(np, colors, rows, cols, expected, degree, profile)
+    if not refit or cfg['refit_confidence'] is None:
+        return field
+
+    corrected = _apply(np, colors, field)
+    calibration_map = reference_calibration(corrected, profile)
+    centroids = np.array([calibration_map[bits] for bits in profile.bits_order], dtype=np.float64)
+    distances = np.sqrt(((corrected[:, :, None, :] - centroids) ** 2).sum(axis=3))
+    nearest = np.sort(distances, axis=2)
+    confidence = 1 - nearest[:, :, 0] / np.maximum(nearest[:, :, 1], 1e-9)
+    labels = distances.argmin(axis=2)
+    confident = confidence >= cfg['refit_confidence']
+    confident[rows, cols] = False # Les motifs fixes gardent leur couleur connue
+    palette = profile.palette_array()
+    extra_rows, extra_cols = np.nonzero(confident)
+    return _fit(np, colors,
+                np.concatenate([rows, extra_rows]), np.concatenate([cols, extra_cols]),
+                np.concatenate([expected, palette[labels[extra_rows, extra_cols]]]), degree, profile)
+
+def compensate_cell_colors(cell_colors, degree: int = None, profile: pf.ProtocolProfile = None, refit: bool = True):
+    """Couleurs de cellules corrigées de l'éclairage, ramenées à l'échelle de la palette (entiers de 0 à 255)."""
+    np = backends.numpy()
+    field = fit_illumination_field(cell_colors, degree, profile, refit)
+    return _apply(np, np.asarray(cell_colors, dtype=np.float64), field)
+
+def reference_calibration(cell_colors, profile: pf.ProtocolProfile = None) -> dict[str, tuple[int, int, int]]:
+    """
+    calibration_map (même forme que decoder.perform_color_calibration) calculée sur toutes les cellules
+    des motifs fixes de cell_colors: couleur moyenne des cellules fixes de chaque paire de bits.
+    """
+    np = backends.numpy()
+    profile = pf.resolve(profile)
+    rows, cols, _, reference_labels = _references(np, profile)
+    observed = np.asarray(cell_colors, dtype=np.float64)[rows, cols]
+    bits_order = profile.bits_order
+    counts = np.bincount(reference_labels, minlength=len(bits_order))
+    sums = np.stack([np.bincount(reference_labels, weights=observed[:, channel], minlength=len(bits_order))
+                     for channel in range(3)], axis=1)
+    return {bits: tuple(int(round(v)) for v in sums[k] / counts[k])
+            for k, bits in enumerate(bits_order) if counts[k]}
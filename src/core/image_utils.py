@@ -1,19 +1,43 @@
-from PIL import Image, ImageDraw
+from __future__ import annotations
+import io
+from typing import TYPE_CHECKING
 import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.profile as pf
+import src.core.vector_output as vector_output
 
-def bits_to_rgb(bits_pair: str):
-    """Convertit une paire de bits (ex: '01') en une couleur RVB en utilisant BITS_TO_COLOR_MAP."""
-    if bits_pair not in pc.BITS_TO_COLOR_MAP:
+if TYPE_CHECKING:
+    from PIL import Image
+
+def bits_to_rgb(bits_pair: str, profile: pf.ProtocolProfile = None):
+    """Convertit une paire de bits (ex: '01') en une couleur RVB selon la palette du profil (BITS_TO_COLOR_MAP par défaut)."""
+    bits_to_color = pf.resolve(profile).bits_to_color
+    if bits_pair not in bits_to_color:
         # Pourrait arriver si la bit_matrix contient None ou des valeurs incorrectes
         # print(f"Warning: bits_pair '{bits_pair}' not found in BITS_TO_COLOR_MAP. Defaulting to black.")
         return pc.BLACK # Retourner une couleur par défaut ou lever une erreur
-    return pc.BITS_TO_COLOR_MAP[bits_pair]
+    return bits_to_color[bits_pair]
 
-def create_protocol_image(bit_matrix, cell_pixel_size: int, output_filename: str):
+def create_protocol_image(bit_matrix, cell_pixel_size: int, output_filename: str, profile: pf.ProtocolProfile = None):
     """
     Crée une image graphique du protocole à partir de la bit_matrix.
-    Sauvegarde l'image dans output_filename.
+    Sauvegarde l'image dans output_filename; les extensions .svg et .pdf donnent un rendu vectoriel
+    (voir vector_output), cell_pixel_size étant alors la taille nominale d'une cellule.
+    """
+    extension = output_filename.rsplit('.', 1)[-1].lower()
+    if extension in vector_output.VECTOR_FORMATS:
+        with open(output_filename, 'wb') as f:
+            f.write(vector_output.render_vector_bytes(bit_matrix, extension, cell_pixel_size, profile))
+        return
+    render_protocol_image(bit_matrix, cell_pixel_size, profile).save(output_filename)
+    # print(f"Image sauvegardée sous {output_filename}") 
+
+def render_protocol_image(bit_matrix, cell_pixel_size: int, profile: pf.ProtocolProfile = None) -> Image.Image:
+    """
+    Crée l'image graphique du protocole (image PIL en mode RGB) sans l'écrire sur disque.
+    Les couleurs sont celles de la palette de profile (profil par défaut si None).
     """
+    profile = pf.resolve(profile)
     if not bit_matrix or not bit_matrix[0]:
         raise ValueError("bit_matrix is empty or invalid.")
     
@@ -23,8 +47,8 @@ def create_protocol_image(bit_matrix, cell_pixel_size: int, output_filename: str
     image_width = matrix_width * cell_pixel_size
     image_height = matrix_height * cell_pixel_size
     
-    image = Image.new("RGB", (image_width, image_height), pc.WHITE) # Fond blanc par défaut
-    draw = ImageDraw.Draw(image)
+    image = backends.pil_image().new("RGB", (image_width, image_height), pc.WHITE) # Fond blanc par défaut
+    draw = backends.pil_image_draw().Draw(image)
     
     for r in range(matrix_height):
         for c in range(matrix_width):
@@ -36,7 +60,7 @@ def create_protocol_image(bit_matrix, cell_pixel_size: int, output_filename: str
                 # print(f"Warning: Cell ({r},{c}) is None. Drawing as white.")
                 color_rgb = pc.WHITE # Ou une autre couleur de débogage
             else:
-                color_rgb = bits_to_rgb(bits_pair)
+                color_rgb = bits_to_rgb(bits_pair, profile)
             
             # Coordonnées du rectangle pour la cellule
             x0 = c * cell_pixel_size
@@ -46,13 +70,18 @@ def create_protocol_image(bit_matrix, cell_pixel_size: int, output_filename: str
             
             draw.rectangle([x0, y0, x1, y1], fill=color_rgb)
             
-    image.save(output_filename)
-    # print(f"Image sauvegardée sous {output_filename}") 
+    return image
+
+def encode_image_bytes(image: Image.Image, image_format: str = "PNG") -> bytes:
+    """Sérialise une image PIL en octets (PNG par défaut)."""
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format)
+    return buffer.getvalue()
 
 def load_image_from_file(filepath: str):
     """Charge une image à partir du chemin de fichier spécifié."""
     try:
-        image = Image.open(filepath)
+        image = backends.pil_image().open(filepath)
         return image.convert("RGB") # S'assurer que l'image est en mode RGB
     except FileNotFoundError:
         raise FileNotFoundError(f"Le fichier image '{filepath}' n'a pas été trouvé.")
@@ -65,11 +94,26 @@ def rgb_to_bits(rgb_tuple: tuple[int, int, int], calibration_map: dict[str, tupl
     La calibration_map est un dictionnaire comme {'00': (r,g,b), '01': (r,g,b), ...}.
     Utilise la distance euclidienne pour trouver la couleur la plus proche.
     """
+    return rgb_to_bits_with_confidence(rgb_tuple, calibration_map)[0]
+
+def rgb_to_bits_with_confidence(
+    rgb_tuple: tuple[int, int, int],
+    calibration_map: dict[str, tuple[int, int, int]]
+    ) -> tuple[str, float, str | None]:
+    """
+    Classification "souple": comme rgb_to_bits, mais retourne aussi la confiance et le second choix.
+    Retourne (closest_bits, confidence, second_closest_bits).
+    confidence = 1 - d1 / d2, où d1 et d2 sont les distances euclidiennes aux deux couleurs les plus proches:
+    1.0 pour une correspondance exacte, 0.0 pour une cellule à égale distance de deux couleurs.
+    second_closest_bits est None si la calibration_map ne contient qu'une couleur.
+    """
     if not calibration_map:
         raise ValueError("La calibration_map est vide.")
 
     min_distance = float('inf')
+    second_distance = float('inf')
     closest_bits = None
+    second_bits = None
 
     r1, g1, b1 = rgb_tuple
 
@@ -79,11 +123,20 @@ def rgb_to_bits(rgb_tuple: tuple[int, int, int], calibration_map: dict[str, tupl
         distance = (r1 - r2)**2 + (g1 - g2)**2 + (b1 - b2)**2
         
         if distance < min_distance:
+            second_distance, second_bits = min_distance, closest_bits
             min_distance = distance
             closest_bits = bits_repr
+        elif distance < second_distance:
+            second_distance = distance
+            second_bits = bits_repr
             
     if closest_bits is None:
         # Ne devrait pas arriver si calibration_map n'est pas vide
         raise RuntimeError("Impossible de déterminer les bits les plus proches à partir de la calibration_map.")
-        
-    return closest_bits 
\ No newline at end of file
+
+    if second_bits is None:
+        return closest_bits, 1.0, None
+    if second_distance == 0:
+        return closest_bits, 0.0, second_bits # Deux couleurs de calibration identiques
+    confidence = 1.0 - (min_distance ** 0.5) / (second_distance ** 0.5)
+    return closest_bits, confidence, second_bits
@@ -0,0 +1,79 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+# Instrumentation du décodage: chronométrage par étape, observateurs et statistiques par appel.
+# Étapes du décodeur: 'load', 'estimate', 'calibrate', 'metadata', 'sample', 'ecc', 'decrypt', 'text'.
+
+_stage_observers = [] # Remplacée (jamais modifiée en place) sous _observers_lock: lue sans verrou par stage_timer
+_observers_lock = threading.Lock()
+
+class DecodeStats:
+    """
+    Statistiques d'un appel de décodage, à passer via le paramètre stats des fonctions du décodeur.
+    stages: {nom_étape: durée en ms} dans l'ordre d'exécution.
+    warnings: avertissements agrégés émis pendant l'appel.
+    counters: compteurs libres (ex: 'sampled_cells', 'erasures').
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.warnings = []
+        self.counters = {}
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.stages.values())
+
+    def add_stage(self, name: str, duration_ms: float):
+        self.stages[name] = self.stages.get(name, 0.0) + duration_ms
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def as_dict(self) -> dict:
+        return {
+            'stages': dict(self.stages),
+            'total_ms': self.total_ms,
+            'warnings': list(self.warnings),
+            'counters': dict(self.counters),
+        }
+
+def add_stage_observer(callback):
+    """
+    Enregistre callback(stage_name, duration_ms, stats) appelé à la fin de chaque étape de décodage.
+    stats est l'objet DecodeStats de l'appel, ou None si l'appelant n'en a pas fourni.
+    """
+    global _stage_observers
+    with _observers_lock:
+        if callback not in _stage_observers:
+            _stage_observers = _stage_observers + [callback]
+
+def remove_stage_observer(callback):
+    """Retire un observateur enregistré avec add_stage_observer (sans erreur s'il est absent)."""
+    global _stage_observers
+    with _observers_lock:
+        _stage_observers = [observer for observer in _stage_observers if observer != callback]
+
+@contextmanager
+def stage_timer(stage_name: str, stats: DecodeStats = None):
+    """
+    Chronomètre le bloc et publie la durée dans stats et auprès des observateurs.
+    Sans stats ni observateur, le coût se limite à deux appels à perf_counter.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        if stats is not None:
+            stats.add_stage(stage_name, duration_ms)
+        for callback in _stage_observers:
+            callback(stage_name, duration_ms, stats)
+
+def warn(logger: logging.Logger, stats: DecodeStats, message: str, *args):
+    """Émet un avertissement via logging et le conserve dans stats (si fourni)."""
+    logger.warning(message, *args)
+    if stats is not None:
+        stats.warnings.append(message % args if args else message)
@@ -0,0 +1,216 @@
+import src.core.protocol_config as pc
+import src.core.profile as pf
+import src.core.data_processing as dp
+
+# Masquage des données (inspiré des masques QR) pour les symboles de version PROTOCOL_VERSION_EXTENDED.
+# Un masque XOR la valeur 2 bits des cellules DATA_ECC (hors bloc de métadonnées étendues) qui satisfont
+# sa condition. Le masque retenu est celui de pénalité minimale; son id est inscrit dans le champ 'mask'
+# des métadonnées étendues (0 = pas de masque). Le masque étant un XOR, l'appliquer deux fois le retire.
+#
+# Le score est calculé sur des "bitboards": un entier Python par valeur de cellule, un bit par cellule
+# (ligne r, colonne c -> bit r * (MATRIX_DIM + 1) + c). La colonne de garde (toujours à 0) empêche les motifs
+# de déborder d'une ligne sur la suivante. Chaque terme de pénalité est ainsi évalué sur tout le
+# symbole en quelques opérations entières, sans boucle par cellule ni dépendance externe.
+# Les bitboards dépendent de la disposition: ils sont calculés une fois par profil de protocole
+# (voir profile.ProtocolProfile.cached).
+
+# mask_id -> (condition sur (ligne, colonne) absolues, valeur XOR appliquée aux 2 bits de la cellule)
+MASK_PATTERNS = {
+    1: (lambda r, c: (r + c) % 2 == 0, 0b01),
+    2: (lambda r, c: r % 2 == 0, 0b11),
+    3: (lambda r, c: c % 3 == 0, 0b10),
+    4: (lambda r, c: (r + c) % 3 == 0, 0b01),
+    5: (lambda r, c: (r // 2 + c // 3) % 2 == 0, 0b11),
+    6: (lambda r, c: (r * c) % 2 + (r * c) % 3 == 0, 0b10),
+    7: (lambda r, c: ((r + c) % 2 + (r * c) % 3) % 2 == 0, 0b01),
+}
+
+_GUARD_CELL = '0' * pc.BITS_PER_CELL
+
+class _Layout:
+    """Bitboards et listes de cellules dérivés de la disposition d'un profil (voir _layout)."""
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.stride = profile.matrix_dim + 1 # Colonne de garde
+        self.valid_cells = sum(((1 << profile.matrix_dim) - 1) << (r * self.stride) for r in range(profile.matrix_dim))
+        self.total_cells = profile.matrix_dim * profile.matrix_dim
+        # Cellules DATA_ECC du bloc de métadonnées étendues: jamais masquées
+        self.header_cells = profile.fill_order[:dp.extended_metadata_length() // pc.BITS_PER_CELL]
+        # Valeurs des cellules sombres / claires des motifs de type FP: couleurs des motifs de synchronisation
+        self.dark_value = int(profile.color_to_bits[profile.settings['TP_CONFIG']['line_color1']], 2)
+        self.light_value = int(profile.color_to_bits[profile.settings['TP_CONFIG']['line_color2']], 2)
+        self.finder_exclusions = self._finder_window_exclusions()
+
+    def cell_bit(self, r: int, c: int) -> int:
+        return 1 << (r * self.stride + c)
+
+    def _finder_window_exclusions(self) -> dict:
+        """
+        {pas: bitboard} des débuts de motif autorisés: un motif de type FP qui chevauche un vrai FP
+        (marge comprise) n'est pas pénalisé.
+        """
+        finder_area = 0
+        for zone_name in ('FP_TL', 'FP_TR', 'FP_BL'):
+            r_start, r_end, c_start, c_end = self.profile.zone_coords[zone_name]
+            for r in range(r_start, r_end + 1):
+                for c in range(c_start, c_end + 1):
+                    finder_area |= self.cell_bit(r, c)
+        pattern_length = len(pc.MASKING_CONFIG['finder_like_patterns'][0])
+        exclusions = {}
+        for step in (1, self.stride):
+            overlapping = 0
+            for k in range(pattern_length):
+                overlapping |= finder_area >> (k * step)
+            exclusions[step] = ~overlapping
+        return exclusions
+
+def _layout(profile: pf.ProtocolProfile = None) -> _Layout:
+    profile = pf.resolve(profile)
+    return profile.cached('masking_layout', lambda: _Layout(profile))
+
+def available_mask_ids() -> list[int]:
+    """Ids de masque utilisables (0 = pas de masque)."""
+    return [0] + sorted(MASK_PATTERNS)
+
+def _mask_region(mask_id: int, profile: pf.ProtocolProfile = None) -> int:
+    layout = _layout(profile)
+    def build():
+        region = 0
+        if mask_id:
+            condition, _ = MASK_PATTERNS[mask_id]
+            for r, c in layout.profile.fill_order[len(layout.header_cells):]:
+                if condition(r, c):
+                    region |= layout.cell_bit(r, c)
+        return region
+    return layout.profile.cached(('mask_region', mask_id), build)
+
+def mask_xor_values(mask_id: int, profile: pf.ProtocolProfile = None) -> tuple:
+    """Valeur XOR (0 à 3) de chaque cellule DATA_ECC, dans l'ordre de remplissage, pour mask_id."""
+    if mask_id not in available_mask_ids():
+        raise ValueError(f"Unknown mask id {mask_id}.")
+    layout = _layout(profile)
+    def build():
+        region = _mask_region(mask_id, layout.profile)
+        xor_value = MASK_PATTERNS[mask_id][1] if mask_id else 0
+        return tuple(xor_value if region & layout.cell_bit(r, c) else 0 for r, c in layout.profile.fill_order)
+    return layout.profile.cached(('mask_xor', mask_id), build)
+
+def _xor_cell_bits(bits_pair: str, xor_value: int) -> str:
+    return format(int(bits_pair, 2) ^ xor_value, f'0{pc.BITS_PER_CELL}b')
+
+def apply_mask(bit_matrix, mask_id: int, profile: pf.ProtocolProfile = None):
+    """Applique (ou retire) le masque mask_id à bit_matrix, en place."""
+    if not mask_id:
+        return
+    profile = pf.resolve(profile)
+    for (r, c), xor_value in zip(profile.fill_order, mask_xor_values(mask_id, profile)):
+        if xor_value:
+            bit_matrix[r][c] = _xor_cell_bits(bit_matrix[r][c], xor_value)
+
+def unmask_payload_cells(cell_bits: list, mask_id: int, profile: pf.ProtocolProfile = None) -> list:
+    """
+    Retire le masque d'une liste de valeurs 2 bits lues dans l'ordre de remplissage DATA_ECC.
+    Les valeurs None (cellule sans second choix, par exemple) sont conservées.
+    """
+    if not mask_id:
+        return list(cell_bits)
+    return [
+        bits if bits is None or not xor_value else _xor_cell_bits(bits, xor_value)
+        for bits, xor_value in zip(cell_bits, mask_xor_values(mask_id, profile))
+    ]
+
+# --- Score de pénalité ---
+
+def _value_planes(bit_matrix, profile: pf.ProtocolProfile = None) -> list[int]:
+    """
+    Un bitboard par valeur de cellule (index = valeur 2 bits). La matrice est lue comme un seul texte
+    binaire dont on extrait un bitboard par rang de bit; chaque valeur est ensuite une combinaison de ceux-ci.
+    """
+    symbol_text = "".join("".join(row) + _GUARD_CELL for row in bit_matrix)
+    bit_boards = [int(symbol_text[k::pc.BITS_PER_CELL][::-1], 2) for k in range(pc.BITS_PER_CELL)]
+    valid_cells = _layout(profile).valid_cells
+    planes = []
+    for value in range(2 ** pc.BITS_PER_CELL):
+        plane = valid_cells
+        for k, board in enumerate(bit_boards):
+            bit_set = (value >> (pc.BITS_PER_CELL - 1 - k)) & 1
+            plane &= board if bit_set else ~board
+        planes.append(plane)
+    return planes
+
+def _windows(plane: int, step: int, length: int) -> int:
+    """Bits i tels que les cellules i, i+step, ..., i+(length-1)*step sont toutes dans plane."""
+    result = plane
+    for k in range(1, length):
+        result &= plane >> (k * step)
+    return result
+
+def penalty_score(planes: list[int], profile: pf.ProtocolProfile = None) -> int:
+    """
+    Pénalité d'un symbole décrit par ses bitboards (un par valeur de cellule). Termes inspirés du QR:
+    - séries: run_penalty + (L - run_length) par série horizontale ou verticale de L >= run_length cellules;
+    - blocs: block_penalty par bloc 2x2 d'une seule valeur;
+    - motifs de type FP (noir/blanc 1:1:3:1:1 bordé de blanc) hors des vrais FP: finder_like_penalty chacun;
+    - équilibre: balance_penalty par tranche de 5 % d'écart de chaque valeur à la proportion idéale.
+    """
+    cfg = pc.MASKING_CONFIG
+    layout = _layout(profile)
+    run_length = cfg['run_length']
+    score = 0
+    for plane in planes:
+        for step in (1, layout.stride):
+            windows = _windows(plane, step, run_length)
+            if windows:
+                # Une série de L cellules donne L - run_length + 1 fenêtres, dont un seul début.
+                run_count = (windows & ~(windows << step)).bit_count()
+                score += cfg['run_penalty'] * run_count + windows.bit_count() - run_count
+        score += cfg['block_penalty'] * _windows(_windows(plane, 1, 2), layout.stride, 2).bit_count()
+
+    dark = planes[layout.dark_value]
+    light = planes[layout.light_value]
+    for step, allowed_starts in layout.finder_exclusions.items():
+        for pattern in cfg['finder_like_patterns']:
+            matches = allowed_starts
+            for k, symbol in enumerate(pattern):
+                matches &= (dark if symbol == '1' else light) >> (k * step)
+            score += cfg['finder_like_penalty'] * matches.bit_count()
+
+    total_cells = layout.total_cells
+    ideal_percent = 100 // len(planes)
+    for plane in planes:
+        deviation_percent = abs(plane.bit_count() * 100 - ideal_percent * total_cells) // total_cells
+        score += cfg['balance_penalty'] * (deviation_percent // 5)
+    return score
+
+def score_masks(bit_matrix, extended_fields: dict = None, profile: pf.ProtocolProfile = None) -> dict:
+    """
+    Pénalité de chaque masque candidat pour bit_matrix (complète, non masquée; le contenu de ses cellules
+    de métadonnées étendues est ignoré). Pour chaque candidat, le bloc de métadonnées étendues évalué est
+    celui qui sera réellement écrit (champ 'mask' compris). Retourne {mask_id: pénalité}.
+    """
+    layout = _layout(profile)
+    header_cells = layout.header_cells
+    header_area = 0
+    for r, c in header_cells:
+        header_area |= layout.cell_bit(r, c)
+    base_planes = [plane & ~header_area for plane in _value_planes(bit_matrix, layout.profile)]
+
+    scores = {}
+    for mask_id in available_mask_ids():
+        region = _mask_region(mask_id, layout.profile)
+        xor_value = MASK_PATTERNS[mask_id][1] if mask_id else 0
+        planes = [
+            (base_planes[value] & ~region) | (base_planes[value ^ xor_value] & region)
+            for value in range(len(base_planes))
+        ]
+        header_stream = dp.format_extended_metadata_bits(**{**(extended_fields or {}), 'mask': mask_id})
+        for (r, c), i in zip(header_cells, range(0, len(header_stream), pc.BITS_PER_CELL)):
+            planes[int(header_stream[i:i + pc.BITS_PER_CELL], 2)] |= layout.cell_bit(r, c)
+        scores[mask_id] = penalty_score(planes, layout.profile)
+    return scores
+
+def select_mask(bit_matrix, extended_fields: dict = None, profile: pf.ProtocolProfile = None) -> int:
+    """Retourne l'id du masque de pénalité minimale (le plus petit id en cas d'égalité)."""
+    scores = score_masks(bit_matrix, extended_fields, profile)
+    return min(scores, key=lambda mask_id: (scores[mask_id], mask_id))
@@ -0,0 +1,89 @@
+import src.core.backends as backends
+import src.core.profile as pf
+
+# Orientation du symbole dans l'image: rotation d'un nombre de quarts de tour (sens trigonométrique, comme
+# numpy.rot90 et PIL Image.Transpose.ROTATE_90) et miroir (symbole vu à travers le dos d'une étiquette
+# transparente: retournement gauche-droite appliqué avant la rotation).
+# Une orientation est un couple (quarts_de_tour, miroir); les 8 combinaisons forment ORIENTATIONS.
+# Les FP n'occupent que trois coins et les patchs CCP longent le bord bas près du FP bas-gauche: seul le bon
+# couple fait coïncider les cellules fixes de l'image avec leurs couleurs attendues. Le passage de l'image à
+# l'orientation de référence est une vue NumPy (rot90/fliplr), sans copie du tableau des cellules.
+
+IDENTITY = (0, False)
+ORIENTATIONS = [(quarter_turns, mirrored) for mirrored in (False, True) for quarter_turns in range(4)]
+
+def to_image_view(cell_array, orientation):
+    """Vue (sans copie) d'un tableau (MATRIX_DIM, MATRIX_DIM, ...) en orientation de référence, tel que vu dans l'image."""
+    np = backends.numpy()
+    quarter_turns, mirrored = orientation
+    return np.rot90(np.fliplr(cell_array) if mirrored else cell_array, quarter_turns)
+
+def canonical_view(cell_array, orientation):
+    """Vue (sans copie) d'un tableau de cellules échantillonné dans l'image, ramené à l'orientation de référence."""
+    np = backends.numpy()
+    quarter_turns, mirrored = orientation
+    view = np.rot90(cell_array, -quarter_turns)
+    return np.fliplr(view) if mirrored else view
+
+def image_cell(orientation, row: int, col: int, profile: pf.ProtocolProfile = None) -> tuple[int, int]:
+    """Position dans l'image de la cellule (row, col) du symbole de référence."""
+    np = backends.numpy()
+    matrix_dim = pf.resolve(profile).matrix_dim
+    indices = to_image_view(np.arange(matrix_dim * matrix_dim).reshape(matrix_dim, matrix_dim), orientation)
+    image_row, image_col = np.argwhere(indices == row * matrix_dim + col)[0]
+    return int(image_row), int(image_col)
+
+def timing_lines(orientation, profile: pf.ProtocolProfile = None) -> tuple[int, int]:
+    """
+    (ligne de l'image portant le motif de synchronisation horizontal, colonne portant le vertical).
+    Les deux motifs TP couvrent les mêmes frontières de cellules dans un sens ou dans l'autre:
+    seule leur position change avec l'orientation.
+    """
+    profile = pf.resolve(profile)
+    tp_h_row, _, tp_h_first, _ = profile.zone_coords['TP_H']
+    tp_v_first, _, tp_v_col, _ = profile.zone_coords['TP_V']
+    h_start = image_cell(orientation, tp_h_row, tp_h_first, profile)
+    h_next = image_cell(orientation, tp_h_row, tp_h_first + 1, profile)
+    v_start = image_cell(orientation, tp_v_first, tp_v_col, profile)
+    if h_start[0] == h_next[0]: # TP_H reste horizontal
+        return h_start[0], v_start[1]
+    return v_start[0], h_start[1]
+
+def _fixed_cells(np, profile):
+    """(lignes, colonnes, couleurs attendues centrées) des cellules des motifs fixes du profil."""
+    def build():
+        cells = profile.fixed_cells
+        expected = np.array([profile.bits_to_color[bits] for _, _, bits in cells], dtype=np.float64)
+        return pf.read_only(np.array([r for r, _, _ in cells]), np.array([c for _, c, _ in cells]),
+                            expected - expected.mean(axis=0))
+    return profile.cached('orientation_fixed_cells', build)
+
+def fixed_cells_mask(profile: pf.ProtocolProfile = None):
+    """
+    Masque (MATRIX_DIM, MATRIX_DIM) en lecture seule des cellules de l'image lues par detect_orientation:
+    positions des cellules fixes dans l'une quelconque des 8 orientations.
+    """
+    np = backends.numpy()
+    profile = pf.resolve(profile)
+    def build():
+        rows, cols, _ = _fixed_cells(np, profile)
+        fixed = np.zeros((profile.matrix_dim, profile.matrix_dim), dtype=bool)
+        fixed[rows, cols] = True
+        return pf.read_only(np.logical_or.reduce([to_image_view(fixed, orientation) for orientation in ORIENTATIONS]))[0]
+    return profile.cached('orientation_fixed_cells_mask', build)
+
+def detect_orientation(cell_colors, profile: pf.ProtocolProfile = None):
+    """
+    Orientation du symbole d'après cell_colors, les couleurs des cellules échantillonnées dans l'image
+    (tableau (MATRIX_DIM, MATRIX_DIM, 3)): celle dont les cellules fixes sont le mieux corrélées (par canal,
+    donc insensible au gain et au décalage de l'éclairage) à leurs couleurs attendues.
+    Les 8 orientations sont toujours évaluées: le coût ne dépend pas de l'orientation.
+    """
+    np = backends.numpy()
+    rows, cols, expected = _fixed_cells(np, pf.resolve(profile))
+    observed = np.stack([canonical_view(cell_colors, orientation)[rows, cols] for orientation in ORIENTATIONS])
+    observed = observed - observed.mean(axis=1, keepdims=True) # (orientations, cellules fixes, canaux)
+    covariance = (observed * expected).sum(axis=1)
+    norms = np.sqrt((observed ** 2).sum(axis=1) * (expected ** 2).sum(axis=0))
+    scores = np.divide(covariance, norms, out=np.zeros_like(covariance), where=norms > 0).sum(axis=1)
+    return ORIENTATIONS[int(np.argmax(scores))]
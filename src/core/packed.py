@@ -0,0 +1,295 @@
+import os
+import struct
+import zlib
+
+import src.core.protocol_config as pc
+import src.core.profile as pf
+import src.core.encoder as encoder
+import src.core.image_utils as iu
+import src.core.vector_output as vector_output
+
+# Format binaire compact des matrices de symboles: à transmettre ou stocker à la place d'une image quand le
+# destinataire n'a besoin que de la matrice (le rendu se fait ensuite à la demande, voir render_packed).
+# Symbole: en-tête fixe + cellules (BITS_PER_CELL bits chacune, ligne par ligne, bit de poids fort en premier,
+# complétées par des zéros jusqu'à l'octet) + CRC-32 de l'en-tête et des cellules. Un symbole 35 x 35 tient en
+# 323 octets. L'en-tête identifie le profil de protocole (dimension et empreinte des réglages, voir
+# ProtocolProfile.fingerprint): une matrice n'est relue qu'avec le profil qui l'a produite.
+# Conteneur (plusieurs symboles): en-tête de fichier, symboles ajoutés les uns après les autres (jamais réécrits),
+# puis l'index des offsets et un bloc final (offset de l'index, nombre de symboles, CRC-32 de l'index). Les ajouts
+# écrivent les nouveaux symboles à la place de l'ancien index, et le nouvel index n'est écrit qu'à la fermeture
+# (ou à chaque PackedSymbolWriter.flush): l'accès au symbole i est direct. Chaque symbole se décrit lui-même: si
+# le bloc final est perdu ou périmé (ajout interrompu), l'index est reconstruit en parcourant les symboles.
+
+PACKED_MAGIC = b'SYMB'
+PACKED_FORMAT_VERSION = 1
+PACKED_FORMAT = 'sym' # Nom du format pour render_cache / service (à côté de 'png', 'svg', 'pdf')
+# magic, version du format, bits par cellule, dimension de la matrice, empreinte du profil
+_PACKED_HEADER = struct.Struct('<4sBBHI')
+_CHECKSUM = struct.Struct('<I')
+
+CONTAINER_MAGIC = b'SYMPACK\x00'
+CONTAINER_FORMAT_VERSION = 1
+# magic, version du format
+_CONTAINER_HEADER = struct.Struct('<8sH6x')
+# offset de l'index, nombre de symboles, CRC-32 de l'index, magic de fin
+_CONTAINER_TRAILER = struct.Struct('<QII8s')
+_INDEX_ENTRY = struct.Struct('<Q')
+
+def _cells_bytes(matrix_dim: int) -> int:
+    return -(-matrix_dim * matrix_dim * pc.BITS_PER_CELL // 8)
+
+def _record_size(matrix_dim: int) -> int:
+    return _PACKED_HEADER.size + _cells_bytes(matrix_dim) + _CHECKSUM.size
+
+def _checksum_ok(record: bytes) -> bool:
+    body_size = len(record) - _CHECKSUM.size
+    return zlib.crc32(record[:body_size]) == _CHECKSUM.unpack_from(record, body_size)[0]
+
+def packed_size(profile: pf.ProtocolProfile = None) -> int:
+    """Taille en octets d'un symbole empaqueté (en-tête et CRC compris) pour profile."""
+    return _record_size(pf.resolve(profile).matrix_dim)
+
+def pack_matrix(bit_matrix, profile: pf.ProtocolProfile = None) -> bytes:
+    """
+    Empaquette bit_matrix (MATRIX_DIM x MATRIX_DIM paires de bits, voir encoder.encode_message_to_matrix).
+    Lève une ValueError si la matrice n'a pas la dimension du profil ou contient une cellule vide (None).
+    """
+    profile = pf.resolve(profile)
+    matrix_dim = profile.matrix_dim
+    if len(bit_matrix) != matrix_dim or any(len(row) != matrix_dim for row in bit_matrix):
+        raise ValueError(f"bit_matrix must be {matrix_dim}x{matrix_dim} for profile '{profile.name}'.")
+    try:
+        bits = "".join("".join(row) for row in bit_matrix)
+    except TypeError:
+        raise ValueError("bit_matrix has unset (None) cells.")
+    cells_bytes = _cells_bytes(matrix_dim)
+    if len(bits) != matrix_dim * matrix_dim * pc.BITS_PER_CELL:
+        raise ValueError(f"bit_matrix cells must be {pc.BITS_PER_CELL}-bit strings.")
+    cells = (int(bits, 2) << (cells_bytes * 8 - len(bits))).to_bytes(cells_bytes, 'big')
+    data = _PACKED_HEADER.pack(PACKED_MAGIC, PACKED_FORMAT_VERSION, pc.BITS_PER_CELL, matrix_dim,
+                               profile.fingerprint()) + cells
+    return data + _CHECKSUM.pack(zlib.crc32(data))
+
+def read_header(data: bytes) -> dict:
+    """En-tête d'un symbole empaqueté: {'format_version', 'bits_per_cell', 'matrix_dim', 'profile_fingerprint'}."""
+    if len(data) < _PACKED_HEADER.size or bytes(data[:len(PACKED_MAGIC)]) != PACKED_MAGIC:
+        raise ValueError("Not a packed symbol (unknown magic).")
+    _, version, bits_per_cell, matrix_dim, fingerprint = _PACKED_HEADER.unpack_from(data, 0)
+    if version != PACKED_FORMAT_VERSION or bits_per_cell != pc.BITS_PER_CELL:
+        raise ValueError(f"Unsupported packed symbol (format version {version}, {bits_per_cell} bits per cell).")
+    return {'format_version': version, 'bits_per_cell': bits_per_cell, 'matrix_dim': matrix_dim,
+            'profile_fingerprint': fingerprint}
+
+def unpack_matrix(data: bytes, profile: pf.ProtocolProfile = None) -> list[list[str]]:
+    """
+    Relit une matrice empaquetée par pack_matrix avec le même profil.
+    Lève une ValueError si les octets sont tronqués ou corrompus (CRC) ou si le profil ne correspond pas.
+    """
+    profile = pf.resolve(profile)
+    header = read_header(data)
+    matrix_dim = header['matrix_dim']
+    if len(data) != _record_size(matrix_dim):
+        raise ValueError(f"Packed symbol has {len(data)} bytes, expected {_record_size(matrix_dim)}.")
+    if not _checksum_ok(data):
+        raise ValueError("Packed symbol checksum mismatch (corrupted data).")
+    if matrix_dim != profile.matrix_dim or header['profile_fingerprint'] != profile.fingerprint():
+        raise ValueError(f"Packed symbol was produced with another protocol profile "
+                         f"(matrix {matrix_dim}x{matrix_dim}, fingerprint {header['profile_fingerprint']:08x}).")
+
+    cell_count = matrix_dim * matrix_dim
+    cells_bytes = _cells_bytes(matrix_dim)
+    cells_data = data[_PACKED_HEADER.size:_PACKED_HEADER.size + cells_bytes]
+    bits = format(int.from_bytes(cells_data, 'big'), f'0{cells_bytes * 8}b')
+    step = pc.BITS_PER_CELL
+    cells = [bits[i:i + step] for i in range(0, cell_count * step, step)]
+    return [cells[r * matrix_dim:(r + 1) * matrix_dim] for r in range(matrix_dim)]
+
+# --- Aller-retour avec l'encodeur et le rendu ---
+
+def encode_message_to_packed(message_text: str, ecc_level_percent: int, custom_xor_key_str: str = None,
+                             profile: pf.ProtocolProfile = None) -> bytes:
+    """Encode un message (un seul symbole, voir encoder.encode_message_to_matrix) directement au format empaqueté."""
+    return pack_matrix(encoder.encode_message_to_matrix(message_text, ecc_level_percent, custom_xor_key_str,
+                                                        profile=profile), profile)
+
+def render_packed_image(data: bytes, cell_pixel_size: int, profile: pf.ProtocolProfile = None):
+    """Rend un symbole empaqueté en image PIL (voir image_utils.render_protocol_image)."""
+    return iu.render_protocol_image(unpack_matrix(data, profile), cell_pixel_size, profile)
+
+def render_packed(data: bytes, cell_pixel_size: int, image_format: str = "PNG", profile: pf.ProtocolProfile = None) -> bytes:
+    """Rend un symbole empaqueté en octets d'image: raster (PNG...) ou vectoriel ('svg', 'pdf')."""
+    bit_matrix = unpack_matrix(data, profile)
+    if image_format.lower() in vector_output.VECTOR_FORMATS:
+        return vector_output.render_vector_bytes(bit_matrix, image_format, cell_pixel_size, profile=profile)
+    return iu.encode_image_bytes(iu.render_protocol_image(bit_matrix, cell_pixel_size, profile), image_format.upper())
+
+# --- Conteneur de plusieurs symboles ---
+
+def _index_bytes(offsets: list[int]) -> bytes:
+    return b"".join(_INDEX_ENTRY.pack(offset) for offset in offsets)
+
+def _read_at(f, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    return f.read(size)
+
+def _scan_records(f, file_size: int) -> tuple[list[int], int]:
+    """
+    Reconstruction de l'index: parcourt les symboles complets et valides depuis le début des données.
+    Retourne (offsets, offset de fin du dernier symbole valide).
+    """
+    offsets = []
+    offset = _CONTAINER_HEADER.size
+    while offset + _PACKED_HEADER.size <= file_size:
+        try:
+            size = _record_size(read_header(_read_at(f, offset, _PACKED_HEADER.size))['matrix_dim'])
+        except ValueError:
+            break
+        record = _read_at(f, offset, size)
+        if len(record) != size or not _checksum_ok(record):
+            break
+        offsets.append(offset)
+        offset += size
+    return offsets, offset
+
+def _read_index(f) -> tuple[list[int], int]:
+    """Retourne (offsets des symboles, offset de fin des données) d'un conteneur ouvert en lecture binaire."""
+    f.seek(0, os.SEEK_END)
+    file_size = f.tell()
+    f.seek(0)
+    magic, version = _CONTAINER_HEADER.unpack(f.read(_CONTAINER_HEADER.size).ljust(_CONTAINER_HEADER.size, b'\0'))
+    if magic != CONTAINER_MAGIC:
+        raise ValueError("Not a packed symbol container (unknown magic).")
+    if version != CONTAINER_FORMAT_VERSION:
+        raise ValueError(f"Unsupported packed symbol container (format version {version}).")
+
+    if file_size >= _CONTAINER_HEADER.size + _CONTAINER_TRAILER.size:
+        f.seek(file_size - _CONTAINER_TRAILER.size)
+        index_offset, count, index_crc, end_magic = _CONTAINER_TRAILER.unpack(f.read(_CONTAINER_TRAILER.size))
+        if end_magic == CONTAINER_MAGIC and index_offset + count * _INDEX_ENTRY.size + _CONTAINER_TRAILER.size == file_size:
+            f.seek(index_offset)
+            index = f.read(count * _INDEX_ENTRY.size)
+            if zlib.crc32(index) == index_crc:
+                return [offset for (offset,) in _INDEX_ENTRY.iter_unpack(index)], index_offset
+    return _scan_records(f, file_size) # Bloc final absent ou invalide (ajout interrompu)
+
+class PackedSymbolWriter:
+    """
+    Ajoute des symboles empaquetés à un conteneur (créé s'il n'existe pas, complété sinon).
+    Les symboles déjà écrits ne sont jamais réécrits; l'index et le bloc final ne sont écrits qu'une fois, par
+    flush ou close (un ajout coûte la taille du symbole, pas celle de l'index).
+    """
+
+    def __init__(self, path: str, profile: pf.ProtocolProfile = None):
+        self.path = path
+        self.profile = pf.resolve(profile)
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        self._file = open(path, 'r+b' if exists else 'w+b')
+        if exists:
+            try:
+                self._offsets, self._end = _read_index(self._file)
+            except ValueError:
+                self._file.close()
+                raise
+        else:
+            self._file.write(_CONTAINER_HEADER.pack(CONTAINER_MAGIC, CONTAINER_FORMAT_VERSION))
+            self._offsets, self._end = [], _CONTAINER_HEADER.size
+        self._index_stale = not exists
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def append_packed(self, data: bytes) -> int:
+        """
+        Ajoute un symbole déjà empaqueté (validé par read_header et son CRC). Retourne son index.
+        Lève une ValueError si le symbole a été empaqueté avec un autre profil que celui du conteneur.
+        """
+        header = read_header(data)
+        if len(data) != _record_size(header['matrix_dim']) or not _checksum_ok(data):
+            raise ValueError("Invalid packed symbol (size or checksum).")
+        if header['matrix_dim'] != self.profile.matrix_dim or header['profile_fingerprint'] != self.profile.fingerprint():
+            raise ValueError(f"Packed symbol was produced with another protocol profile than the container's "
+                             f"(matrix {header['matrix_dim']}x{header['matrix_dim']}, "
+                             f"fingerprint {header['profile_fingerprint']:08x}).")
+        if not self._index_stale:
+            # L'ancien index est écrasé: on le retire d'abord pour qu'un arrêt avant flush laisse un conteneur
+            # sans bloc final (index reconstruit par parcours) plutôt qu'un bloc final périmé.
+            self._file.truncate(self._end)
+            self._index_stale = True
+        self._file.seek(self._end)
+        self._file.write(data)
+        self._offsets.append(self._end)
+        self._end += len(data)
+        return len(self._offsets) - 1
+
+    def append(self, bit_matrix) -> int:
+        """Empaquette bit_matrix avec le profil du conteneur et l'ajoute. Retourne son index."""
+        return self.append_packed(pack_matrix(bit_matrix, self.profile))
+
+    def flush(self):
+        """Écrit l'index et le bloc final après le dernier symbole ajouté (sans effet s'ils sont à jour)."""
+        if self._index_stale:
+            index = _index_bytes(self._offsets)
+            self._file.seek(self._end)
+            self._file.write(index)
+            self._file.write(_CONTAINER_TRAILER.pack(self._end, len(self._offsets), zlib.crc32(index), CONTAINER_MAGIC))
+            self._file.truncate()
+            self._index_stale = False
+        self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            try:
+                self.flush()
+            finally:
+                self._file.close()
+                self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+class PackedSymbolFile:
+    """
+    Lecture d'un conteneur de symboles empaquetés avec accès direct: packed(i) lit les seuls octets du
+    symbole i, matrix(i) le relit en matrice et render(i, ...) le rend à la demande.
+    """
+
+    def __init__(self, path: str, profile: pf.ProtocolProfile = None):
+        self.profile = pf.resolve(profile)
+        self._file = open(path, 'rb')
+        try:
+            self._offsets, _ = _read_index(self._file)
+        except ValueError:
+            self._file.close()
+            raise
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def packed(self, index: int) -> bytes:
+        if not 0 <= index < len(self._offsets):
+            raise IndexError(f"Symbol index {index} out of range (0-{len(self._offsets) - 1}).")
+        offset = self._offsets[index]
+        header = read_header(_read_at(self._file, offset, _PACKED_HEADER.size))
+        return _read_at(self._file, offset, _record_size(header['matrix_dim']))
+
+    def matrix(self, index: int) -> list[list[str]]:
+        return unpack_matrix(self.packed(index), self.profile)
+
+    def render(self, index: int, cell_pixel_size: int, image_format: str = "PNG") -> bytes:
+        return render_packed(self.packed(index), cell_pixel_size, image_format, self.profile)
+
+    def __iter__(self):
+        for index in range(len(self._offsets)):
+            yield self.matrix(index)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
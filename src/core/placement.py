@@ -0,0 +1,89 @@
+from operator import itemgetter
+
+import src.core.protocol_config as pc
+import src.core.profile as pf
+import src.core.data_processing as dp
+
+# Ordres de placement du payload dans les cellules DATA_ECC (symboles de version 2).
+# Un ordre est une permutation: position de la cellule dans le flux du payload -> index de la cellule dans
+# matrix_layout.get_data_ecc_fill_order() (balayage ligne par ligne). Les cellules du bloc de métadonnées
+# étendues restent toujours en tête (permutation identité): le décodeur les lit avant de connaître l'ordre.
+# Les permutations sont calculées une fois par profil de protocole (voir profile.ProtocolProfile.cached)
+# puis appliquées par une seule opération de collecte (itemgetter).
+
+def placement_id(name: str) -> int:
+    """Identifiant (champ 'placement' des métadonnées étendues) d'un ordre nommé ('row', 'block', 'diagonal')."""
+    try:
+        return pc.PLACEMENT_CONFIG['orders'][name]
+    except KeyError:
+        raise ValueError(f"Unknown placement order '{name}' (known: {', '.join(pc.PLACEMENT_CONFIG['orders'])}).")
+
+def _block_order(cells: list) -> list:
+    """
+    Entrelacement par blocs: le flux est écrit ligne par ligne dans une table de block_depth lignes et lu
+    colonne par colonne. Deux cellules voisines dans le balayage sont ~len(cells)/block_depth positions
+    à l'écart dans le flux.
+    """
+    depth = pc.PLACEMENT_CONFIG['block_depth']
+    return sorted(range(len(cells)), key=lambda k: (k % depth, k // depth))
+
+def _diagonal_order(cells: list) -> list:
+    """Balayage en zigzag des anti-diagonales (sens alterné d'une diagonale à la suivante)."""
+    def zigzag_key(k):
+        r, c = cells[k]
+        diagonal = r + c
+        return (diagonal, r if diagonal % 2 else -r)
+    return sorted(range(len(cells)), key=zigzag_key)
+
+_ORDER_BUILDERS = {
+    'row': lambda cells: list(range(len(cells))),
+    'block': _block_order,
+    'diagonal': _diagonal_order,
+}
+
+def placement_permutation(placement: int, profile: pf.ProtocolProfile = None) -> tuple:
+    """
+    Retourne (permutation, inverse) pour l'ordre placement:
+    permutation[position_dans_le_flux] = index de cellule; inverse[index de cellule] = position dans le flux.
+    """
+    profile = pf.resolve(profile)
+
+    def build():
+        names = {order_id: name for name, order_id in pc.PLACEMENT_CONFIG['orders'].items()}
+        if placement not in names:
+            raise ValueError(f"Unknown placement id {placement}.")
+        fill_order = profile.fill_order
+        header_cells = dp.extended_metadata_length() // pc.BITS_PER_CELL
+        payload_order = _ORDER_BUILDERS[names[placement]](fill_order[header_cells:])
+        permutation = tuple(range(header_cells)) + tuple(header_cells + k for k in payload_order)
+        inverse = [0] * len(permutation)
+        for position, cell_index in enumerate(permutation):
+            inverse[cell_index] = position
+        return permutation, tuple(inverse)
+    return profile.cached(('placement_permutation', placement), build)
+
+def _gatherers(placement: int, profile: pf.ProtocolProfile = None) -> tuple:
+    """(collecte flux <- cellules, collecte cellules <- flux) pour l'ordre placement."""
+    profile = pf.resolve(profile)
+    def build():
+        permutation, inverse = placement_permutation(placement, profile)
+        return itemgetter(*permutation), itemgetter(*inverse)
+    return profile.cached(('placement_gatherers', placement), build)
+
+def stream_to_cells(stream_values: list, placement: int, profile: pf.ProtocolProfile = None) -> list:
+    """Valeurs dans l'ordre du flux -> valeurs dans l'ordre des cellules (get_data_ecc_fill_order)."""
+    if not placement:
+        return list(stream_values)
+    return list(_gatherers(placement, profile)[1](stream_values))
+
+def cells_to_stream(cell_values: list, placement: int, profile: pf.ProtocolProfile = None) -> list:
+    """Valeurs dans l'ordre des cellules (get_data_ecc_fill_order) -> valeurs dans l'ordre du flux."""
+    if not placement:
+        return list(cell_values)
+    return list(_gatherers(placement, profile)[0](cell_values))
+
+def cell_index_to_stream_position(cell_index: int, placement: int, profile: pf.ProtocolProfile = None) -> int:
+    """Position dans le flux du payload de la cellule d'index cell_index (ordre de remplissage)."""
+    if not placement:
+        return cell_index
+    return placement_permutation(placement, profile)[1][cell_index]
@@ -0,0 +1,304 @@
+import threading
+import zlib
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.data_processing as dp
+
+# Profil de protocole compilé: une configuration de disposition (dimension de la matrice, palette, motifs
+# fixes) est compilée une seule fois en tous ses artefacts dérivés: coordonnées des zones, type de zone de
+# chaque cellule, ordre de remplissage DATA_ECC, gabarit des motifs fixes, palette et tables de capacité.
+# Un ProtocolProfile est figé: il peut être partagé entre threads et passé explicitement (paramètre profile)
+# à l'encodeur, au rendu et au décodeur; plusieurs profils coexistent dans un même processus sans toucher
+# aux dictionnaires de protocol_config. Les artefacts propres à un module (bitboards des masques,
+# permutations de placement, termes de l'éclairage...) sont calculés à la demande et conservés dans le profil
+# (voir ProtocolProfile.cached), jamais dans un cache global; ils sont construits sous le verrou du profil et
+# les tableaux NumPy partagés sont en lecture seule (voir read_only): aucun état mutable partagé entre threads.
+# Le format des flux de bits (métadonnées, métadonnées étendues, ajout structuré, BITS_PER_CELL) est commun à
+# tous les profils: seuls les réglages de PROFILE_SETTINGS peuvent varier.
+
+PROFILE_SETTINGS = ('MATRIX_DIM', 'COLOR_TO_BITS_MAP', 'FP_CONFIG', 'TP_CONFIG', 'CCP_CONFIG')
+ECC_LEVELS = range(0, 101)
+
+_default_profile = None
+_default_profile_lock = threading.Lock()
+
+def _freeze(value):
+    """Copie immuable (MappingProxyType, tuples) d'un réglage de configuration."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+@dataclass(frozen=True, eq=False)
+class ProtocolProfile:
+    """
+    Configuration de protocole compilée (voir compile_profile). Tous les champs sont en lecture seule.
+    zone_coords: {nom de zone: (r_start, r_end, c_start, c_end)} ('CCP_AREA': tuple des patchs);
+    zone_map[r][c]: type de zone de la cellule (voir matrix_layout.get_cell_zone_type);
+    fill_order / metadata_cells: cellules DATA_ECC et METADATA_AREA dans leur ordre de lecture;
+    fixed_template[r][c]: paire de bits des cellules des motifs fixes (None ailleurs);
+    fixed_cells: [(row, col, bits)] des motifs fixes, en balayage ligne par ligne;
+    bits_order / palette: paires de bits triées et couleurs RVB correspondantes;
+    capacity_tables: {version: {niveau ECC: (bits de message, bits ECC)}}.
+    """
+    name: str
+    settings: MappingProxyType
+    matrix_dim: int
+    color_to_bits: MappingProxyType
+    bits_to_color: MappingProxyType
+    bits_order: tuple
+    palette: tuple
+    zone_coords: MappingProxyType
+    zone_names: tuple
+    zone_map: tuple
+    fill_order: tuple
+    metadata_cells: tuple
+    fixed_template: tuple
+    fixed_cells: tuple
+    capacity_tables: MappingProxyType
+    _derived: dict = field(default_factory=dict, repr=False)
+    _lock: object = field(default_factory=threading.RLock, repr=False)
+
+    def cached(self, key, build):
+        """
+        Artefact dérivé key du profil, construit par build() au premier appel puis conservé.
+        La construction a lieu sous le verrou du profil (réentrant: build peut lire d'autres artefacts); un
+        artefact déjà construit est lu sans verrou.
+        """
+        value = self._derived.get(key)
+        if value is None:
+            with self._lock:
+                value = self._derived.get(key)
+                if value is None:
+                    value = self._derived[key] = build()
+        return value
+
+    def palette_array(self):
+        """Palette (tableau NumPy en lecture seule (couleurs, 3) de flottants, dans l'ordre de bits_order)."""
+        def build():
+            np = backends.numpy()
+            return read_only(np.array(self.palette, dtype=np.float64))[0]
+        return self.cached('palette_array', build)
+
+    def fingerprint(self) -> int:
+        """Empreinte CRC-32 des réglages du profil (identifie le profil dans les formats sérialisés, voir packed)."""
+        return self.cached('fingerprint', lambda: zlib.crc32(repr(_canonical(self.settings)).encode('utf-8')))
+
+    def payload_bits(self, extended: bool = False) -> int:
+        """Bits DATA_ECC disponibles pour le message et l'ECC (hors bloc de métadonnées étendues si extended)."""
+        available_bits = len(self.fill_order) * pc.BITS_PER_CELL
+        return available_bits - dp.extended_metadata_length() if extended else available_bits
+
+def _canonical(value):
+    """Forme canonique (clés triées, listes) d'un réglage figé, indépendante de l'ordre d'insertion."""
+    if isinstance(value, MappingProxyType):
+        return sorted((repr(key), _canonical(item)) for key, item in value.items())
+    if isinstance(value, tuple):
+        return [_canonical(item) for item in value]
+    return value
+
+def read_only(*arrays) -> tuple:
+    """Marque les tableaux NumPy en lecture seule (artefacts partagés entre threads) et les retourne en tuple."""
+    for array in arrays:
+        array.flags.writeable = False
+    return arrays
+
+# --- Calculs de la disposition (à partir des réglages, sans cache) ---
+
+def _fp_core_coords(settings, fp_r_start, fp_c_start):
+    fp_s = settings['FP_CONFIG']['size']
+    fp_m = settings['FP_CONFIG']['margin']
+    return (fp_r_start + fp_m, fp_r_start + fp_s - 1 - fp_m,
+            fp_c_start + fp_m, fp_c_start + fp_s - 1 - fp_m)
+
+def _zone_coordinates(settings) -> dict:
+    """Coordonnées (r_start, r_end, c_start, c_end) de toutes les zones nommées."""
+    fp_s = settings['FP_CONFIG']['size']
+    md_dim = settings['MATRIX_DIM']
+    coords = {}
+
+    # Finder Patterns (FP): emprise complète (marge comprise) et noyau
+    corners = {'FP_TL': (0, 0), 'FP_TR': (0, md_dim - fp_s), 'FP_BL': (md_dim - fp_s, 0)}
+    for fp_name, (r_start, c_start) in corners.items():
+        coords[fp_name] = (r_start, r_start + fp_s - 1, c_start, c_start + fp_s - 1)
+        coords[f'{fp_name}_CORE'] = _fp_core_coords(settings, r_start, c_start)
+
+    # Timing Patterns (TP): ligne / colonne fp_s - 1, entre les FP
+    tp_idx = fp_s - 1
+    coords['TP_H'] = (tp_idx, tp_idx, fp_s, md_dim - 1 - fp_s)
+    coords['TP_V'] = (fp_s, md_dim - 1 - fp_s, tp_idx, tp_idx)
+
+    # Métadonnées: à gauche du FP_TR
+    md_rows = pc.METADATA_CONFIG['rows']
+    md_cols = pc.METADATA_CONFIG['cols']
+    c_start = md_dim - fp_s - md_cols
+    coords['METADATA_AREA'] = (0, md_rows - 1, c_start, c_start + md_cols - 1)
+
+    # Calibration Color Patches (CCP): en ligne, à droite du FP_BL
+    ccp_ps = settings['CCP_CONFIG']['patch_size']
+    patches = []
+    for i in range(len(settings['CCP_CONFIG']['colors'])):
+        r_start, c_start = md_dim - fp_s, fp_s + i * ccp_ps
+        coords[f'CCP_PATCH_{i}'] = (r_start, r_start + ccp_ps - 1, c_start, c_start + ccp_ps - 1)
+        patches.append(coords[f'CCP_PATCH_{i}'])
+    coords['CCP_AREA'] = tuple(patches)
+    return coords
+
+def _zone_names(settings) -> tuple:
+    """Noms des zones spécifiques, dans l'ordre où get_cell_zone_type les examine."""
+    ccp_patches = tuple(f'CCP_PATCH_{i}' for i in range(len(settings['CCP_CONFIG']['colors'])))
+    return ('FP_TL_CORE', 'FP_TR_CORE', 'FP_BL_CORE') + ccp_patches + ('FP_TL', 'FP_TR', 'FP_BL', 'TP_H', 'TP_V', 'METADATA_AREA')
+
+def _cell_zone_type(zone_coords, zone_names, row: int, col: int) -> str:
+    # Zones les plus spécifiques d'abord (noyaux, patchs), puis l'emprise des FP (marges), les TP et les métadonnées
+    for zone_name in zone_names:
+        r_start, r_end, c_start, c_end = zone_coords[zone_name]
+        if r_start <= row <= r_end and c_start <= col <= c_end:
+            return f'{zone_name}_MARGIN' if zone_name in ('FP_TL', 'FP_TR', 'FP_BL') else zone_name
+    return 'DATA_ECC' # Par défaut, c'est une cellule de données/ECC
+
+def fixed_pattern_bits(settings, color_to_bits, zone_type: str, relative_row: int, relative_col: int) -> str:
+    """
+    Paire de bits d'une cellule d'un motif fixe. relative_row/col sont relatives au coin supérieur gauche du
+    motif (noyau FP, emprise FP pour les marges, patch CCP, ligne TP). Lève une ValueError si la cellule
+    n'appartient à aucun motif fixe ou si sa couleur n'est pas dans la palette.
+    """
+    if 'CORE' in zone_type: # Anneaux concentriques du noyau, du centre vers l'extérieur
+        fp_cfg = settings['FP_CONFIG']
+        core_dim = fp_cfg['size'] - 2 * fp_cfg['margin']
+        center_coord = core_dim // 2
+        max_dist = max(abs(relative_row - center_coord), abs(relative_col - center_coord))
+        if max_dist > 2 or not (0 <= relative_row < core_dim and 0 <= relative_col < core_dim):
+            raise ValueError("Relative coordinates out of bounds for FP core pattern.")
+        color = fp_cfg['pattern_colors'][max_dist]
+    elif 'MARGIN' in zone_type: # La marge utilise la couleur la plus externe des pattern_colors
+        color = settings['FP_CONFIG']['pattern_colors'][3]
+    elif zone_type.startswith('CCP_PATCH_'):
+        color = settings['CCP_CONFIG']['colors'][int(zone_type.split('_')[-1])]
+    elif zone_type in ('TP_H', 'TP_V'): # Alternance le long du motif, en commençant par line_color1
+        position = relative_col if zone_type == 'TP_H' else relative_row
+        color = settings['TP_CONFIG']['line_color1' if position % 2 == 0 else 'line_color2']
+    else:
+        raise ValueError(f"Unknown zone_type for get_fixed_pattern_bits: {zone_type}")
+    bits = color_to_bits.get(color)
+    if bits is None:
+        raise ValueError(f"Color {color} not found in COLOR_TO_BITS_MAP.")
+    return bits
+
+def _fixed_template(settings, color_to_bits, zone_coords, zone_map) -> tuple:
+    template = []
+    for r, zone_row in enumerate(zone_map):
+        template_row = []
+        for c, zone_type in enumerate(zone_row):
+            if zone_type in ('METADATA_AREA', 'DATA_ECC'):
+                template_row.append(None)
+                continue
+            # Origine du motif: le noyau ou l'emprise du FP (marges), sinon la zone elle-même
+            origin_zone = zone_type[:-len('_MARGIN')] if zone_type.endswith('_MARGIN') else zone_type
+            r_start, _, c_start, _ = zone_coords[origin_zone]
+            template_row.append(fixed_pattern_bits(settings, color_to_bits, zone_type, r - r_start, c - c_start))
+        template.append(tuple(template_row))
+    return tuple(template)
+
+def split_payload_capacity(available_data_ecc_bits: int, ecc_level_percent: int) -> tuple[int, int]:
+    """
+    Répartit available_data_ecc_bits entre le message (crypté) et l'ECC au niveau ecc_level_percent.
+    Retourne (target_message_bit_length, num_ecc_bits) (voir encoder.compute_payload_capacity).
+    """
+    if not (0 <= ecc_level_percent <= 100):
+        raise ValueError("ecc_level_percent must be between 0 and 100.")
+
+    # Bits ECC arrondis au multiple de 8 inférieur (contrainte de calculate_simple_ecc), en laissant au moins
+    # un octet de données utiles
+    num_ecc_bits = max(0, int(available_data_ecc_bits * (ecc_level_percent / 100.0) // 8) * 8)
+    min_data_bits_needed = 8
+    if num_ecc_bits > available_data_ecc_bits - min_data_bits_needed:
+        num_ecc_bits = max(0, int((available_data_ecc_bits - min_data_bits_needed) // 8) * 8)
+
+    target_message_bit_length = available_data_ecc_bits - num_ecc_bits
+    if target_message_bit_length < 0:
+        raise ValueError(f"Not enough space for message and ECC. Target message bits: {target_message_bit_length}")
+    return target_message_bit_length, num_ecc_bits
+
+def _validate_settings(settings):
+    md_dim = settings['MATRIX_DIM']
+    fp_s = settings['FP_CONFIG']['size']
+    color_to_bits = settings['COLOR_TO_BITS_MAP']
+    if len(color_to_bits) != 2 ** pc.BITS_PER_CELL or len(set(color_to_bits.values())) != len(color_to_bits):
+        raise ValueError(f"COLOR_TO_BITS_MAP must map {2 ** pc.BITS_PER_CELL} colors to distinct bit pairs.")
+    if any(len(bits) != pc.BITS_PER_CELL for bits in color_to_bits.values()):
+        raise ValueError(f"COLOR_TO_BITS_MAP values must be {pc.BITS_PER_CELL}-bit strings.")
+    ccp_width = len(settings['CCP_CONFIG']['colors']) * settings['CCP_CONFIG']['patch_size']
+    if md_dim < 2 * fp_s + max(pc.METADATA_CONFIG['cols'], ccp_width, 1):
+        raise ValueError(f"MATRIX_DIM {md_dim} is too small for the finder patterns, metadata and calibration patches.")
+
+def compile_profile(name: str = 'custom', **overrides) -> ProtocolProfile:
+    """
+    Compile un profil à partir des réglages de protocol_config, remplacés par overrides
+    (noms de PROFILE_SETTINGS, ex: MATRIX_DIM=41). Lève une ValueError pour un réglage inconnu ou incohérent
+    (palette incomplète, couleur de motif hors palette, matrice trop petite, message trop long pour le champ
+    de longueur des métadonnées).
+    """
+    unknown = set(overrides) - set(PROFILE_SETTINGS)
+    if unknown:
+        raise ValueError(f"Unknown profile setting(s): {', '.join(sorted(unknown))} (supported: {', '.join(PROFILE_SETTINGS)}).")
+    settings = _freeze({key: overrides.get(key, getattr(pc, key)) for key in PROFILE_SETTINGS})
+    _validate_settings(settings)
+
+    md_dim = settings['MATRIX_DIM']
+    color_to_bits = settings['COLOR_TO_BITS_MAP']
+    bits_to_color = {bits: color for color, bits in color_to_bits.items()}
+    bits_order = tuple(sorted(bits_to_color))
+    zone_coords = _zone_coordinates(settings)
+    zone_names = _zone_names(settings)
+    zone_map = tuple(tuple(_cell_zone_type(zone_coords, zone_names, r, c) for c in range(md_dim)) for r in range(md_dim))
+    fill_order = tuple((r, c) for r in range(md_dim) for c in range(md_dim) if zone_map[r][c] == 'DATA_ECC')
+    md_r_start, md_r_end, md_c_start, md_c_end = zone_coords['METADATA_AREA']
+    metadata_cells = tuple((r, c) for r in range(md_r_start, md_r_end + 1) for c in range(md_c_start, md_c_end + 1))
+    fixed_template = _fixed_template(settings, color_to_bits, zone_coords, zone_map)
+
+    available_bits = len(fill_order) * pc.BITS_PER_CELL
+    if available_bits >= 2 ** pc.METADATA_CONFIG['msg_len_bits']:
+        raise ValueError(f"MATRIX_DIM {md_dim} gives {available_bits} payload bits, more than the metadata length "
+                         f"field can describe ({pc.METADATA_CONFIG['msg_len_bits']} bits).")
+    capacity_tables = {}
+    for version, reserved_bits in ((pc.PROTOCOL_VERSION_BASE, 0), (pc.PROTOCOL_VERSION_EXTENDED, dp.extended_metadata_length())):
+        capacity_tables[version] = MappingProxyType(
+            {ecc: split_payload_capacity(available_bits - reserved_bits, ecc) for ecc in ECC_LEVELS})
+
+    return ProtocolProfile(
+        name=name,
+        settings=settings,
+        matrix_dim=md_dim,
+        color_to_bits=color_to_bits,
+        bits_to_color=MappingProxyType(bits_to_color),
+        bits_order=bits_order,
+        palette=tuple(bits_to_color[bits] for bits in bits_order),
+        zone_coords=MappingProxyType(zone_coords),
+        zone_names=zone_names,
+        zone_map=zone_map,
+        fill_order=fill_order,
+        metadata_cells=metadata_cells,
+        fixed_template=fixed_template,
+        fixed_cells=tuple((r, c, bits) for r, row in enumerate(fixed_template) for c, bits in enumerate(row) if bits is not None),
+        capacity_tables=MappingProxyType(capacity_tables),
+    )
+
+def default_profile() -> ProtocolProfile:
+    """Profil compilé à partir de protocol_config (compilé une seule fois au premier appel, puis partagé)."""
+    global _default_profile
+    profile = _default_profile
+    if profile is None:
+        with _default_profile_lock:
+            if _default_profile is None:
+                _default_profile = compile_profile('default')
+            profile = _default_profile
+    return profile
+
+def resolve(profile: ProtocolProfile = None) -> ProtocolProfile:
+    """profile, ou le profil par défaut si None (paramètre profile des fonctions de l'encodeur et du décodeur)."""
+    return default_profile() if profile is None else profile
@@ -54,11 +54,144 @@ METADATA_CONFIG = {
                                         # Ici, 4+4+12+16 = 36. Si protection_bits = 36, cela signifie que les 36 bits d'info sont répétés ou protégés.
 }
 
+# Versions du protocole (champ 'version_bits' des métadonnées)
+PROTOCOL_VERSION_BASE = 1       # Symbole simple: le payload commence directement par le message crypté
+PROTOCOL_VERSION_EXTENDED = 2   # Le payload commence par un bloc de métadonnées étendues (voir ci-dessous)
+SUPPORTED_PROTOCOL_VERSIONS = (PROTOCOL_VERSION_BASE, PROTOCOL_VERSION_EXTENDED)
+
+# Métadonnées étendues (version 2): placées dans les premières cellules DATA_ECC (ordre ligne par ligne),
+# protégées par simple répétition comme les métadonnées principales.
+EXTENDED_METADATA_CONFIG = {
+    'info_bits': 8,                     # Bits d'information (champs ci-dessous + bits réservés à 0)
+    'protection_bits': 8,               # Répétition des bits d'information
+    'fields': [                         # (nom, nombre de bits) dans l'ordre du flux
+        ('structured_append', 1),       # 1 si le message porte un en-tête d'ajout structuré
+        ('mask', 3),                    # Masque appliqué aux cellules DATA_ECC (0 = aucun, voir MASKING_CONFIG)
+        ('placement', 2),               # Ordre de placement du payload (voir PLACEMENT_CONFIG)
+    ],
+}
+
+# Ajout structuré (Structured Append): découpage d'un long message sur plusieurs symboles.
+# L'en-tête est placé au début des données en clair de chaque symbole.
+STRUCTURED_APPEND_CONFIG = {
+    'index_bits': 4,                    # Position du symbole dans la séquence (0 à total-1)
+    'total_bits': 4,                    # Nombre de symboles moins un (1 à 16 symboles)
+    'parity_bits': 8,                   # XOR de tous les octets du message complet (identifiant de séquence)
+}
+
+# Masquage des données (src/core/masking.py): les symboles de version 2 portent un masque XOR choisi
+# par l'encodeur parmi 8 candidats (0 = aucun) pour éviter longues séries, blocs unis et faux motifs FP.
+MASKING_CONFIG = {
+    'enabled': True,               # Sélection automatique d'un masque si le message tient dans un symbole de version 2
+    'run_length': 5,               # Longueur minimale d'une série pénalisée
+    'run_penalty': 3,              # Pénalité d'une série de run_length cellules (+1 par cellule supplémentaire)
+    'block_penalty': 3,            # Pénalité par bloc 2x2 d'une seule couleur
+    'finder_like_penalty': 40,     # Pénalité par motif noir/blanc 1:1:3:1:1 (+4 blancs) hors des FP
+    'finder_like_patterns': ['10111010000', '00001011101'], # 1 = noir, 0 = blanc
+    'balance_penalty': 10,         # Pénalité par tranche de 5 % d'écart d'une couleur à 25 %
+}
+
+# Placement entrelacé du payload (src/core/placement.py, symboles de version 2): une rayure ou une tache le long
+# d'une ligne touche des positions dispersées du flux au lieu d'une suite contiguë de bits.
+PLACEMENT_CONFIG = {
+    'orders': {'row': 0, 'block': 1, 'diagonal': 2}, # Nom -> valeur du champ 'placement'
+    'default': 'block',            # Ordre des symboles de version 2 si l'appelant n'en impose pas
+    'block_depth': 31,             # Profondeur de l'entrelacement: une rayure de <= 31 cellules d'une ligne est
+                                   # entièrement dispersée (premier, distinct des largeurs de ligne 15 et 34)
+}
+
 # Paramètres ECC (Error Correction Code)
 DEFAULT_ECC_LEVEL_PERCENT = 20  # Pourcentage de bits dédiés à l'ECC par rapport aux bits de données
 
+# Décodage "souple" (soft-decision): chaque cellule reçoit une confiance (marge de distance entre
+# les deux couleurs calibrées les plus proches). Les cellules peu sûres sont marquées comme effacements
+# et, si l'ECC échoue, le décodeur essaie leur second choix de couleur.
+SOFT_DECODING_CONFIG = {
+    'erasure_confidence_threshold': 0.25, # Confiance en dessous de laquelle une cellule est un effacement
+    'max_erasures': 12,                   # Nombre max d'effacements essayés (2^max_erasures combinaisons au pire)
+}
+
+# Récupération de la grille sur les motifs de synchronisation (src/core/grid.py): pas de cellule fractionnaire
+GRID_CONFIG = {
+    'passes': 2,               # Mesures successives, chacune placée selon la grille de la précédente
+    'band_fraction': 0.5,      # Largeur de la bande de pixels moyennée le long d'une ligne TP (fraction du pas)
+    'min_contrast': 40,        # Écart minimal de luminance noir/blanc (percentiles 5 et 95) le long d'une ligne TP
+    'min_edge_fraction': 0.75, # Part minimale des frontières de la ligne TP à retrouver
+    'max_pitch_error': 0.25,   # Écart relatif toléré entre le pas mesuré et le pas estimé d'après la taille de l'image
+    'max_edge_residual': 0.25, # Écart max (en pas) d'une transition à la droite ajustée
+}
+
+# Compensation spatiale de l'éclairage (src/core/illumination.py): champs de gain/décalage polynomiaux
+# ajustés sur les cellules des motifs fixes, appliqués aux couleurs de toutes les cellules avant classification.
+ILLUMINATION_CONFIG = {
+    'enabled': True,
+    'degree': 2,       # Degré des polynômes en (ligne, colonne)
+    'min_gain': 0.05,  # Gain minimal (évite d'amplifier le bruit des zones presque noires)
+    'refit_confidence': 0.5, # Second ajustement sur les cellules classées au moins à cette confiance (None: aucun)
+}
+
+# Classification des couleurs des cellules (src/core/color_clustering.py)
+# 'calibration': couleurs de référence = moyennes des patchs CCP (de toutes les cellules fixes, corrigées, si la
+#                compensation de l'éclairage est active).
+# 'adaptive': couleurs CCP affinées par k-means sur toutes les cellules, motifs fixes ancrés (éclairage inégal).
+CLASSIFICATION_MODES = ('calibration', 'adaptive')
+CLASSIFICATION_CONFIG = {
+    'mode': 'calibration',
+    'kmeans_iterations': 4, # Itérations max (arrêt anticipé à convergence)
+    # Image sans perte aux couleurs exactes de la palette (rendu synthétique, voir decoder.exact_palette_cells):
+    # symboles lus par correspondance directe, sans calibration ni calcul de distance
+    'exact_palette': True,
+}
+
+# Chargement adaptatif des grandes captures (src/core/capture.py)
+CAPTURE_CONFIG = {
+    'max_direct_cell_px': 16,      # Images d'au plus MATRIX_DIM * 16 px de côté: décodées telles quelles
+    'preview_min_side': 560,       # Côté minimal de l'aperçu réduit utilisé pour localiser le symbole
+    'working_cell_px': 10,         # Taille de cellule de l'image de travail passée au décodeur
+    'dark_threshold': 128,         # Un pixel dont min(R, G, B) est inférieur n'appartient pas au fond clair
+    'max_pitch_mismatch': 0.1,     # Écart relatif toléré entre les pas horizontal et vertical de la grille
+}
+
 # Paramètres de Cryptage
 DEFAULT_XOR_KEY_BITS = METADATA_CONFIG['key_bits'] # Longueur de la clé XOR par défaut (en bits)
 
 # Paramètres de Génération d'Image
-DEFAULT_CELL_PIXEL_SIZE = 10 # Taille par défaut d'une cellule en pixels lors de la génération de l'image 
\ No newline at end of file
+DEFAULT_CELL_PIXEL_SIZE = 10 # Taille par défaut d'une cellule en pixels lors de la génération de l'image 
+# Service HTTP local (src/core/service.py)
+SERVICE_CONFIG = {
+    'host': '127.0.0.1',
+    'port': 8080,
+    'workers': 2,                    # Processus de travail pré-chauffés (0 = traitement dans le thread de la requête)
+    'max_concurrent_requests': 8,    # Au-delà: réponse 503 immédiate (pas de file d'attente non bornée)
+    'max_request_bytes': 4 * 1024 * 1024, # Taille max du corps d'une requête (413 au-delà)
+    'max_cell_pixel_size': 64,       # Borne la taille des images produites par /encode
+    'request_timeout_s': 30.0,
+    'deterministic_keys': False,     # Clé XOR dérivée du message si la requête n'en fournit pas (rend le cache utile)
+}
+
+# Cache de rendu des symboles (src/core/render_cache.py)
+RENDER_CACHE_CONFIG = {
+    'max_bytes': 64 * 1024 * 1024, # Taille totale max des images en mémoire (éviction LRU au-delà)
+    'disk_dir': None,              # Répertoire du niveau disque optionnel (None = mémoire seule)
+    'disk_max_bytes': 512 * 1024 * 1024, # Taille totale max des fichiers du niveau disque (éviction LRU au-delà)
+}
+
+# Planches d'étiquettes (src/core/sheet.py)
+SHEET_CONFIG = {
+    'columns': 8,              # Étiquettes par ligne
+    'rows': 12,                # Lignes d'étiquettes par page
+    'cell_pixel_size': 7,      # 8 x 12 étiquettes de 39 x 39 cellules tiennent sur une page A4 à 300 dpi
+    'quiet_zone_cells': 2,     # Zone blanche autour de chaque symbole, en cellules
+    'gap_px': 0,               # Espace supplémentaire entre deux étiquettes voisines
+    'margin_px': 40,           # Marge de la page (si page_size_mm est None)
+    'page_size_mm': None,      # (largeur, hauteur), ex. (210, 297) pour A4; None = page ajustée à la grille
+    'dpi': 300,                # Résolution inscrite dans le fichier (et conversion des mm en pixels)
+}
+
+# Traitement par lots (src/core/batch.py): exécuteur des workers
+# 'process': un processus par worker (tâches sérialisées); 'thread': threads du processus courant, sans démarrage
+#            de processus ni sérialisation (Pillow et NumPy libèrent le GIL pendant les calculs sur les images).
+BATCH_BACKENDS = ('process', 'thread')
+BATCH_CONFIG = {
+    'backend': 'process',
+}
@@ -0,0 +1,237 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import src.core.protocol_config as pc
+import src.core.profile as pf
+import src.core.data_processing as dp
+import src.core.encoder as encoder
+import src.core.image_utils as iu
+import src.core.vector_output as vector_output
+import src.core.packed as packed
+
+# Cache des images rendues: (version du cache, empreinte du profil, réglages de masquage et de placement,
+# message, niveau ECC, clé XOR, taille de cellule, format) -> octets de l'image.
+# Niveau mémoire: LRU borné par la taille totale des images. Niveau disque optionnel, borné par disk_max_bytes
+# (les fichiers les moins récemment utilisés sont supprimés): un fichier par entrée, nommé par l'empreinte
+# SHA-256 de la clé du cache. Les entrées écrites avec d'autres réglages ne sont plus jamais lues et sont
+# éliminées par l'éviction LRU; purge_disk() vide le répertoire.
+
+CACHE_FORMAT_VERSION = 1 # À incrémenter quand le rendu change sans que les réglages de la clé changent
+
+def _is_cache_file(name: str) -> bool:
+    """Fichier d'entrée du niveau disque: <empreinte SHA-256>.<format> (les autres fichiers sont ignorés)."""
+    digest, _, extension = name.partition('.')
+    return len(digest) == 64 and bool(extension) and extension != 'tmp' and all(c in '0123456789abcdef' for c in digest)
+
+def deterministic_xor_key(message_text: str, ecc_level_percent: int) -> str:
+    """Clé XOR dérivée du message et du niveau ECC: deux rendus identiques produisent les mêmes octets."""
+    seed = f"{ecc_level_percent}\x00{message_text}".encode('utf-8')
+    return dp.derive_xor_key(seed, pc.METADATA_CONFIG['key_bits'])
+
+def _layout_settings_digest() -> str:
+    """Empreinte des réglages qui modifient le symbole sans faire partie du profil (masquage, placement)."""
+    settings = json.dumps({'masking': pc.MASKING_CONFIG, 'placement': pc.PLACEMENT_CONFIG}, sort_keys=True)
+    return hashlib.sha256(settings.encode('utf-8')).hexdigest()[:16]
+
+def make_cache_key(message_text: str, ecc_level_percent: int, xor_key: str, cell_pixel_size: int,
+                   image_format: str, profile: pf.ProtocolProfile = None) -> tuple:
+    """
+    Clé du cache (le format en dernier: il donne l'extension du fichier du niveau disque).
+    La taille de cellule est ramenée à 0 pour packed.PACKED_FORMAT, dont les octets n'en dépendent pas.
+    """
+    if image_format.lower() == packed.PACKED_FORMAT:
+        cell_pixel_size = 0
+    return (CACHE_FORMAT_VERSION, pf.resolve(profile).fingerprint(), _layout_settings_digest(),
+            message_text, int(ecc_level_percent), xor_key, int(cell_pixel_size), image_format.upper())
+
+class RenderCache:
+    """
+    Cache LRU des images rendues, sûr entre threads.
+    max_bytes: taille totale max (octets d'images) en mémoire; une image plus grande n'est pas mise en mémoire.
+    disk_dir: répertoire du niveau disque (créé au besoin); None pour un cache mémoire seul.
+    disk_max_bytes: taille totale max des fichiers du niveau disque (éviction LRU au-delà, fichiers déjà
+    présents compris, du plus ancien au plus récent).
+    """
+
+    def __init__(self, max_bytes: int = None, disk_dir: str = None, disk_max_bytes: int = None):
+        self.max_bytes = pc.RENDER_CACHE_CONFIG['max_bytes'] if max_bytes is None else max_bytes
+        self.disk_dir = disk_dir if disk_dir is not None else pc.RENDER_CACHE_CONFIG['disk_dir']
+        self.disk_max_bytes = pc.RENDER_CACHE_CONFIG['disk_max_bytes'] if disk_max_bytes is None else disk_max_bytes
+        self._entries = OrderedDict()
+        self._disk_entries = OrderedDict() # Nom de fichier -> taille, du moins au plus récemment utilisé
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._scan_disk()
+
+    def _scan_disk(self):
+        """Reprend les fichiers d'un processus précédent, du moins au plus récemment modifié."""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and _is_cache_file(entry.name):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        with self._lock:
+            for _, name, size in sorted(files):
+                self._disk_entries[name] = size
+                self.disk_bytes += size
+            self._prune_disk()
+
+    def _disk_name(self, key: tuple) -> str:
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return f"{digest}.{key[-1].lower()}"
+
+    def _disk_path(self, key: tuple) -> str:
+        return os.path.join(self.disk_dir, self._disk_name(key))
+
+    def _prune_disk(self):
+        # Appelé avec le verrou tenu. Un fichier déjà supprimé (autre processus, purge) est simplement oublié.
+        while self.disk_bytes > self.disk_max_bytes and self._disk_entries:
+            name, size = self._disk_entries.popitem(last=False)
+            self.disk_bytes -= size
+            self.disk_evictions += 1
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def _store_in_memory(self, key: tuple, data: bytes):
+        # Appelé avec le verrou tenu.
+        if key in self._entries:
+            self.current_bytes -= len(self._entries.pop(key))
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = data
+        self.current_bytes += len(data)
+        while self.current_bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= len(evicted)
+            self.evictions += 1
+
+    def get(self, key: tuple):
+        """Retourne les octets en cache pour key, ou None. Un succès disque est promu en mémoire."""
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = None
+            if data is not None:
+                name = self._disk_name(key)
+                with self._lock:
+                    self.disk_hits += 1
+                    self._store_in_memory(key, data)
+                    if name in self._disk_entries:
+                        self._disk_entries.move_to_end(name)
+                try:
+                    os.utime(self._disk_path(key)) # Ordre LRU conservé d'un processus à l'autre
+                except FileNotFoundError:
+                    pass
+                return data
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: tuple, data: bytes):
+        with self._lock:
+            self._store_in_memory(key, data)
+        if self.disk_dir:
+            # Écriture atomique: un lecteur concurrent ne voit jamais un fichier partiel.
+            if len(data) > self.disk_max_bytes:
+                return
+            fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            name = self._disk_name(key)
+            os.replace(temp_path, os.path.join(self.disk_dir, name))
+            with self._lock:
+                self.disk_bytes += len(data) - self._disk_entries.pop(name, 0)
+                self._disk_entries[name] = len(data)
+                self._prune_disk()
+
+    def clear(self):
+        """Vide le niveau mémoire (le niveau disque est conservé, voir purge_disk)."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def purge_disk(self) -> int:
+        """Supprime tous les fichiers du niveau disque (entrées de ce processus ou d'un précédent). Retourne leur nombre."""
+        if not self.disk_dir:
+            return 0
+        removed = 0
+        with self._lock:
+            for entry in os.scandir(self.disk_dir):
+                if entry.is_file() and _is_cache_file(entry.name):
+                    try:
+                        os.remove(entry.path)
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+            self._disk_entries.clear()
+            self.disk_bytes = 0
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'disk_entries': len(self._disk_entries),
+                'disk_bytes': self.disk_bytes,
+                'disk_evictions': self.disk_evictions,
+                'hit_rate': (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            }
+
+def render_symbol_bytes(message_text: str, ecc_level_percent: int, cell_pixel_size: int, image_format: str = "PNG",
+                        xor_key: str = None, deterministic_key: bool = False, cache: RenderCache = None) -> bytes:
+    """
+    Encode et rend un symbole (un seul) en octets d'image, ou en matrice empaquetée pour le format
+    packed.PACKED_FORMAT (cell_pixel_size est alors sans effet).
+    Sans xor_key, la clé est aléatoire (comportement historique) sauf si deterministic_key est vrai.
+    Le cache n'est consulté que si la clé est connue (fournie ou déterministe): avec une clé aléatoire,
+    deux rendus du même message ne sont pas censés être identiques.
+    """
+    if xor_key is None and deterministic_key:
+        xor_key = deterministic_xor_key(message_text, ecc_level_percent)
+
+    key = None
+    if cache is not None and xor_key is not None:
+        key = make_cache_key(message_text, ecc_level_percent, xor_key, cell_pixel_size, image_format)
+        data = cache.get(key)
+        if data is not None:
+            return data
+
+    bit_matrix = encoder.encode_message_to_matrix(message_text, ecc_level_percent, xor_key)
+    if image_format.lower() == packed.PACKED_FORMAT:
+        data = packed.pack_matrix(bit_matrix)
+    elif image_format.lower() in vector_output.VECTOR_FORMATS:
+        data = vector_output.render_vector_bytes(bit_matrix, image_format, cell_pixel_size)
+    else:
+        data = iu.encode_image_bytes(iu.render_protocol_image(bit_matrix, cell_pixel_size), image_format.upper())
+    if key is not None:
+        cache.put(key, data)
+    return data
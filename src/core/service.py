@@ -0,0 +1,339 @@
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+import src.core.protocol_config as pc
+import src.core.profile as pf
+import src.core.encoder as encoder
+import src.core.backends as backends
+import src.core.batch as batch
+import src.core.render_cache as rc
+import src.core.capacity as capacity
+
+# Service HTTP local (bibliothèque standard uniquement) pour l'encodage / décodage.
+# POST /encode  corps JSON {"message", "ecc"?, "key"?, "cell_size"?, "format"?, "deterministic_key"?} -> image
+#               ("format": png, ou svg / pdf pour un rendu vectoriel, ou sym pour la matrice empaquetée
+#               sans rendu, voir packed)
+# POST /decode  corps = octets d'une image                                      -> JSON
+# POST /capacity corps JSON {"message", "ecc"?, "structured_append"?} -> JSON (plan de capacité, sans pool ni créneau)
+# GET  /health  -> JSON (état du pool)          GET /metrics -> JSON (compteurs et latences)
+# Le travail est fait par un pool de processus pré-chauffés (disposition calculée, Pillow importé).
+
+logger = logging.getLogger(__name__)
+
+IMAGE_CONTENT_TYPES = {'png': 'image/png', 'svg': 'image/svg+xml', 'pdf': 'application/pdf',
+                       'sym': 'application/octet-stream'}
+
+def warm_worker():
+    """Précalcule la disposition et charge Pillow: la première requête ne paie pas ces coûts."""
+    pf.default_profile()
+    backends.pil_image()
+    backends.pil_image_draw()
+    encoder.encode_message_to_matrix("warm-up", pc.DEFAULT_ECC_LEVEL_PERCENT)
+
+def _worker_ready() -> bool:
+    return True
+
+def encode_request(message: str, ecc_level_percent: int, xor_key: str, cell_pixel_size: int, image_format: str) -> bytes:
+    """Encode un message en une image (un seul symbole). Exécuté dans un processus de travail."""
+    return rc.render_symbol_bytes(message, ecc_level_percent, cell_pixel_size, image_format, xor_key=xor_key)
+
+def decode_request(image_bytes: bytes) -> dict:
+    """Décode une image reçue en octets. Exécuté dans un processus de travail."""
+    return batch.decode_job({'source': 'request', 'data': image_bytes})
+
+class RequestError(Exception):
+    """Erreur renvoyée au client avec un statut HTTP."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+class ServiceMetrics:
+    """Compteurs du service, protégés par un verrou (le serveur traite les requêtes dans des threads)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.rejected = 0 # Refus pour cause de concurrence (503)
+        self.endpoints = {}
+
+    def begin(self):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+    def end(self, endpoint: str, status: int, duration_ms: float):
+        with self._lock:
+            self.in_flight -= 1
+            entry = self.endpoints.setdefault(endpoint, {'requests': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+            entry['requests'] += 1
+            if status >= 400:
+                entry['errors'] += 1
+            entry['total_ms'] += duration_ms
+            entry['max_ms'] = max(entry['max_ms'], duration_ms)
+
+    def reject(self):
+        with self._lock:
+            self.rejected += 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            endpoints = {
+                name: {**entry, 'mean_ms': entry['total_ms'] / entry['requests'] if entry['requests'] else 0.0}
+                for name, entry in self.endpoints.items()
+            }
+            return {
+                'uptime_s': time.time() - self.started_at,
+                'in_flight': self.in_flight,
+                'max_in_flight': self.max_in_flight,
+                'rejected': self.rejected,
+                'endpoints': endpoints,
+            }
+
+class EncodeDecodeService:
+    """
+    Pool de travail pré-chauffé + limites (taille des requêtes, concurrence).
+    workers=0: le travail est fait dans le thread de la requête (utile pour les tests et le profilage).
+    render_cache: cache des images rendues, consulté dans le processus du serveur avant d'envoyer le travail
+    au pool (seules les requêtes à clé connue, fournie ou déterministe, sont mises en cache).
+    """
+
+    def __init__(self, workers: int = None, max_concurrent_requests: int = None, max_request_bytes: int = None,
+                 request_timeout_s: float = None, render_cache: rc.RenderCache = None):
+        self.workers = pc.SERVICE_CONFIG['workers'] if workers is None else workers
+        self.max_concurrent_requests = max_concurrent_requests or pc.SERVICE_CONFIG['max_concurrent_requests']
+        self.max_request_bytes = max_request_bytes or pc.SERVICE_CONFIG['max_request_bytes']
+        self.request_timeout_s = request_timeout_s or pc.SERVICE_CONFIG['request_timeout_s']
+        self.metrics = ServiceMetrics()
+        self.render_cache = render_cache
+        self._slots = threading.BoundedSemaphore(self.max_concurrent_requests)
+        self._pool = None
+
+    def start(self):
+        """Chauffe le processus courant puis démarre (et attend) tous les processus de travail."""
+        warm_worker()
+        if self.workers > 0:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=warm_worker)
+            wait([self._pool.submit(_worker_ready) for _ in range(self.workers)])
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+    def try_acquire_slot(self) -> bool:
+        if self._slots.acquire(blocking=False):
+            return True
+        self.metrics.reject()
+        return False
+
+    def release_slot(self):
+        self._slots.release()
+
+    def run(self, func, *args):
+        if self._pool is None:
+            return func(*args)
+        try:
+            return self._pool.submit(func, *args).result(timeout=self.request_timeout_s)
+        except TimeoutError:
+            raise RequestError(504, f"Processing exceeded {self.request_timeout_s} s.")
+
+    def health(self) -> dict:
+        return {'status': 'ok', 'workers': self.workers, 'max_concurrent_requests': self.max_concurrent_requests}
+
+    def _parse_message_request(self, body: bytes) -> dict:
+        try:
+            params = json.loads(body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise RequestError(400, f"Invalid JSON body: {e}")
+        if not isinstance(params, dict) or not isinstance(params.get('message'), str):
+            raise RequestError(400, "Body must be a JSON object with a string 'message'.")
+        return params
+
+    def capacity(self, body: bytes) -> dict:
+        """Traite le corps JSON de /capacity: plan de capacité du message (voir capacity.plan_message)."""
+        params = self._parse_message_request(body)
+        try:
+            return capacity.plan_message(params['message'], params.get('ecc', pc.DEFAULT_ECC_LEVEL_PERCENT),
+                                         bool(params.get('structured_append', False)))
+        except ValueError as e:
+            raise RequestError(400, str(e))
+
+    def encode(self, body: bytes) -> tuple[bytes, str]:
+        """Traite le corps JSON de /encode. Retourne (octets de l'image, type MIME)."""
+        params = self._parse_message_request(body)
+
+        image_format = str(params.get('format', 'png')).lower()
+        if image_format not in IMAGE_CONTENT_TYPES:
+            raise RequestError(400, f"Unsupported format '{image_format}' (supported: {', '.join(IMAGE_CONTENT_TYPES)}).")
+        try:
+            ecc_level = int(params.get('ecc', pc.DEFAULT_ECC_LEVEL_PERCENT))
+            cell_pixel_size = int(params.get('cell_size', pc.DEFAULT_CELL_PIXEL_SIZE))
+        except (TypeError, ValueError):
+            raise RequestError(400, "'ecc' and 'cell_size' must be integers.")
+        if not 1 <= cell_pixel_size <= pc.SERVICE_CONFIG['max_cell_pixel_size']:
+            raise RequestError(400, f"'cell_size' must be between 1 and {pc.SERVICE_CONFIG['max_cell_pixel_size']}.")
+        # Admission: un message trop long est refusé avant d'occuper un processus de travail.
+        try:
+            fits = capacity.message_fits(params['message'], ecc_level)
+        except ValueError as e:
+            raise RequestError(400, str(e))
+        if not fits:
+            raise RequestError(400, f"Message ({capacity.message_length(params['message'])} bytes) exceeds the "
+                                    f"symbol capacity at ECC level {ecc_level}%.")
+
+        xor_key = params.get('key')
+        if xor_key is None and params.get('deterministic_key', pc.SERVICE_CONFIG['deterministic_keys']):
+            xor_key = rc.deterministic_xor_key(params['message'], ecc_level)
+        cache_key = None
+        if self.render_cache is not None and xor_key is not None:
+            cache_key = rc.make_cache_key(params['message'], ecc_level, xor_key, cell_pixel_size, image_format)
+            image_bytes = self.render_cache.get(cache_key)
+            if image_bytes is not None:
+                return image_bytes, IMAGE_CONTENT_TYPES[image_format]
+
+        try:
+            image_bytes = self.run(encode_request, params['message'], ecc_level, xor_key, cell_pixel_size, image_format)
+        except ValueError as e:
+            raise RequestError(400, str(e))
+        if cache_key is not None:
+            self.render_cache.put(cache_key, image_bytes)
+        return image_bytes, IMAGE_CONTENT_TYPES[image_format]
+
+    def metrics_snapshot(self) -> dict:
+        snapshot = self.metrics.as_dict()
+        if self.render_cache is not None:
+            snapshot['render_cache'] = self.render_cache.stats()
+        return snapshot
+
+    def decode(self, body: bytes) -> dict:
+        """Traite le corps (image) de /decode. Retourne l'enregistrement de décodage."""
+        if not body:
+            raise RequestError(400, "Empty request body.")
+        record = self.run(decode_request, body)
+        del record['source']
+        if not record['ok']:
+            raise RequestError(422, record['error'])
+        return record
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    server_version = "ProtocolService/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logger.debug("%s - " + format, self.address_string(), *args)
+
+    def _send(self, status: int, body: bytes, content_type: str, extra_headers: dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload: dict, extra_headers: dict = None):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json', extra_headers)
+
+    def do_GET(self):
+        service = self.server.service
+        path = urlsplit(self.path).path
+        if path == '/health':
+            self._send_json(200, service.health())
+        elif path == '/metrics':
+            self._send_json(200, service.metrics_snapshot())
+        else:
+            self._send_json(404, {'error': f"Unknown endpoint {path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        path = urlsplit(self.path).path
+        if path not in ('/encode', '/decode', '/capacity'):
+            self._send_json(404, {'error': f"Unknown endpoint {path}"})
+            return
+
+        length_header = self.headers.get('Content-Length')
+        if length_header is None:
+            self._send_json(411, {'error': "Content-Length required."}, {'Connection': 'close'})
+            self.close_connection = True
+            return
+        try:
+            content_length = int(length_header)
+        except ValueError:
+            content_length = -1
+        if content_length < 0:
+            # Longueur illisible: le corps ne peut pas être délimité, la connexion est fermée.
+            self._send_json(400, {'error': f"Invalid Content-Length {length_header!r}."}, {'Connection': 'close'})
+            self.close_connection = True
+            return
+        if content_length > service.max_request_bytes:
+            # Le corps n'est pas lu: la connexion est fermée.
+            self._send_json(413, {'error': f"Request body exceeds {service.max_request_bytes} bytes."},
+                            {'Connection': 'close'})
+            self.close_connection = True
+            return
+        body = self.rfile.read(content_length)
+
+        if path == '/capacity':
+            # Réponse immédiate (tables précalculées): ne consomme ni créneau de concurrence ni processus de travail.
+            start = time.perf_counter()
+            service.metrics.begin()
+            try:
+                response = (200, service.capacity(body))
+            except RequestError as e:
+                response = (e.status, {'error': str(e)})
+            service.metrics.end(path, response[0], (time.perf_counter() - start) * 1000)
+            self._send_json(*response)
+            return
+
+        if not service.try_acquire_slot():
+            self._send_json(503, {'error': "Too many concurrent requests."}, {'Retry-After': '1'})
+            return
+        service.metrics.begin()
+        start = time.perf_counter()
+        try:
+            if path == '/encode':
+                image_bytes, content_type = service.encode(body)
+                response = (200, image_bytes, content_type)
+            else:
+                response = (200, json.dumps(service.decode(body), ensure_ascii=False).encode('utf-8'), 'application/json')
+        except RequestError as e:
+            response = (e.status, json.dumps({'error': str(e)}).encode('utf-8'), 'application/json')
+        except Exception as e:
+            logger.exception("Unhandled error on %s", path)
+            response = (500, json.dumps({'error': f"{type(e).__name__}: {e}"}).encode('utf-8'), 'application/json')
+        finally:
+            service.release_slot()
+        # Métriques enregistrées avant l'envoi: un client qui lit /metrics juste après voit sa requête.
+        service.metrics.end(path, response[0], (time.perf_counter() - start) * 1000)
+        self._send(*response)
+
+def make_server(host: str = None, port: int = None, service: EncodeDecodeService = None) -> ThreadingHTTPServer:
+    """Crée le serveur HTTP (port 0: port libre choisi par le système). Le service doit être démarré."""
+    host = pc.SERVICE_CONFIG['host'] if host is None else host
+    port = pc.SERVICE_CONFIG['port'] if port is None else port
+    server = ThreadingHTTPServer((host, port), ServiceRequestHandler)
+    server.daemon_threads = True
+    server.service = service or EncodeDecodeService()
+    return server
+
+def serve(host: str = None, port: int = None, **service_options):
+    """Démarre le service et bloque jusqu'à l'interruption (Ctrl+C)."""
+    service = EncodeDecodeService(**service_options)
+    service.start()
+    server = make_server(host, port, service)
+    logger.info("Listening on http://%s:%d (%d worker(s))", *server.server_address[:2], service.workers)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
@@ -0,0 +1,151 @@
+import os
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+
+# Planches d'étiquettes: N symboles disposés en grille sur une ou plusieurs pages.
+# Une page est construite en une seule réplication vectorisée (NumPy): les matrices sont converties en
+# indices de couleur, entourées de leur zone blanche, agrandies (repeat) puis réarrangées en grille
+# (reshape/transpose); la palette n'est appliquée qu'une fois, sur la page entière (image en mode 'P').
+# Le coût dépend du nombre de pixels, pas du nombre d'étiquettes.
+
+_EMPTY_CELL = '20'         # Valeur hors protocole (indice 4) pour une cellule None: rendue comme le fond
+_BACKGROUND_INDEX = 2 ** pc.BITS_PER_CELL
+MULTIPAGE_EXTENSIONS = ('.pdf',) # Formats écrits en un seul fichier, une page à la fois
+
+def sheet_layout(**overrides) -> dict:
+    """SHEET_CONFIG complété par overrides (mêmes clés). Lève ValueError pour une clé ou une valeur invalide."""
+    unknown = set(overrides) - set(pc.SHEET_CONFIG)
+    if unknown:
+        raise ValueError(f"Unknown sheet layout option(s): {', '.join(sorted(unknown))}.")
+    layout = {**pc.SHEET_CONFIG, **overrides}
+    for key in ('columns', 'rows', 'cell_pixel_size', 'dpi'):
+        if layout[key] < 1:
+            raise ValueError(f"Sheet layout '{key}' must be at least 1.")
+    for key in ('quiet_zone_cells', 'gap_px', 'margin_px'):
+        if layout[key] < 0:
+            raise ValueError(f"Sheet layout '{key}' cannot be negative.")
+    return layout
+
+def sheet_geometry(layout: dict) -> dict:
+    """
+    Dimensions en pixels d'une page: étiquette (symbole + zone blanche), pas de la grille, taille de la grille,
+    taille de la page et origine de la grille. Avec page_size_mm, la grille est centrée sur la page.
+    """
+    label_px = (pc.MATRIX_DIM + 2 * layout['quiet_zone_cells']) * layout['cell_pixel_size']
+    pitch_px = label_px + layout['gap_px']
+    grid_width = layout['columns'] * pitch_px - layout['gap_px']
+    grid_height = layout['rows'] * pitch_px - layout['gap_px']
+    if layout['page_size_mm'] is None:
+        page_width = grid_width + 2 * layout['margin_px']
+        page_height = grid_height + 2 * layout['margin_px']
+    else:
+        page_width, page_height = (round(mm / 25.4 * layout['dpi']) for mm in layout['page_size_mm'])
+        if grid_width > page_width or grid_height > page_height:
+            raise ValueError(f"A {layout['columns']}x{layout['rows']} grid ({grid_width}x{grid_height} px) "
+                             f"does not fit on a {page_width}x{page_height} px page.")
+    return {
+        'label_px': label_px, 'pitch_px': pitch_px,
+        'grid_size': (grid_width, grid_height), 'page_size': (page_width, page_height),
+        'origin': ((page_width - grid_width) // 2, (page_height - grid_height) // 2),
+        'labels_per_page': layout['columns'] * layout['rows'],
+    }
+
+def _palette() -> bytes:
+    """Palette RVB indexée par la valeur des bits d'une cellule, suivie de la couleur du fond."""
+    colors = [pc.BITS_TO_COLOR_MAP[format(value, f'0{pc.BITS_PER_CELL}b')] for value in range(_BACKGROUND_INDEX)]
+    return bytes(channel for rgb in colors + [pc.WHITE] for channel in rgb)
+
+def _matrix_text(bit_matrix) -> str:
+    try:
+        return "".join(map("".join, bit_matrix))
+    except TypeError: # Cellules None
+        return "".join(bits if bits is not None else _EMPTY_CELL for row in bit_matrix for bits in row)
+
+def _cell_indices(matrices: list, np):
+    """Matrices de bits -> tableau (n, MATRIX_DIM, MATRIX_DIM) d'indices de couleur (valeur des bits)."""
+    text = "".join(_matrix_text(matrix) for matrix in matrices)
+    expected_length = len(matrices) * pc.MATRIX_DIM * pc.MATRIX_DIM * pc.BITS_PER_CELL
+    if len(text) != expected_length:
+        raise ValueError(f"Sheet symbols must be {pc.MATRIX_DIM}x{pc.MATRIX_DIM} matrices of {pc.BITS_PER_CELL}-bit cells.")
+    digits = np.frombuffer(text.encode('ascii'), dtype=np.uint8).reshape(
+        len(matrices), pc.MATRIX_DIM, pc.MATRIX_DIM, pc.BITS_PER_CELL) - ord('0')
+    indices = np.zeros(digits.shape[:3], dtype=np.uint8)
+    for k in range(pc.BITS_PER_CELL):
+        indices = (indices << 1) + digits[..., k]
+    if indices.max(initial=0) > _BACKGROUND_INDEX:
+        raise ValueError("Sheet symbols contain cell values outside the protocol alphabet.")
+    return indices
+
+def render_sheet(matrices: list, layout: dict = None, palette_image: bool = False):
+    """
+    Rend une page contenant au plus columns x rows symboles, ligne par ligne.
+    Retourne une image PIL RGB, ou en mode palette ('P') avec palette_image (fichiers plus petits, et sans
+    perte en PDF, où Pillow compresse les pages RGB en JPEG).
+    """
+    np = backends.numpy()
+    layout = layout or sheet_layout()
+    geometry = sheet_geometry(layout)
+    slots = geometry['labels_per_page']
+    if len(matrices) > slots:
+        raise ValueError(f"{len(matrices)} symbols do not fit on one page ({slots} labels per page).")
+
+    labels = np.full((slots, pc.MATRIX_DIM, pc.MATRIX_DIM), _BACKGROUND_INDEX, dtype=np.uint8)
+    if matrices:
+        labels[:len(matrices)] = _cell_indices(matrices, np)
+    quiet = layout['quiet_zone_cells']
+    gap = layout['gap_px']
+    cell_px = layout['cell_pixel_size']
+    labels = np.pad(labels, ((0, 0), (quiet, quiet), (quiet, quiet)), constant_values=_BACKGROUND_INDEX)
+    labels = labels.repeat(cell_px, axis=1).repeat(cell_px, axis=2)
+    if gap:
+        labels = np.pad(labels, ((0, 0), (0, gap), (0, gap)), constant_values=_BACKGROUND_INDEX)
+
+    pitch = geometry['pitch_px']
+    grid_width, grid_height = geometry['grid_size']
+    grid = labels.reshape(layout['rows'], layout['columns'], pitch, pitch).transpose(0, 2, 1, 3)
+    grid = grid.reshape(layout['rows'] * pitch, layout['columns'] * pitch)[:grid_height, :grid_width]
+
+    page_width, page_height = geometry['page_size']
+    x0, y0 = geometry['origin']
+    page = np.full((page_height, page_width), _BACKGROUND_INDEX, dtype=np.uint8)
+    page[y0:y0 + grid_height, x0:x0 + grid_width] = grid
+    # Image en mode palette; la conversion RVB par Pillow est plus rapide qu'une indexation NumPy de la page
+    image = backends.pil_image().frombuffer('P', (page_width, page_height), page, 'raw', 'P', 0, 1)
+    image.putpalette(_palette())
+    return image.copy() if palette_image else image.convert('RGB')
+
+def iter_sheet_pages(matrices, layout: dict = None, palette_image: bool = False):
+    """Produit une page par groupe de columns x rows symboles; matrices peut être un itérable paresseux."""
+    layout = layout or sheet_layout()
+    labels_per_page = sheet_geometry(layout)['labels_per_page']
+    page_matrices = []
+    for matrix in matrices:
+        page_matrices.append(matrix)
+        if len(page_matrices) == labels_per_page:
+            yield render_sheet(page_matrices, layout, palette_image)
+            page_matrices = []
+    if page_matrices:
+        yield render_sheet(page_matrices, layout, palette_image)
+
+def write_sheets(matrices, output_path: str, layout: dict = None) -> list[str]:
+    """
+    Écrit les planches de matrices. PDF: un seul fichier, les pages y sont ajoutées une à une.
+    Autres formats (PNG, TIFF...): un fichier par page, <nom>-001<ext>, <nom>-002<ext>...
+    Les pages sont écrites en mode palette (sans perte) et la résolution (dpi) est inscrite dans les fichiers.
+    Retourne les chemins écrits.
+    """
+    layout = layout or sheet_layout()
+    stem, extension = os.path.splitext(output_path)
+    multipage = extension.lower() in MULTIPAGE_EXTENSIONS
+    written = []
+    for page_number, page in enumerate(iter_sheet_pages(matrices, layout, palette_image=True), start=1):
+        if multipage:
+            page.save(output_path, resolution=layout['dpi'], append=page_number > 1)
+            if not written:
+                written.append(output_path)
+        else:
+            path = f"{stem}-{page_number:03d}{extension}"
+            page.save(path, dpi=(layout['dpi'], layout['dpi']))
+            written.append(path)
+    return written
@@ -0,0 +1,143 @@
+from collections import OrderedDict
+import src.core.protocol_config as pc
+
+# Ajout structuré (Structured Append): un message trop long pour un symbole est découpé en
+# segments, chacun préfixé par un en-tête (index, total, parité) puis encodé dans son propre symbole.
+# Le décodeur regroupe les segments par (parité, total) et libère le message dès que le dernier arrive.
+
+def structured_append_header_length() -> int:
+    """Retourne la longueur en octets de l'en-tête d'ajout structuré."""
+    cfg = pc.STRUCTURED_APPEND_CONFIG
+    total_bits = cfg['index_bits'] + cfg['total_bits'] + cfg['parity_bits']
+    if total_bits % 8 != 0:
+        raise ValueError(f"STRUCTURED_APPEND_CONFIG header ({total_bits} bits) must be a whole number of bytes.")
+    return total_bits // 8
+
+def max_structured_append_symbols() -> int:
+    """Nombre maximal de symboles dans une séquence (le champ total stocke total - 1)."""
+    return 2**pc.STRUCTURED_APPEND_CONFIG['total_bits']
+
+def compute_message_parity(message_bytes: bytes) -> int:
+    """Calcule la parité de la séquence: XOR de tous les octets du message complet."""
+    parity = 0
+    for byte in message_bytes:
+        parity ^= byte
+    return parity & (2**pc.STRUCTURED_APPEND_CONFIG['parity_bits'] - 1)
+
+def format_structured_append_header(index: int, total: int, parity: int) -> bytes:
+    """Construit l'en-tête d'ajout structuré (index, total, parité) sous forme d'octets."""
+    cfg = pc.STRUCTURED_APPEND_CONFIG
+    if not (1 <= total <= max_structured_append_symbols()):
+        raise ValueError(f"Structured append total must be between 1 and {max_structured_append_symbols()}, got {total}.")
+    if not (0 <= index < total):
+        raise ValueError(f"Structured append index {index} out of range for total {total}.")
+    if not (0 <= parity < 2**cfg['parity_bits']):
+        raise ValueError(f"Structured append parity {parity} does not fit on {cfg['parity_bits']} bits.")
+
+    header_bits = (
+        format(index, f"0{cfg['index_bits']}b") +
+        format(total - 1, f"0{cfg['total_bits']}b") +
+        format(parity, f"0{cfg['parity_bits']}b")
+    )
+    return int(header_bits, 2).to_bytes(structured_append_header_length(), 'big')
+
+def parse_structured_append_segment(segment: bytes) -> dict:
+    """
+    Sépare un segment décodé en en-tête et données.
+    Retourne {'index': int, 'total': int, 'parity': int, 'data': bytes}.
+    """
+    cfg = pc.STRUCTURED_APPEND_CONFIG
+    header_len = structured_append_header_length()
+    if len(segment) < header_len:
+        raise ValueError(f"Structured append segment too short ({len(segment)} bytes) to contain a header.")
+
+    header_bits = format(int.from_bytes(segment[:header_len], 'big'), f'0{header_len * 8}b')
+    pos = 0
+    index = int(header_bits[pos : pos + cfg['index_bits']], 2)
+    pos += cfg['index_bits']
+    total = int(header_bits[pos : pos + cfg['total_bits']], 2) + 1
+    pos += cfg['total_bits']
+    parity = int(header_bits[pos : pos + cfg['parity_bits']], 2)
+
+    if index >= total:
+        raise ValueError(f"Structured append header is inconsistent: index {index} >= total {total}.")
+
+    return {'index': index, 'total': total, 'parity': parity, 'data': segment[header_len:]}
+
+def split_message_into_segments(message_bytes: bytes, segment_capacity_bytes: int) -> list[bytes]:
+    """
+    Découpe message_bytes en segments (en-tête inclus) de segment_capacity_bytes octets au plus.
+    Lève une ValueError si le message nécessite plus de symboles que la séquence maximale.
+    """
+    chunk_size = segment_capacity_bytes - structured_append_header_length()
+    if chunk_size <= 0:
+        raise ValueError(f"Segment capacity ({segment_capacity_bytes} bytes) too small for the structured append header.")
+
+    total = max(1, -(-len(message_bytes) // chunk_size)) # Division entière arrondie au supérieur
+    if total > max_structured_append_symbols():
+        raise ValueError(
+            f"Message ({len(message_bytes)} bytes) needs {total} symbols, "
+            f"more than the structured append maximum ({max_structured_append_symbols()})."
+        )
+
+    parity = compute_message_parity(message_bytes)
+    return [
+        format_structured_append_header(i, total, parity) + message_bytes[i * chunk_size : (i + 1) * chunk_size]
+        for i in range(total)
+    ]
+
+class StructuredAppendAssembler:
+    """
+    Regroupe incrémentalement des segments d'ajout structuré reçus dans n'importe quel ordre.
+    Les segments sont regroupés par (parité, total). add_segment retourne le message complet
+    dès que le dernier segment d'une séquence arrive, et libère alors la séquence.
+    La mémoire retenue est bornée par la taille des messages en cours: un segment déjà reçu
+    (scan répété) n'est pas stocké à nouveau, et au plus max_pending_sequences séquences
+    incomplètes sont conservées (la plus ancienne est abandonnée au-delà).
+    on_evict(parity, total) est appelé pour chaque séquence abandonnée: l'appelant peut libérer ce qu'il
+    y associe (sources des segments, par exemple).
+    """
+
+    def __init__(self, max_pending_sequences: int = 16, on_evict=None):
+        if max_pending_sequences <= 0:
+            raise ValueError("max_pending_sequences must be positive.")
+        self.max_pending_sequences = max_pending_sequences
+        self.on_evict = on_evict
+        self._pending = OrderedDict() # (parity, total) -> {index: data}
+
+    def add_segment(self, segment: dict) -> str | None:
+        """
+        Ajoute un segment {'index', 'total', 'parity', 'data'} (voir parse_structured_append_segment).
+        Retourne le message texte reconstitué si la séquence est complète, sinon None.
+        """
+        key = (segment['parity'], segment['total'])
+        parts = self._pending.get(key)
+        if parts is None:
+            parts = {}
+            self._pending[key] = parts
+            if len(self._pending) > self.max_pending_sequences:
+                evicted_key, _ = self._pending.popitem(last=False) # Abandonner la séquence la plus ancienne
+                if self.on_evict is not None:
+                    self.on_evict(*evicted_key)
+        else:
+            self._pending.move_to_end(key)
+
+        parts.setdefault(segment['index'], segment['data'])
+        if len(parts) < segment['total']:
+            return None
+
+        del self._pending[key]
+        message_bytes = b"".join(parts[i] for i in range(segment['total'])).rstrip(b'\x00')
+        if compute_message_parity(message_bytes) != segment['parity']:
+            raise ValueError("Structured append parity mismatch: segments do not belong to the same message.")
+        try:
+            return message_bytes.decode('utf-8', errors='strict')
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Failed to decode reassembled structured append message. Details: {e}") from e
+
+    def pending_sequences(self) -> list[dict]:
+        """Retourne l'état des séquences incomplètes: [{'parity', 'total', 'received'}, ...]."""
+        return [
+            {'parity': parity, 'total': total, 'received': sorted(parts)}
+            for (parity, total), parts in self._pending.items()
+        ]
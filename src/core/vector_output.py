@@ -0,0 +1,136 @@
+import zlib
+from itertools import groupby
+
+import src.core.protocol_config as pc
+import src.core.profile as pf
+
+# Rendu vectoriel (SVG, PDF) d'une matrice de bits, bibliothèque standard uniquement.
+# Les cellules voisines de même couleur sont fusionnées en rectangles (séries horizontales, puis séries
+# identiques de lignes consécutives); chaque couleur est ensuite dessinée en un seul chemin au-dessus d'un
+# fond blanc. Les coordonnées sont entières (en cellules) et la sortie ne contient ni date ni identifiant:
+# deux rendus d'une même matrice sont identiques octet pour octet (utilisable comme clé de cache).
+# Les couleurs sont celles de la palette du profil de protocole (paramètre profile, profil par défaut si None).
+
+VECTOR_FORMATS = ('svg', 'pdf')
+
+def _background_bits(profile: pf.ProtocolProfile = None):
+    return pf.resolve(profile).color_to_bits.get(pc.WHITE) # None: palette sans blanc, toutes les cellules sont dessinées
+
+def merged_rectangles(bit_matrix, profile: pf.ProtocolProfile = None) -> list[tuple]:
+    """
+    Retourne les rectangles (ligne, colonne, hauteur, largeur, bits) couvrant les cellules qui ne sont pas
+    de la couleur du fond (les cellules None sont traitées comme le fond), triés par (ligne, colonne).
+    """
+    background_bits = _background_bits(profile)
+    rectangles = []
+    open_runs = {} # (colonne, largeur, bits) -> [ligne de départ, hauteur] des rectangles encore extensibles
+    for r, row in enumerate(bit_matrix):
+        row_runs = {}
+        c = 0
+        for bits, cells in groupby(row):
+            width = len(list(cells))
+            if bits is not None and bits != background_bits:
+                run = (c, width, bits)
+                extended = open_runs.pop(run, None)
+                if extended is not None:
+                    extended[1] += 1
+                    row_runs[run] = extended
+                else:
+                    row_runs[run] = [r, 1]
+            c += width
+        for (c0, width, bits), (r0, height) in open_runs.items(): # Séries non prolongées sur cette ligne
+            rectangles.append((r0, c0, height, width, bits))
+        open_runs = row_runs
+    for (c0, width, bits), (r0, height) in open_runs.items():
+        rectangles.append((r0, c0, height, width, bits))
+    rectangles.sort()
+    return rectangles
+
+def _rectangles_by_color(bit_matrix, profile: pf.ProtocolProfile = None) -> dict:
+    by_color = {}
+    for rectangle in merged_rectangles(bit_matrix, profile):
+        by_color.setdefault(rectangle[4], []).append(rectangle[:4])
+    return dict(sorted(by_color.items()))
+
+def _hex_color(rgb) -> str:
+    return "#{:02x}{:02x}{:02x}".format(*rgb)
+
+def _color_for_bits(bits: str, profile: pf.ProtocolProfile = None):
+    return pf.resolve(profile).bits_to_color.get(bits, pc.BLACK) # Même repli que image_utils.bits_to_rgb
+
+def render_svg(bit_matrix, module_size: float = 1, unit: str = '', quiet_zone_cells: int = 0,
+               profile: pf.ProtocolProfile = None) -> bytes:
+    """
+    Document SVG du symbole. Le viewBox est en cellules; la taille affichée est module_size unit par cellule
+    (ex: module_size=0.5, unit='mm' pour l'impression; unité vide = pixels CSS).
+    """
+    size = len(bit_matrix) + 2 * quiet_zone_cells
+    display_size = f"{size * module_size:g}{unit}"
+    parts = [
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" version="1.1" width="{display_size}" height="{display_size}" '
+        f'viewBox="0 0 {size} {size}" shape-rendering="crispEdges">\n'
+        f'<rect width="{size}" height="{size}" fill="{_hex_color(pc.WHITE)}"/>\n'
+    ]
+    for bits, rectangles in _rectangles_by_color(bit_matrix, profile).items():
+        path = "".join(
+            f"M{c + quiet_zone_cells} {r + quiet_zone_cells}h{width}v{height}h-{width}z"
+            for r, c, height, width in rectangles
+        )
+        parts.append(f'<path fill="{_hex_color(_color_for_bits(bits, profile))}" d="{path}"/>\n')
+    parts.append('</svg>\n')
+    return "".join(parts).encode('ascii')
+
+def render_pdf(bit_matrix, module_size_pt: float = 1, quiet_zone_cells: int = 0,
+               profile: pf.ProtocolProfile = None) -> bytes:
+    """
+    Document PDF d'une page contenant le symbole, module_size_pt points par cellule
+    (1 pt = 1/72 pouce; module_size_pt = taille_en_mm * 72 / 25.4).
+    """
+    size = len(bit_matrix) + 2 * quiet_zone_cells
+    scale = f"{module_size_pt:.4f}"
+    page_size = f"{size * module_size_pt:.4f}"
+    commands = [f"q {scale} 0 0 {scale} 0 0 cm", "{:.3f} {:.3f} {:.3f} rg".format(*(v / 255 for v in pc.WHITE)),
+                f"0 0 {size} {size} re", "f"]
+    for bits, rectangles in _rectangles_by_color(bit_matrix, profile).items():
+        commands.append("{:.3f} {:.3f} {:.3f} rg".format(*(v / 255 for v in _color_for_bits(bits, profile))))
+        # Origine du PDF en bas à gauche: la ligne r occupe l'ordonnée size - quiet - r - hauteur
+        commands.extend(
+            f"{c + quiet_zone_cells} {size - quiet_zone_cells - r - height} {width} {height} re"
+            for r, c, height, width in rectangles
+        )
+        commands.append("f")
+    commands.append("Q")
+    content = zlib.compress("\n".join(commands).encode('ascii'))
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_size} {page_size}] /Contents 4 0 R "
+        f"/Resources << >> >>".encode('ascii'),
+        f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode('ascii') + content + b"\nendstream",
+    ]
+    document = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(document))
+        document += f"{number} 0 obj\n".encode('ascii') + body + b"\nendobj\n"
+    xref_offset = len(document)
+    document += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('ascii')
+    for offset in offsets:
+        document += f"{offset:010d} 00000 n \n".encode('ascii')
+    document += (f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\n"
+                 f"startxref\n{xref_offset}\n%%EOF\n").encode('ascii')
+    return bytes(document)
+
+def render_vector_bytes(bit_matrix, image_format: str, cell_pixel_size: int, profile: pf.ProtocolProfile = None) -> bytes:
+    """
+    Rendu vectoriel au format image_format ('svg' ou 'pdf'), à la même taille nominale que le rendu
+    raster: cell_pixel_size pixels CSS (SVG) ou points (PDF, 72 par pouce) par cellule.
+    """
+    image_format = image_format.lower()
+    if image_format == 'svg':
+        return render_svg(bit_matrix, cell_pixel_size, profile=profile)
+    if image_format == 'pdf':
+        return render_pdf(bit_matrix, cell_pixel_size, profile=profile)
+    raise ValueError(f"Unsupported vector format '{image_format}' (supported: {', '.join(VECTOR_FORMATS)}).")
@@ -1,10 +1,16 @@
+import argparse
 import os
-import core.encoder as encoder
-import core.decoder as decoder
-import core.image_utils as image_utils
-import core.protocol_config as pc
+import sys
 
-def main():
+# Permet `python src/main.py` depuis n'importe quel répertoire: les modules du cœur s'importent via `src.core`.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import src.core.encoder as encoder
+import src.core.decoder as decoder
+import src.core.image_utils as image_utils
+import src.core.protocol_config as pc
+
+def run_demo():
     print("Starting main execution...")
     message_to_encode = "Hello World"
     ecc_percentage = pc.DEFAULT_ECC_LEVEL_PERCENT
@@ -66,5 +72,99 @@ def main():
         import traceback
         traceback.print_exc()
 
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Encodage / décodage par lots du protocole graphique.")
+    subparsers = parser.add_subparsers(dest='command')
+
+    encode_parser = subparsers.add_parser('encode', help="Encode des messages (JSONL, CSV ou stdin) en images.")
+    encode_parser.add_argument('input', help="Fichier .jsonl/.csv, ou '-' pour stdin (JSONL ou une ligne par message).")
+    encode_parser.add_argument('output', help="Répertoire de sortie, archive .tar, ou fichier de tuiles .npy/.tiles (un symbole par message).")
+    encode_parser.add_argument('--ecc', type=int, default=pc.DEFAULT_ECC_LEVEL_PERCENT,
+                               help="Niveau ECC par défaut (pourcentage) si l'entrée n'en précise pas.")
+    encode_parser.add_argument('--cell-size', type=int, default=pc.DEFAULT_CELL_PIXEL_SIZE, help="Taille d'une cellule en pixels.")
+
+    decode_parser = subparsers.add_parser('decode', help="Décode des images (répertoire, glob ou archive tar) en JSONL.")
+    decode_parser.add_argument('input', help="Répertoire, motif glob (entre guillemets) ou archive .tar[.gz].")
+    decode_parser.add_argument('output', nargs='?', default='-', help="Fichier JSONL de résultats ('-' pour stdout).")
+
+    for sub in (encode_parser, decode_parser):
+        sub.add_argument('--workers', type=int, default=1, help="Nombre de workers (1 = séquentiel).")
+        sub.add_argument('--backend', choices=pc.BATCH_BACKENDS, default=pc.BATCH_CONFIG['backend'],
+                         help="Workers: processus, ou threads du processus courant (sans démarrage ni sérialisation).")
+        sub.add_argument('--no-resume', action='store_true', help="Retraite tout au lieu de sauter les éléments déjà traités.")
+        sub.add_argument('--quiet', action='store_true', help="Pas de rapport de progression périodique.")
+
+    sheet_parser = subparsers.add_parser('sheet', help="Encode des messages en planches d'étiquettes (PDF multipage ou une image par page).")
+    sheet_parser.add_argument('input', help="Fichier .jsonl/.csv, ou '-' pour stdin (JSONL ou une ligne par message).")
+    sheet_parser.add_argument('output', help="Fichier .pdf, ou nom d'image (.png...) suffixé par le numéro de page.")
+    sheet_parser.add_argument('--ecc', type=int, default=pc.DEFAULT_ECC_LEVEL_PERCENT,
+                              help="Niveau ECC par défaut (pourcentage) si l'entrée n'en précise pas.")
+    sheet_parser.add_argument('--columns', type=int, default=pc.SHEET_CONFIG['columns'])
+    sheet_parser.add_argument('--rows', type=int, default=pc.SHEET_CONFIG['rows'])
+    sheet_parser.add_argument('--cell-size', type=int, default=pc.SHEET_CONFIG['cell_pixel_size'], help="Taille d'une cellule en pixels.")
+    sheet_parser.add_argument('--quiet-zone', type=int, default=pc.SHEET_CONFIG['quiet_zone_cells'], help="Zone blanche en cellules.")
+    sheet_parser.add_argument('--gap', type=int, default=pc.SHEET_CONFIG['gap_px'], help="Espace entre étiquettes en pixels.")
+    sheet_parser.add_argument('--margin', type=int, default=pc.SHEET_CONFIG['margin_px'], help="Marge de page en pixels.")
+    sheet_parser.add_argument('--page-size-mm', type=float, nargs=2, metavar=('WIDTH', 'HEIGHT'),
+                              default=pc.SHEET_CONFIG['page_size_mm'], help="Taille de page fixe (ex: 210 297 pour A4).")
+    sheet_parser.add_argument('--dpi', type=int, default=pc.SHEET_CONFIG['dpi'])
+    sheet_parser.add_argument('--quiet', action='store_true', help="Pas de rapport de progression périodique.")
+
+    serve_parser = subparsers.add_parser('serve', help="Service HTTP local (/encode, /decode, /health, /metrics).")
+    serve_parser.add_argument('--host', default=pc.SERVICE_CONFIG['host'])
+    serve_parser.add_argument('--port', type=int, default=pc.SERVICE_CONFIG['port'])
+    serve_parser.add_argument('--workers', type=int, default=pc.SERVICE_CONFIG['workers'],
+                              help="Processus de travail pré-chauffés (0 = dans le thread de la requête).")
+    serve_parser.add_argument('--max-concurrent', type=int, default=pc.SERVICE_CONFIG['max_concurrent_requests'])
+    serve_parser.add_argument('--max-request-bytes', type=int, default=pc.SERVICE_CONFIG['max_request_bytes'])
+    serve_parser.add_argument('--cache-bytes', type=int, default=pc.RENDER_CACHE_CONFIG['max_bytes'],
+                              help="Taille du cache de rendu en mémoire (0 = pas de cache).")
+    serve_parser.add_argument('--cache-dir', default=pc.RENDER_CACHE_CONFIG['disk_dir'],
+                              help="Répertoire du niveau disque du cache de rendu.")
+    serve_parser.add_argument('--cache-disk-bytes', type=int, default=pc.RENDER_CACHE_CONFIG['disk_max_bytes'],
+                              help="Taille max du niveau disque (éviction LRU au-delà).")
+    serve_parser.add_argument('--purge-cache', action='store_true',
+                              help="Vide le niveau disque du cache de rendu au démarrage.")
+
+    subparsers.add_parser('demo', help="Encode puis décode 'Hello World' (comportement historique).")
+    return parser
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command in (None, 'demo'):
+        run_demo()
+        return 0
+
+    if args.command == 'serve':
+        import logging
+        import src.core.service as service
+        import src.core.render_cache as rc
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+        render_cache = None
+        if args.cache_bytes > 0:
+            render_cache = rc.RenderCache(args.cache_bytes, args.cache_dir, args.cache_disk_bytes)
+            if args.purge_cache:
+                logging.info("Render cache: %d file(s) purged.", render_cache.purge_disk())
+        service.serve(args.host, args.port, workers=args.workers, max_concurrent_requests=args.max_concurrent,
+                      max_request_bytes=args.max_request_bytes, render_cache=render_cache)
+        return 0
+
+    import src.core.batch as batch # Import différé: la démo n'en a pas besoin
+    progress = batch.ProgressReporter(args.command, interval_s=None if args.quiet else 1.0)
+    if args.command == 'sheet':
+        import src.core.sheet as sheet
+        layout = sheet.sheet_layout(columns=args.columns, rows=args.rows, cell_pixel_size=args.cell_size,
+                                    quiet_zone_cells=args.quiet_zone, gap_px=args.gap, margin_px=args.margin,
+                                    page_size_mm=args.page_size_mm, dpi=args.dpi)
+        summary = batch.run_sheet(args.input, args.output, ecc=args.ecc, layout=layout, progress=progress)
+    elif args.command == 'encode':
+        summary = batch.run_encode(args.input, args.output, ecc=args.ecc, cell_pixel_size=args.cell_size,
+                                   workers=args.workers, resume=not args.no_resume, progress=progress,
+                                   backend=args.backend)
+    else:
+        summary = batch.run_decode(args.input, args.output, workers=args.workers,
+                                   resume=not args.no_resume, progress=progress, backend=args.backend)
+    return 1 if summary['errors'] else 0
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,49 @@
+import unittest
+import os
+import subprocess
+import sys
+
+import src.core.backends as backends
+
+# Budget d'import du cœur d'encodage (en millisecondes), mesuré dans un interpréteur neuf.
+IMPORT_TIME_BUDGET_MS = 100
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def _run_in_fresh_interpreter(code: str) -> str:
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    return result.stdout.strip()
+
+class TestBackends(unittest.TestCase):
+
+    def test_core_imports_without_heavy_backends(self):
+        output = _run_in_fresh_interpreter(
+            "import sys\n"
+            "import src.core.encoder, src.core.decoder, src.core.image_utils\n"
+            "print('numpy' in sys.modules, 'PIL' in sys.modules)"
+        )
+        self.assertEqual(output, "False False")
+
+    def test_encoder_import_time_budget(self):
+        # Meilleur de 3 mesures pour absorber le bruit de la machine
+        timings = [
+            float(_run_in_fresh_interpreter(
+                "import time\n"
+                "start = time.perf_counter()\n"
+                "import src.core.encoder\n"
+                "print((time.perf_counter() - start) * 1000)"
+            ))
+            for _ in range(3)
+        ]
+        self.assertLess(min(timings), IMPORT_TIME_BUDGET_MS,
+                        f"import src.core.encoder took {min(timings):.1f} ms (budget {IMPORT_TIME_BUDGET_MS} ms).")
+
+    def test_lazy_loaders_cache_modules(self):
+        self.assertIs(backends.pil_image(), backends.pil_image())
+        self.assertTrue(hasattr(backends.pil_image(), 'new'))
+        self.assertTrue(hasattr(backends.pil_image_draw(), 'Draw'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+from unittest import mock
+
+import src.core.protocol_config as pc
+import src.core.batch as batch
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.progress_stream = io.StringIO()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def _progress(self, label):
+        return batch.ProgressReporter(label, stream=self.progress_stream, interval_s=None)
+
+    def _write_jsonl(self, name, records):
+        path = self._path(name)
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        return path
+
+    def _read_jsonl(self, path):
+        with open(path, encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def test_iter_encode_jobs_jsonl_and_csv(self):
+        jsonl_path = self._write_jsonl("in.jsonl", [{"id": "a", "message": "Hello", "ecc": 10}, {"message": "World"}])
+        jobs = list(batch.iter_encode_jobs(jsonl_path))
+        self.assertEqual(jobs[0], {'id': 'a', 'message': 'Hello', 'ecc': 10})
+        self.assertEqual(jobs[1]['message'], "World")
+        self.assertEqual(jobs[1]['ecc'], pc.DEFAULT_ECC_LEVEL_PERCENT)
+
+        csv_path = self._path("in.csv")
+        with open(csv_path, 'w', encoding='utf-8', newline='') as f:
+            f.write("id,message,ecc\nx,\"Bonjour, monde\",30\n")
+        self.assertEqual(list(batch.iter_encode_jobs(csv_path)), [{'id': 'x', 'message': 'Bonjour, monde', 'ecc': 30}])
+
+    def test_encode_decode_directory_round_trip(self):
+        source = self._write_jsonl("in.jsonl", [{"id": "a", "message": "Hello"}, {"id": "b", "message": "Wörld 😊"}])
+        output_dir = self._path("out")
+        summary = batch.run_encode(source, output_dir, cell_pixel_size=4, progress=self._progress('encode'))
+        self.assertEqual((summary['processed'], summary['errors']), (2, 0))
+        self.assertTrue(os.path.exists(os.path.join(output_dir, "a.png")))
+
+        results_path = self._path("results.jsonl")
+        summary = batch.run_decode(output_dir, results_path, progress=self._progress('decode'))
+        self.assertEqual((summary['processed'], summary['errors']), (2, 0))
+        messages = {r['source']: r['message'] for r in self._read_jsonl(results_path)}
+        self.assertEqual(messages, {"a.png": "Hello", "b.png": "Wörld 😊"})
+
+    def test_resume_skips_completed_items(self):
+        source = self._write_jsonl("in.jsonl", [{"id": "a", "message": "Hello"}])
+        output_dir = self._path("out")
+        batch.run_encode(source, output_dir, cell_pixel_size=4, progress=self._progress('encode'))
+
+        source = self._write_jsonl("in.jsonl", [{"id": "a", "message": "Hello"}, {"id": "b", "message": "Again"}])
+        summary = batch.run_encode(source, output_dir, cell_pixel_size=4, progress=self._progress('encode'))
+        self.assertEqual((summary['processed'], summary['skipped']), (1, 1))
+
+        results_path = self._path("results.jsonl")
+        batch.run_decode(output_dir, results_path, progress=self._progress('decode'))
+        summary = batch.run_decode(output_dir, results_path, progress=self._progress('decode'))
+        self.assertEqual((summary['processed'], summary['skipped']), (0, 2))
+        self.assertEqual(len(self._read_jsonl(results_path)), 2)
+
+    def test_tar_output_and_input_with_structured_append(self):
+        long_message = "x" * 400 # Dépasse un symbole: ajout structuré
+        source = self._write_jsonl("in.jsonl", [{"id": "short", "message": "Hi"}, {"id": "long", "message": long_message}])
+        archive_path = self._path("out.tar")
+        batch.run_encode(source, archive_path, cell_pixel_size=4, progress=self._progress('encode'))
+        with tarfile.open(archive_path) as archive:
+            names = archive.getnames()
+        self.assertIn("short.png", names)
+        self.assertTrue(any(name.startswith("long.1of") for name in names))
+
+        results_path = self._path("results.jsonl")
+        batch.run_decode(archive_path, results_path, workers=2, progress=self._progress('decode'))
+        records = self._read_jsonl(results_path)
+        assembled = [r for r in records if 'sources' in r]
+        self.assertEqual(len(assembled), 1)
+        self.assertEqual(assembled[0]['message'], long_message)
+        self.assertEqual(sorted(assembled[0]['sources']), sorted(n for n in names if n.startswith("long.")))
+
+    def test_abandoned_sequences_release_their_sources(self):
+        # Une séquence incomplète, 20 autres entrelacées (> 16 en attente), puis une séquence complète
+        # de même clé (parité, total) que la première, abandonnée entre-temps: elle n'hérite pas de ses sources.
+        def segment_record(source, parity, index, data):
+            return {'source': source, 'ok': True, 'message': None,
+                    'segment': {'index': index, 'total': 2, 'parity': parity}, 'segment_data': data.hex()}
+        message = "ab"
+        parity = batch.sa.compute_message_parity(message.encode('utf-8'))
+        other_parities = [p for p in range(22) if p != parity][:20]
+        records = [segment_record("stale.1of2.png", parity, 0, b"a")]
+        records += [segment_record(f"seq{p}.1of2.png", p, 0, b"x") for p in other_parities]
+        records += [segment_record("late.1of2.png", parity, 0, b"a"), segment_record("late.2of2.png", parity, 1, b"b")]
+        by_source = {r['source']: r for r in records}
+
+        results_path = self._path("results.jsonl")
+        with mock.patch.object(batch, 'iter_decode_sources', return_value=[{'source': r['source']} for r in records]), \
+             mock.patch.object(batch, 'decode_job', side_effect=lambda item: by_source[item['source']]):
+            batch.run_decode(self._path("unused"), results_path, progress=self._progress('decode'))
+        grouped = [r for r in self._read_jsonl(results_path) if 'sources' in r]
+        abandoned = [r for r in grouped if not r['ok']]
+        self.assertEqual(len(abandoned), 1 + len(other_parities) + 1 - 16) # Au-delà de 16 séquences en attente
+        self.assertEqual(abandoned[0]['sources'], ["stale.1of2.png"])
+        self.assertTrue(all(len(r['sources']) == 1 for r in abandoned))
+        completed = [r for r in grouped if r['ok']]
+        self.assertEqual(completed, [{'sources': ["late.1of2.png", "late.2of2.png"], 'ok': True, 'message': message}])
+
+    def test_resume_completes_interrupted_structured_append(self):
+        long_message = "y" * 900 # Au moins trois symboles
+        source = self._write_jsonl("in.jsonl", [{"id": "long", "message": long_message}])
+        output_dir = self._path("out")
+        batch.run_encode(source, output_dir, cell_pixel_size=4, progress=self._progress('encode'))
+        names = sorted(name for name in os.listdir(output_dir) if name.endswith(".png"))
+        self.assertGreaterEqual(len(names), 3)
+
+        results_path = self._path("results.jsonl")
+        real_decode_job = batch.decode_job
+        calls = []
+        def interrupted_decode_job(item):
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            calls.append(item['source'])
+            return real_decode_job(item)
+        with mock.patch.object(batch, 'decode_job', side_effect=interrupted_decode_job):
+            with self.assertRaises(KeyboardInterrupt):
+                batch.run_decode(output_dir, results_path, progress=self._progress('decode'))
+        self.assertFalse(any('sources' in r for r in self._read_jsonl(results_path)))
+
+        summary = batch.run_decode(output_dir, results_path, progress=self._progress('decode'))
+        self.assertEqual((summary['processed'], summary['skipped']), (len(names) - 2, 2))
+        grouped = [r for r in self._read_jsonl(results_path) if 'sources' in r]
+        self.assertEqual(len(grouped), 1)
+        self.assertTrue(grouped[0]['ok'])
+        self.assertEqual(grouped[0]['message'], long_message)
+        self.assertEqual(sorted(grouped[0]['sources']), names)
+
+        # Une nouvelle reprise ne recharge pas la séquence déjà close.
+        batch.run_decode(output_dir, results_path, progress=self._progress('decode'))
+        self.assertEqual(len([r for r in self._read_jsonl(results_path) if 'sources' in r]), 1)
+
+    def test_errors_are_reported_per_item(self):
+        source = self._write_jsonl("in.jsonl", [{"id": "bad", "message": "Hello", "ecc": 150},
+                                                {"id": "good", "message": "Hello"}])
+        summary = batch.run_encode(source, self._path("out"), cell_pixel_size=4, progress=self._progress('encode'))
+        self.assertEqual((summary['processed'], summary['errors']), (2, 1))
+        self.assertIn("bad", self.progress_stream.getvalue())
+
+    def test_run_tasks_preserves_all_results_with_bounded_window(self):
+        results = list(batch.run_tasks(abs, range(-20, 0), workers=2, max_in_flight=3))
+        self.assertEqual(sorted(results), list(range(1, 21)))
+        results = list(batch.run_tasks(abs, range(-20, 0), workers=3, max_in_flight=4, backend='thread'))
+        self.assertEqual(sorted(results), list(range(1, 21)))
+        with self.assertRaises(ValueError):
+            list(batch.run_tasks(abs, range(3), backend='fiber'))
+
+    def test_thread_backend_round_trip(self):
+        records = [{"id": f"m{i}", "message": f"Message {i}"} for i in range(6)]
+        source = self._write_jsonl("in.jsonl", records)
+        output_dir = self._path("out")
+        summary = batch.run_encode(source, output_dir, cell_pixel_size=4, workers=3, backend='thread',
+                                   progress=self._progress('encode'))
+        self.assertEqual((summary['processed'], summary['errors']), (6, 0))
+
+        results_path = self._path("results.jsonl")
+        summary = batch.run_decode(output_dir, results_path, workers=3, backend='thread', progress=self._progress('decode'))
+        self.assertEqual((summary['processed'], summary['errors']), (6, 0))
+        messages = {r['source']: r['message'] for r in self._read_jsonl(results_path)}
+        self.assertEqual(messages, {f"m{i}.png": f"Message {i}" for i in range(6)})
+
+if __name__ == '__main__':
+    unittest.main()
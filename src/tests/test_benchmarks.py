@@ -0,0 +1,81 @@
+import unittest
+import json
+import shutil
+import tempfile
+
+import src.benchmarks.run_benchmarks as rb
+
+class TestBenchmarks(unittest.TestCase):
+
+    def test_make_message_is_deterministic(self):
+        self.assertEqual(rb.make_message(32, 20), rb.make_message(32, 20))
+        self.assertEqual(len(rb.make_message(32, 20)), 32)
+        max_message = rb.make_message('max', 20)
+        target_bits, _ = rb.en.compute_payload_capacity(20)
+        self.assertEqual(len(max_message), target_bits // 8)
+
+    def test_quick_run_covers_all_stages(self):
+        config = dict(rb.QUICK_CONFIG, repeats=1)
+        work_dir = tempfile.mkdtemp()
+        try:
+            results = rb.run_benchmarks(config, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        self.assertEqual(
+            {r['name'] for r in results},
+            {'encode', 'mask', 'render', 'load', 'calibrate', 'sample', 'parse', 'decode'}
+        )
+        self.assertEqual(
+            {r['params'].get('input') for r in results if r['name'] == 'decode'}, {'png', 'jpeg'}
+        )
+        self.assertTrue(all(r['median_ms'] >= 0 for r in results))
+        self.assertEqual(len({r['key'] for r in results}), len(results))
+
+    def test_compare_with_baseline(self):
+        results = [
+            {'name': 'encode', 'key': 'encode[ecc=20]', 'min_ms': 1.2},
+            {'name': 'decode', 'key': 'decode[ecc=20]', 'min_ms': 3.0},
+            {'name': 'render', 'key': 'render[new]', 'min_ms': 9.0}, # Absent de la référence
+        ]
+        baseline = {
+            'results': [
+                {'key': 'encode[ecc=20]', 'min_ms': 1.0},
+                {'key': 'decode[ecc=20]', 'min_ms': 2.0},
+            ],
+            'thresholds': {'decode': 0.6},
+        }
+        self.assertEqual(rb.compare_with_baseline(results, baseline, 0.25), [])
+        regressions = rb.compare_with_baseline(results, baseline, 0.1)
+        self.assertEqual([r['key'] for r in regressions], ['encode[ecc=20]'])
+        self.assertAlmostEqual(regressions[0]['ratio'], 1.2)
+
+        # Médiane ralentie par quelques mesures lentes, minimum inchangé: pas de régression
+        noisy = [{'name': 'encode', 'key': 'encode[ecc=20]', 'min_ms': 1.0, 'median_ms': 1.9}]
+        self.assertEqual(rb.compare_with_baseline(noisy, baseline, 0.1), [])
+        self.assertGreater(rb.QUICK_THRESHOLD, rb.DEFAULT_THRESHOLD)
+
+    def test_noise_floor_and_reference_cell_size(self):
+        # Étape de quelques microsecondes: x3, mais sous le plancher de bruit absolu
+        results = [{'name': 'parse', 'key': 'parse[ecc=20]', 'min_ms': 0.03}]
+        baseline = {'results': [{'key': 'parse[ecc=20]', 'min_ms': 0.01}]}
+        self.assertEqual(rb.compare_with_baseline(results, baseline, 0.25), [])
+        self.assertEqual(len(rb.compare_with_baseline(results, baseline, 0.25, noise_floor_ms=0.0)), 1)
+        self.assertEqual(rb.compare_with_baseline(results, dict(baseline, noise_floor_ms=0.0), 0.25)[0]['key'],
+                         'parse[ecc=20]')
+
+        self.assertGreater(rb.time_call(lambda: None, 1)['loops'], 1) # Appel court: répété en boucle
+        work_dir = tempfile.mkdtemp()
+        try:
+            quick = rb.run_benchmarks(dict(rb.QUICK_CONFIG, repeats=1, cell_pixel_sizes=[2]), work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        decode = [r for r in quick if r['name'] == 'decode']
+        self.assertEqual([r['params']['cell_px'] for r in decode], [rb.REFERENCE_CELL_PIXEL_SIZE] * 2)
+        baseline_keys = set()
+        with open(rb.DEFAULT_BASELINE_PATH, encoding='utf-8') as f:
+            baseline_keys = {entry['key'] for entry in json.load(f)['results']}
+        for result in decode: # Les mesures rapides ont une référence
+            self.assertIn(result['key'], baseline_keys)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import unittest
+import io
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+import src.core.protocol_config as pc
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.batch as batch
+import src.core.bulk_output as bulk
+
+class TestBulkOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cell_px = 3
+        self.matrices = [en.encode_message_to_matrix(f"Tile {i}", pc.DEFAULT_ECC_LEVEL_PERCENT) for i in range(3)]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _path(self, name):
+        return os.path.join(self.temp_dir, name)
+
+    def test_render_tile_bytes_matches_pil_rendering(self):
+        tile = bulk.render_tile_bytes(self.matrices[0], self.cell_px)
+        self.assertEqual(tile, iu.render_protocol_image(self.matrices[0], self.cell_px).tobytes())
+
+    def test_raw_tiles_round_trip(self):
+        path = self._path("batch.tiles")
+        with bulk.BulkTileWriter(path, 4, self.cell_px) as writer:
+            for i, matrix in enumerate(self.matrices):
+                writer.write(i, matrix)
+            with self.assertRaises(IndexError):
+                writer.write(4, self.matrices[0])
+        with bulk.TileFile(path) as tiles:
+            self.assertEqual((len(tiles), tiles.format, tiles.cell_pixel_size), (4, 'raw', self.cell_px))
+            self.assertEqual([tiles.is_written(i) for i in range(4)], [True, True, True, False])
+            self.assertIsInstance(tiles.tile(1), memoryview)
+            self.assertEqual(bytes(tiles.tile(1)), bulk.render_tile_bytes(self.matrices[1], self.cell_px))
+            self.assertEqual(de.decode_image_to_message(tiles.tile_image(2)), "Tile 2")
+            array = tiles.as_numpy()
+            self.assertEqual(array.shape, (4, pc.MATRIX_DIM * self.cell_px, pc.MATRIX_DIM * self.cell_px, 3))
+            self.assertFalse(array[3].any())
+            del array
+
+    def test_npy_file_is_readable_by_numpy(self):
+        path = self._path("batch.npy")
+        with bulk.BulkTileWriter(path, len(self.matrices), self.cell_px) as writer:
+            for i, matrix in enumerate(self.matrices):
+                writer.write(i, matrix)
+        array = np.load(path, mmap_mode='r')
+        self.assertEqual(array.shape, (3, pc.MATRIX_DIM * self.cell_px, pc.MATRIX_DIM * self.cell_px, 3))
+        self.assertEqual(array.dtype, np.uint8)
+        self.assertEqual(array[0].tobytes(), bulk.render_tile_bytes(self.matrices[0], self.cell_px))
+        del array
+        with bulk.TileFile(path) as tiles:
+            self.assertEqual(de.decode_image_to_message(tiles.tile_image(1)), "Tile 1")
+
+    def test_reuse_existing_keeps_written_tiles(self):
+        path = self._path("batch.tiles")
+        with bulk.BulkTileWriter(path, 2, self.cell_px) as writer:
+            writer.write(0, self.matrices[0])
+        with bulk.BulkTileWriter(path, 2, self.cell_px, reuse_existing=True) as writer:
+            writer.write(1, self.matrices[1])
+        with bulk.TileFile(path) as tiles:
+            self.assertTrue(tiles.is_written(0) and tiles.is_written(1))
+            self.assertEqual(bytes(tiles.tile(0)), bulk.render_tile_bytes(self.matrices[0], self.cell_px))
+        with self.assertRaises(ValueError): # Géométrie différente
+            bulk.BulkTileWriter(self._path("batch.tiles"), 2, self.cell_px + 1, reuse_existing=True).close()
+        with self.assertRaises(ValueError):
+            bulk._read_layout(b"not a tile file")
+
+    def test_run_encode_bulk_with_resume(self):
+        source = self._path("in.jsonl")
+        records = [{"id": "a", "message": "Hello"}, {"id": "b", "message": "x" * 5000}, {"id": "c", "message": "Wörld"}]
+        with open(source, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        output = self._path("out.tiles")
+        progress_stream = io.StringIO()
+        summary = batch.run_encode(source, output, cell_pixel_size=self.cell_px,
+                                   progress=batch.ProgressReporter('encode', stream=progress_stream, interval_s=None))
+        self.assertEqual((summary['processed'], summary['errors']), (3, 1))
+        with open(output + '.manifest.jsonl', encoding='utf-8') as f:
+            manifest = [json.loads(line) for line in f]
+        self.assertEqual(manifest, [{'id': 'a', 'index': 0}, {'id': 'c', 'index': 2}])
+        with bulk.TileFile(output) as tiles:
+            self.assertEqual([tiles.is_written(i) for i in range(3)], [True, False, True])
+            self.assertEqual(de.decode_image_to_message(tiles.tile_image(2)), "Wörld")
+
+        summary = batch.run_encode(source, output, cell_pixel_size=self.cell_px,
+                                   progress=batch.ProgressReporter('encode', stream=progress_stream, interval_s=None))
+        self.assertEqual((summary['processed'], summary['skipped']), (1, 2))
+        with bulk.TileFile(output) as tiles:
+            self.assertEqual(de.decode_image_to_message(tiles.tile_image(0)), "Hello")
+        with self.assertRaises(ValueError):
+            batch.run_encode('-', output)
+
+if __name__ == '__main__':
+    unittest.main()
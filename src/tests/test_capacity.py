@@ -0,0 +1,59 @@
+import unittest
+
+import src.core.protocol_config as pc
+import src.core.encoder as en
+import src.core.data_processing as dp
+import src.core.decoder as de
+import src.core.capacity as capacity
+
+class TestCapacity(unittest.TestCase):
+
+    def test_tables_match_encoder(self):
+        tables = capacity.capacity_tables()
+        self.assertEqual(tables[pc.PROTOCOL_VERSION_BASE][20], en.compute_payload_capacity(20))
+        self.assertEqual(tables[pc.PROTOCOL_VERSION_EXTENDED][20], en.compute_payload_capacity(20, extended=True))
+        self.assertEqual(len(tables[pc.PROTOCOL_VERSION_BASE]), 101)
+
+    def test_plan_matches_encoded_symbol(self):
+        base_bytes = capacity.capacity_tables()[pc.PROTOCOL_VERSION_BASE][20][0] // 8
+        extended_bytes = capacity.capacity_tables()[pc.PROTOCOL_VERSION_EXTENDED][20][0] // 8
+        for length in (0, extended_bytes, extended_bytes + 1, base_bytes, base_bytes + 1):
+            with self.subTest(length=length):
+                message = "x" * length
+                plan = capacity.plan_message(message, 20)
+                self.assertEqual(plan['message_bits'], length * 8)
+                if not plan['fits']:
+                    self.assertLess(plan['headroom_bits'], 0)
+                    with self.assertRaises(ValueError):
+                        en.encode_message_to_matrix(message, 20)
+                    continue
+                self.assertGreaterEqual(plan['headroom_bits'], 0)
+                matrix = en.encode_message_to_matrix(message, 20)
+                metadata = dp.parse_metadata_bits(de.extract_metadata_stream(matrix))
+                self.assertEqual(metadata['protocol_version'], plan['version'])
+                self.assertEqual(de.validate_metadata(metadata)['num_ecc_bits'], plan['ecc_bits'])
+                self.assertEqual(plan['capacity_bits'] - plan['message_bits'], plan['headroom_bits'])
+
+    def test_utf8_length_and_masking(self):
+        self.assertEqual(capacity.message_length("é"), 2)
+        self.assertEqual(capacity.message_length(b"\x00\x01"), 2)
+        self.assertEqual(capacity.plan_message("é", 20), capacity.plan_length(2, 20))
+        original = pc.MASKING_CONFIG['enabled']
+        pc.MASKING_CONFIG['enabled'] = False
+        try:
+            self.assertEqual(capacity.plan_message("short", 20)['version'], pc.PROTOCOL_VERSION_BASE)
+        finally:
+            pc.MASKING_CONFIG['enabled'] = original
+        with self.assertRaises(ValueError):
+            capacity.plan_message("x", 101)
+
+    def test_structured_append_plan(self):
+        message = "Long message " * 40
+        plan = capacity.plan_message(message, 20, structured_append=True)
+        self.assertTrue(plan['fits'])
+        self.assertFalse(capacity.message_fits(message, 20))
+        self.assertEqual(plan['symbols'], len(en.encode_message_to_matrices(message, 20)))
+        self.assertFalse(capacity.plan_length(10**6, 20, structured_append=True)['fits'])
+
+if __name__ == '__main__':
+    unittest.main()
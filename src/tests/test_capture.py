@@ -0,0 +1,90 @@
+import unittest
+import io
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.batch as batch
+import src.core.capture as capture
+
+class TestCapture(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.message = "Large capture"
+        cls.cell_px = 40
+        cls.offset = (613, 389)
+        matrix = en.encode_message_to_matrix(cls.message, pc.DEFAULT_ECC_LEVEL_PERCENT)
+        cls.symbol = iu.render_protocol_image(matrix, cls.cell_px)
+        cls.capture = backends.pil_image().new("RGB", (3000, 2200), (236, 234, 228)) # Fond clair (papier)
+        cls.capture.paste(cls.symbol, cls.offset)
+
+    def _encoded(self, image_format):
+        buffer = io.BytesIO()
+        self.capture.save(buffer, image_format, quality=92)
+        return buffer.getvalue()
+
+    def test_locate_symbol(self):
+        preview = self.capture.reduce(4)
+        left, top, right, bottom = capture.locate_symbol(preview)
+        side = pc.MATRIX_DIM * self.cell_px / 4
+        for found, expected in zip((left, top, right, bottom),
+                                   (self.offset[0] / 4, self.offset[1] / 4,
+                                    self.offset[0] / 4 + side, self.offset[1] / 4 + side)):
+            self.assertAlmostEqual(found, expected, delta=1.5)
+        blank = backends.pil_image().new("RGB", (400, 400), pc.WHITE)
+        self.assertIsNone(capture.locate_symbol(blank))
+
+    def test_large_jpeg_is_decoded_from_a_small_working_image(self):
+        data = self._encoded("JPEG")
+        working = capture.load_working_image(io.BytesIO(data))
+        working_side = pc.MATRIX_DIM * pc.CAPTURE_CONFIG['working_cell_px']
+        self.assertEqual(working.size, (working_side, working_side))
+        self.assertEqual(working.mode, "RGB")
+        self.assertEqual(de.decode_image_to_message(io.BytesIO(data)), self.message)
+        record = batch.decode_job({'source': 'capture.jpg', 'data': data})
+        self.assertTrue(record['ok'], record.get('error'))
+        self.assertEqual(record['message'], self.message)
+
+    def test_large_png_and_loaded_image(self):
+        self.assertEqual(de.decode_image_to_message(io.BytesIO(self._encoded("PNG"))), self.message)
+        self.assertEqual(de.decode_image_to_message(self.capture), self.message)
+
+    def test_rotated_and_mirrored_captures(self):
+        transpose = backends.pil_image().Transpose
+        for operations in ([transpose.ROTATE_180], [transpose.ROTATE_90], [transpose.FLIP_LEFT_RIGHT, transpose.ROTATE_270]):
+            symbol = self.symbol
+            for operation in operations:
+                symbol = symbol.transpose(operation)
+            rotated = backends.pil_image().new("RGB", self.capture.size, (236, 234, 228))
+            rotated.paste(symbol, self.offset)
+            with self.subTest(operations=operations):
+                left, top, _, _ = capture.locate_symbol(rotated.reduce(4))
+                self.assertAlmostEqual(left, self.offset[0] / 4, delta=1.5)
+                self.assertAlmostEqual(top, self.offset[1] / 4, delta=1.5)
+                buffer = io.BytesIO()
+                rotated.save(buffer, "JPEG", quality=92)
+                self.assertEqual(de.decode_image_to_message(io.BytesIO(buffer.getvalue())), self.message)
+
+    def test_data_run_mimicking_finder_line(self):
+        # Clé choisie pour que, tourné d'un demi-tour, le bord haut (sans FP) porte sept cellules sombres
+        # en tête de ligne, comme un cœur de FP
+        matrix = en.encode_message_to_matrix(self.message, pc.DEFAULT_ECC_LEVEL_PERCENT, '1001110101111011')
+        symbol = iu.render_protocol_image(matrix, self.cell_px).transpose(backends.pil_image().Transpose.ROTATE_180)
+        rotated = backends.pil_image().new("RGB", self.capture.size, (236, 234, 228))
+        rotated.paste(symbol, self.offset)
+        left, top, right, bottom = capture.locate_symbol(rotated.reduce(4))
+        self.assertAlmostEqual(left, self.offset[0] / 4, delta=1.5)
+        self.assertAlmostEqual(top, self.offset[1] / 4, delta=1.5)
+
+    def test_small_images_are_used_as_is(self):
+        small = iu.render_protocol_image(en.encode_message_to_matrix("small", pc.DEFAULT_ECC_LEVEL_PERCENT), 4)
+        self.assertIs(capture.load_working_image(small), small)
+        # Grande image sans symbole localisable: l'image entière est réduite
+        blank = backends.pil_image().new("L", (1200, 1000), 255)
+        self.assertEqual(capture.load_working_image(blank).mode, "RGB")
+
+if __name__ == '__main__':
+    unittest.main()
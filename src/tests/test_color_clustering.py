@@ -0,0 +1,77 @@
+import unittest
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.instrumentation as instr
+import src.core.color_clustering as cc
+
+def uneven_lighting(image, strength, seed):
+    """Éclairage qui décroît depuis le coin bas-gauche (patchs CCP) vers le coin haut-droit, dominante jaune, bruit."""
+    np = backends.numpy()
+    rng = np.random.default_rng(seed)
+    pixels = np.asarray(image).astype(np.float64)
+    height, width, _ = pixels.shape
+    y, x = np.mgrid[0:height, 0:width]
+    gain = 1 - strength * ((height - 1 - y) / height + x / width) / 2
+    pixels = pixels * gain[..., None] * np.array([1.0, 0.92, 0.8]) + 15 + rng.normal(0, 6, pixels.shape)
+    return backends.pil_image().fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+class TestColorClustering(unittest.TestCase):
+
+    def setUp(self):
+        self.cell_px = 10
+        self.messages = [f"Uneven light {i}" for i in range(6)]
+        original_mode = pc.CLASSIFICATION_CONFIG['mode']
+        self.addCleanup(pc.CLASSIFICATION_CONFIG.__setitem__, 'mode', original_mode)
+        # Sans compensation de l'éclairage (voir test_illumination): seul l'effet du clustering est mesuré
+        original_illumination = pc.ILLUMINATION_CONFIG['enabled']
+        pc.ILLUMINATION_CONFIG['enabled'] = False
+        self.addCleanup(pc.ILLUMINATION_CONFIG.__setitem__, 'enabled', original_illumination)
+
+    def _capture(self, message, strength, seed):
+        matrix = en.encode_message_to_matrix(message, pc.DEFAULT_ECC_LEVEL_PERCENT)
+        return uneven_lighting(iu.render_protocol_image(matrix, self.cell_px), strength, seed)
+
+    def _decoded_count(self, strength):
+        decoded = 0
+        for seed, message in enumerate(self.messages):
+            try:
+                decoded += de.decode_image_to_message(self._capture(message, strength, seed)) == message
+            except ValueError:
+                pass
+        return decoded
+
+    def test_clean_image_keeps_palette(self):
+        image = iu.render_protocol_image(en.encode_message_to_matrix("Clean", pc.DEFAULT_ECC_LEVEL_PERCENT), self.cell_px)
+        calibration_map = de.perform_color_calibration(image, self.cell_px)
+        cell_colors = de.sample_cell_colors(image, self.cell_px)
+        self.assertEqual(cc.refine_calibration(cell_colors, calibration_map), pc.BITS_TO_COLOR_MAP)
+
+    def test_refined_colors_follow_the_whole_symbol(self):
+        image = self._capture("Refine", 0.65, 0)
+        calibration_map = de.perform_color_calibration(image, self.cell_px)
+        refined = cc.refine_calibration(de.sample_cell_colors(image, self.cell_px), calibration_map)
+        self.assertEqual(sorted(refined), sorted(calibration_map))
+        # Les cellules éloignées des CCP sont plus sombres: le blanc de référence s'assombrit
+        self.assertLess(sum(refined['00']), sum(calibration_map['00']))
+
+    def test_adaptive_mode_decodes_poorly_lit_captures(self):
+        pc.CLASSIFICATION_CONFIG['mode'] = 'calibration'
+        self.assertLess(self._decoded_count(0.65), len(self.messages) // 2)
+        pc.CLASSIFICATION_CONFIG['mode'] = 'adaptive'
+        self.assertEqual(self._decoded_count(0.65), len(self.messages))
+
+    def test_cluster_stage_and_unknown_mode(self):
+        pc.CLASSIFICATION_CONFIG['mode'] = 'adaptive'
+        stats = instr.DecodeStats()
+        self.assertEqual(de.decode_image_to_message(self._capture("Stage", 0.3, 1), stats), "Stage")
+        self.assertIn('cluster', stats.stages)
+        pc.CLASSIFICATION_CONFIG['mode'] = 'gmm'
+        with self.assertRaises(ValueError):
+            de.peek_metadata(self._capture("Stage", 0.3, 1))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -35,6 +35,16 @@ class TestDataProcessing(unittest.TestCase):
         with self.assertRaises(ValueError):
             dp.generate_xor_key(-5)
 
+    def test_derive_xor_key(self):
+        key = dp.derive_xor_key(b"seed", 16)
+        self.assertEqual(len(key), 16)
+        self.assertTrue(all(c in '01' for c in key))
+        self.assertEqual(key, dp.derive_xor_key(b"seed", 16))
+        self.assertNotEqual(key, dp.derive_xor_key(b"other seed", 16))
+        self.assertEqual(len(dp.derive_xor_key(b"seed", 300)), 300) # Plusieurs blocs SHA-256
+        with self.assertRaises(ValueError):
+            dp.derive_xor_key(b"seed", 0)
+
     def test_apply_xor_cipher(self):
         data = "10101010"
         key = "01010101"
@@ -359,6 +369,38 @@ class TestDecoderDataProcessing(unittest.TestCase):
         # Test with only an incomplete byte
         self.assertEqual(dp.padded_bits_to_text("10101"), "")
 
+    def test_resolve_erasures_simple_ecc(self):
+        data = "0100100001101001" # "Hi"
+        payload = data + dp.calculate_simple_ecc(data, 8)
+        # Cellule corrompue à l'offset 2 (lue '11'), le second choix étant la valeur d'origine
+        corrupted = payload[:2] + "11" + payload[4:]
+        self.assertFalse(dp.verify_simple_ecc(corrupted[:16], corrupted[16:]))
+        self.assertEqual(dp.resolve_erasures_simple_ecc(corrupted, 16, [(2, payload[2:4]), (8, "11")]), payload)
+
+        # Effacement dans la zone ECC
+        corrupted_ecc = payload[:18] + ("1" if payload[18] == "0" else "0") + payload[19:]
+        self.assertEqual(dp.resolve_erasures_simple_ecc(corrupted_ecc, 16, [(18, payload[18:20])]), payload)
+
+        # Aucune alternative ne corrige l'erreur, ou pas d'ECC
+        self.assertIsNone(dp.resolve_erasures_simple_ecc(corrupted, 16, [(8, "11")]))
+        self.assertIsNone(dp.resolve_erasures_simple_ecc(data, 16, [(2, "11")]))
+
+    def test_extended_metadata_round_trip(self):
+        stream = dp.format_extended_metadata_bits(structured_append=1)
+        self.assertEqual(len(stream), dp.extended_metadata_length())
+        self.assertEqual(dp.parse_extended_metadata_bits(stream)['structured_append'], 1)
+        self.assertEqual(dp.parse_extended_metadata_bits(dp.format_extended_metadata_bits())['structured_append'], 0)
+
+        with self.assertRaises(ValueError):
+            dp.format_extended_metadata_bits(unknown_field=1)
+        with self.assertRaises(ValueError):
+            dp.format_extended_metadata_bits(structured_append=2) # Ne tient pas sur 1 bit
+
+        info_len = pc.EXTENDED_METADATA_CONFIG['info_bits']
+        corrupted = stream[:info_len] + ('1' if stream[info_len] == '0' else '0') + stream[info_len + 1:]
+        with self.assertRaisesRegex(ValueError, "Extended metadata protection check failed"):
+            dp.parse_extended_metadata_bits(corrupted)
+
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
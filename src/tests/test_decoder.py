@@ -0,0 +1,190 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+import numpy as np
+from PIL import Image, ImageDraw
+
+import src.core.protocol_config as pc
+import src.core.matrix_layout as ml
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.data_processing as dp
+import src.core.instrumentation as instr
+
+class TestDecoder(unittest.TestCase):
+
+    def setUp(self):
+        self.cell_px = 6
+        self.message = "Soft decision"
+        self.bit_matrix = en.encode_message_to_matrix(self.message, pc.DEFAULT_ECC_LEVEL_PERCENT)
+        temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
+        self.image_path = temp_file.name
+        temp_file.close()
+        iu.create_protocol_image(self.bit_matrix, self.cell_px, self.image_path)
+
+    def tearDown(self):
+        if os.path.exists(self.image_path):
+            os.remove(self.image_path)
+
+    def _paint_cell(self, row, col, color):
+        with Image.open(self.image_path) as img:
+            img = img.convert("RGB")
+            draw = ImageDraw.Draw(img)
+            x0, y0 = col * self.cell_px, row * self.cell_px
+            draw.rectangle([x0, y0, x0 + self.cell_px - 1, y0 + self.cell_px - 1], fill=color)
+            img.save(self.image_path)
+
+    def _first_payload_cell_with_bits(self, bits):
+        # Hors bloc de métadonnées étendues (symbole masqué, version 2): cellule de données/ECC
+        header_cells = dp.extended_metadata_length() // pc.BITS_PER_CELL
+        for r, c in ml.get_data_ecc_fill_order()[header_cells:]:
+            if self.bit_matrix[r][c] == bits:
+                return r, c
+        self.fail(f"No payload cell with bits {bits}.")
+
+    def test_decode_image_to_message_round_trip(self):
+        self.assertEqual(de.decode_image_to_message(self.image_path), self.message)
+
+    def test_decode_image_with_confidence_clean(self):
+        result = de.decode_image_with_confidence(self.image_path)
+        self.assertEqual(result['message'], self.message)
+        self.assertEqual(result['erasures'], [])
+        self.assertEqual(result['corrected_erasures'], 0)
+        self.assertEqual(len(result['confidence_map']), pc.MATRIX_DIM)
+        for r, c in ml.get_data_ecc_fill_order():
+            self.assertEqual(result['confidence_map'][r][c], 1.0)
+        self.assertIsNone(result['confidence_map'][3][3]) # Coeur du FP_TL: jamais échantillonné
+
+    def test_peek_metadata(self):
+        header = de.peek_metadata(self.image_path)
+        self.assertEqual(header['protocol_version'], pc.PROTOCOL_VERSION_EXTENDED) # Message court: symbole masqué
+        target_bits, num_ecc_bits = en.compute_payload_capacity(pc.DEFAULT_ECC_LEVEL_PERCENT, extended=True)
+        self.assertEqual(header['message_encrypted_len'], target_bits)
+        self.assertEqual(header['num_ecc_bits'], num_ecc_bits)
+        self.assertNotIn('xor_key', header)
+
+        with Image.open(self.image_path) as img:
+            self.assertEqual(de.peek_metadata(img), header) # Image déjà chargée
+
+    def test_peek_metadata_reads_only_header_cells(self):
+        sampled, sampled_colors = [], []
+        original_sample_cells = de.sample_cells
+        def recording_sample_cells(image, cell_px_size, calibration_map, cells, cell_colors=None):
+            sampled.extend(cells)
+            return original_sample_cells(image, cell_px_size, calibration_map, cells, cell_colors)
+        original_sample_cell_colors = de.sample_cell_colors
+        def recording_sample_cell_colors(*args, **kwargs):
+            colors = original_sample_cell_colors(*args, **kwargs)
+            sampled_colors.append(colors)
+            return colors
+        with Image.open(self.image_path) as img:
+            tinted = img.convert("RGB").point(lambda value: max(value - 3, 0)) # Hors palette: chemin calibré
+        with mock.patch.object(de, 'sample_cells', recording_sample_cells), \
+             mock.patch.object(de, 'sample_cell_colors', recording_sample_cell_colors):
+            self.assertEqual(de.peek_metadata(tinted), de.peek_metadata(self.image_path))
+        self.assertEqual(sorted(sampled), sorted(de.get_metadata_cells()))
+        # Pixels échantillonnés (symbole non tourné: cellules de l'image = cellules du symbole): positions possibles
+        # des cellules fixes pour l'orientation, puis cellules fixes et métadonnées; aucune cellule du payload
+        orientation_colors, header_colors = sampled_colors
+        self.assertTrue((~np.isnan(orientation_colors[:, :, 0]) == de.orient.fixed_cells_mask()).all())
+        payload_rows, payload_cols = map(list, zip(*ml.get_data_ecc_fill_order()))
+        self.assertTrue(np.isnan(header_colors[payload_rows, payload_cols]).all())
+        for r, c in de.get_metadata_cells():
+            self.assertFalse(np.isnan(header_colors[r, c]).any())
+
+        sampled = []
+        original_sample_exact_cells = de.sample_exact_cells
+        def recording_sample_exact_cells(cell_bits, cells):
+            sampled.extend(cells)
+            return original_sample_exact_cells(cell_bits, cells)
+        with mock.patch.object(de, 'sample_exact_cells', recording_sample_exact_cells):
+            de.peek_metadata(self.image_path)
+        self.assertEqual(sorted(sampled), sorted(de.get_metadata_cells()))
+
+    def test_exact_palette_image_skips_calibration(self):
+        with Image.open(self.image_path) as img:
+            image = img.convert("RGB")
+        self.assertEqual(de.exact_palette_cells(image), self.bit_matrix)
+        self.assertEqual(de.exact_palette_cells(image.convert("P")), self.bit_matrix) # Image en mode palette
+        with mock.patch.object(de, 'perform_color_calibration') as calibration, \
+             mock.patch.object(de.iu, 'rgb_to_bits_with_confidence') as classify:
+            self.assertEqual(de.decode_image_to_message(image.convert("P")), self.message)
+            calibration.assert_not_called()
+            classify.assert_not_called()
+
+    def test_exact_palette_any_orientation(self):
+        with Image.open(self.image_path) as img:
+            image = img.convert("RGB")
+        for transpose in (Image.Transpose.ROTATE_90, Image.Transpose.ROTATE_180, Image.Transpose.ROTATE_270,
+                          Image.Transpose.FLIP_LEFT_RIGHT, Image.Transpose.TRANSVERSE):
+            with self.subTest(transpose.name):
+                oriented = image.transpose(transpose)
+                self.assertEqual(de.exact_palette_cells(oriented), self.bit_matrix) # Vue de référence
+                stats = instr.DecodeStats()
+                self.assertEqual(de.decode_image_to_message(oriented, stats=stats), self.message)
+                self.assertEqual(stats.counters['exact_palette'], 1)
+                self.assertNotIn('calibrate', stats.stages)
+
+    def test_exact_palette_falls_back_to_calibration(self):
+        with Image.open(self.image_path) as img:
+            image = img.convert("RGB")
+        tinted = image.point(lambda value: max(value - 3, 0)) # Couleurs hors palette
+        cropped = image.crop((0, 0, image.width - 1, image.height - 1))
+        for name, degraded in (('tinted', tinted), ('cropped', cropped)):
+            with self.subTest(name):
+                self.assertIsNone(de.exact_palette_cells(degraded))
+        self._paint_cell(3, 3, pc.WHITE) # Coeur du FP_TL effacé: couleurs exactes mais motif altéré
+        with Image.open(self.image_path) as img:
+            self.assertIsNone(de.exact_palette_cells(img.convert("RGB")))
+        stats = instr.DecodeStats()
+        self.assertEqual(de.decode_image_to_message(tinted, stats=stats), self.message)
+        self.assertIn('calibrate', stats.stages)
+        self.assertNotIn('exact_palette', stats.counters)
+
+    def test_invalid_metadata_fails_before_payload(self):
+        # Métadonnées effacées (tout blanc): la protection passe mais la version 0 est refusée
+        for r, c in de.get_metadata_cells():
+            self._paint_cell(r, c, pc.WHITE)
+        # Aucune cellule du payload n'est lue (classée), ni par la lecture directe ni par la lecture calibrée
+        read = []
+        original_sample_cells, original_sample_exact_cells = de.sample_cells, de.sample_exact_cells
+        def recording_sample_cells(image, cell_px_size, calibration_map, cells, cell_colors=None):
+            read.extend(cells)
+            return original_sample_cells(image, cell_px_size, calibration_map, cells, cell_colors)
+        def recording_sample_exact_cells(cell_bits, cells):
+            read.extend(cells)
+            return original_sample_exact_cells(cell_bits, cells)
+        payload_cells = set(ml.get_data_ecc_fill_order())
+        for exact_palette in (True, False):
+            with self.subTest(exact_palette=exact_palette):
+                read.clear()
+                with mock.patch.object(de, 'sample_cells', recording_sample_cells), \
+                     mock.patch.object(de, 'sample_exact_cells', recording_sample_exact_cells), \
+                     mock.patch.dict(pc.CLASSIFICATION_CONFIG, {'exact_palette': exact_palette}):
+                    with self.assertRaisesRegex(ValueError, "Unsupported protocol version 0"):
+                        de.decode_image_to_message(self.image_path)
+                self.assertEqual(sorted(read), sorted(de.get_metadata_cells()))
+                self.assertFalse(payload_cells & set(read))
+
+    def test_low_confidence_cell_is_corrected_as_erasure(self):
+        # Une cellule blanche teintée de bleu est lue bleue, mais de peu: erreur peu sûre.
+        row, col = self._first_payload_cell_with_bits(pc.COLOR_TO_BITS_MAP[pc.WHITE])
+        self._paint_cell(row, col, (125, 125, 255))
+
+        result = de.decode_image_with_confidence(self.image_path)
+        self.assertEqual(result['message'], self.message)
+        self.assertIn((row, col), result['erasures'])
+        self.assertEqual(result['corrected_erasures'], 1)
+        self.assertLess(result['confidence_map'][row][col], pc.SOFT_DECODING_CONFIG['erasure_confidence_threshold'])
+
+    def test_confident_error_is_not_corrected(self):
+        # Une erreur franche (blanc -> noir pur) n'est pas un effacement: l'ECC échoue.
+        row, col = self._first_payload_cell_with_bits(pc.COLOR_TO_BITS_MAP[pc.WHITE])
+        self._paint_cell(row, col, pc.BLACK)
+        with self.assertRaisesRegex(ValueError, "ECC verification failed"):
+            de.decode_image_to_message(self.image_path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,9 +7,6 @@ import src.core.data_processing as dp # Ajouté pour utiliser les fonctions de d
 class TestEncoder(unittest.TestCase):
 
     def setUp(self):
-        # Réinitialiser les caches de matrix_layout si nécessaire
-        ml._zone_coords_cache = {}
-        ml._all_defined_zones_cache = None
         self.expected_matrix_dim = pc.MATRIX_DIM
         # S'assurer que la config des métadonnées est celle attendue pour les calculs de taille
         self.assertEqual(pc.METADATA_CONFIG['total_bits'], 72)
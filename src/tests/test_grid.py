@@ -0,0 +1,52 @@
+import unittest
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.instrumentation as instr
+import src.core.grid as gr
+
+class TestGrid(unittest.TestCase):
+
+    def setUp(self):
+        self.message = "Fractional pitch"
+        self.image = iu.render_protocol_image(en.encode_message_to_matrix(self.message, pc.DEFAULT_ECC_LEVEL_PERCENT), 10)
+
+    def test_rendered_grid_is_measured(self):
+        row_centers, col_centers = gr.measure_grid(self.image)
+        for centers in (row_centers, col_centers):
+            self.assertAlmostEqual(gr.grid_pitch(centers), 10, delta=0.01)
+            for c in (0, 17, 34):
+                self.assertAlmostEqual(centers[c], c * 10 + 5, delta=0.1)
+
+    def test_resized_images_decode(self):
+        resampling = backends.pil_image().Resampling
+        for size in ((333, 333), (401, 401), (347, 361), (180, 180)):
+            for method in (resampling.NEAREST, resampling.BILINEAR, resampling.LANCZOS):
+                with self.subTest(size=size, method=method):
+                    resized = self.image.resize(size, method)
+                    row_centers, col_centers = gr.measure_grid(resized)
+                    self.assertAlmostEqual(gr.grid_pitch(col_centers), size[0] / pc.MATRIX_DIM, delta=0.05)
+                    self.assertAlmostEqual(gr.grid_pitch(row_centers), size[1] / pc.MATRIX_DIM, delta=0.05)
+                    stats = instr.DecodeStats()
+                    self.assertEqual(de.decode_image_to_message(resized, stats), self.message)
+                    self.assertEqual(stats.warnings, [])
+
+    def test_integer_grid_drifts_on_fractional_pitch(self):
+        resized = self.image.resize((333, 333), backends.pil_image().Resampling.BILINEAR) # Pas de 9.51 px
+        measured = de.sample_cell_colors(resized, 9, gr.measure_grid(resized))
+        uniform = de.sample_cell_colors(resized, 9)
+        expected = de.sample_cell_colors(self.image, 10)
+        self.assertLess(abs(measured - expected).max(axis=2).max(), 64)
+        self.assertGreater(abs(uniform - expected).max(axis=2).max(), 200) # Cellules lues chez la voisine
+
+    def test_unreadable_timing_patterns(self):
+        self.assertIsNone(gr.measure_grid(backends.pil_image().new("RGB", (350, 350), pc.WHITE)))
+        row_centers, col_centers = gr.uniform_grid(9)
+        self.assertEqual(list(row_centers[:3]), [4.0, 13.0, 22.0])
+        self.assertEqual(list(col_centers), list(row_centers))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.illumination as illumination
+
+def shaded(image, field, seed):
+    """Applique un champ d'éclairage field(y, x) -> gain, une dominante jaune et du bruit."""
+    np = backends.numpy()
+    rng = np.random.default_rng(seed)
+    pixels = np.asarray(image).astype(np.float64)
+    y, x = np.mgrid[0:pixels.shape[0], 0:pixels.shape[1]] / pixels.shape[0]
+    pixels = pixels * field(y, x)[..., None] * np.array([1.0, 0.92, 0.8]) + 15 + rng.normal(0, 6, pixels.shape)
+    return backends.pil_image().fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+
+FIELDS = {
+    'gradient': lambda y, x: 1 - 0.8 * ((1 - y) + x) / 2,                  # Ombre depuis le coin haut-droit
+    'vignette': lambda y, x: 1 - 0.85 * ((y - 0.5) ** 2 + (x - 0.5) ** 2) * 2, # Bords et coins assombris
+}
+
+class TestIllumination(unittest.TestCase):
+
+    def setUp(self):
+        self.cell_px = 10
+        self.matrix = en.encode_message_to_matrix("Shadow", pc.DEFAULT_ECC_LEVEL_PERCENT)
+        self.image = iu.render_protocol_image(self.matrix, self.cell_px)
+        original_enabled = pc.ILLUMINATION_CONFIG['enabled']
+        self.addCleanup(pc.ILLUMINATION_CONFIG.__setitem__, 'enabled', original_enabled)
+
+    def test_clean_colors_are_unchanged(self):
+        cell_colors = de.sample_cell_colors(self.image, self.cell_px)
+        self.assertTrue((illumination.compensate_cell_colors(cell_colors) == cell_colors).all())
+        self.assertEqual(illumination.reference_calibration(cell_colors), pc.BITS_TO_COLOR_MAP)
+
+    def test_smooth_field_is_removed_from_every_cell(self):
+        np = backends.numpy()
+        cell_colors = de.sample_cell_colors(self.image, self.cell_px)
+        rows, cols = np.mgrid[0:pc.MATRIX_DIM, 0:pc.MATRIX_DIM] / (pc.MATRIX_DIM - 1)
+        gain = (0.9 - 0.5 * cols * rows)[..., None] * np.array([1.0, 0.9, 0.7])
+        offset = (10 + 30 * rows)[..., None]
+        compensated = illumination.compensate_cell_colors(cell_colors * gain + offset)
+        self.assertLessEqual(np.abs(compensated - cell_colors).max(), 1)
+
+    def test_shadowed_captures_decode(self):
+        for name, field in FIELDS.items():
+            with self.subTest(field=name):
+                capture = shaded(self.image, field, seed=len(name))
+                pc.ILLUMINATION_CONFIG['enabled'] = False
+                with self.assertRaises(ValueError):
+                    de.decode_image_to_message(capture)
+                pc.ILLUMINATION_CONFIG['enabled'] = True
+                self.assertEqual(de.decode_image_to_message(capture), "Shadow")
+
+    def test_sample_cell_colors_matches_pixel_sampling(self):
+        cell_colors = de.sample_cell_colors(self.image, self.cell_px)
+        self.assertEqual(cell_colors.shape, (pc.MATRIX_DIM, pc.MATRIX_DIM, 3))
+        self.assertEqual(tuple(cell_colors[3][30]), self.image.getpixel((30 * 10 + 5, 3 * 10 + 5)))
+        with self.assertRaises(ValueError):
+            de.sample_cell_colors(self.image.crop((0, 0, 340, 340)), self.cell_px)
+
+if __name__ == '__main__':
+    unittest.main()
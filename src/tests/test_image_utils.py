@@ -134,6 +134,22 @@ class TestImageUtils(unittest.TestCase):
         # Un cas un peu plus ambigu
         self.assertEqual(iu.rgb_to_bits((100, 100, 100), calibration_map), '01') # Devrait être plus proche de (10,10,10) que de (250,250,250)
 
+    def test_rgb_to_bits_with_confidence(self):
+        calibration_map = {'00': (255, 255, 255), '01': (0, 0, 0), '10': (255, 0, 0)}
+        bits, confidence, alternative = iu.rgb_to_bits_with_confidence((255, 255, 255), calibration_map)
+        self.assertEqual((bits, confidence), ('00', 1.0))
+        self.assertIn(alternative, ('01', '10'))
+
+        # Bleu délavé: presque à égale distance du bleu et du blanc
+        calibration_map['11'] = (0, 0, 255)
+        bits, confidence, alternative = iu.rgb_to_bits_with_confidence((125, 125, 255), calibration_map)
+        self.assertEqual((bits, alternative), ('11', '00'))
+        self.assertLess(confidence, 0.1)
+
+        self.assertEqual(iu.rgb_to_bits_with_confidence((10, 10, 10), {'01': (0, 0, 0)}), ('01', 1.0, None))
+        with self.assertRaises(ValueError):
+            iu.rgb_to_bits_with_confidence((0, 0, 0), {})
+
     def test_rgb_to_bits_empty_map(self):
         with self.assertRaises(ValueError):
             iu.rgb_to_bits((100, 100, 100), {})
@@ -0,0 +1,74 @@
+import unittest
+import os
+import tempfile
+from unittest import mock
+
+import src.core.protocol_config as pc
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.matrix_layout as ml
+import src.core.image_utils as iu
+import src.core.instrumentation as instr
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
+        self.image_path = temp_file.name
+        temp_file.close()
+        bit_matrix = en.encode_message_to_matrix("Stages", pc.DEFAULT_ECC_LEVEL_PERCENT)
+        iu.create_protocol_image(bit_matrix, 4, self.image_path)
+
+    def tearDown(self):
+        if os.path.exists(self.image_path):
+            os.remove(self.image_path)
+
+    def test_decode_stats_records_all_stages(self):
+        stats = instr.DecodeStats()
+        self.assertEqual(de.decode_image_to_message(self.image_path, stats=stats), "Stages")
+        self.assertEqual( # Rendu aux couleurs exactes de la palette: pas de calibration
+            list(stats.stages),
+            ['load', 'estimate', 'metadata', 'sample', 'ecc', 'decrypt', 'text']
+        )
+        self.assertTrue(all(duration >= 0 for duration in stats.stages.values()))
+        self.assertAlmostEqual(stats.total_ms, sum(stats.stages.values()))
+        self.assertEqual(stats.counters['sampled_cells'], 36 + len(ml.get_data_ecc_fill_order()))
+        self.assertEqual(stats.counters['exact_palette'], 1)
+        self.assertEqual(stats.warnings, [])
+
+        stats = instr.DecodeStats()
+        with mock.patch.dict(pc.CLASSIFICATION_CONFIG, {'exact_palette': False}):
+            self.assertEqual(de.decode_image_to_message(self.image_path, stats=stats), "Stages")
+        self.assertEqual(
+            list(stats.stages),
+            ['load', 'estimate', 'calibrate', 'metadata', 'sample', 'ecc', 'decrypt', 'text']
+        )
+        self.assertNotIn('exact_palette', stats.counters)
+
+    def test_stage_observer(self):
+        calls = []
+        observer = lambda name, duration_ms, stats: calls.append((name, stats))
+        instr.add_stage_observer(observer)
+        try:
+            de.decode_image_to_message(self.image_path)
+        finally:
+            instr.remove_stage_observer(observer)
+        self.assertEqual([name for name, _ in calls][0], 'load')
+        self.assertIn('text', [name for name, _ in calls])
+        self.assertTrue(all(stats is None for _, stats in calls))
+
+        calls.clear()
+        de.decode_image_to_message(self.image_path) # Observateur retiré
+        self.assertEqual(calls, [])
+
+    def test_out_of_bounds_warnings_are_aggregated(self):
+        image = iu.load_image_from_file(self.image_path).crop((0, 0, 100, 100)) # 35*4 = 140px attendus
+        stats = instr.DecodeStats()
+        with self.assertLogs(de.logger, level='WARNING') as logs:
+            bit_matrix, _, _ = de.extract_soft_bit_matrix_from_image(image, 4, {'00': pc.WHITE, '01': pc.BLACK}, stats)
+        self.assertEqual(len(logs.records), 2) # Dimensions + un seul message pour toutes les cellules hors limites
+        self.assertEqual(len(stats.warnings), 2)
+        self.assertIsNone(bit_matrix[34][34])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import unittest
+import copy
+import time
+
+import src.core.protocol_config as pc
+import src.core.matrix_layout as ml
+import src.core.data_processing as dp
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.masking as masking
+
+class TestMasking(unittest.TestCase):
+
+    def setUp(self):
+        # Symbole de version 2 non masqué (masque 0): référence pour les masques candidats
+        self.unmasked = en.encode_bytes_to_matrix(b"Masking test", pc.DEFAULT_ECC_LEVEL_PERCENT, '1010011100101101',
+                                                  extended_fields={}, mask_id=0)
+        self.header_cells = ml.get_data_ecc_fill_order()[:dp.extended_metadata_length() // pc.BITS_PER_CELL]
+
+    def test_apply_mask_is_involutive_and_limited_to_data_cells(self):
+        for mask_id in masking.available_mask_ids()[1:]:
+            matrix = copy.deepcopy(self.unmasked)
+            masking.apply_mask(matrix, mask_id)
+            changed = {(r, c) for r in range(pc.MATRIX_DIM) for c in range(pc.MATRIX_DIM)
+                       if matrix[r][c] != self.unmasked[r][c]}
+            self.assertTrue(changed, f"Mask {mask_id} changed no cell.")
+            for r, c in changed:
+                self.assertEqual(ml.get_cell_zone_type(r, c), 'DATA_ECC')
+                self.assertNotIn((r, c), self.header_cells)
+            masking.apply_mask(matrix, mask_id)
+            self.assertEqual(matrix, self.unmasked)
+
+    def test_unmask_payload_cells(self):
+        matrix = copy.deepcopy(self.unmasked)
+        masking.apply_mask(matrix, 5)
+        masked_cells = [matrix[r][c] for r, c in ml.get_data_ecc_fill_order()]
+        expected_cells = [self.unmasked[r][c] for r, c in ml.get_data_ecc_fill_order()]
+        self.assertEqual(masking.unmask_payload_cells(masked_cells, 5), expected_cells)
+        masked_cells[-1] = None # Cellule sans second choix
+        self.assertEqual(masking.unmask_payload_cells(masked_cells, 5), expected_cells[:-1] + [None])
+        with self.assertRaises(ValueError):
+            masking.mask_xor_values(8)
+
+    def test_penalty_terms(self):
+        white = pc.COLOR_TO_BITS_MAP[pc.WHITE]
+        # Motif équilibré sans séries, blocs ni motifs de type FP (la ligne 20 alterne blanc / rouge)
+        matrix = [[format((r + 2 * c) % 4, '02b') for c in range(pc.MATRIX_DIM)] for r in range(pc.MATRIX_DIM)]
+        base_score = masking.penalty_score(masking._value_planes(matrix))
+        for c in range(10, 17): # Une série blanche de 7 cellules
+            matrix[20][c] = white
+        run_score = masking.penalty_score(masking._value_planes(matrix))
+        cfg = pc.MASKING_CONFIG
+        self.assertEqual(run_score - base_score, cfg['run_penalty'] + 7 - cfg['run_length'])
+
+        uniform = [[white] * pc.MATRIX_DIM for _ in range(pc.MATRIX_DIM)]
+        self.assertGreater(masking.penalty_score(masking._value_planes(uniform)), run_score)
+
+    def test_select_mask_minimizes_penalty(self):
+        scores = masking.score_masks(self.unmasked)
+        self.assertEqual(sorted(scores), masking.available_mask_ids())
+        self.assertEqual(scores[masking.select_mask(self.unmasked)], min(scores.values()))
+
+    def test_encoder_records_selected_mask(self):
+        matrix = en.encode_message_to_matrix("Masking test", pc.DEFAULT_ECC_LEVEL_PERCENT, '1010011100101101')
+        header_stream = "".join(matrix[r][c] for r, c in self.header_cells)
+        mask_id = dp.parse_extended_metadata_bits(header_stream)['mask']
+        self.assertEqual(mask_id, masking.select_mask(self.unmasked))
+        masking.apply_mask(matrix, mask_id)
+        for r, c in ml.get_data_ecc_fill_order()[len(self.header_cells):]:
+            self.assertEqual(matrix[r][c], self.unmasked[r][c])
+
+    def test_forced_masks_round_trip(self):
+        for mask_id in masking.available_mask_ids():
+            message = f"Mask {mask_id} é"
+            matrix = en.encode_message_to_matrix(message, pc.DEFAULT_ECC_LEVEL_PERCENT, mask_id=mask_id)
+            self.assertEqual(de.decode_image_to_message(iu.render_protocol_image(matrix, 3)), message)
+
+    def test_message_too_long_for_masked_symbol_is_unmasked(self):
+        base_bits, _ = en.compute_payload_capacity(pc.DEFAULT_ECC_LEVEL_PERCENT)
+        message = "x" * (base_bits // 8) # Tient en version 1 mais pas en version 2
+        matrix = en.encode_message_to_matrix(message, pc.DEFAULT_ECC_LEVEL_PERCENT)
+        header = de.peek_metadata(iu.render_protocol_image(matrix, 3))
+        self.assertEqual(header['protocol_version'], pc.PROTOCOL_VERSION_BASE)
+        with self.assertRaises(ValueError):
+            en.encode_message_to_matrix(message, pc.DEFAULT_ECC_LEVEL_PERCENT, mask_id=3)
+        with self.assertRaisesRegex(ValueError, "extended"):
+            en.encode_bytes_to_matrix(b"x", pc.DEFAULT_ECC_LEVEL_PERCENT, mask_id=3)
+
+    def test_mask_selection_time_budget(self):
+        masking.select_mask(self.unmasked) # Chauffe des caches de disposition
+        repeats = 20
+        start = time.perf_counter()
+        for _ in range(repeats):
+            masking.select_mask(self.unmasked)
+        mean_ms = (time.perf_counter() - start) * 1000 / repeats
+        self.assertLess(mean_ms, 5.0) # Budget large (~0.3 ms attendu) pour les machines chargées
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,9 +5,6 @@ import src.core.matrix_layout as ml
 class TestMatrixLayout(unittest.TestCase):
 
     def setUp(self):
-        # Réinitialiser le cache pour chaque test pour assurer l'indépendance des tests
-        ml._zone_coords_cache = {}
-        ml._all_defined_zones_cache = None
         # S'assurer que MATRIX_DIM est bien 35 comme attendu par les coordonnées codées en dur dans les tests
         self.assertEqual(pc.MATRIX_DIM, 35)
         self.assertEqual(pc.FP_CONFIG['size'], 7)
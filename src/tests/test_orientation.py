@@ -0,0 +1,62 @@
+import unittest
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.grid as gr
+import src.core.orientation as orientation
+
+def oriented(image, image_orientation):
+    """Image du symbole vu dans l'orientation donnée (miroir gauche-droite, puis quarts de tour)."""
+    transpose = backends.pil_image().Transpose
+    quarter_turns, mirrored = image_orientation
+    if mirrored:
+        image = image.transpose(transpose.FLIP_LEFT_RIGHT)
+    for _ in range(quarter_turns):
+        image = image.transpose(transpose.ROTATE_90)
+    return image
+
+class TestOrientation(unittest.TestCase):
+
+    def setUp(self):
+        self.message = "Any way up"
+        self.image = iu.render_protocol_image(en.encode_message_to_matrix(self.message, pc.DEFAULT_ECC_LEVEL_PERCENT), 10)
+
+    def test_views_are_inverse_and_share_memory(self):
+        np = backends.numpy()
+        cells = np.arange(pc.MATRIX_DIM * pc.MATRIX_DIM * 3, dtype=np.float64).reshape(pc.MATRIX_DIM, pc.MATRIX_DIM, 3)
+        for image_orientation in orientation.ORIENTATIONS:
+            image_view = orientation.to_image_view(cells, image_orientation)
+            canonical = orientation.canonical_view(image_view, image_orientation)
+            self.assertTrue(np.shares_memory(canonical, cells))
+            self.assertTrue((canonical == cells).all())
+
+    def test_views_match_image_transforms(self):
+        for image_orientation in orientation.ORIENTATIONS:
+            with self.subTest(orientation=image_orientation):
+                captured = de.sample_cell_colors(oriented(self.image, image_orientation), 10)
+                canonical = orientation.canonical_view(captured, image_orientation)
+                self.assertTrue((canonical == de.sample_cell_colors(self.image, 10)).all())
+                self.assertEqual(orientation.detect_orientation(captured), image_orientation)
+
+    def test_timing_lines(self):
+        self.assertEqual(orientation.timing_lines(orientation.IDENTITY), (6, 6))
+        self.assertEqual(orientation.timing_lines((2, False)), (28, 28))
+        self.assertEqual(orientation.timing_lines((1, True)), (6, 6)) # Symétrie par rapport à la diagonale
+        grid = gr.measure_grid(oriented(self.image, (3, False)), *orientation.timing_lines((3, False)))
+        self.assertAlmostEqual(gr.grid_pitch(grid[1]), 10, delta=0.01)
+
+    def test_all_orientations_decode(self):
+        for image_orientation in orientation.ORIENTATIONS:
+            for size in (350, 333):
+                with self.subTest(orientation=image_orientation, size=size):
+                    captured = oriented(self.image, image_orientation).resize((size, size))
+                    result = de.decode_image_with_confidence(captured)
+                    self.assertEqual(result['message'], self.message)
+                    self.assertIsNone(result['confidence_map'][0][0]) # Carte en orientation de référence (FP)
+                    self.assertIsNotNone(result['confidence_map'][34][34])
+
+if __name__ == '__main__':
+    unittest.main()
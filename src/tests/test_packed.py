@@ -0,0 +1,121 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+
+import src.core.protocol_config as pc
+import src.core.profile as pf
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.packed as packed
+
+class TestPacked(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.matrix = en.encode_message_to_matrix("Packed symbol", pc.DEFAULT_ECC_LEVEL_PERCENT, '1011001110001111')
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_pack_round_trip_and_size(self):
+        data = packed.pack_matrix(self.matrix)
+        self.assertEqual(len(data), packed.packed_size())
+        self.assertEqual(len(data), 12 + 307 + 4) # En-tête, 35 x 35 cellules de 2 bits, CRC
+        self.assertEqual(packed.unpack_matrix(data), self.matrix)
+        header = packed.read_header(data)
+        self.assertEqual((header['matrix_dim'], header['bits_per_cell']), (pc.MATRIX_DIM, pc.BITS_PER_CELL))
+        self.assertEqual(header['profile_fingerprint'], pf.default_profile().fingerprint())
+        self.assertEqual(packed.encode_message_to_packed("Packed symbol", pc.DEFAULT_ECC_LEVEL_PERCENT, '1011001110001111'), data)
+
+    def test_invalid_data_is_rejected(self):
+        data = packed.pack_matrix(self.matrix)
+        corrupted = bytearray(data)
+        corrupted[40] ^= 0x01
+        for bad in (bytes(corrupted), data[:-1], b"PNG" + data[3:]):
+            with self.assertRaises(ValueError):
+                packed.unpack_matrix(bad)
+        with self.assertRaises(ValueError): # Autre profil
+            packed.unpack_matrix(data, pf.compile_profile('larger', MATRIX_DIM=41))
+        with self.assertRaises(ValueError):
+            packed.pack_matrix(en.initialize_bit_matrix()) # Cellules vides
+        with self.assertRaises(ValueError):
+            packed.pack_matrix(self.matrix[:-1])
+
+    def test_render_packed_decodes(self):
+        data = packed.pack_matrix(self.matrix)
+        self.assertEqual(de.decode_image_to_message(io.BytesIO(packed.render_packed(data, 6))), "Packed symbol")
+        self.assertIn(b"<svg", packed.render_packed(data, 6, 'svg'))
+        self.assertEqual(packed.render_packed_image(data, 4).size, (pc.MATRIX_DIM * 4, pc.MATRIX_DIM * 4))
+
+        larger = pf.compile_profile('larger', MATRIX_DIM=41)
+        larger_data = packed.encode_message_to_packed("Profil 41", 20, profile=larger)
+        self.assertEqual(len(larger_data), packed.packed_size(larger))
+        image = packed.render_packed_image(larger_data, 6, larger)
+        self.assertEqual(de.decode_image_to_message(image, profile=larger), "Profil 41")
+
+    def test_container_append_and_random_access(self):
+        path = os.path.join(self.temp_dir, "symbols.sympack")
+        messages = [f"Message {i}" for i in range(5)]
+        matrices = [en.encode_message_to_matrix(message, 20) for message in messages]
+        with packed.PackedSymbolWriter(path) as writer:
+            self.assertEqual([writer.append(matrix) for matrix in matrices[:3]], [0, 1, 2])
+        with packed.PackedSymbolWriter(path) as writer: # Reprise: ajout à la suite
+            self.assertEqual(len(writer), 3)
+            writer.append_packed(packed.pack_matrix(matrices[3]))
+            writer.append(matrices[4])
+
+        with packed.PackedSymbolFile(path) as container:
+            self.assertEqual(len(container), 5)
+            self.assertEqual(container.matrix(3), matrices[3])
+            self.assertEqual(container.matrix(0), matrices[0])
+            self.assertEqual(list(container), matrices)
+            self.assertEqual(de.decode_image_to_message(io.BytesIO(container.render(4, 4))), "Message 4")
+            with self.assertRaises(IndexError):
+                container.packed(5)
+
+        # Bloc final tronqué (ajout interrompu): l'index est reconstruit en parcourant les symboles
+        with open(path, 'r+b') as f:
+            f.truncate(os.path.getsize(path) - 10)
+        with packed.PackedSymbolFile(path) as container:
+            self.assertEqual(list(container), matrices)
+        with packed.PackedSymbolWriter(path) as writer:
+            self.assertEqual(writer.append(matrices[0]), 5)
+        with packed.PackedSymbolFile(path) as container:
+            self.assertEqual(len(container), 6)
+            self.assertEqual(container.matrix(5), matrices[0])
+
+        # L'index n'est réécrit qu'au flush / à la fermeture; entre-temps l'ancien index est retiré
+        record_size = packed.packed_size()
+        with packed.PackedSymbolWriter(path) as writer:
+            writer.append(matrices[1])
+            writer.append(matrices[2])
+            with packed.PackedSymbolFile(path) as container:
+                # Pas de bloc final: seuls les symboles complets déjà sur disque sont relus (parcours)
+                self.assertIn(len(container), (6, 7, 8))
+            writer.flush()
+            self.assertEqual(os.path.getsize(path), packed._CONTAINER_HEADER.size + 8 * record_size
+                             + 8 * packed._INDEX_ENTRY.size + packed._CONTAINER_TRAILER.size)
+            writer.append(matrices[3])
+        with packed.PackedSymbolFile(path) as container:
+            self.assertEqual(len(container), 9)
+            self.assertEqual(container.matrix(8), matrices[3])
+
+        larger = pf.compile_profile('larger', MATRIX_DIM=41)
+        patches = pf.compile_profile('patches', CCP_CONFIG={**pc.CCP_CONFIG, 'patch_size': 3})
+        with packed.PackedSymbolWriter(path) as writer: # Symboles d'un autre profil: refusés
+            for profile in (larger, patches):
+                with self.subTest(profile.name), self.assertRaisesRegex(ValueError, "another protocol profile"):
+                    matrix = en.encode_message_to_matrix("Other", 20, profile=profile)
+                    writer.append_packed(packed.pack_matrix(matrix, profile))
+            self.assertEqual(len(writer), 9)
+
+        not_container = os.path.join(self.temp_dir, "other.bin")
+        with open(not_container, 'wb') as f:
+            f.write(b"not a container")
+        with self.assertRaises(ValueError):
+            packed.PackedSymbolFile(not_container)
+
+if __name__ == '__main__':
+    unittest.main()
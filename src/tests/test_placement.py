@@ -0,0 +1,88 @@
+import unittest
+
+import src.core.protocol_config as pc
+import src.core.matrix_layout as ml
+import src.core.data_processing as dp
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.placement as pl
+
+class TestPlacement(unittest.TestCase):
+
+    def setUp(self):
+        self.fill_order = ml.get_data_ecc_fill_order()
+        self.header_cells = dp.extended_metadata_length() // pc.BITS_PER_CELL
+
+    def _longest_contiguous_run(self, positions):
+        positions = sorted(positions)
+        longest = current = 1
+        for previous, position in zip(positions, positions[1:]):
+            current = current + 1 if position == previous + 1 else 1
+            longest = max(longest, current)
+        return longest
+
+    def test_permutations_are_bijections_with_fixed_header(self):
+        for name in pc.PLACEMENT_CONFIG['orders']:
+            permutation, inverse = pl.placement_permutation(pl.placement_id(name))
+            self.assertEqual(sorted(permutation), list(range(len(self.fill_order))))
+            self.assertEqual(permutation[:self.header_cells], tuple(range(self.header_cells)))
+            for position, cell_index in enumerate(permutation):
+                self.assertEqual(inverse[cell_index], position)
+        with self.assertRaises(ValueError):
+            pl.placement_id('spiral')
+        with self.assertRaises(ValueError):
+            pl.placement_permutation(3)
+
+    def test_gather_scatter_are_inverse(self):
+        values = [f"v{i}" for i in range(len(self.fill_order))]
+        for name in pc.PLACEMENT_CONFIG['orders']:
+            placement = pl.placement_id(name)
+            cells = pl.stream_to_cells(values, placement)
+            self.assertEqual(pl.cells_to_stream(cells, placement), values)
+            for cell_index in (self.header_cells, len(values) // 2, len(values) - 1):
+                self.assertEqual(values[pl.cell_index_to_stream_position(cell_index, placement)], cells[cell_index])
+
+    def test_row_burst_is_spread_across_the_stream(self):
+        # Rayure horizontale: 20 cellules consécutives d'une ligne de données
+        damaged_row = 20
+        damaged_cells = [i for i, (r, c) in enumerate(self.fill_order) if r == damaged_row][:20]
+        row_positions = [pl.cell_index_to_stream_position(i, pl.placement_id('row')) for i in damaged_cells]
+        self.assertEqual(self._longest_contiguous_run(row_positions), 20)
+        for name in ('block', 'diagonal'):
+            placement = pl.placement_id(name)
+            positions = [pl.cell_index_to_stream_position(i, placement) for i in damaged_cells]
+            self.assertEqual(self._longest_contiguous_run(positions), 1, name)
+
+    def test_column_burst_is_spread_across_the_stream(self):
+        cell_indices = {cell: i for i, cell in enumerate(self.fill_order)}
+        damaged_cells = [cell_indices[(r, 20)] for r in range(8, 28)] # Rayure verticale
+        for name in ('block', 'diagonal'):
+            placement = pl.placement_id(name)
+            positions = [pl.cell_index_to_stream_position(i, placement) for i in damaged_cells]
+            self.assertEqual(self._longest_contiguous_run(positions), 1, name)
+
+    def test_block_interleaving_distance(self):
+        placement = pl.placement_id('block')
+        payload_cells = len(self.fill_order) - self.header_cells
+        min_distance = payload_cells // pc.PLACEMENT_CONFIG['block_depth'] - 1
+        for cell_index in range(self.header_cells, len(self.fill_order) - 1):
+            distance = abs(pl.cell_index_to_stream_position(cell_index + 1, placement)
+                           - pl.cell_index_to_stream_position(cell_index, placement))
+            self.assertGreaterEqual(distance, min_distance)
+
+    def test_encode_decode_each_order(self):
+        for name in pc.PLACEMENT_CONFIG['orders']:
+            message = f"Placement {name}"
+            matrix = en.encode_message_to_matrix(message, pc.DEFAULT_ECC_LEVEL_PERCENT, placement_order=name)
+            image = iu.render_protocol_image(matrix, 3)
+            self.assertEqual(de.decode_image_to_message(image), message)
+
+    def test_base_symbol_only_supports_row_order(self):
+        with self.assertRaisesRegex(ValueError, "extended"):
+            en.encode_message_to_matrix("x", pc.DEFAULT_ECC_LEVEL_PERCENT, mask_id=0, placement_order='block')
+        with self.assertRaisesRegex(ValueError, "set by the encoder"):
+            en.encode_bytes_to_matrix(b"x", pc.DEFAULT_ECC_LEVEL_PERCENT, extended_fields={'placement': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import dataclasses
+import threading
+
+import src.core.protocol_config as pc
+import src.core.profile as pf
+import src.core.matrix_layout as ml
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+
+class TestProfile(unittest.TestCase):
+
+    def test_default_profile_matches_configuration(self):
+        profile = pf.default_profile()
+        self.assertIs(pf.resolve(), profile)
+        self.assertEqual(profile.matrix_dim, pc.MATRIX_DIM)
+        self.assertEqual(dict(profile.bits_to_color), pc.BITS_TO_COLOR_MAP)
+        self.assertEqual(list(profile.fill_order), ml.get_data_ecc_fill_order())
+        self.assertEqual(list(profile.metadata_cells), de.get_metadata_cells())
+        self.assertEqual(profile.capacity_tables[pc.PROTOCOL_VERSION_BASE][20], en.compute_payload_capacity(20))
+        self.assertEqual(profile.capacity_tables[pc.PROTOCOL_VERSION_BASE][20], (1576, 392))
+        self.assertEqual(list(profile.fixed_cells), en.get_fixed_pattern_cells())
+        self.assertEqual(profile.zone_map[6][10], ml.get_cell_zone_type(6, 10))
+
+    def test_profile_is_immutable(self):
+        profile = pf.default_profile()
+        with self.assertRaises(dataclasses.FrozenInstanceError):
+            profile.matrix_dim = 41
+        with self.assertRaises(TypeError):
+            profile.zone_coords['TP_H'] = (0, 0, 0, 0)
+        with self.assertRaises(TypeError):
+            profile.settings['FP_CONFIG']['size'] = 9
+        self.assertIsInstance(profile.settings['CCP_CONFIG']['colors'], tuple)
+
+    def test_invalid_overrides(self):
+        with self.assertRaises(ValueError):
+            pf.compile_profile(QUIET_ZONE=4)
+        with self.assertRaises(ValueError):
+            pf.compile_profile(MATRIX_DIM=20)
+        with self.assertRaises(ValueError): # Couleur des patchs absente de la palette
+            pf.compile_profile(CCP_CONFIG={'patch_size': 2, 'colors': [pc.WHITE, pc.BLACK, pc.BLUE, pc.GREEN]})
+
+    def _round_trip(self, profile, message):
+        bit_matrix = en.encode_message_to_matrix(message, pc.DEFAULT_ECC_LEVEL_PERCENT, profile=profile)
+        self.assertEqual(len(bit_matrix), profile.matrix_dim)
+        image = iu.render_protocol_image(bit_matrix, 8, profile)
+        self.assertEqual(image.size, (profile.matrix_dim * 8, profile.matrix_dim * 8))
+        return image, de.decode_image_to_message(image, profile=profile)
+
+    def test_custom_profiles_round_trip(self):
+        larger = pf.compile_profile('larger', MATRIX_DIM=41)
+        self.assertGreater(larger.payload_bits(), pf.default_profile().payload_bits())
+        self.assertEqual(self._round_trip(larger, "Profil 41x41")[1], "Profil 41x41")
+
+        green = pf.compile_profile(
+            'green',
+            COLOR_TO_BITS_MAP={pc.WHITE: '00', pc.BLACK: '01', pc.GREEN: '10', pc.BLUE: '11'},
+            FP_CONFIG={**pc.FP_CONFIG, 'pattern_colors': [pc.GREEN, pc.BLUE, pc.BLACK, pc.WHITE]},
+            CCP_CONFIG={**pc.CCP_CONFIG, 'colors': [pc.WHITE, pc.BLACK, pc.BLUE, pc.GREEN]},
+        )
+        image, message = self._round_trip(green, "Palette verte")
+        self.assertEqual(message, "Palette verte")
+        self.assertNotIn(pc.RED, {color for _, color in image.getcolors()})
+        self.assertEqual(pc.MATRIX_DIM, 35) # La configuration globale n'est pas modifiée
+        self.assertEqual(pc.COLOR_TO_BITS_MAP[pc.RED], '10')
+
+    def test_derived_artifacts_are_built_once(self):
+        profile = pf.compile_profile('fresh')
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def build():
+            calls.append(1)
+            return object()
+
+        def read(results):
+            barrier.wait()
+            results.append(profile.cached('artifact', build))
+
+        results = []
+        threads = [threading.Thread(target=read, args=(results,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len({id(result) for result in results}), 1)
+        with self.assertRaises(ValueError): # Tableaux partagés en lecture seule
+            profile.palette_array()[0, 0] = 1.0
+
+    def test_profiles_decode_concurrently(self):
+        larger = pf.compile_profile('larger', MATRIX_DIM=41)
+        images = {
+            None: iu.render_protocol_image(en.encode_message_to_matrix("Défaut", 20), 6),
+            larger: iu.render_protocol_image(en.encode_message_to_matrix("Grand", 20, profile=larger), 6, larger),
+        }
+        expected = {None: "Défaut", larger: "Grand"}
+        results, errors = [], []
+
+        def decode(profile):
+            try:
+                for _ in range(3):
+                    results.append(de.decode_image_to_message(images[profile], profile=profile) == expected[profile])
+            except Exception as e: # Remonté au thread principal
+                errors.append(e)
+
+        threads = [threading.Thread(target=decode, args=(profile,)) for profile in (None, larger) * 2]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [True] * 12)
+
+if __name__ == '__main__':
+    unittest.main()
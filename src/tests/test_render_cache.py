@@ -0,0 +1,110 @@
+import unittest
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+import src.core.protocol_config as pc
+import src.core.render_cache as rc
+import src.core.profile as pf
+import src.core.decoder as de
+import src.core.image_utils as iu
+
+class TestRenderCache(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_deterministic_key_gives_identical_bytes(self):
+        first = rc.render_symbol_bytes("Label 42", 20, 4, deterministic_key=True)
+        second = rc.render_symbol_bytes("Label 42", 20, 4, deterministic_key=True)
+        self.assertEqual(first, second)
+        self.assertNotEqual(rc.deterministic_xor_key("Label 42", 20), rc.deterministic_xor_key("Label 43", 20))
+        self.assertEqual(de.decode_image_to_message(iu.load_image_from_file(io.BytesIO(first))), "Label 42")
+
+    def test_hits_and_misses(self):
+        cache = rc.RenderCache(max_bytes=1024 * 1024)
+        first = rc.render_symbol_bytes("Reprint", 20, 4, deterministic_key=True, cache=cache)
+        second = rc.render_symbol_bytes("Reprint", 20, 4, deterministic_key=True, cache=cache)
+        self.assertIs(first, second) # Servi depuis la mémoire
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['entries']), (1, 1, 1))
+        self.assertEqual(stats['bytes'], len(first))
+
+        rc.render_symbol_bytes("Reprint", 20, 8, deterministic_key=True, cache=cache) # Autre taille de cellule
+        self.assertEqual(cache.stats()['misses'], 2)
+
+    def test_random_key_bypasses_cache(self):
+        cache = rc.RenderCache()
+        rc.render_symbol_bytes("Random", 20, 4, cache=cache)
+        self.assertEqual(cache.stats()['entries'], 0)
+
+    def test_lru_eviction_by_byte_size(self):
+        cache = rc.RenderCache(max_bytes=10)
+        cache.put(('a',), b"1234")
+        cache.put(('b',), b"1234")
+        cache.get(('a',)) # 'a' devient le plus récent
+        cache.put(('c',), b"1234") # 12 octets > 10: 'b' est évincé
+        self.assertIsNone(cache.get(('b',)))
+        self.assertEqual(cache.get(('a',)), b"1234")
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertLessEqual(cache.stats()['bytes'], 10)
+
+        cache.put(('huge',), b"x" * 11) # Plus grand que le cache: non conservé
+        self.assertIsNone(cache.get(('huge',)))
+
+    def test_disk_tier(self):
+        key = rc.make_cache_key("Disk", 20, '1' * pc.METADATA_CONFIG['key_bits'], 4, 'png')
+        cache = rc.RenderCache(disk_dir=self.temp_dir)
+        cache.put(key, b"image-bytes")
+        self.assertEqual(len([n for n in os.listdir(self.temp_dir) if n.endswith('.png')]), 1)
+
+        restarted = rc.RenderCache(disk_dir=self.temp_dir) # Nouveau processus: mémoire vide
+        self.assertEqual(restarted.get(key), b"image-bytes")
+        self.assertEqual(restarted.get(key), b"image-bytes")
+        stats = restarted.stats()
+        self.assertEqual((stats['disk_hits'], stats['hits'], stats['misses']), (1, 1, 0))
+
+    def test_key_covers_profile_and_layout_settings(self):
+        xor_key = '1' * pc.METADATA_CONFIG['key_bits']
+        key = rc.make_cache_key("Layout", 20, xor_key, 4, 'png')
+        self.assertEqual(key, rc.make_cache_key("Layout", 20, xor_key, 4, 'PNG', pf.default_profile()))
+        self.assertNotEqual(key, rc.make_cache_key("Layout", 20, xor_key, 4, 'png', pf.compile_profile(MATRIX_DIM=41)))
+        with mock.patch.dict(pc.MASKING_CONFIG, {'enabled': False}):
+            self.assertNotEqual(key, rc.make_cache_key("Layout", 20, xor_key, 4, 'png'))
+        with mock.patch.dict(pc.PLACEMENT_CONFIG, {'default': 'row'}):
+            self.assertNotEqual(key, rc.make_cache_key("Layout", 20, xor_key, 4, 'png'))
+        with mock.patch.object(rc, 'CACHE_FORMAT_VERSION', rc.CACHE_FORMAT_VERSION + 1):
+            self.assertNotEqual(key, rc.make_cache_key("Layout", 20, xor_key, 4, 'png'))
+
+    def test_packed_format_ignores_cell_size(self):
+        cache = rc.RenderCache()
+        first = rc.render_symbol_bytes("Packed", 20, 4, 'sym', deterministic_key=True, cache=cache)
+        self.assertIs(rc.render_symbol_bytes("Packed", 20, 8, 'sym', deterministic_key=True, cache=cache), first)
+        self.assertEqual((cache.stats()['entries'], cache.stats()['hits']), (1, 1))
+
+    def test_disk_tier_is_bounded_and_purgeable(self):
+        keys = [rc.make_cache_key(f"Disk {i}", 20, '1' * pc.METADATA_CONFIG['key_bits'], 4, 'png') for i in range(3)]
+        with open(os.path.join(self.temp_dir, 'notes.txt'), 'w') as f: # Fichier étranger au cache: jamais supprimé
+            f.write("keep")
+        cache = rc.RenderCache(max_bytes=0, disk_dir=self.temp_dir, disk_max_bytes=25)
+        cache.put(keys[0], b"0" * 10)
+        cache.put(keys[1], b"1" * 10)
+        self.assertEqual(cache.get(keys[0]), b"0" * 10) # keys[0] devient le plus récent
+        cache.put(keys[2], b"2" * 10) # 30 octets > 25: keys[1] est supprimé du disque
+        self.assertFalse(os.path.exists(cache._disk_path(keys[1])))
+        stats = cache.stats()
+        self.assertEqual((stats['disk_entries'], stats['disk_bytes'], stats['disk_evictions']), (2, 20, 1))
+
+        restarted = rc.RenderCache(max_bytes=0, disk_dir=self.temp_dir, disk_max_bytes=15) # Fichiers repris puis élagués
+        self.assertEqual(restarted.stats()['disk_entries'], 1)
+        self.assertEqual(restarted.purge_disk(), 1)
+        self.assertIsNone(restarted.get(keys[2]))
+        self.assertEqual(os.listdir(self.temp_dir), ['notes.txt'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+
+import src.core.protocol_config as pc
+import src.core.backends as backends
+import src.core.encoder as en
+import src.core.image_utils as iu
+import src.benchmarks.robustness as rh
+
+class TestRobustness(unittest.TestCase):
+
+    def setUp(self):
+        self.image = iu.render_protocol_image(en.encode_message_to_matrix("Harness", pc.DEFAULT_ECC_LEVEL_PERCENT), 10)
+
+    def _rng(self, seed=7):
+        return backends.numpy().random.default_rng(seed)
+
+    def test_cases_are_reproducible_and_encodable(self):
+        self.assertEqual(rh.make_case(1, 3), rh.make_case(1, 3))
+        self.assertNotEqual(rh.make_case(1, 3), rh.make_case(2, 3))
+        for index in range(10):
+            case = rh.make_case(5, index)
+            self.assertIn(case['ecc'], rh.ECC_LEVELS)
+            en.encode_message_to_matrix(case['message'], case['ecc']) # Tient dans le symbole
+
+    def test_degradations_are_seeded(self):
+        np = backends.numpy()
+        self.assertTrue((np.asarray(rh.degrade_image(self.image, {}, self._rng())) == np.asarray(self.image)).all())
+        for name, params in rh.DEGRADATIONS.items():
+            with self.subTest(degradation=name):
+                first = rh.degrade_image(self.image, params, self._rng())
+                second = rh.degrade_image(self.image, params, self._rng())
+                self.assertEqual(first.mode, "RGB")
+                self.assertTrue((np.asarray(first) == np.asarray(second)).all())
+        self.assertEqual(rh.degrade_image(self.image, {'rescale': 0.5}, self._rng()).size, (175, 175))
+
+    def test_decoder_configuration_is_restored(self):
+        with self.assertRaises(KeyError):
+            with rh.decoder_configuration({'ILLUMINATION_CONFIG': {'enabled': False}}):
+                self.assertFalse(pc.ILLUMINATION_CONFIG['enabled'])
+                raise KeyError("stop")
+        self.assertTrue(pc.ILLUMINATION_CONFIG['enabled'])
+
+    def test_harness_report(self):
+        degradations = {'clean': {}, 'lighting': {'lighting_gradient': 0.7}}
+        configurations = {'default': {}, 'no-illumination': {'ILLUMINATION_CONFIG': {'enabled': False}}}
+        report = rh.run_harness(3, 11, degradations, configurations, workers=1)
+        results = {(r['configuration'], r['degradation']): r for r in report['results']}
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[('default', 'clean')]['success_rate'], 1.0)
+        self.assertGreaterEqual(results[('default', 'lighting')]['decoded'], results[('no-illumination', 'lighting')]['decoded'])
+        self.assertIn('calibrate', results[('default', 'lighting')]['stages_ms'])
+        self.assertGreater(report['decodes_per_s'], 0)
+        table = rh.format_table(report)
+        self.assertIn('no-illumination', table)
+        self.assertIn('lighting', table)
+
+        parallel = rh.run_harness(3, 11, degradations, configurations, workers=2)
+        self.assertEqual([r['decoded'] for r in parallel['results']], [r['decoded'] for r in report['results']])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+import src.benchmarks.scaling as scaling
+
+class TestScaling(unittest.TestCase):
+
+    def test_default_worker_counts(self):
+        self.assertEqual(scaling.default_worker_counts(1), [1])
+        self.assertEqual(scaling.default_worker_counts(6), [1, 2, 4, 6])
+        self.assertEqual(scaling.default_worker_counts(8), [1, 2, 4, 8])
+
+    def test_scaling_report(self):
+        self.assertEqual(scaling.make_jobs(3), scaling.make_jobs(3))
+        report = scaling.run_scaling(items=4, worker_counts=[2], backends=('thread', 'process'))
+        self.assertEqual(report['worker_counts'], [1, 2])
+        self.assertEqual(len(report['results']), 8) # 2 opérations x 2 exécuteurs x 2 nombres de workers
+        for result in report['results']:
+            self.assertEqual((result['items'], result['errors']), (4, 0))
+            self.assertGreater(result['items_per_s'], 0)
+            if result['workers'] == 1:
+                self.assertEqual(result['speedup'], 1.0)
+        table = scaling.format_table(report)
+        self.assertIn('thread', table)
+        self.assertIn('decode', table)
+
+if __name__ == '__main__':
+    unittest.main()
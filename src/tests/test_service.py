@@ -0,0 +1,137 @@
+import unittest
+import http.client
+import json
+import threading
+
+import src.core.service as service
+import src.core.render_cache as rc
+import src.core.packed as packed
+import src.core.encoder as en
+
+class TestService(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = service.EncodeDecodeService(workers=0, max_concurrent_requests=2, max_request_bytes=64 * 1024,
+                                                  render_cache=rc.RenderCache())
+        cls.service.start()
+        cls.server = service.make_server('127.0.0.1', 0, cls.service)
+        cls.port = cls.server.server_address[1]
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        cls.service.close()
+
+    def _request(self, method, path, body=None, headers=None):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+        try:
+            connection.request(method, path, body=body, headers=headers or {})
+            response = connection.getresponse()
+            return response.status, response.getheader('Content-Type'), response.read()
+        finally:
+            connection.close()
+
+    def _encode(self, params):
+        return self._request('POST', '/encode', json.dumps(params).encode('utf-8'), {'Content-Type': 'application/json'})
+
+    def test_health(self):
+        status, _, body = self._request('GET', '/health')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['status'], 'ok')
+
+    def test_encode_decode_round_trip(self):
+        status, content_type, image_bytes = self._encode({'message': "Héllo service", 'cell_size': 4})
+        self.assertEqual(status, 200)
+        self.assertEqual(content_type, 'image/png')
+        self.assertTrue(image_bytes.startswith(b"\x89PNG"))
+
+        status, _, body = self._request('POST', '/decode', image_bytes, {'Content-Type': 'image/png'})
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body)['message'], "Héllo service")
+
+    def test_encode_vector_format(self):
+        status, content_type, body = self._encode({'message': "Vector", 'format': 'svg', 'key': '1010011100101101'})
+        self.assertEqual((status, content_type), (200, 'image/svg+xml'))
+        self.assertIn(b"<svg", body)
+        self.assertEqual(self._encode({'message': "Vector", 'format': 'svg', 'key': '1010011100101101'})[2], body)
+
+        status, content_type, body = self._encode({'message': "Packed", 'format': 'sym', 'key': '1010011100101101'})
+        self.assertEqual((status, content_type), (200, 'application/octet-stream'))
+        self.assertEqual(len(body), 323)
+        self.assertEqual(packed.unpack_matrix(body), en.encode_message_to_matrix("Packed", 20, '1010011100101101'))
+
+    def test_bad_requests(self):
+        self.assertEqual(self._encode({'text': "no message"})[0], 400)
+        self.assertEqual(self._encode({'message': "x", 'format': 'gif'})[0], 400)
+        self.assertEqual(self._encode({'message': "x", 'cell_size': 1000})[0], 400)
+        self.assertEqual(self._encode({'message': "x" * 1000})[0], 400) # Trop long pour un symbole
+        self.assertEqual(self._request('POST', '/decode', b"not an image")[0], 422)
+        self.assertEqual(self._request('GET', '/unknown')[0], 404)
+
+    def test_capacity(self):
+        body = json.dumps({'message': "Héllo", 'ecc': 20}).encode('utf-8')
+        status, _, plan = self._request('POST', '/capacity', body)
+        self.assertEqual(status, 200)
+        self.assertTrue(json.loads(plan)['fits'])
+        status, _, plan = self._request('POST', '/capacity', json.dumps({'message': "x" * 1000}).encode('utf-8'))
+        self.assertEqual(status, 200)
+        self.assertFalse(json.loads(plan)['fits'])
+        self.assertEqual(self._request('POST', '/capacity', json.dumps({'message': "x", 'ecc': 101}).encode('utf-8'))[0], 400)
+
+    def test_request_size_limit(self):
+        status, _, body = self._request('POST', '/decode', b"x" * (64 * 1024 + 1))
+        self.assertEqual(status, 413)
+
+    def test_invalid_content_length(self):
+        for length in ('-1', 'abc'):
+            with self.subTest(length):
+                status, _, body = self._request('POST', '/decode', b"x" * 5000, {'Content-Length': length})
+                self.assertEqual(status, 400)
+                self.assertIn('Content-Length', json.loads(body)['error'])
+        self.assertEqual(self._request('GET', '/health')[0], 200) # Le serveur répond toujours
+
+    def test_concurrency_cap(self):
+        # Les deux créneaux sont pris: la requête suivante est refusée immédiatement.
+        self.assertTrue(self.service.try_acquire_slot())
+        self.assertTrue(self.service.try_acquire_slot())
+        try:
+            status, _, _ = self._encode({'message': "busy"})
+            self.assertEqual(status, 503)
+        finally:
+            self.service.release_slot()
+            self.service.release_slot()
+        self.assertGreaterEqual(self.service.metrics.as_dict()['rejected'], 1)
+
+    def test_metrics(self):
+        self._encode({'message': "metrics", 'cell_size': 2})
+        status, _, body = self._request('GET', '/metrics')
+        self.assertEqual(status, 200)
+        metrics = json.loads(body)
+        self.assertGreaterEqual(metrics['endpoints']['/encode']['requests'], 1)
+        self.assertEqual(metrics['in_flight'], 0)
+
+    def test_render_cache_with_deterministic_key(self):
+        params = {'message': "cached label", 'cell_size': 3, 'deterministic_key': True}
+        _, _, first = self._encode(params)
+        _, _, second = self._encode(params)
+        self.assertEqual(first, second)
+        _, _, body = self._request('GET', '/metrics')
+        self.assertGreaterEqual(json.loads(body)['render_cache']['hits'], 1)
+
+class TestServiceWorkerPool(unittest.TestCase):
+
+    def test_pool_round_trip(self):
+        pool_service = service.EncodeDecodeService(workers=1)
+        pool_service.start()
+        try:
+            image_bytes, _ = pool_service.encode(json.dumps({'message': "pool", 'cell_size': 3}).encode('utf-8'))
+            self.assertEqual(pool_service.decode(image_bytes)['message'], "pool")
+        finally:
+            pool_service.close()
+
+if __name__ == '__main__':
+    unittest.main()
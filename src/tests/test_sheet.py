@@ -0,0 +1,103 @@
+import unittest
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+
+import src.core.protocol_config as pc
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+import src.core.batch as batch
+import src.core.sheet as sheet
+
+class TestSheet(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.messages = [f"Label {i}" for i in range(7)]
+        self.matrices = [en.encode_message_to_matrix(m, pc.DEFAULT_ECC_LEVEL_PERCENT) for m in self.messages]
+        self.layout = sheet.sheet_layout(columns=3, rows=2, cell_pixel_size=3, quiet_zone_cells=2, gap_px=5, margin_px=7)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def _label_box(self, geometry, slot):
+        row, column = divmod(slot, self.layout['columns'])
+        quiet_px = self.layout['quiet_zone_cells'] * self.layout['cell_pixel_size']
+        symbol_px = pc.MATRIX_DIM * self.layout['cell_pixel_size']
+        x = geometry['origin'][0] + column * geometry['pitch_px'] + quiet_px
+        y = geometry['origin'][1] + row * geometry['pitch_px'] + quiet_px
+        return (x, y, x + symbol_px, y + symbol_px)
+
+    def test_geometry(self):
+        geometry = sheet.sheet_geometry(self.layout)
+        label_px = (pc.MATRIX_DIM + 4) * 3
+        self.assertEqual(geometry['label_px'], label_px)
+        self.assertEqual(geometry['grid_size'], (3 * label_px + 2 * 5, 2 * label_px + 5))
+        self.assertEqual(geometry['page_size'], (3 * label_px + 10 + 14, 2 * label_px + 5 + 14))
+        a4 = sheet.sheet_geometry(sheet.sheet_layout(page_size_mm=(210, 297), dpi=300))
+        self.assertEqual(a4['page_size'], (2480, 3508))
+        with self.assertRaisesRegex(ValueError, "does not fit"):
+            sheet.sheet_geometry(sheet.sheet_layout(page_size_mm=(50, 50)))
+        with self.assertRaises(ValueError):
+            sheet.sheet_layout(colums=3)
+
+    def test_labels_match_individual_rendering(self):
+        page = sheet.render_sheet(self.matrices[:5], self.layout)
+        geometry = sheet.sheet_geometry(self.layout)
+        self.assertEqual(page.size, geometry['page_size'])
+        for slot in range(5):
+            label = page.crop(self._label_box(geometry, slot))
+            expected = iu.render_protocol_image(self.matrices[slot], self.layout['cell_pixel_size'])
+            self.assertEqual(label.tobytes(), expected.tobytes(), slot)
+        empty_slot = page.crop(self._label_box(geometry, 5))
+        self.assertEqual(empty_slot.getcolors(), [(empty_slot.width * empty_slot.height, pc.WHITE)])
+        self.assertEqual(de.decode_image_to_message(page.crop(self._label_box(geometry, 3))), self.messages[3])
+
+    def test_none_cells_are_rendered_as_background(self):
+        matrix = [row[:] for row in self.matrices[0]]
+        matrix[20][20] = None
+        page = sheet.render_sheet([matrix], self.layout)
+        label = page.crop(self._label_box(sheet.sheet_geometry(self.layout), 0))
+        self.assertEqual(label.tobytes(), iu.render_protocol_image(matrix, self.layout['cell_pixel_size']).tobytes())
+        with self.assertRaises(ValueError):
+            sheet.render_sheet(self.matrices, self.layout) # 7 symboles pour 6 emplacements
+
+    def test_write_pages(self):
+        png_paths = sheet.write_sheets(iter(self.matrices), os.path.join(self.temp_dir, "labels.png"), self.layout)
+        self.assertEqual([os.path.basename(p) for p in png_paths], ["labels-001.png", "labels-002.png"])
+        page = iu.backends.pil_image().open(png_paths[0])
+        self.assertEqual(tuple(round(v) for v in page.info['dpi']), (300, 300))
+        self.assertEqual(page.convert('RGB').tobytes(), sheet.render_sheet(self.matrices[:6], self.layout).tobytes())
+
+        pdf_path = os.path.join(self.temp_dir, "labels.pdf")
+        self.assertEqual(sheet.write_sheets(self.matrices, pdf_path, self.layout), [pdf_path])
+        with open(pdf_path, 'rb') as f:
+            pdf = f.read()
+        self.assertEqual(re.findall(rb"/Count (\d+)", pdf)[-1], b"2") # Pages ajoutées par mises à jour incrémentales
+        self.assertNotIn(b"/DCTDecode", pdf) # Pas de compression JPEG
+
+    def test_run_sheet(self):
+        source = os.path.join(self.temp_dir, "in.jsonl")
+        with open(source, 'w', encoding='utf-8') as f:
+            for message in self.messages:
+                f.write(json.dumps({'message': message}) + "\n")
+        summary = batch.run_sheet(source, os.path.join(self.temp_dir, "out", "sheet.png"), layout=self.layout,
+                                  progress=batch.ProgressReporter('sheet', stream=io.StringIO(), interval_s=None))
+        self.assertEqual((summary['processed'], summary['errors'], len(summary['pages'])), (7, 0, 2))
+
+    def test_sheet_time_scales_with_pixels(self):
+        layout = sheet.sheet_layout(cell_pixel_size=2) # 8 x 12 étiquettes
+        matrices = [self.matrices[i % len(self.matrices)] for i in range(96)]
+        sheet.render_sheet(matrices[:1], layout) # Chauffe (import NumPy / Pillow)
+        start = time.perf_counter()
+        sheet.render_sheet(matrices, layout)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.assertLess(elapsed_ms, 500.0) # Budget large: quelques dizaines de ms attendues
+
+if __name__ == '__main__':
+    unittest.main()
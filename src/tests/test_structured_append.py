@@ -0,0 +1,97 @@
+import unittest
+import os
+import random
+import tempfile
+
+import src.core.protocol_config as pc
+import src.core.structured_append as sa
+import src.core.encoder as en
+import src.core.decoder as de
+import src.core.image_utils as iu
+
+class TestStructuredAppend(unittest.TestCase):
+
+    def test_header_round_trip(self):
+        header = sa.format_structured_append_header(3, 5, 0xA7)
+        self.assertEqual(len(header), sa.structured_append_header_length())
+        segment = sa.parse_structured_append_segment(header + b"abc")
+        self.assertEqual(segment, {'index': 3, 'total': 5, 'parity': 0xA7, 'data': b"abc"})
+
+    def test_header_value_errors(self):
+        with self.assertRaises(ValueError):
+            sa.format_structured_append_header(5, 5, 0) # index >= total
+        with self.assertRaises(ValueError):
+            sa.format_structured_append_header(0, sa.max_structured_append_symbols() + 1, 0)
+        with self.assertRaises(ValueError):
+            sa.parse_structured_append_segment(b"\x01") # Trop court
+
+    def test_split_message_into_segments(self):
+        message = bytes(range(50))
+        segments = sa.split_message_into_segments(message, 12) # 10 octets de données par segment
+        self.assertEqual(len(segments), 5)
+        parsed = [sa.parse_structured_append_segment(s) for s in segments]
+        self.assertEqual([p['index'] for p in parsed], list(range(5)))
+        self.assertTrue(all(p['total'] == 5 for p in parsed))
+        self.assertEqual(b"".join(p['data'] for p in parsed), message)
+
+        too_long = b"x" * (10 * (sa.max_structured_append_symbols() + 1))
+        with self.assertRaisesRegex(ValueError, "structured append maximum"):
+            sa.split_message_into_segments(too_long, 12)
+
+    def test_assembler_any_order_and_duplicates(self):
+        message = "Structured append " * 5
+        segments = [sa.parse_structured_append_segment(s)
+                    for s in sa.split_message_into_segments(message.encode('utf-8'), 20)]
+        random.Random(0).shuffle(segments)
+
+        assembler = sa.StructuredAppendAssembler()
+        results = []
+        for segment in segments[:-1]:
+            results.append(assembler.add_segment(segment))
+            results.append(assembler.add_segment(segment)) # Scan répété: ignoré
+        self.assertTrue(all(r is None for r in results))
+        self.assertEqual(len(assembler.pending_sequences()), 1)
+
+        self.assertEqual(assembler.add_segment(segments[-1]), message)
+        self.assertEqual(assembler.pending_sequences(), []) # Séquence libérée
+
+    def test_assembler_bounded_pending_sequences(self):
+        assembler = sa.StructuredAppendAssembler(max_pending_sequences=2)
+        for parity in range(5):
+            assembler.add_segment({'index': 0, 'total': 2, 'parity': parity, 'data': b"a"})
+        self.assertEqual([p['parity'] for p in assembler.pending_sequences()], [3, 4])
+
+        evicted = []
+        assembler = sa.StructuredAppendAssembler(max_pending_sequences=2, on_evict=lambda *key: evicted.append(key))
+        for parity in range(4):
+            assembler.add_segment({'index': 0, 'total': 2, 'parity': parity, 'data': b"a"})
+        self.assertEqual(evicted, [(0, 2), (1, 2)])
+
+    def test_encode_decode_multi_symbol_round_trip(self):
+        single_capacity_bits, _ = en.compute_payload_capacity(pc.DEFAULT_ECC_LEVEL_PERCENT)
+        message = "Longue étiquette 😊 " * (single_capacity_bits // 8 // 10)
+        matrices = en.encode_message_to_matrices(message, pc.DEFAULT_ECC_LEVEL_PERCENT)
+        self.assertGreater(len(matrices), 1)
+
+        temp_dir = tempfile.mkdtemp()
+        try:
+            assembler = sa.StructuredAppendAssembler()
+            decoded = None
+            for i, matrix in reversed(list(enumerate(matrices))):
+                path = os.path.join(temp_dir, f"symbol_{i}.png")
+                iu.create_protocol_image(matrix, 4, path)
+                with self.assertRaisesRegex(ValueError, "structured append symbol"):
+                    de.decode_image_to_message(path)
+                decoded = assembler.add_segment(de.decode_image_to_segment(path))
+            self.assertEqual(decoded, message)
+        finally:
+            for name in os.listdir(temp_dir):
+                os.remove(os.path.join(temp_dir, name))
+            os.rmdir(temp_dir)
+
+    def test_encode_message_to_matrices_single_symbol(self):
+        matrices = en.encode_message_to_matrices("Hello", pc.DEFAULT_ECC_LEVEL_PERCENT)
+        self.assertEqual(len(matrices), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import os
+import re
+import shutil
+import tempfile
+import time
+import zlib
+
+import src.core.protocol_config as pc
+import src.core.encoder as en
+import src.core.image_utils as iu
+import src.core.render_cache as rc
+import src.core.vector_output as vo
+
+class TestVectorOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = en.encode_message_to_matrix("Vector output", pc.DEFAULT_ECC_LEVEL_PERCENT, '1010011100101101')
+        self.background = pc.COLOR_TO_BITS_MAP[pc.WHITE]
+
+    def _blank(self):
+        return [[self.background] * pc.MATRIX_DIM for _ in range(pc.MATRIX_DIM)]
+
+    def test_rectangles_cover_exactly_the_foreground_cells(self):
+        rebuilt = self._blank()
+        for r, c, height, width, bits in vo.merged_rectangles(self.matrix):
+            for rr in range(r, r + height):
+                for cc in range(c, c + width):
+                    self.assertEqual(rebuilt[rr][cc], self.background, "Overlapping rectangles")
+                    rebuilt[rr][cc] = bits
+        self.assertEqual(rebuilt, self.matrix)
+
+    def test_merging_reduces_element_count(self):
+        foreground_cells = sum(bits != self.background for row in self.matrix for bits in row)
+        self.assertLess(len(vo.merged_rectangles(self.matrix)), foreground_cells)
+        # Un bloc uni devient un seul rectangle
+        block = self._blank()
+        for r in range(5, 15):
+            block[r][3:20] = ['01'] * 17
+        self.assertEqual(vo.merged_rectangles(block), [(5, 3, 10, 17, '01')])
+
+    def test_svg_paths_match_matrix(self):
+        svg = vo.render_svg(self.matrix, 0.5, 'mm', quiet_zone_cells=2).decode('ascii')
+        self.assertIn('width="19.5mm"', svg)
+        self.assertIn('viewBox="0 0 39 39"', svg)
+        colors = {"#{:02x}{:02x}{:02x}".format(*rgb): bits for rgb, bits in pc.COLOR_TO_BITS_MAP.items()}
+        rebuilt = self._blank()
+        for fill, path in re.findall(r'<path fill="(#[0-9a-f]{6})" d="([^"]*)"/>', svg):
+            for x, y, width, height in re.findall(r'M(\d+) (\d+)h(\d+)v(\d+)h-\d+z', path):
+                for r in range(int(y) - 2, int(y) - 2 + int(height)):
+                    for c in range(int(x) - 2, int(x) - 2 + int(width)):
+                        rebuilt[r][c] = colors[fill]
+        self.assertEqual(rebuilt, self.matrix)
+        self.assertLessEqual(svg.count('<path'), len(pc.COLOR_TO_BITS_MAP))
+
+    def test_pdf_structure_and_content(self):
+        pdf = vo.render_pdf(self.matrix, 2)
+        self.assertTrue(pdf.startswith(b"%PDF-1.4"))
+        xref_offset = int(re.search(rb"startxref\n(\d+)", pdf).group(1))
+        self.assertTrue(pdf[xref_offset:].startswith(b"xref"))
+        for number, offset in enumerate(re.findall(rb"(\d{10}) 00000 n", pdf), start=1):
+            self.assertTrue(pdf[int(offset):].startswith(f"{number} 0 obj".encode('ascii')))
+        self.assertIn(b"/MediaBox [0 0 70.0000 70.0000]", pdf)
+
+        stream = re.search(rb"stream\n(.*)\nendstream", pdf, re.S).group(1)
+        content = zlib.decompress(stream).decode('ascii')
+        rectangle_count = len(re.findall(r"^\d+ \d+ \d+ \d+ re$", content, re.M))
+        self.assertEqual(rectangle_count, len(vo.merged_rectangles(self.matrix)) + 1) # + fond
+
+    def test_output_is_deterministic_and_small(self):
+        for render in (vo.render_svg, vo.render_pdf):
+            first = render(self.matrix)
+            self.assertEqual(first, render([row[:] for row in self.matrix]))
+            self.assertLess(len(first), 10 * 1024)
+
+    def test_vector_files_and_cached_rendering(self):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            for extension in vo.VECTOR_FORMATS:
+                path = os.path.join(temp_dir, f"symbol.{extension}")
+                iu.create_protocol_image(self.matrix, 4, path)
+                with open(path, 'rb') as f:
+                    self.assertEqual(f.read(), vo.render_vector_bytes(self.matrix, extension, 4))
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        cache = rc.RenderCache(1024 * 1024)
+        svg = rc.render_symbol_bytes("Vector output", pc.DEFAULT_ECC_LEVEL_PERCENT, 4, 'svg',
+                                     deterministic_key=True, cache=cache)
+        self.assertTrue(svg.startswith(b"<?xml"))
+        self.assertIs(rc.render_symbol_bytes("Vector output", pc.DEFAULT_ECC_LEVEL_PERCENT, 4, 'svg',
+                                             deterministic_key=True, cache=cache), svg)
+        with self.assertRaises(ValueError):
+            vo.render_vector_bytes(self.matrix, 'eps', 4)
+
+    def test_render_time_budget(self):
+        repeats = 50
+        start = time.perf_counter()
+        for _ in range(repeats):
+            vo.render_svg(self.matrix)
+        mean_ms = (time.perf_counter() - start) * 1000 / repeats
+        self.assertLess(mean_ms, 10.0) # Budget large (< 1 ms attendu) pour les machines chargées
+
+if __name__ == '__main__':
+    unittest.main()